@@ -15,6 +15,14 @@ except ImportError:
     HAS_MARKET_DATA = False
     print("WARNING: market_data_service not available")
 
+try:
+    from services.ohlcv_store import ohlcv_store
+    HAS_OHLCV = True
+except ImportError:
+    ohlcv_store = None
+    HAS_OHLCV = False
+    print("WARNING: ohlcv_store not available")
+
 try:
     from myskills.technical_analyst import TechnicalAnalyst
     HAS_TECHNICAL = True
@@ -39,21 +47,22 @@ def get_stock_price(ticker: str):
     otherwise the search_stocks tool can help find the right ticker.
     """
     try:
-        stock = yf.Ticker(ticker)
-        # Use fast_info to get real-time price if possible, or history
-        info = stock.fast_info
-        price = info.last_price if hasattr(info, 'last_price') else None
-        
-        if price is None:
-            hist = stock.history(period="1d")
-            if not hist.empty:
-                price = hist['Close'].iloc[-1]
+        # Last close from the local OHLCV store (re-checked with Yahoo at most
+        # every OHLCV_REFRESH_MINUTES); live quote for tickers it has no bars for
+        price = ohlcv_store.latest_close(ticker) if HAS_OHLCV else None
+        currency = "INR" if ticker.upper().endswith((".NS", ".BO")) else None
+
+        if price is None or currency is None:
+            info = yf.Ticker(ticker).fast_info
+            if price is None:
+                price = info.last_price if hasattr(info, 'last_price') else None
+            currency = info.currency if hasattr(info, 'currency') else "Unknown"
         
         if price:
             return {
                 "ticker": ticker,
                 "current_price": round(price, 2),
-                "currency": info.currency if hasattr(info, 'currency') else "Unknown"
+                "currency": currency
             }
         return {"error": f"Could not find price for {ticker}"}
     except Exception as e:
@@ -160,10 +169,11 @@ def get_stock_history(ticker: str, period: str = "6mo"):
     Period options: 1mo, 3mo, 6mo, 1y, 2y, 5y, ytd, max.
     Returns a list of data points suitable for the 'chart' UI component.
     """
+    if not HAS_OHLCV:
+        return {"error": "Price history not available in this environment"}
     try:
-        stock = yf.Ticker(ticker)
-        # Get history with auto-adjustment
-        hist = stock.history(period=period)
+        # Local bars (adjusted like yfinance's auto_adjust); only missing days are downloaded
+        hist = ohlcv_store.history(ticker, period=period)
         
         if hist.empty:
             return {"error": f"No history found for {ticker}"}
@@ -19,7 +19,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import logging
 
 from database.db_config import db_config
-from database.stock_populator import StockDataPopulator, StockListFetcher
+from database.stock_populator import StockDataPopulator
+from services.refresh_scheduler import view_tracker
 from services.screener_db_service import db_screener
 from cache_config import cache  # Import cache wrapper
 
@@ -71,32 +72,34 @@ def init_database():
 @db_routes.route("/populate", methods=["POST"])
 def populate_stocks():
     """
-    Populate database with stock list.
+    Sync the stock list with the NSE/BSE listing files.
+
+    Listings are merged by ISIN, so both exchanges are ingested in one pass.
 
     Query params:
-        - exchange: 'NSE' or 'BSE' (default: NSE)
+        - dry_run: If true, only return the listing/delisting diff
     """
     try:
-        exchange = request.args.get("exchange", "NSE")
+        dry_run = request.args.get("dry_run", "false").lower() == "true"
 
-        # Fetch stock list
-        logger.info(f"Fetching {exchange} stock list...")
+        logger.info(f"Syncing stock universe (dry_run={dry_run})...")
 
-        if exchange == "NSE":
-            stock_list = StockListFetcher.get_nse_stock_list()
-        else:
-            return jsonify(
-                {"status": "error", "message": f"Exchange {exchange} not yet supported"}
-            ), 400
+        if dry_run:
+            from database.universe_ingestor import universe_ingestor
 
-        # Populate database
-        populator = StockDataPopulator()
-        result = populator.populate_initial_stocks(stock_list)
+            result = universe_ingestor.sync(dry_run=True)
+            message = (
+                f"{len(result['inserts'])} new listings, "
+                f"{len(result['delistings'])} delistings"
+            )
+        else:
+            result = StockDataPopulator().sync_universe()
+            message = f"Populated {result['inserted']} stocks"
 
         return jsonify(
             {
                 "status": "success",
-                "message": f"Populated {result['inserted']} stocks",
+                "message": message,
                 "data": result,
             }
         )
@@ -152,6 +155,44 @@ def get_database_stats():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@db_routes.route("/changes", methods=["GET"])
+def list_changes():
+    """
+    Stock field changes recorded after a cursor (change-data-capture feed).
+
+    Query params:
+        - since: Cursor returned by the previous call (default: 0)
+        - limit: Max changes (default: 1000, max 5000)
+        - fields: Comma-separated column names to include
+    """
+    try:
+        from services.change_log import change_log
+
+        since = max(int(request.args.get("since", 0)), 0)
+        limit = max(min(int(request.args.get("limit", 1000)), 5000), 1)
+        fields = [
+            field
+            for field in request.args.get("fields", "").split(",")
+            if re.match(r"^[a-z0-9_]{1,64}$", field)
+        ]
+
+        batch = change_log.changes_since(since, limit=limit, fields=fields)
+        return jsonify(
+            {
+                "status": "success",
+                "data": batch["changes"],
+                "cursor": batch["cursor"],
+                "has_more": batch["has_more"],
+            }
+        )
+
+    except ValueError:
+        return jsonify({"status": "error", "message": "since and limit must be integers"}), 400
+    except Exception as e:
+        logger.error(f"Change feed error: {e}")
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
 @db_routes.route("/stocks", methods=["GET"])
 @cache.cached(timeout=60, query_string=True)
 def list_stocks():
@@ -227,9 +268,15 @@ def list_stocks():
 
 
 @db_routes.route("/stocks/<nse_code>", methods=["GET"])
-@cache.memoize(timeout=300)
 def get_stock_details(nse_code: str):
     """Get detailed stock information"""
+    # Count the view before the cache so popular stocks get refreshed first
+    view_tracker.record(nse_code)
+    return _get_stock_details(nse_code)
+
+
+@cache.memoize(timeout=300)
+def _get_stock_details(nse_code: str):
     try:
         query = "SELECT * FROM stocks WHERE nse_code = ?"
         stock = db_config.execute_query(query, (nse_code,), fetch_one=True)
@@ -264,9 +311,7 @@ def refresh_database():
 
         # Step 1: Update stock list
         logger.info("Refreshing stock list...")
-        stock_list = StockListFetcher.get_nse_stock_list()
-        pop_result = populator.populate_initial_stocks(stock_list)
-        results["populate"] = pop_result
+        results["populate"] = populator.sync_universe()
 
         # Step 2: Enrich stocks
         logger.info("Enriching stock data...")
@@ -1,3 +1,4 @@
+import hashlib
 import json
 import os
 import sys
@@ -5,7 +6,7 @@ import threading
 
 import numpy as np
 import pandas as pd
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, make_response, request, stream_with_context
 from flask_cors import CORS
 from dotenv import load_dotenv
 from flask_jwt_extended import jwt_required, get_jwt_identity
@@ -46,6 +47,7 @@ app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY", "super-secret-ke
 from models import db
 from auth import auth_bp, bcrypt, jwt
 from cache_config import cache  # Import cache extension
+from cache_utils import compress_response
 from portfolio_routes import portfolio_bp
 from debt_optimizer_routes import debt_optimizer_bp
 from chat_routes import chat_bp
@@ -99,6 +101,15 @@ def add_security_headers(response):
 with app.app_context():
     db.create_all()
 
+# create_all never alters existing tables: add the columns the models expect
+# (users.analysis_version, user_portfolio.quantity, ...) before serving.
+# Every migration is idempotent.
+try:
+    from database.migrations import run_migrations
+    run_migrations()
+except Exception as e:
+    print(f"⚠️ Startup migrations failed: {e}")
+
 # Enable CORS
 CORS(
     app,
@@ -146,73 +157,51 @@ def upload_files():
     files = request.files.getlist("files[]")
     saved_files = []
     stocks_added = 0
-    
-    from models import UserPortfolio, db
+    duplicates = 0
+    quantities = 0
+    errors = []
+    error_count = 0
+
+    from services.portfolio_upload import UploadError, portfolio_uploader
 
     for file in files:
         if file.filename == "":
             continue
         if file:
             filename = file.filename
-            # Process file immediately to DB (don't rely on fs)
+            # Stream the file straight into the portfolio (don't rely on fs)
             try:
-                # Read file into pandas
-                if filename.endswith('.csv'):
-                    df = pd.read_csv(file)
-                else:
-                    df = pd.read_excel(file)
-                
-                # Normalize columns
-                df.columns = df.columns.astype(str).str.strip()
-                
-                # Find stock column
-                stock_col = None
-                code_col = None
-                
-                possible_names = ['Stock Name', 'Symbol', 'Ticker', 'Company']
-                possible_codes = ['NSE Code', 'ISIN', 'Symbol', 'Code']
-                
-                for col in df.columns:
-                    if col in possible_names:
-                        stock_col = col
-                    if col in possible_codes:
-                        code_col = col
-                        
-                if stock_col:
-                    stocks = df[stock_col].dropna().unique()
-                    
-                    # Add to UserPortfolio
-                    for stock in stocks:
-                        stock_name = str(stock).strip()
-                        if not stock_name:
-                            continue
-                            
-                        # Check exist
-                        existing = UserPortfolio.query.filter_by(
-                            user_id=user_id, 
-                            stock_name=stock_name
-                        ).first()
-                        
-                        if not existing:
-                            new_item = UserPortfolio(
-                                user_id=user_id,
-                                stock_name=stock_name
-                            )
-                            db.session.add(new_item)
-                            stocks_added += 1
-                    
-                    db.session.commit()
-                    saved_files.append(filename)
+                result = portfolio_uploader.import_file(user_id, file.stream, filename)
+            except UploadError as e:
+                # Skip this file, keep the others
+                errors.append({"file": filename, "row": None, "value": None, "error": str(e)})
+                error_count += 1
+                continue
             except Exception as e:
                 print(f"Error processing file {filename}: {e}")
                 return jsonify({"status": "error", "message": f"Failed to process {filename}: {str(e)}"}), 500
 
+            saved_files.append(filename)
+            stocks_added += result["added"]
+            duplicates += result["duplicates"]
+            quantities += result["quantities"]
+            errors += [{"file": filename, **error} for error in result["errors"]]
+            error_count += result["error_count"]
+
+    message = f"Processed {len(saved_files)} files. Added {stocks_added} new stocks to portfolio."
+    if error_count:
+        message += f" {error_count} rows or files could not be imported (see errors)."
+
     return jsonify(
         {
             "status": "success",
-            "message": f"Processed {len(saved_files)} files. Added {stocks_added} new stocks to portfolio.",
+            "message": message,
             "files": saved_files,
-            "stocks_added": stocks_added
+            "stocks_added": stocks_added,
+            "duplicates": duplicates,
+            "quantities_set": quantities,
+            "errors": errors,
+            "error_count": error_count,
         }
     )
 
@@ -273,28 +262,41 @@ def process_data():
             
             # Start background task (always use multi-source)
             task = process_portfolio_task.delay(user_id, use_multi_source=True)
+
+            # First event, so the stream knows the task before a worker picks it up
+            from services.progress_stream import ProgressPublisher
+            ProgressPublisher(task.id).publish("progress", {
+                "current": 0, "total": 100, "percent": 0, "message": "Task is waiting to start..."
+            })
             
             return jsonify({
                 "status": "processing",
                 "task_id": task.id,
                 "message": "Portfolio processing started in background",
-                "check_status_url": f"/api/process/status/{task.id}"
+                "check_status_url": f"/api/process/status/{task.id}",
+                "stream_url": f"/api/process/stream/{task.id}"
             })
             
         except Exception as celery_error:
-            # Fallback to synchronous processing (using task logic directly)
-            print(f"Celery error ({celery_error}), running synchronously...")
-            from tasks.portfolio_tasks import process_portfolio_task
-            
-            # Run synchronously (blocking)
-            # We use apply() to run the task locally
-            result = process_portfolio_task.apply(args=[user_id, True])
-            
-            # Since it's sync, user will wait (might timeout on Vercel if >10s)
+            # No broker: run the task on the bounded in-process job runner
+            # instead of blocking this request (same task ID / status API)
+            print(f"Celery error ({celery_error}), queueing in-process job...")
+            from services.job_runner import JobQueueFull
+            from services.worker_jobs import submit_portfolio_job
+
+            try:
+                job = submit_portfolio_job(user_id)
+            except JobQueueFull as e:
+                response = jsonify({"status": "error", "message": "Too many portfolios processing, please retry shortly"})
+                return response, 429, {"Retry-After": str(e.retry_after)}
+
+            job_id = job["job_id"]
             return jsonify({
-                 "status": "completed",
-                 "message": "Portfolio processed successfully (Synchronous)",
-                 "data": "Refresh results page"
+                "status": "processing",
+                "task_id": job_id,
+                "message": "Portfolio processing started in background (in-process)",
+                "check_status_url": f"/api/process/status/{job_id}",
+                "stream_url": f"/api/process/stream/{job_id}"
             })
             
     except Exception as e:
@@ -317,6 +319,13 @@ def check_process_status(task_id):
         }
     """
     try:
+        from services.job_runner import job_runner
+
+        # Tasks run in-process (no broker) live in the jobs table
+        job = job_runner.status(task_id)
+        if job is not None:
+            return jsonify(_job_process_status(job))
+
         from celery_app import celery_app
         
         task = celery_app.AsyncResult(task_id)
@@ -347,6 +356,60 @@ def check_process_status(task_id):
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+def _job_process_status(job):
+    """In-process job status in the shape of a Celery task status"""
+    from services.progress_stream import latest_event
+
+    response = {"task_id": job["job_id"]}
+    if job["status"] == "queued":
+        response.update(status="PENDING", message="Task is waiting to start...")
+    elif job["status"] == "running":
+        progress = latest_event(job["job_id"], "progress") or {}
+        response.update(
+            status="PROGRESS", progress=progress, message=progress.get("message", "Processing...")
+        )
+    elif job["status"] == "completed":
+        response.update(status="SUCCESS", result=job["result"], message="Processing completed successfully")
+    elif job["status"] == "cancelled":
+        response.update(status="REVOKED", message="Processing was cancelled")
+    else:
+        response.update(status="FAILURE", error=job["error"], message="Processing failed")
+    return response
+
+
+@app.route("/api/process/stream/<task_id>", methods=["GET"])
+def stream_process_status(task_id):
+    """
+    Server-sent events for a processing task (instead of polling /status).
+
+    Events:
+        progress - {current, total, percent, message}
+        result   - {symbol, data, quality, completed, total}, one per holding
+        done     - the task result
+        error    - {message}
+
+    Events from before the connection are replayed; on reconnect the
+    Last-Event-ID header skips what the client already has. Streams close
+    after a few seconds and the browser reconnects, so a sync worker is never
+    held past its timeout. Unknown task IDs get a 404.
+    """
+    from services.job_runner import job_runner
+    from services.progress_stream import has_events, sse_stream
+
+    if job_runner.status(task_id) is None and not has_events(task_id):
+        return jsonify({"status": "error", "message": "Unknown task"}), 404
+
+    last_event_id = request.headers.get("Last-Event-ID", type=int)
+    return Response(
+        stream_with_context(sse_stream(task_id, last_event_id)),
+        mimetype="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",  # Don't let nginx buffer the stream
+        },
+    )
+
+
 @app.route("/api/stock/<symbol>/multi_source_data", methods=["GET"])
 def get_multi_source_data(symbol):
     """
@@ -369,7 +432,19 @@ def get_multi_source_data(symbol):
 
 @app.route("/api/results", methods=["GET"])
 @jwt_required(optional=True)
+@compress_response()
 def get_results():
+    """
+    The user's portfolio analysis.
+
+    Query params:
+        - since: Only rows changed after this version (from a previous response)
+        - fields: Comma-separated keys to return per row (default: all)
+        - limit / offset: Page through rows (default: all rows)
+
+    The ETag is the user's analysis version (plus the query), so a matching
+    If-None-Match returns 304 before any analysis row is read.
+    """
     user_id = get_jwt_identity()
     
     # If anonymous, we can't fetch personalized results easily unless we track session
@@ -378,27 +453,81 @@ def get_results():
         return jsonify({"status": "error", "message": "Login required to view analysis results"}), 401
 
     try:
-        from models import UserAnalysis
-        
-        # Fetch from DB
-        analyses = UserAnalysis.query.filter_by(user_id=user_id).all()
-        
-        if not analyses:
+        from models import User, UserAnalysis, db
+
+        version = db.session.query(User.analysis_version).filter(User.id == user_id).scalar() or 0
+
+        query_key = hashlib.md5(
+            "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True))).encode()
+        ).hexdigest()[:12]
+        etag = f"{user_id}-{version}-{query_key}"
+        # Version 0: analysis saved before versions were tracked, no ETag
+        if version and request.if_none_match.contains_weak(etag):
+            response = make_response("", 304)
+            response.set_etag(etag, weak=True)
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+
+        # ?since=<version>: only rows changed after the version from the last poll
+        since = request.args.get("since", type=int)
+        fields = [f.strip() for f in request.args.get("fields", "").split(",") if f.strip()]
+        limit = request.args.get("limit", type=int)
+        offset = max(request.args.get("offset", 0, type=int), 0)
+
+        query = UserAnalysis.query.filter_by(user_id=user_id)
+        total = query.count()
+        if total == 0:
             return jsonify({
                 "status": "error", 
                 "message": "No analysis found. Please upload portfolio and click Process."
             }), 404
+        if not version:
+            version = (
+                db.session.query(db.func.max(UserAnalysis.version))
+                .filter(UserAnalysis.user_id == user_id)
+                .scalar()
+            ) or 0
+
+        if since is not None:
+            query = query.filter(UserAnalysis.version > since)
+        query = query.order_by(UserAnalysis.stock_name)
+        if limit is not None:
+            limit = max(min(limit, 500), 1)  # Max 500
+            matching = query.count() if since is not None else total
+            query = query.offset(offset).limit(limit)
+        analyses = query.all()
             
         # Convert to list of dicts
         # Flatten the structure: merge metadata with analysis_data
         records = []
         for analysis in analyses:
             record = analysis.analysis_data or {}
+            if fields:
+                record = {key: record.get(key) for key in fields}
             record['Stock Name'] = analysis.stock_name
             record['NSE Code'] = analysis.nse_code
+            record['_version'] = analysis.version
             records.append(record)
-            
-        return jsonify({"status": "success", "data": records})
+
+        payload = {"status": "success", "data": records, "version": version}
+        if limit is not None:
+            payload["pagination"] = {
+                "limit": limit,
+                "offset": offset,
+                "total": matching,
+                "has_more": (offset + limit) < matching,
+            }
+        if since is not None:
+            # Current holdings, so pollers can drop ones removed since
+            payload["symbols"] = [
+                name for (name,) in db.session.query(UserAnalysis.stock_name).filter_by(user_id=user_id)
+            ]
+
+        response = make_response(jsonify(payload))
+        if version:
+            response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
 
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
@@ -715,26 +844,10 @@ def health_check():
 def run_database_migrations():
     """Run database migrations to add new columns (safe to run multiple times)"""
     try:
-        migrations = [
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS durability_score INTEGER",
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS valuation_score INTEGER",
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS momentum_score INTEGER",
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS roce_annual_pct DECIMAL(10,2)",
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS earnings_yield_pct DECIMAL(10,2)",
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS rel_strength_score INTEGER",
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS target_price DECIMAL(10,2)",
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS recommendation_key VARCHAR(50)",
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS analyst_count INTEGER",
-        ]
-        
-        results = []
-        for i, migration in enumerate(migrations, 1):
-            try:
-                db_config.execute_query(migration)
-                results.append({"migration": i, "status": "success"})
-            except Exception as e:
-                results.append({"migration": i, "status": "skipped", "reason": str(e)[:100]})
-        
+        from database.migrations import run_migrations
+
+        results = run_migrations()
+
         return jsonify({
             "status": "success",
             "message": "Database migrations completed",
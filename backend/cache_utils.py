@@ -47,3 +47,59 @@ def cache_response(max_age=3600, etag=True):
         
         return decorated_function
     return decorator
+
+
+def compress_response(min_size=1024, level=6):
+    """
+    Decorator to gzip/brotli-compress large responses per Accept-Encoding.
+
+    Brotli is used when the client accepts it and the `brotli` package is
+    installed; otherwise gzip. Bodies under `min_size` bytes are sent as-is.
+
+    Usage:
+        @app.route("/api/something")
+        @compress_response()
+        def something():
+            return jsonify(data)
+    """
+    import gzip
+
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            result = f(*args, **kwargs)
+            if not isinstance(result, tuple):
+                response = make_response(result)
+            else:
+                response = make_response(*result)
+
+            response.vary.add('Accept-Encoding')
+            if (
+                response.status_code != 200
+                or response.direct_passthrough
+                or 'Content-Encoding' in response.headers
+            ):
+                return response
+
+            content = response.get_data()
+            if len(content) < min_size:
+                return response
+
+            accepted = request.accept_encodings
+            if brotli is not None and accepted['br']:
+                # Brotli quality 0-11; map the gzip-style level onto it
+                response.set_data(brotli.compress(content, quality=min(level, 11)))
+                response.headers['Content-Encoding'] = 'br'
+            elif accepted['gzip']:
+                response.set_data(gzip.compress(content, compresslevel=level))
+                response.headers['Content-Encoding'] = 'gzip'
+
+            return response
+
+        return decorated_function
+    return decorator
@@ -4,6 +4,10 @@ Celery application for background tasks.
 Usage:
     # Start worker
     celery -A celery_app worker --loglevel=info
+
+    # Start scheduler (periodic refresh, symbol queue, nightly technicals;
+    # deployed as klyx-celery-beat in render.yaml - run exactly one)
+    celery -A celery_app beat --loglevel=info
     
     # Monitor tasks
     celery -A celery_app events
@@ -15,6 +19,7 @@ Prerequisites:
 
 import os
 from celery import Celery
+from celery.schedules import crontab
 
 # Redis connection URL
 # Development: redis://localhost:6379/0
@@ -59,6 +64,36 @@ celery_app.conf.update(
     task_max_retries=3,
 )
 
+# Periodic jobs (run with: celery -A celery_app beat)
+try:
+    from config import config as app_config
+
+    refresh_interval = app_config.REFRESH_INTERVAL_SECONDS
+except ImportError:
+    refresh_interval = 300
+
+celery_app.conf.beat_schedule = {
+    # Priority-ordered refresh: prices intraday, fundamentals off-hours
+    'scheduled-refresh': {
+        'task': 'tasks.scheduled_refresh',
+        'schedule': float(refresh_interval),
+        'options': {'expires': refresh_interval},  # Drop ticks that queued too long
+    },
+    # Names that missed the symbol master, resolved in small batches
+    'resolve-symbol-queue': {
+        'task': 'tasks.resolve_symbol_queue',
+        'schedule': 600.0,
+        'options': {'expires': 600},
+    },
+    # Technical indicators from the day's bars, after the closing price pass
+    # (17:00 IST; the beat runs in UTC)
+    'nightly-technicals': {
+        'task': 'tasks.compute_technicals',
+        'schedule': crontab(hour=11, minute=30, day_of_week='mon-fri'),
+        'options': {'expires': 3600},
+    },
+}
+
 # Import tasks explicitly (autodiscover has path issues)
 # This ensures tasks are registered when celery_app is imported
 try:
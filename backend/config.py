@@ -41,6 +41,147 @@ class Config:
     # Cache settings
     ENABLE_CACHE = True
     CACHE_TTL_MINUTES = 15
+    CACHE_STALE_TTL_MINUTES = 60  # Serve stale data while refreshing in background
+    CACHE_MAX_ENTRIES = 2048  # In-process LRU bound (Redis tier is shared)
+
+    # Single-flight fetches (see services/single_flight.py): one fetch per
+    # symbol + field classes at a time, across threads and processes
+    SINGLE_FLIGHT_LEASE_SECONDS = 60  # Redis lease; longer than a slow multi-source fetch
+    SINGLE_FLIGHT_RESULT_SECONDS = 30  # How long waiting workers can pick up the result
+
+    # Record/replay cache for external sources (see services/http_cache.py)
+    # Modes: 'off', 'cache', 'record', 'replay'
+    HTTP_CACHE_MODE = os.getenv("KLYX_HTTP_CACHE", "off")
+    HTTP_CACHE_PATH = os.getenv(
+        "KLYX_HTTP_CACHE_PATH",
+        os.path.join(os.path.dirname(__file__), "database", "http_cache.db"),
+    )
+    HTTP_CACHE_DEFAULT_TTL = 3600
+    # Per-endpoint TTLs in seconds (matched against host or call endpoint name)
+    HTTP_CACHE_TTLS = {
+        "nseindia.com": 300,
+        "nse.quote": 300,
+        "yahoo.com": 900,
+        "yfinance.fundamentals": 6 * 3600,
+        "moneycontrol.com": 24 * 3600,
+        "moneycontrol.fundamentals": 7 * 24 * 3600,
+        "moneycontrol.shareholding": 7 * 24 * 3600,
+        "news.google.com": 1800,
+        "alphavantage.co": 24 * 3600,
+    }
+    # Query params left out of cache keys (secrets and cache-busters)
+    HTTP_CACHE_IGNORED_PARAMS = ["apikey", "crumb", "_"]
+    # Only requests to these market-data hosts (and their subdomains) are cached
+    HTTP_CACHE_HOSTS = [
+        "nseindia.com",
+        "yahoo.com",
+        "moneycontrol.com",
+        "news.google.com",
+        "alphavantage.co",
+    ]
+    # Requests carrying any of these headers are never cached
+    HTTP_CACHE_AUTH_HEADERS = ["authorization", "proxy-authorization", "x-api-key"]
+
+    # Refresh scheduler (see services/refresh_scheduler.py)
+    REFRESH_INTERVAL_SECONDS = 300  # Celery beat tick
+    REFRESH_LOCK_SECONDS = 1800  # Overlap guard; frees the lock if a run dies
+    # Freshness policy: a field class is refetched only once older than its TTL,
+    # and sources whose field classes are all fresh are not called
+    # (see FreshnessPolicy in services/refresh_scheduler.py)
+    FIELD_CLASS_TTL_MINUTES = {
+        "price": 15,  # Outside market hours: fresh once it covers the last close
+        "technicals": 24 * 60,
+        "quarterly": 7 * 24 * 60,  # Ratios, margins, analyst estimates (also due after results)
+        "annual": 90 * 24 * 60,  # Annual statements
+        "shareholding": 30 * 24 * 60,  # Filed quarterly
+        "static": 180 * 24 * 60,  # Sector / industry classification
+    }
+    # Stocks per tick, sized to finish within one interval
+    # (prices: batched yf.download; fundamentals: ~10 stocks/min multi-source)
+    REFRESH_BATCH_SIZES = {
+        "price": 1000,
+        "fundamentals": 50,
+    }
+    CLOSING_PRICE_WINDOW_MINUTES = 60  # Price pass right after the NSE close
+
+    # Background jobs (see services/job_runner.py)
+    JOB_LEASE_SECONDS = 120  # A running job with no heartbeat for this long is resumed
+    # Max running jobs per type (others wait in the queue)
+    JOB_CONCURRENCY_LIMITS = {
+        "enrich": 1,
+        "populate": 1,
+        "refresh": 1,
+        "sync-fundamentals": 1,
+        "portfolio": 2,  # In-process /api/process fallback (no Celery broker)
+    }
+    # Max queued jobs per type before submissions get 429 (types not listed are unbounded)
+    JOB_QUEUE_LIMITS = {
+        "portfolio": 20,
+    }
+    JOB_RETRY_AFTER_SECONDS = 30  # Retry-After sent with a 429 when a queue is full
+
+    # Portfolio risk analytics (see services/portfolio_risk.py)
+    PRICE_PANEL_CACHE_SECONDS = 300  # Aligned price panels reused across requests
+
+    # Local daily OHLCV bars per Yahoo ticker (see services/ohlcv_store.py)
+    OHLCV_STORE_PATH = os.getenv(
+        "OHLCV_STORE_PATH",
+        os.path.join(os.path.dirname(__file__), "database", "ohlcv"),
+    )
+    OHLCV_REFRESH_MINUTES = 15  # History reads within this of the last check skip Yahoo
+
+    # Universe-wide technical indicators (see services/technical_indicators.py)
+    TECHNICALS_HISTORY_DAYS = 252  # Trading days per stock (SMA 200 and 1-year beta)
+    TECHNICALS_MAX_STALE_DAYS = 7  # Skip stocks whose last bar is older than this
+
+    # Portfolio optimizer (see services/portfolio_optimizer.py)
+    OPTIMIZER_RISK_FREE_RATE = 0.065  # Annual, for Sharpe ratios (~ 91-day T-bill)
+    OPTIMIZER_MAX_ITERATIONS = 500  # SLSQP iteration cap per solve
+
+    # Chunked enrichment (Celery chord; see tasks/portfolio_tasks.py)
+    ENRICH_CHUNK_SIZE = 20  # Stocks per subtask - small chunks spread evenly over workers
+    # Materialized screener presets: rebuilt after enrichment, dropped after
+    # price / technicals refreshes
+    PRESET_CACHE_TTL_MINUTES = 24 * 60
+
+    # Universe ingestion from exchange listing files (see database/universe_ingestor.py)
+    # Local copies take precedence over the download URLs when set
+    NSE_EQUITY_LIST_URL = "https://nsearchives.nseindia.com/content/equities/EQUITY_L.csv"
+    NSE_EQUITY_LIST_PATH = os.getenv("NSE_EQUITY_LIST_PATH")
+    BSE_SCRIP_MASTER_URL = (
+        "https://api.bseindia.com/BseIndiaAPI/api/ListofScripData/w"
+        "?Group=&Scripcode=&industry=&segment=Equity&status=Active"
+    )
+    BSE_SCRIP_MASTER_PATH = os.getenv("BSE_SCRIP_MASTER_PATH")
+    NSE_MAINBOARD_SERIES = ["EQ", "BE", "BZ"]  # SME (SM/ST) and debt series are excluded
+    # Refuse to mark more than this share of active stocks delisted in one run
+    # (a truncated listing file would otherwise "delist" half the universe)
+    UNIVERSE_MAX_DELIST_FRACTION = 0.05
+
+    # Change-data-capture log of stock field updates (see services/change_log.py)
+    CHANGE_LOG_RETENTION_DAYS = 30
+    # A change id behind a gap is held back this long: the missing id may
+    # belong to a transaction that is still committing
+    CHANGE_LOG_SETTLE_SECONDS = 60
+
+    # Shareholding (see services/shareholding_store.py)
+    SHAREHOLDING_RECHECK_HOURS = 24  # Re-check a company whose latest filing is not out yet
+    MONEYCONTROL_POOL_SIZE = 10  # Keep-alive connections per host
+    MONEYCONTROL_RETRIES = 3  # Retries on connection errors / 429 / 5xx (exponential backoff)
+    MONEYCONTROL_TIMEOUT = 15
+
+    # Portfolio upload (see services/portfolio_upload.py)
+    UPLOAD_CHUNK_SIZE = 1000  # Rows parsed and inserted per batch
+    UPLOAD_MAX_ERRORS = 100  # Per-row errors returned in the response (all are counted)
+
+    # Relative Strength (see StockDataPopulator._update_relative_strength)
+    # Composite return = weighted mean of the available horizons
+    RS_HORIZON_WEIGHTS = {
+        "month_change_pct": 0.2,
+        "qtr_change_pct": 0.2,
+        "half_year_change_pct": 0.2,
+        "year_1_change_pct": 0.4,
+    }
 
     # Logging
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -14,6 +14,38 @@ import psycopg2
 from psycopg2.extras import RealDictCursor
 
 
+class Transaction:
+    """Cursor wrapper for locked_transaction (same conventions as execute_query)"""
+
+    def __init__(self, cursor, is_postgres: bool):
+        self.cursor = cursor
+        self.is_postgres = is_postgres
+        self.for_update = " FOR UPDATE" if is_postgres else ""
+
+    def _sql(self, query: str) -> str:
+        return query.replace("?", "%s") if self.is_postgres else query
+
+    def execute(self, query: str, params: tuple = None, fetch_one: bool = False):
+        self.cursor.execute(self._sql(query), params or ())
+        if query.strip().upper().startswith("SELECT"):
+            if fetch_one:
+                result = self.cursor.fetchone()
+                return dict(result) if result else None
+            return [dict(row) for row in self.cursor.fetchall()]
+        return self.cursor.rowcount
+
+    def execute_many(self, query: str, params_list: list):
+        if not params_list:
+            return 0
+        if self.is_postgres:
+            from psycopg2.extras import execute_batch
+
+            execute_batch(self.cursor, self._sql(query), params_list, page_size=500)
+        else:
+            self.cursor.executemany(query, params_list)
+        return self.cursor.rowcount
+
+
 class DatabaseConfig:
     """Database configuration manager"""
 
@@ -104,11 +136,70 @@ class DatabaseConfig:
 
     def execute_many(self, query: str, params_list: list):
         """Execute query with multiple parameter sets"""
+        is_postgres = self.is_production and self.postgres_url
+        if is_postgres:
+            query = query.replace("?", "%s")
+
         with self.get_connection() as conn:
             cursor = conn.cursor()
-            cursor.executemany(query, params_list)
+            if is_postgres:
+                # executemany is one round trip per row on psycopg2; batch instead
+                from psycopg2.extras import execute_batch
+
+                execute_batch(cursor, query, params_list, page_size=500)
+            else:
+                cursor.executemany(query, params_list)
             return cursor.rowcount
 
+    def execute_transaction(self, statements: list):
+        """
+        Execute several parameterized statements in one transaction.
+
+        Args:
+            statements: List of (query, params_list) tuples; empty params_list entries are skipped
+
+        Returns:
+            List of rowcounts, one per statement
+        """
+        is_postgres = self.is_production and self.postgres_url
+        rowcounts = []
+
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            for query, params_list in statements:
+                if not params_list:
+                    rowcounts.append(0)
+                    continue
+                if is_postgres:
+                    from psycopg2.extras import execute_batch
+
+                    execute_batch(cursor, query.replace("?", "%s"), params_list, page_size=500)
+                else:
+                    cursor.executemany(query, params_list)
+                rowcounts.append(cursor.rowcount)
+        return rowcounts
+
+    @contextmanager
+    def locked_transaction(self):
+        """
+        One transaction for a read-modify-write sequence.
+
+        Yields a Transaction whose reads use `tx.for_update` to lock the rows
+        they read (SELECT ... FOR UPDATE on Postgres). SQLite has no row locks,
+        so the transaction takes the database write lock up front
+        (BEGIN IMMEDIATE) and no other writer can change what it read.
+
+        Usage:
+            with db_config.locked_transaction() as tx:
+                row = tx.execute(f"SELECT ... WHERE id = ?{tx.for_update}", (1,), fetch_one=True)
+                tx.execute("UPDATE ... WHERE id = ?", (1,))
+        """
+        is_postgres = bool(self.is_production and self.postgres_url)
+        with self.get_connection() as conn:
+            if not is_postgres:
+                conn.execute("BEGIN IMMEDIATE")
+            yield Transaction(conn.cursor(), is_postgres)
+
     def init_database(self):
         """Initialize database with schema"""
         schema_file = os.path.join(os.path.dirname(__file__), "schema.sql")
@@ -1,6 +1,10 @@
 """
 Enrich database with missing sector_name and day_change_pct fields.
 Uses yfinance to fetch sector and price data for stocks.
+
+Price-only refresh (refresh_daily_prices) skips the slow per-symbol `.info`
+endpoint and pulls daily bars for hundreds of tickers per `yf.download` call.
+The downloaded closes are also appended to daily_prices (price history).
 """
 
 import os
@@ -10,14 +14,28 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import logging
 import time
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 
+import numpy as np
+import pandas as pd
 import yfinance as yf
 from database.db_config import db_config
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Tickers per yf.download request (yfinance threads the individual downloads)
+PRICE_BATCH_SIZE = 200
+
+# Trading-day lookbacks for the change % columns
+CHANGE_LOOKBACKS = {
+    "week_change_pct": 5,
+    "month_change_pct": 21,
+    "qtr_change_pct": 63,
+    "half_year_change_pct": 126,
+    "year_1_change_pct": 252,
+}
+
 
 def fetch_sector_and_price_change(nse_code: str) -> Optional[Dict]:
     """
@@ -71,7 +89,8 @@ def enrich_database():
     query = """
         SELECT id, nse_code, stock_name, sector_name, day_change_pct
         FROM stocks
-        WHERE sector_name IS NULL OR day_change_pct IS NULL
+        WHERE (sector_name IS NULL OR day_change_pct IS NULL)
+          AND COALESCE(listing_status, 'active') <> 'delisted'
         ORDER BY id
     """
 
@@ -102,7 +121,8 @@ def enrich_database():
                 SET sector_name = ?,
                     industry_name = ?,
                     day_change_pct = ?,
-                    last_updated = datetime('now')
+                    static_updated_at = CURRENT_TIMESTAMP,
+                    last_updated = CURRENT_TIMESTAMP
                 WHERE id = ?
             """
 
@@ -142,5 +162,299 @@ def enrich_database():
     """)
 
 
+def download_price_bars(tickers: List[str], period: str = "1y") -> Optional[pd.DataFrame]:
+    """Daily bars for many Yahoo tickers in one multi-ticker download (None if empty)"""
+    if not tickers:
+        return None
+    bars = yf.download(
+        tickers,
+        period=period,
+        interval="1d",
+        group_by="column",
+        auto_adjust=False,
+        threads=True,
+        progress=False,
+    )
+    if bars is None or bars.empty:
+        return None
+    return bars
+
+
+def bar_matrix(bars: pd.DataFrame, field: str, tickers: List[str]) -> np.ndarray:
+    """(days x tickers) array of one bar field, NaN where a ticker has no bar"""
+    if field not in bars.columns.get_level_values(0):
+        return np.full((len(bars.index), len(tickers)), np.nan)
+    # Columns are (field, ticker); older yfinance flattens single-ticker downloads
+    frame = bars[field]
+    if frame.ndim == 1:
+        frame = frame.to_frame(tickers[0])
+    return frame.reindex(columns=tickers).to_numpy(dtype=float)
+
+
+def fetch_price_snapshots(nse_codes: List[str], period: str = "1y") -> Dict[str, Dict]:
+    """
+    Fetch price-derived fields for many stocks in one multi-ticker download.
+
+    Args:
+        nse_codes: NSE stock codes (e.g., ['RELIANCE', 'TCS'])
+        period: History window for yf.download (1y covers the 52-week range)
+
+    Returns:
+        Dict of {nse_code: {current_price, day_change_pct, week_change_pct,
+        month_change_pct, qtr_change_pct, half_year_change_pct, year_1_change_pct,
+        week_52_high, week_52_low}}
+    """
+    tickers = [f"{code}.NS" for code in nse_codes]
+    bars = download_price_bars(tickers, period)
+    if bars is None:
+        return {}
+    return price_snapshots(bars, nse_codes)
+
+
+def price_snapshots(bars: pd.DataFrame, nse_codes: List[str]) -> Dict[str, Dict]:
+    """Snapshot fields (see fetch_price_snapshots) from downloaded .NS bars"""
+    tickers = [f"{code}.NS" for code in nse_codes]
+    close = bar_matrix(bars, "Close", tickers)
+    high = bar_matrix(bars, "High", tickers)
+    low = bar_matrix(bars, "Low", tickers)
+
+    # Carry the last traded close forward over holidays/suspensions
+    close = pd.DataFrame(close).ffill().to_numpy()
+
+    n_bars = close.shape[0]
+    last = close[-1]
+    prev = close[-2] if n_bars > 1 else np.full_like(last, np.nan)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fields = {
+            "current_price": last,
+            "day_change_pct": (last / prev - 1) * 100,
+            "week_52_high": np.where(np.isnan(high), -np.inf, high).max(axis=0),
+            "week_52_low": np.where(np.isnan(low), np.inf, low).min(axis=0),
+        }
+        for column, lookback in CHANGE_LOOKBACKS.items():
+            base = close[max(n_bars - 1 - lookback, 0)]
+            fields[column] = (last / base - 1) * 100
+
+    def clean(value):
+        return float(value) if np.isfinite(value) else None
+
+    snapshots = {}
+    for i, code in enumerate(nse_codes):
+        if not np.isfinite(last[i]) or last[i] <= 0:
+            continue
+        snapshots[code] = {name: clean(values[i]) for name, values in fields.items()}
+
+    return snapshots
+
+
+def refresh_daily_prices(
+    batch_size: int = PRICE_BATCH_SIZE, stocks: Optional[List[Dict]] = None
+) -> Dict:
+    """
+    Price-only refresh for all stocks (or the given {id, nse_code} rows).
+    Called by the worker for daily price updates and by the refresh scheduler.
+
+    Uses batched multi-ticker downloads instead of per-symbol `.info` calls,
+    then bulk-writes price, change % and 52-week range.
+    """
+    logger.info("Starting daily price refresh...")
+
+    if stocks is None:
+        # Ordered by market cap so the most important stocks are refreshed first
+        stocks = db_config.execute_query(
+            """
+            SELECT id, nse_code
+            FROM stocks
+            WHERE nse_code IS NOT NULL
+              AND COALESCE(listing_status, 'active') <> 'delisted'
+            ORDER BY market_cap DESC NULLS LAST
+            """
+        )
+
+    if not stocks:
+        logger.info("No stocks to refresh!")
+        return {"updated": 0, "failed": 0, "total": 0}
+
+    logger.info(f"Refreshing prices for {len(stocks)} stocks in batches of {batch_size}")
+    start = time.time()
+
+    updated = 0
+    failed = 0
+
+    for offset in range(0, len(stocks), batch_size):
+        batch = stocks[offset : offset + batch_size]
+
+        try:
+            refreshed = refresh_price_batch(batch)
+        except Exception as e:
+            logger.error(f"❌ Batch download failed at offset {offset}: {e}")
+            failed += len(batch)
+            continue
+
+        updated += len(refreshed)
+        failed += len(batch) - len(refreshed)
+        logger.info(
+            f"Batch {offset // batch_size + 1}: {len(refreshed)}/{len(batch)} prices refreshed"
+        )
+
+    try:
+        refresh_index_prices()
+    except Exception as e:
+        logger.warning(f"⚠️ Index price refresh failed: {e}")
+
+    if updated:
+        _invalidate_presets()
+
+    elapsed = time.time() - start
+    logger.info(
+        f"Daily refresh complete: {updated} updated, {failed} failed in {elapsed:.1f}s"
+    )
+    return {
+        "updated": updated,
+        "failed": failed,
+        "total": len(stocks),
+        "duration_seconds": round(elapsed, 1),
+    }
+
+
+def _invalidate_presets():
+    """Materialized screener presets were computed from the old prices"""
+    from services.screener_db_service import db_screener
+
+    try:
+        db_screener.invalidate_presets()
+    except Exception as e:
+        logger.warning(f"⚠️ Preset cache invalidation failed: {e}")
+
+
+def refresh_price_batch(batch: List[Dict]) -> List[str]:
+    """
+    Download and write prices for one batch of {id, nse_code} rows.
+
+    Returns:
+        NSE codes that were refreshed (codes without data are left out)
+    """
+    ids = {s["nse_code"]: s["id"] for s in batch}
+    codes = list(ids)
+    bars = download_price_bars([f"{code}.NS" for code in codes])
+    if bars is None:
+        return []
+    snapshots = price_snapshots(bars, codes)
+    _store_history(bars, {f"{code}.NS": code for code in codes})
+
+    price_rows = []
+    range_rows = []
+    for code, snap in snapshots.items():
+        stock_id = ids[code]
+        price_rows.append(
+            (
+                snap["current_price"],
+                snap["day_change_pct"],
+                snap["week_change_pct"],
+                snap["month_change_pct"],
+                snap["qtr_change_pct"],
+                snap["half_year_change_pct"],
+                snap["year_1_change_pct"],
+                stock_id,
+            )
+        )
+        range_rows.append((snap["week_52_high"], snap["week_52_low"], stock_id))
+
+    if price_rows:
+        db_config.execute_many(
+            """
+            UPDATE stocks
+            SET current_price = ?,
+                day_change_pct = ?,
+                week_change_pct = ?,
+                month_change_pct = ?,
+                qtr_change_pct = ?,
+                half_year_change_pct = ?,
+                year_1_change_pct = ?,
+                price_updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+            """,
+            price_rows,
+        )
+        _write_52_week_range(range_rows)
+
+    return list(snapshots)
+
+
+def refresh_index_prices() -> int:
+    """Append daily closes of the index series (NIFTY etc.) to daily_prices"""
+    from services.price_history import INDEX_TICKERS
+
+    tickers = list(INDEX_TICKERS.values())
+    bars = download_price_bars(tickers)
+    if bars is None:
+        return 0
+    return _store_history(bars, {ticker: symbol for symbol, ticker in INDEX_TICKERS.items()})
+
+
+def _store_history(bars: pd.DataFrame, symbols: Dict[str, str], period: str = "1y") -> int:
+    """
+    Keep the downloaded bars ({ticker: symbol}) in daily_prices (the price
+    source for risk, the optimizer and technicals) and in the local OHLCV
+    store (chart / AI tool reads); never raises.
+
+    Returns:
+        Rows written to daily_prices
+    """
+    from services.ohlcv_store import COLUMNS, make_records, ohlcv_store, period_start
+    from services.price_history import price_history
+
+    tickers = list(symbols)
+    try:
+        fields = {field: bar_matrix(bars, column, tickers) for field, column in COLUMNS.items()}
+        dates = bars.index.values.astype("datetime64[D]")
+        ohlcv_store.append_many(
+            {
+                ticker: make_records(dates, **{field: values[:, j] for field, values in fields.items()})
+                for j, ticker in enumerate(tickers)
+            },
+            fetched_from=period_start(period),
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to store OHLCV bars: {e}")
+
+    try:
+        return price_history.append(
+            [day.strftime("%Y-%m-%d") for day in bars.index],
+            [symbols[ticker] for ticker in tickers],
+            bar_matrix(bars, "Close", tickers),
+            bar_matrix(bars, "Adj Close", tickers),
+            high=bar_matrix(bars, "High", tickers),
+            low=bar_matrix(bars, "Low", tickers),
+        )
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to store price history: {e}")
+        return 0
+
+
+def _write_52_week_range(rows: List[tuple]):
+    """Upsert 52-week high/low into stock_metadata (one row per stock)"""
+    db_config.execute_many(
+        """
+        UPDATE stock_metadata
+        SET week_52_high = ?, week_52_low = ?
+        WHERE stock_id = ?
+        """,
+        rows,
+    )
+    db_config.execute_many(
+        """
+        INSERT INTO stock_metadata (stock_id, week_52_high, week_52_low)
+        SELECT ?, ?, ?
+        WHERE NOT EXISTS (SELECT 1 FROM stock_metadata WHERE stock_id = ?)
+        """,
+        [(stock_id, high, low, stock_id) for high, low, stock_id in rows],
+    )
+
+
 if __name__ == "__main__":
-    enrich_database()
+    if "--prices" in sys.argv:
+        refresh_daily_prices()
+    else:
+        enrich_database()
@@ -0,0 +1,202 @@
+"""
+Schema migrations for existing databases.
+
+schema.sql covers fresh installs (CREATE ... IF NOT EXISTS). These statements
+bring databases created from an older schema up to date. Written in PostgreSQL
+syntax and converted for SQLite. Safe to run multiple times.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+from typing import Dict, List
+
+from database.db_config import db_config
+
+logger = logging.getLogger(__name__)
+
+
+MIGRATIONS = [
+    # Trendlyne parity scores
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS durability_score INTEGER",
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS valuation_score INTEGER",
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS momentum_score INTEGER",
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS roce_annual_pct DECIMAL(10,2)",
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS earnings_yield_pct DECIMAL(10,2)",
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS rel_strength_score INTEGER",
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS target_price DECIMAL(10,2)",
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS recommendation_key VARCHAR(50)",
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS analyst_count INTEGER",
+    # Refresh scheduler
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS next_earnings_date DATE",
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS price_updated_at TIMESTAMP",
+    """CREATE TABLE IF NOT EXISTS stock_views (
+        stock_id INTEGER REFERENCES stocks(id) ON DELETE CASCADE,
+        view_date DATE NOT NULL,
+        views INTEGER DEFAULT 0,
+        PRIMARY KEY (stock_id, view_date)
+    )""",
+    # Multi-horizon / per-sector Relative Strength
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS half_year_change_pct DECIMAL(10,4)",
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS sector_rel_strength_score INTEGER",
+    # Worker job framework
+    """CREATE TABLE IF NOT EXISTS jobs (
+        id VARCHAR(36) PRIMARY KEY,
+        job_type VARCHAR(50) NOT NULL,
+        status VARCHAR(20) NOT NULL,
+        params TEXT,
+        total_items INTEGER,
+        result TEXT,
+        error_message TEXT,
+        cancel_requested INTEGER DEFAULT 0,
+        owner VARCHAR(255),
+        heartbeat_at DOUBLE PRECISION,
+        created_at TIMESTAMP,
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP
+    )""",
+    """CREATE TABLE IF NOT EXISTS job_items (
+        job_id VARCHAR(36) REFERENCES jobs(id) ON DELETE CASCADE,
+        item_key VARCHAR(100) NOT NULL,
+        position INTEGER NOT NULL,
+        payload TEXT,
+        status VARCHAR(20) NOT NULL,
+        attempts INTEGER DEFAULT 0,
+        error_message TEXT,
+        updated_at TIMESTAMP,
+        PRIMARY KEY (job_id, item_key)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at)",
+    # Symbol master
+    """CREATE TABLE IF NOT EXISTS symbol_master (
+        id SERIAL PRIMARY KEY,
+        isin VARCHAR(12) UNIQUE,
+        nse_code VARCHAR(50) UNIQUE,
+        bse_code VARCHAR(20),
+        yf_ticker VARCHAR(50),
+        mc_id VARCHAR(100),
+        mc_url TEXT,
+        company_name VARCHAR(255),
+        updated_at TIMESTAMP
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_symbol_master_bse ON symbol_master(bse_code)",
+    """CREATE TABLE IF NOT EXISTS symbol_aliases (
+        alias VARCHAR(255) PRIMARY KEY,
+        symbol_id INTEGER REFERENCES symbol_master(id) ON DELETE CASCADE
+    )""",
+    """CREATE TABLE IF NOT EXISTS symbol_lookup_queue (
+        query VARCHAR(255) PRIMARY KEY,
+        raw_query VARCHAR(255),
+        status VARCHAR(20),
+        attempts INTEGER DEFAULT 0,
+        requested_at TIMESTAMP,
+        last_attempt_at TIMESTAMP
+    )""",
+    # Listing-file universe ingestion
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS listing_status VARCHAR(20) DEFAULT 'active'",
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS delisted_at TIMESTAMP",
+    "CREATE INDEX IF NOT EXISTS idx_stocks_isin ON stocks(isin)",
+    # Per-field-class refresh timestamps (price_updated_at already exists)
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS technicals_updated_at TIMESTAMP",
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS quarterly_updated_at TIMESTAMP",
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS annual_updated_at TIMESTAMP",
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS shareholding_updated_at TIMESTAMP",
+    "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS static_updated_at TIMESTAMP",
+    # Change-data-capture log
+    """CREATE TABLE IF NOT EXISTS stock_changes (
+        id SERIAL PRIMARY KEY,
+        stock_id INTEGER REFERENCES stocks(id) ON DELETE CASCADE,
+        field VARCHAR(64) NOT NULL,
+        old_value TEXT,
+        new_value TEXT,
+        changed_at TIMESTAMP
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_stock_changes_changed_at ON stock_changes(changed_at)",
+    # Quarterly shareholding snapshots
+    """CREATE TABLE IF NOT EXISTS shareholding_snapshots (
+        symbol VARCHAR(50) NOT NULL,
+        quarter VARCHAR(7) NOT NULL,
+        promoter_holding_pct DECIMAL(10,4),
+        fii_holding_pct DECIMAL(10,4),
+        dii_holding_pct DECIMAL(10,4),
+        public_holding_pct DECIMAL(10,4),
+        source VARCHAR(50),
+        fetched_at TIMESTAMP,
+        PRIMARY KEY (symbol, quarter)
+    )""",
+    # Incremental portfolio analysis (content hashes + per-user versions)
+    "ALTER TABLE user_analysis ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "ALTER TABLE user_analysis ADD COLUMN IF NOT EXISTS version BIGINT NOT NULL DEFAULT 0",
+    "ALTER TABLE user_analysis ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP",
+    "CREATE INDEX IF NOT EXISTS idx_user_analysis_version ON user_analysis(user_id, version)",
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS analysis_version BIGINT NOT NULL DEFAULT 0",
+    # Tables created by SQLAlchemy used JSON; JSONB is smaller and indexable (Postgres only).
+    # Converted once: the table is not rewritten when the column already is JSONB
+    """DO $$
+    BEGIN
+        IF EXISTS (
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'user_analysis' AND column_name = 'analysis_data'
+              AND data_type <> 'jsonb'
+        ) THEN
+            ALTER TABLE user_analysis ALTER COLUMN analysis_data TYPE JSONB USING analysis_data::jsonb;
+        END IF;
+    END $$""",
+    # Holding quantities and daily price history for portfolio risk analytics
+    "ALTER TABLE user_portfolio ADD COLUMN IF NOT EXISTS quantity DECIMAL(18,4)",
+    """CREATE TABLE IF NOT EXISTS daily_prices (
+        symbol VARCHAR(50) NOT NULL,
+        trade_date DATE NOT NULL,
+        close DOUBLE PRECISION,
+        adj_close DOUBLE PRECISION,
+        PRIMARY KEY (symbol, trade_date)
+    )""",
+    "CREATE INDEX IF NOT EXISTS idx_daily_prices_date ON daily_prices(trade_date)",
+    # High / low for the technical indicators (daily_prices is their price source)
+    "ALTER TABLE daily_prices ADD COLUMN IF NOT EXISTS high DOUBLE PRECISION",
+    "ALTER TABLE daily_prices ADD COLUMN IF NOT EXISTS low DOUBLE PRECISION",
+]
+
+
+def _to_sqlite(statement: str, db) -> str:
+    """SQLite has no IF NOT EXISTS on ADD COLUMN; duplicates fail and are skipped"""
+    statement = db._convert_to_sqlite(statement)
+    return statement.replace("ADD COLUMN IF NOT EXISTS", "ADD COLUMN")
+
+
+def run_migrations(db=None) -> List[Dict]:
+    """
+    Apply all migrations.
+
+    Returns:
+        List of {migration, status, sql|reason} dicts (one per statement)
+    """
+    db = db or db_config
+    results = []
+
+    logger.info("Running database migrations...")
+
+    for i, migration in enumerate(MIGRATIONS, 1):
+        sql = migration if db.is_production else _to_sqlite(migration, db)
+        summary = " ".join(migration.split())[:60]
+        if not db.is_production and migration.startswith("DO $$"):
+            results.append({"migration": i, "status": "skipped", "reason": "Postgres only"})
+            continue
+        try:
+            db.execute_query(sql)
+            logger.info(f"✅ Migration {i}/{len(MIGRATIONS)}: {summary}...")
+            results.append({"migration": i, "status": "success", "sql": summary})
+        except Exception as e:
+            logger.warning(f"⚠️  Migration {i} failed (may already exist): {e}")
+            results.append({"migration": i, "status": "skipped", "reason": str(e)[:100]})
+
+    logger.info("✅ All migrations complete!")
+    return results
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_migrations()
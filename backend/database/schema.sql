@@ -7,6 +7,7 @@ CREATE TABLE IF NOT EXISTS users (
     email VARCHAR(120) UNIQUE NOT NULL,
     name VARCHAR(100) NOT NULL,
     password_hash VARCHAR(255) NOT NULL,
+    analysis_version BIGINT NOT NULL DEFAULT 0, -- Bumped when user_analysis rows change
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
@@ -15,6 +16,7 @@ CREATE TABLE IF NOT EXISTS user_portfolio (
     id SERIAL PRIMARY KEY,
     user_id VARCHAR(36) REFERENCES users(id) ON DELETE CASCADE,
     stock_name VARCHAR(255) NOT NULL,
+    quantity DECIMAL(18, 4), -- Shares held (NULL = not given, risk analytics then equal-weights)
     added_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT unique_user_stock UNIQUE(user_id, stock_name)
 );
@@ -25,10 +27,15 @@ CREATE TABLE IF NOT EXISTS user_analysis (
     stock_name VARCHAR(255) NOT NULL,
     nse_code VARCHAR(50),
     analysis_data JSONB, -- Stores full enriched data
+    content_hash VARCHAR(64), -- Unchanged payloads are not rewritten
+    version BIGINT NOT NULL DEFAULT 0, -- Per-user change counter for incremental reads
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     CONSTRAINT unique_user_analysis UNIQUE(user_id, stock_name)
 );
 
+CREATE INDEX IF NOT EXISTS idx_user_analysis_version ON user_analysis(user_id, version);
+
 CREATE TABLE IF NOT EXISTS debt_scenarios (
     id SERIAL PRIMARY KEY,
     user_id VARCHAR(36) REFERENCES users(id) ON DELETE CASCADE,
@@ -61,6 +68,7 @@ CREATE TABLE IF NOT EXISTS stocks (
     week_change_pct DECIMAL(10, 4),
     month_change_pct DECIMAL(10, 4),
     qtr_change_pct DECIMAL(10, 4),
+    half_year_change_pct DECIMAL(10, 4),
     year_1_change_pct DECIMAL(10, 4),
     year_3_change_pct DECIMAL(10, 4),
 
@@ -107,6 +115,7 @@ CREATE TABLE IF NOT EXISTS stocks (
     -- Momentum
     momentum_score INTEGER,
     rel_strength_score INTEGER,
+    sector_rel_strength_score INTEGER,
     target_price DECIMAL(10,2),
     recommendation_key VARCHAR(50),
     analyst_count INTEGER,
@@ -130,8 +139,21 @@ CREATE TABLE IF NOT EXISTS stocks (
     data_quality_score INTEGER,
     data_sources TEXT,
 
+    -- Corporate Calendar
+    next_earnings_date DATE,
+
+    -- Listing (see database/universe_ingestor.py)
+    listing_status VARCHAR(20) DEFAULT 'active',
+    delisted_at TIMESTAMP,
+
     -- Metadata
     last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    price_updated_at TIMESTAMP,
+    technicals_updated_at TIMESTAMP,
+    quarterly_updated_at TIMESTAMP,
+    annual_updated_at TIMESTAMP,
+    shareholding_updated_at TIMESTAMP,
+    static_updated_at TIMESTAMP,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
 
     -- Indexes for fast querying
@@ -157,6 +179,7 @@ CREATE INDEX IF NOT EXISTS idx_stocks_pb_ratio ON stocks(pb_ratio);
 CREATE INDEX IF NOT EXISTS idx_stocks_day_change ON stocks(day_change_pct);
 CREATE INDEX IF NOT EXISTS idx_stocks_month_change ON stocks(month_change_pct);
 CREATE INDEX IF NOT EXISTS idx_stocks_market_cap_desc ON stocks(market_cap DESC);
+CREATE INDEX IF NOT EXISTS idx_stocks_isin ON stocks(isin);
 
 -- Stock metadata table for additional info
 CREATE TABLE IF NOT EXISTS stock_metadata (
@@ -187,6 +210,113 @@ CREATE TABLE IF NOT EXISTS stock_metadata (
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Symbol master: all identifiers per listed company (see services/symbol_master.py)
+CREATE TABLE IF NOT EXISTS symbol_master (
+    id SERIAL PRIMARY KEY,
+    isin VARCHAR(12) UNIQUE,
+    nse_code VARCHAR(50) UNIQUE,
+    bse_code VARCHAR(20),
+    yf_ticker VARCHAR(50),
+    mc_id VARCHAR(100),
+    mc_url TEXT,
+    company_name VARCHAR(255),
+    updated_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_symbol_master_bse ON symbol_master(bse_code);
+
+-- Normalized company names / codes -> symbol (see services/symbol_master.normalize_alias)
+CREATE TABLE IF NOT EXISTS symbol_aliases (
+    alias VARCHAR(255) PRIMARY KEY,
+    symbol_id INTEGER REFERENCES symbol_master(id) ON DELETE CASCADE
+);
+
+-- Names that missed the local indexes, resolved over the network in the background
+CREATE TABLE IF NOT EXISTS symbol_lookup_queue (
+    query VARCHAR(255) PRIMARY KEY, -- normalized alias
+    raw_query VARCHAR(255),
+    status VARCHAR(20), -- 'pending', 'resolved', 'not_found'
+    attempts INTEGER DEFAULT 0,
+    requested_at TIMESTAMP,
+    last_attempt_at TIMESTAMP
+);
+
+-- Change-data-capture log of stock field updates (see services/change_log.py)
+CREATE TABLE IF NOT EXISTS stock_changes (
+    id SERIAL PRIMARY KEY, -- read cursor
+    stock_id INTEGER REFERENCES stocks(id) ON DELETE CASCADE,
+    field VARCHAR(64) NOT NULL,
+    old_value TEXT,
+    new_value TEXT,
+    changed_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_stock_changes_changed_at ON stock_changes(changed_at);
+
+-- Quarterly shareholding pattern per symbol (see services/shareholding_store.py)
+CREATE TABLE IF NOT EXISTS shareholding_snapshots (
+    symbol VARCHAR(50) NOT NULL,
+    quarter VARCHAR(7) NOT NULL, -- quarter end month, e.g. '2024-09'
+    promoter_holding_pct DECIMAL(10, 4),
+    fii_holding_pct DECIMAL(10, 4),
+    dii_holding_pct DECIMAL(10, 4),
+    public_holding_pct DECIMAL(10, 4),
+    source VARCHAR(50),
+    fetched_at TIMESTAMP,
+    PRIMARY KEY (symbol, quarter)
+);
+
+-- Daily prices per symbol, kept by the price refresh (see services/price_history.py)
+-- Index series are stored under their own symbol (e.g. 'NIFTY')
+CREATE TABLE IF NOT EXISTS daily_prices (
+    symbol VARCHAR(50) NOT NULL,
+    trade_date DATE NOT NULL,
+    close DOUBLE PRECISION,
+    adj_close DOUBLE PRECISION, -- Split/dividend adjusted (used for returns)
+    high DOUBLE PRECISION,
+    low DOUBLE PRECISION,
+    PRIMARY KEY (symbol, trade_date)
+);
+CREATE INDEX IF NOT EXISTS idx_daily_prices_date ON daily_prices(trade_date);
+
+-- Daily view counts (drives refresh priority for popular stocks)
+CREATE TABLE IF NOT EXISTS stock_views (
+    stock_id INTEGER REFERENCES stocks(id) ON DELETE CASCADE,
+    view_date DATE NOT NULL,
+    views INTEGER DEFAULT 0,
+    PRIMARY KEY (stock_id, view_date)
+);
+
+-- Background worker jobs with per-item checkpoints (see services/job_runner.py)
+CREATE TABLE IF NOT EXISTS jobs (
+    id VARCHAR(36) PRIMARY KEY,
+    job_type VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL, -- 'queued', 'running', 'completed', 'failed', 'cancelled'
+    params TEXT,
+    total_items INTEGER, -- NULL until the job is planned
+    result TEXT,
+    error_message TEXT,
+    cancel_requested INTEGER DEFAULT 0,
+    owner VARCHAR(255), -- host:pid of the runner holding the lease
+    heartbeat_at DOUBLE PRECISION, -- epoch seconds
+    created_at TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS job_items (
+    job_id VARCHAR(36) REFERENCES jobs(id) ON DELETE CASCADE,
+    item_key VARCHAR(100) NOT NULL,
+    position INTEGER NOT NULL,
+    payload TEXT,
+    status VARCHAR(20) NOT NULL, -- 'pending', 'done', 'skipped', 'failed'
+    attempts INTEGER DEFAULT 0,
+    error_message TEXT,
+    updated_at TIMESTAMP,
+    PRIMARY KEY (job_id, item_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+
 -- Data refresh log
 CREATE TABLE IF NOT EXISTS data_refresh_log (
     id SERIAL PRIMARY KEY,
@@ -21,33 +21,82 @@ from typing import Dict, List, Optional
 import pandas as pd
 from database.db_config import db_config
 from services.multi_source_data_service import multi_source_service
+from services.refresh_scheduler import (
+    ANNUAL,
+    FRESHNESS_COLUMNS,
+    FUNDAMENTAL_CLASSES,
+    PRICE,
+    QUARTERLY,
+    SHAREHOLDING,
+    FreshnessPolicy,
+)
+from services.change_log import INSERT_SQL as CHANGE_LOG_INSERT
+from services.change_log import change_log, diff_row
 from services.score_service import ScoreService
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Fields scored for data quality, and the field class each one belongs to
+REQUIRED_FIELDS = {
+    "currentPrice": PRICE,
+    "marketCap": PRICE,
+    "pe_ratio": QUARTERLY,
+    "roe": QUARTERLY,
+    "revenue": ANNUAL,
+    "net_income": ANNUAL,
+    "total_assets": ANNUAL,
+    "total_debt": ANNUAL,
+}
+
+# enrich_one outcomes
+ENRICHED = "enriched"  # fetched and written
+SKIPPED = "skipped"  # every field class was fresh, nothing fetched
+NO_DATA = "no_data"  # the sources returned nothing
+
 
 class StockListFetcher:
     """Fetch list of all NSE/BSE stocks"""
 
     @staticmethod
-    def get_nse_stock_list() -> List[Dict]:
+    def get_nse_stock_list(use_listing_files: bool = True) -> List[Dict]:
         """
-        Get list of all NSE stocks.
-        Returns list of dicts with: {name, symbol, industry, sector}
+        Get list of all NSE mainboard stocks.
+        Returns list of dicts with: {name, nse_code, exchange, isin, bse_code}
         """
+        # Method 1: Exchange listing files (full universe, see universe_ingestor.py)
         try:
-            # Method 1: Try nsepython
+            if not use_listing_files:
+                raise RuntimeError("listing files skipped")
+            from database.universe_ingestor import universe_ingestor
+
+            universe, _ = universe_ingestor.load_listings()
+            stocks = [
+                {
+                    "name": listing["name"],
+                    "nse_code": listing["nse_code"],
+                    "exchange": "NSE",
+                    "isin": listing["isin"],
+                    "bse_code": listing["bse_code"],
+                }
+                for listing in universe
+            ]
+            logger.info(f"Fetched {len(stocks)} NSE stocks from listing files")
+            return stocks
+        except Exception as e:
+            logger.warning(f"Listing files unavailable, trying nsepython: {e}")
+
+        try:
+            # Method 2: Try nsepython
             try:
                 from nsepython import nse_eq_symbols
 
                 symbols = nse_eq_symbols()
 
-                stocks = []
-                for symbol in symbols[:100]:  # Start with top 100 for testing
-                    stocks.append(
-                        {"name": symbol, "nse_code": symbol, "exchange": "NSE"}
-                    )
+                stocks = [
+                    {"name": symbol, "nse_code": symbol, "exchange": "NSE"}
+                    for symbol in symbols
+                ]
 
                 logger.info(f"Fetched {len(stocks)} NSE stocks via nsepython")
                 return stocks
@@ -57,7 +106,7 @@ class StockListFetcher:
         except Exception as e:
             logger.error(f"Error fetching NSE list: {e}")
 
-        # Method 2: Use hardcoded Nifty 50 + Nifty Next 50 as fallback
+        # Method 3: Use hardcoded Nifty 50 + Nifty Next 50 as fallback
         return StockListFetcher._get_nifty_stocks()
 
     @staticmethod
@@ -274,6 +323,7 @@ class StockDataPopulator:
 
     def __init__(self):
         self.db = db_config
+        self.freshness = FreshnessPolicy()
 
     def populate_initial_stocks(self, stock_list: List[Dict]) -> Dict:
         """
@@ -330,42 +380,57 @@ class StockDataPopulator:
             "total": len(stock_list),
         }
 
+    def sync_universe(self) -> Dict:
+        """
+        Sync the stock list with the NSE/BSE listing files in one transaction,
+        falling back to the per-row populate when the files are unavailable.
+        """
+        from database.universe_ingestor import UniverseIngestor
+
+        try:
+            result = UniverseIngestor(self.db).sync()
+            result["total"] = result["nse_listings"]
+            return result
+        except Exception as e:
+            logger.warning(f"⚠️ Listing file sync failed, populating from fallback list: {e}")
+            return self.populate_initial_stocks(
+                StockListFetcher.get_nse_stock_list(use_listing_files=False)
+            )
+
     def enrich_stock_data(
-        self, batch_size: int = 10, max_stocks: Optional[int] = None
+        self,
+        batch_size: int = 10,
+        max_stocks: Optional[int] = None,
+        stocks: Optional[List[Dict]] = None,
+        update_relative_strength: bool = True,
     ) -> Dict:
         """
         Enrich stocks with full fundamental data using multi-source service.
         This is slow but comprehensive.
+
+        Args:
+            batch_size: Pause after this many stocks
+            max_stocks: Limit for the default staleness query
+            stocks: Explicit rows ({id, stock_name, nse_code}) to enrich, in order.
+                    Used by the refresh scheduler; skips the staleness query.
+            update_relative_strength: Recompute RS afterwards. Chunked runs pass
+                    False and recompute once when all chunks are done.
         """
         logger.info("Starting stock data enrichment...")
 
-        # Get stocks that need enrichment (low quality score or old data)
-        # Handle DB-specific syntax for date subtraction
-        if self.db.is_production:
-            time_condition = "last_updated < CURRENT_TIMESTAMP - INTERVAL '7 days'"
+        if stocks is not None:
+            stocks_to_enrich = stocks
         else:
-            time_condition = "last_updated < datetime('now', '-7 days')"
-
-        query = f"""
-            SELECT id, stock_name, nse_code
-            FROM stocks
-            WHERE data_quality_score < 80
-               OR {time_condition}
-            ORDER BY market_cap DESC NULLS LAST
-        """
-
-        if max_stocks:
-            query += f" LIMIT {max_stocks}"
-
-        stocks_to_enrich = self.db.execute_query(query)
+            stocks_to_enrich = self._select_stale_stocks(max_stocks)
 
         if not stocks_to_enrich:
             logger.info("No stocks need enrichment")
-            return {"enriched": 0, "failed": 0}
+            return {"enriched": 0, "skipped": 0, "failed": 0}
 
         logger.info(f"Enriching {len(stocks_to_enrich)} stocks...")
 
         enriched = 0
+        skipped = 0
         failed = 0
 
         for i, stock in enumerate(stocks_to_enrich, 1):
@@ -374,29 +439,13 @@ class StockDataPopulator:
                     f"[{i}/{len(stocks_to_enrich)}] Enriching {stock['nse_code']}..."
                 )
 
-                # Fetch data from multi-source service
-                data, quality = multi_source_service.fetch_stock_data(
-                    stock["nse_code"],
-                    required_fields=[
-                        "currentPrice",
-                        "marketCap",
-                        "pe_ratio",
-                        "roe",
-                        "revenue",
-                        "net_income",
-                        "total_assets",
-                        "total_debt",
-                    ],
-                )
-
-                if data and quality["score"] > 0:
-                    # Update database with enriched data
-                    self._update_stock_data(stock["id"], data, quality)
+                outcome = self.enrich_one(stock)
+                if outcome == ENRICHED:
                     enriched += 1
-                    logger.info(f"  ✓ Quality: {quality['score']}%")
+                elif outcome == SKIPPED:
+                    skipped += 1
                 else:
                     failed += 1
-                    logger.warning(f"  ✗ No data fetched")
 
                 # Rate limiting
                 if i % batch_size == 0:
@@ -411,14 +460,160 @@ class StockDataPopulator:
         
         # After batch adoption: Update Relative Strength for ALL stocks
         # This ensures RS is fresh based on latest price data
+        if update_relative_strength:
+            self._update_relative_strength()
+
+        logger.info(
+            f"✅ Enrichment complete: {enriched} enriched, {skipped} skipped (fresh), {failed} failed"
+        )
+
+        return {
+            "enriched": enriched,
+            "skipped": skipped,
+            "failed": failed,
+            "total": len(stocks_to_enrich),
+        }
+
+    def enrich_one(self, stock: Dict, force: bool = False) -> str:
+        """
+        Fetch and store data for one {id, nse_code} row.
+
+        Only stale field classes are fetched (see FreshnessPolicy); sources
+        whose classes are all fresh are not called. The fetch never takes
+        stale cache entries, so the `*_updated_at` stamps written here mean
+        the data really is that recent.
+
+        Returns:
+            ENRICHED if data was fetched and written, SKIPPED if every field
+            class was fresh, NO_DATA if nothing was found
+        """
+        field_classes = None if force else self._stale_field_classes(stock)
+        if field_classes == []:
+            logger.info(f"  ↷ {stock['nse_code']}: all field classes fresh, skipped")
+            return SKIPPED
+
+        required_fields = [
+            field
+            for field, field_class in REQUIRED_FIELDS.items()
+            if field_classes is None or field_class in field_classes
+        ]
+
+        # Fetch data from multi-source service
+        data, quality = multi_source_service.fetch_stock_data(
+            stock["nse_code"],
+            required_fields=required_fields,
+            field_classes=field_classes,
+            allow_stale=False,
+        )
+
+        if data and any(not key.startswith("_") for key in data):
+            # Update database with enriched data
+            self._update_stock_data(stock["id"], data, quality, field_classes)
+            logger.info(
+                f"  ✓ Quality: {quality['score']}% "
+                f"({', '.join(field_classes) if field_classes else 'all fields'})"
+            )
+            return ENRICHED
+
+        logger.warning(f"  ✗ No data fetched")
+        return NO_DATA
+
+    def _stale_field_classes(self, stock: Dict) -> List[str]:
+        """Field classes of this stock that are due and that the sources can refresh"""
+        row = stock
+        if "last_updated" not in stock:
+            row = self.db.execute_query(
+                f"""
+                SELECT id, data_quality_score, last_updated, next_earnings_date,
+                       {", ".join(FRESHNESS_COLUMNS.values())}
+                FROM stocks
+                WHERE id = ?
+                """,
+                (stock["id"],),
+                fetch_one=True,
+            ) or {}
+
+        return self.freshness.stale_classes(row, multi_source_service.served_classes())
+
+    def finalize_enrichment(self, since_cursor: Optional[int] = None) -> Dict:
+        """
+        Universe-wide steps that run once after an enrichment pass
+        (not per chunk): Relative Strength, scores that depend on it and
+        materialized screener presets.
+
+        Args:
+            since_cursor: Change log cursor taken before the pass; if no stock
+                field changed since, rescoring and presets are skipped
+        """
         self._update_relative_strength()
 
-        logger.info(f"✅ Enrichment complete: {enriched} enriched, {failed} failed")
+        result = {}
+        if since_cursor is not None:
+            changed = change_log.changed_stocks_since(since_cursor)
+            result = {"changed_stocks": len(changed["stock_ids"]), "changed_fields": changed["fields"]}
+            if not changed["stock_ids"]:
+                logger.info("No stock fields changed, skipping rescoring and presets")
+                return {**result, "rescored": 0, "presets_materialized": 0}
+
+        from services.score_service import BatchScorer
 
-        return {"enriched": enriched, "failed": failed, "total": len(stocks_to_enrich)}
+        try:
+            rescored = BatchScorer(self.db).rescore_universe()
+        except Exception as e:
+            logger.error(f"Batch rescoring failed: {e}")
+            rescored = {}
 
-    def _update_stock_data(self, stock_id: int, data: Dict, quality: Dict):
-        """Update stock with enriched data"""
+        from services.screener_db_service import db_screener
+
+        try:
+            presets = db_screener.materialize_presets()
+        except Exception as e:
+            logger.error(f"Preset materialization failed: {e}")
+            presets = {}
+
+        change_log.prune()
+
+        return {
+            **result,
+            "rescored": rescored.get("updated", 0),
+            "presets_materialized": len(presets),
+        }
+
+    def _select_stale_stocks(self, max_stocks: Optional[int] = None) -> List[Dict]:
+        """Stocks with a fundamental field class past its TTL (or never enriched)"""
+        stale_condition = self.freshness.stale_condition(self.db, FUNDAMENTAL_CLASSES)
+
+        query = f"""
+            SELECT id, stock_name, nse_code
+            FROM stocks
+            WHERE {stale_condition}
+              AND COALESCE(listing_status, 'active') <> 'delisted'
+            ORDER BY market_cap DESC NULLS LAST
+        """
+
+        if max_stocks:
+            query += f" LIMIT {max_stocks}"
+
+        return self.db.execute_query(query)
+
+    def _update_stock_data(
+        self,
+        stock_id: int,
+        data: Dict,
+        quality: Dict,
+        field_classes: Optional[List[str]] = None,
+    ) -> Dict:
+        """
+        Update stock with enriched data.
+
+        Only the columns of `field_classes` (None = all) are considered, so a
+        partial refresh never blanks fresh fields, and each fetched class gets
+        its refresh timestamp. Of those, only columns whose value changed are
+        written, each with a change log record in the same transaction.
+
+        Returns:
+            {column: (old, new)} for the changed columns
+        """
 
         # Calculate derived ratios
         debt_to_equity = None
@@ -449,39 +644,6 @@ class StockDataPopulator:
         if pe > 0:
             earnings_yield = (1 / pe) * 100
 
-        update_query = """
-            UPDATE stocks SET
-                current_price = ?,
-                market_cap = ?,
-                pe_ttm = ?,
-                pb_ratio = ?,
-                roe_annual_pct = ?,
-                roce_annual_pct = ?,
-                earnings_yield_pct = ?,
-                roa_annual_pct = ?,
-                operating_margin_pct = ?,
-                revenue_growth_yoy_pct = ?,
-                revenue_annual = ?,
-                net_profit_annual = ?,
-                debt_to_equity = ?,
-                current_ratio = ?,
-                dividend_yield_pct = ?,
-                promoter_holding_pct = ?,
-                fii_holding_pct = ?,
-                dii_holding_pct = ?,
-                data_quality_score = ?,
-                durability_score = ?,
-                valuation_score = ?,
-                momentum_score = ?,
-                target_price = ?,
-                recommendation_key = ?,
-                analyst_count = ?,
-                data_sources = ?,
-                year_1_change_pct = ?,
-                last_updated = CURRENT_TIMESTAMP
-            WHERE id = ?
-        """
-
         # Year 1 Change: YFinance returns decimal (0.5 for 50%), convert to %
         y1_change = data.get("year1Change")
         if y1_change is None:
@@ -489,83 +651,176 @@ class StockDataPopulator:
         if y1_change is not None:
             y1_change = y1_change * 100
 
-        params = (
-            data.get("currentPrice"),
-            data.get("marketCap"),
-            data.get("pe_ratio"),
-            data.get("pb_ratio"),
-            data.get("roe") * 100 if data.get("roe") else None,
-            roce,
-            earnings_yield,
-            data.get("roa") * 100 if data.get("roa") else None,
-            data.get("operating_margin") * 100
-            if data.get("operating_margin")
-            else None,
-            data.get("revenue_growth") * 100 if data.get("revenue_growth") else None,
-            data.get("revenue"),
-            data.get("net_income"),
-            debt_to_equity,
-            current_ratio,
-            data.get("dividend_yield") * 100 if data.get("dividend_yield") else None,
-            data.get("promoter_holding") * 100 if data.get("promoter_holding") is not None else None,
-            data.get("fii_holding") * 100 if data.get("fii_holding") is not None else None,
-            data.get("dii_holding") * 100 if data.get("dii_holding") is not None else None,
-            quality["score"],
-            durability_score,
-            valuation_score,
-            momentum_score,
-            data.get("target_mean_price"),
-            data.get("recommendation_key"),
-            data.get("number_of_analyst_opinions"),
-            ", ".join(quality.get("sources_used", [])),
-            y1_change,
-            stock_id,
-        )
+        # Columns per field class
+        columns = {
+            PRICE: {
+                "current_price": data.get("currentPrice"),
+                "market_cap": data.get("marketCap"),
+                "year_1_change_pct": y1_change,
+            },
+            QUARTERLY: {
+                "pe_ttm": data.get("pe_ratio"),
+                "pb_ratio": data.get("pb_ratio"),
+                "roe_annual_pct": data.get("roe") * 100 if data.get("roe") else None,
+                "roce_annual_pct": roce,
+                "earnings_yield_pct": earnings_yield,
+                "roa_annual_pct": data.get("roa") * 100 if data.get("roa") else None,
+                "operating_margin_pct": data.get("operating_margin") * 100
+                if data.get("operating_margin")
+                else None,
+                "revenue_growth_yoy_pct": data.get("revenue_growth") * 100
+                if data.get("revenue_growth")
+                else None,
+                "dividend_yield_pct": data.get("dividend_yield") * 100
+                if data.get("dividend_yield")
+                else None,
+                "durability_score": durability_score,
+                "valuation_score": valuation_score,
+                "momentum_score": momentum_score,
+                "target_price": data.get("target_mean_price"),
+                "recommendation_key": data.get("recommendation_key"),
+                "analyst_count": data.get("number_of_analyst_opinions"),
+                "next_earnings_date": data.get("next_earnings_date"),
+            },
+            ANNUAL: {
+                "revenue_annual": data.get("revenue"),
+                "net_profit_annual": data.get("net_income"),
+                "debt_to_equity": debt_to_equity,
+                "current_ratio": current_ratio,
+            },
+            SHAREHOLDING: {
+                "promoter_holding_pct": data.get("promoter_holding") * 100
+                if data.get("promoter_holding") is not None
+                else None,
+                "fii_holding_pct": data.get("fii_holding") * 100
+                if data.get("fii_holding") is not None
+                else None,
+                "dii_holding_pct": data.get("dii_holding") * 100
+                if data.get("dii_holding") is not None
+                else None,
+            },
+        }
+        classes = [c for c in (field_classes or columns) if c in columns]
+
+        incoming = {}
+        for field_class in classes:
+            incoming.update(columns[field_class])
+        if incoming.get("next_earnings_date") is None:
+            incoming.pop("next_earnings_date", None)  # keep the stored date
+
+        # The quality score covers price + fundamentals; a partial refresh keeps the stored one
+        if {PRICE, QUARTERLY, ANNUAL} <= set(classes):
+            incoming["data_quality_score"] = quality["score"]
+        sources = ", ".join(quality.get("sources_used", []))
+
+        # Write only what changed and log it (see services/change_log.py). The row
+        # is locked while diffing so old_value is right under concurrent writers.
+        with self.db.locked_transaction() as tx:
+            current = tx.execute(
+                f"SELECT {', '.join(incoming)}, data_sources FROM stocks WHERE id = ?{tx.for_update}",
+                (stock_id,),
+                fetch_one=True,
+            ) or {}
+            changes = diff_row(current, incoming)
+
+            assignments = [f"{column} = ?" for column in changes]
+            params = [new for _, new in changes.values()]
+            if sources != current.get("data_sources"):
+                assignments.append("data_sources = ?")
+                params.append(sources)
+            # Fetched classes are fresh whether or not their values moved
+            assignments += [
+                f"{FRESHNESS_COLUMNS[field_class]} = CURRENT_TIMESTAMP" for field_class in classes
+            ]
+
+            update_query = f"""
+                UPDATE stocks SET
+                    {", ".join(assignments + ["last_updated = CURRENT_TIMESTAMP"])}
+                WHERE id = ?
+            """
+            params.append(stock_id)
 
-        self.db.execute_query(update_query, params)
+            tx.execute(update_query, tuple(params))
+            tx.execute_many(CHANGE_LOG_INSERT, change_log.rows(stock_id, changes))
+        return changes
 
     def _update_relative_strength(self):
         """
-        Calculates Relative Strength (0-99) for all stocks based on 1-year performance.
+        Calculates Relative Strength (0-99) for all stocks in one set-based UPDATE.
         Higher score = Outperformed more stocks.
+
+        The ranked value is a weighted mean of the 1m/3m/6m/1y returns
+        (config.RS_HORIZON_WEIGHTS, skipping missing horizons). Stocks are
+        ranked against the whole universe (rel_strength_score) and within
+        their sector (sector_rel_strength_score).
         """
         logger.info("Updating Relative Strength (RS) ratings...")
         try:
-            # 1. Fetch all stocks with valid 1-year return
-            query = """
-                SELECT id, year_1_change_pct 
-                FROM stocks 
-                WHERE year_1_change_pct IS NOT NULL
-            """
-            stocks = self.db.execute_query(query)
-            
-            if not stocks:
-                return
-
-            # 2. Sort by return descending
-            # Convert to list of dicts if not already
-            if isinstance(stocks, list):
-                 sorted_stocks = sorted(stocks, key=lambda x: float(x.get('year_1_change_pct') or 0), reverse=True)
-            
-            total = len(sorted_stocks)
-            updates = []
-            
-            # 3. Calculate percentile rank (99 = Top 1%, 1 = Bottom 1%)
-            # Formula: (Rank / Total) * 100. Rank 0 is highest.
-            for rank, stock in enumerate(sorted_stocks):
-                # Percentile = Number of values below this one / Total values * 100
-                # Using simple rank mapping: Top stock = 99
-                percentile = int(((total - 1 - rank) / (total - 1)) * 99) if total > 1 else 50
-                updates.append((percentile, stock['id']))
-            
-            # 4. Bulk update
-            update_sql = "UPDATE stocks SET rel_strength_score = ? WHERE id = ?"
-            self.db.execute_many(update_sql, updates)
-            
-            logger.info(f"✅ Updated RS Rating for {total} stocks")
-            
+            updated = self.db.execute_query(self._relative_strength_sql())
+            # sqlite3 reports -1 for statements starting with WITH
+            if updated is not None and updated >= 0:
+                logger.info(f"✅ Updated RS Rating for {updated} stocks")
+            else:
+                logger.info("✅ Updated RS Ratings")
+
         except Exception as e:
             logger.error(f"Failed to update Relative Strength: {e}")
+
+    def _relative_strength_sql(self) -> str:
+        """
+        PERCENT_RANK window query. Postgres: UPDATE ... FROM (subquery);
+        SQLite (3.25+ for window functions): CTE + correlated lookups.
+        """
+        from config import config
+
+        weights = config.RS_HORIZON_WEIGHTS
+        weighted_sum = " + ".join(
+            f"COALESCE({column} * {weight}, 0)" for column, weight in weights.items()
+        )
+        weight_total = " + ".join(
+            f"CASE WHEN {column} IS NOT NULL THEN {weight} ELSE 0 END"
+            for column, weight in weights.items()
+        )
+
+        def percentile(partition: str = "") -> str:
+            # 99 = top of the group, 0 = bottom; a group of one gets 50
+            window = f"{partition} ORDER BY score".strip()
+            rank = f"PERCENT_RANK() OVER ({window}) * 99"
+            rank = f"FLOOR({rank})" if self.db.is_production else f"CAST({rank} AS INTEGER)"
+            return f"CASE WHEN COUNT(*) OVER ({partition}) > 1 THEN {rank} ELSE 50 END"
+
+        ranked = f"""
+            SELECT id,
+                   {percentile()} AS rs,
+                   CASE WHEN sector_name IS NULL THEN NULL
+                        ELSE {percentile("PARTITION BY sector_name")}
+                   END AS sector_rs
+            FROM (
+                SELECT id, sector_name,
+                       ({weighted_sum}) / NULLIF({weight_total}, 0) AS score
+                FROM stocks
+            ) composite
+            WHERE score IS NOT NULL
+        """
+
+        if self.db.is_production:
+            return f"""
+                UPDATE stocks
+                SET rel_strength_score = ranked.rs,
+                    sector_rel_strength_score = ranked.sector_rs
+                FROM ({ranked}) ranked
+                WHERE stocks.id = ranked.id
+            """
+
+        return f"""
+            WITH ranked AS ({ranked})
+            UPDATE stocks
+            SET rel_strength_score = (SELECT rs FROM ranked WHERE ranked.id = stocks.id),
+                sector_rel_strength_score = (SELECT sector_rs FROM ranked WHERE ranked.id = stocks.id)
+            WHERE id IN (SELECT id FROM ranked)
+        """
+
+    def get_database_stats(self) -> Dict:
         """Get database statistics"""
         stats = {}
 
@@ -610,15 +865,13 @@ def main():
     print("\n1. Initializing database...")
     db_config.init_database()
 
-    # Fetch stock list
-    print("\n2. Fetching NSE stock list...")
-    stock_list = StockListFetcher.get_nse_stock_list()
-    print(f"   Found {len(stock_list)} stocks")
-
-    # Populate stocks
-    print("\n3. Populating stock list...")
+    # Sync the universe from the exchange listing files
+    print("\n2. Syncing NSE/BSE listings...")
     populator = StockDataPopulator()
-    result = populator.populate_initial_stocks(stock_list)
+    result = populator.sync_universe()
+    print(f"   Found {result.get('total', 0)} stocks")
+
+    print("\n3. Applied listing changes...")
     print(f"   ✓ Inserted: {result['inserted']}, Updated: {result['updated']}")
 
     # Enrich stocks (start with small batch for testing)
@@ -0,0 +1,489 @@
+"""
+Stock universe ingestion from the exchanges' bulk listing files.
+
+Sources (local copies take precedence over downloads, see config):
+- NSE: EQUITY_L.csv - every listed equity; only mainboard series are kept
+- BSE: scrip master - the "List of Scrips" JSON API or its CSV download
+
+Listings are merged by ISIN (NSE symbol + BSE scrip code for dual-listed
+companies), diffed against the stocks table and applied in one transaction:
+- new NSE listings are inserted as placeholders (enrichment fills them in)
+- existing stocks are matched by NSE code, then ISIN, so a symbol change
+  renames the row instead of creating a duplicate; missing ISIN / BSE code /
+  industry are filled in
+- active stocks missing from the NSE file are marked delisted (not deleted:
+  portfolios and analyses still reference them)
+
+BSE-only companies are registered in the symbol master but not in stocks,
+since the refresh pipeline is keyed by NSE code.
+
+Usage:
+    python database/universe_ingestor.py [--dry-run] [--nse EQUITY_L.csv] [--bse scrips.csv]
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import csv
+import io
+import json
+import logging
+import time
+from typing import Dict, List, Optional, Tuple
+
+import requests
+from config import config
+from database.db_config import db_config
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Accept": "text/csv,application/json,*/*",
+}
+
+# BSE column names differ between the JSON API and the CSV download
+BSE_COLUMNS = {
+    "bse_code": ("SCRIP_CD", "Security Code"),
+    "name": ("Issuer_Name", "Issuer Name", "Scrip_Name", "Security Name"),
+    "isin": ("ISIN_NUMBER", "ISIN No"),
+    "industry": ("INDUSTRY", "Industry"),
+    "status": ("Status",),
+    "instrument": ("Segment", "Instrument"),
+}
+
+PLACEHOLDER_QUALITY = 0
+
+
+def _clean(value) -> Optional[str]:
+    value = str(value).strip() if value is not None else ""
+    return value or None
+
+
+def _pick(row: Dict, names: Tuple[str, ...]) -> Optional[str]:
+    for name in names:
+        if name in row:
+            return _clean(row[name])
+    return None
+
+
+def parse_nse_equity_list(text: str, series: Optional[List[str]] = None) -> List[Dict]:
+    """
+    Parse EQUITY_L.csv.
+
+    Returns:
+        [{nse_code, name, isin, series}], one per ISIN (EQ preferred over BE/BZ)
+    """
+    series = series or config.NSE_MAINBOARD_SERIES
+    rank = {s: i for i, s in enumerate(series)}
+
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    # Headers carry stray spaces (" SERIES", " ISIN NUMBER")
+    reader.fieldnames = [name.strip().upper() for name in reader.fieldnames or []]
+
+    by_isin: Dict[str, Dict] = {}
+    for row in reader:
+        symbol = _clean(row.get("SYMBOL"))
+        row_series = (_clean(row.get("SERIES")) or "").upper()
+        if not symbol or row_series not in rank:
+            continue
+
+        listing = {
+            "nse_code": symbol.upper(),
+            "name": _clean(row.get("NAME OF COMPANY")),
+            "isin": (_clean(row.get("ISIN NUMBER")) or "").upper() or None,
+            "series": row_series,
+        }
+        key = listing["isin"] or f"NSE:{listing['nse_code']}"
+        existing = by_isin.get(key)
+        if existing is None or rank[row_series] < rank[existing["series"]]:
+            by_isin[key] = listing
+
+    return list(by_isin.values())
+
+
+def parse_bse_scrip_master(text: str) -> List[Dict]:
+    """
+    Parse the BSE scrip master (JSON API response or CSV download).
+
+    Only active equity scrips with an equity ISIN (INE...) are kept; funds,
+    ETFs and debt share the file.
+
+    Returns:
+        [{bse_code, name, isin, industry}], one per ISIN
+    """
+    text = text.lstrip("\ufeff").strip()
+    if text.startswith("[") or text.startswith("{"):
+        rows = json.loads(text)
+        if isinstance(rows, dict):
+            rows = rows.get("Table") or rows.get("data") or []
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        reader.fieldnames = [name.strip() for name in reader.fieldnames or []]
+        rows = list(reader)
+
+    by_isin: Dict[str, Dict] = {}
+    for row in rows:
+        record = {field: _pick(row, names) for field, names in BSE_COLUMNS.items()}
+        isin = (record["isin"] or "").upper()
+        if not record["bse_code"] or not isin.startswith("INE"):
+            continue
+        if record["status"] and record["status"].lower() != "active":
+            continue
+        if record["instrument"] and record["instrument"].lower() != "equity":
+            continue
+
+        by_isin.setdefault(
+            isin,
+            {
+                "bse_code": record["bse_code"],
+                "name": record["name"],
+                "isin": isin,
+                "industry": record["industry"],
+            },
+        )
+
+    return list(by_isin.values())
+
+
+def merge_listings(nse: List[Dict], bse: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Merge NSE and BSE listings by ISIN.
+
+    Returns:
+        (nse_universe, bse_only) - NSE listings with bse_code/industry from
+        the BSE file where the ISIN matches, and BSE listings with no NSE line
+    """
+    universe = {
+        listing["isin"] or f"NSE:{listing['nse_code']}": {
+            "nse_code": listing["nse_code"],
+            "name": listing["name"],
+            "isin": listing["isin"],
+            "bse_code": None,
+            "industry": None,
+        }
+        for listing in nse
+    }
+
+    bse_only = []
+    for listing in bse:
+        merged = universe.get(listing["isin"])
+        if merged is None:
+            bse_only.append(dict(listing, nse_code=None))
+        else:
+            merged["bse_code"] = listing["bse_code"]
+            merged["industry"] = listing["industry"]
+            merged["name"] = merged["name"] or listing["name"]
+
+    return list(universe.values()), bse_only
+
+
+class UniverseIngestor:
+    """
+    Sync the stocks table with the exchange listing files.
+
+    Usage:
+        UniverseIngestor().sync()                  # download, diff, apply
+        UniverseIngestor().sync(dry_run=True)      # diff only
+    """
+
+    TIMEOUT = 30
+
+    def __init__(self, db=None):
+        self.db = db or db_config
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def _read(self, path: Optional[str], url: str, referer: str) -> str:
+        if path:
+            with open(path, "r", encoding="utf-8-sig", errors="replace") as f:
+                return f.read()
+
+        response = requests.get(
+            url, headers=dict(HEADERS, Referer=referer), timeout=self.TIMEOUT
+        )
+        response.raise_for_status()
+        return response.text
+
+    def load_nse(self, path: Optional[str] = None) -> List[Dict]:
+        text = self._read(
+            path or config.NSE_EQUITY_LIST_PATH,
+            config.NSE_EQUITY_LIST_URL,
+            "https://www.nseindia.com/",
+        )
+        listings = parse_nse_equity_list(text)
+        logger.info(f"Loaded {len(listings)} NSE mainboard listings")
+        return listings
+
+    def load_bse(self, path: Optional[str] = None) -> List[Dict]:
+        text = self._read(
+            path or config.BSE_SCRIP_MASTER_PATH,
+            config.BSE_SCRIP_MASTER_URL,
+            "https://www.bseindia.com/",
+        )
+        listings = parse_bse_scrip_master(text)
+        logger.info(f"Loaded {len(listings)} BSE equity listings")
+        return listings
+
+    def load_listings(
+        self, nse_path: Optional[str] = None, bse_path: Optional[str] = None
+    ) -> Tuple[List[Dict], List[Dict]]:
+        """
+        Load and merge both files. The BSE file is optional: if it cannot be
+        loaded the NSE universe is used without BSE codes.
+        """
+        nse = self.load_nse(nse_path)
+        try:
+            bse = self.load_bse(bse_path)
+        except Exception as e:
+            logger.warning(f"⚠️ BSE scrip master unavailable, continuing with NSE only: {e}")
+            bse = []
+        return merge_listings(nse, bse)
+
+    # ------------------------------------------------------------------
+    # Diff / apply
+    # ------------------------------------------------------------------
+
+    def diff(self, universe: List[Dict]) -> Dict:
+        """
+        Compare the merged NSE universe with the stocks table.
+
+        Returns:
+            {inserts, updates, delistings, renamed, relisted, active}
+        """
+        current = self.db.execute_query(
+            """
+            SELECT id, stock_name, nse_code, bse_code, isin, industry_name, listing_status
+            FROM stocks
+            """
+        )
+
+        by_code = {row["nse_code"].upper(): row for row in current if row["nse_code"]}
+        by_isin: Dict[str, Dict] = {}
+        for row in current:
+            if row["isin"]:
+                by_isin.setdefault(row["isin"].upper(), row)
+        listed_codes = {listing["nse_code"] for listing in universe}
+
+        matched = set()
+        inserts, updates, renamed, relisted = [], [], [], []
+        for listing in universe:
+            code = listing["nse_code"]
+            row = by_code.get(code)
+            if row is None and listing["isin"]:
+                candidate = by_isin.get(listing["isin"])
+                # Same company under a symbol that is no longer listed: a rename
+                if (
+                    candidate
+                    and candidate["id"] not in matched
+                    and (candidate["nse_code"] or "").upper() not in listed_codes
+                ):
+                    row = candidate
+
+            if row is None:
+                inserts.append(listing)
+                continue
+
+            matched.add(row["id"])
+            name = row["stock_name"]
+            if not name or name.upper() == (row["nse_code"] or "").upper():
+                # Placeholder rows carry the symbol as their name
+                name = listing["name"] or name
+            new = {
+                "nse_code": code,
+                "isin": listing["isin"] or row["isin"],
+                "bse_code": listing["bse_code"] or row["bse_code"],
+                "stock_name": name,
+                "industry_name": row["industry_name"] or listing["industry"],
+            }
+            was_delisted = row["listing_status"] == "delisted"
+            if was_delisted or any(new[field] != row[field] for field in new):
+                updates.append((new, row["id"]))
+            if (row["nse_code"] or "").upper() != code:
+                renamed.append((row["nse_code"], code))
+            if was_delisted:
+                relisted.append(code)
+
+        active = [row for row in current if row["listing_status"] != "delisted"]
+        delistings = [
+            row for row in active if row["id"] not in matched and row["nse_code"]
+        ]
+
+        return {
+            "inserts": inserts,
+            "updates": updates,
+            "delistings": delistings,
+            "renamed": renamed,
+            "relisted": relisted,
+            "active": len(active),
+        }
+
+    def apply(self, diff: Dict, allow_mass_delisting: bool = False) -> Dict:
+        """Apply a diff in a single transaction"""
+        delistings = diff["delistings"]
+        limit = int(diff["active"] * config.UNIVERSE_MAX_DELIST_FRACTION)
+        delisting_skipped = len(delistings) > limit and not allow_mass_delisting
+        if delisting_skipped:
+            logger.warning(
+                f"⚠️ {len(delistings)} of {diff['active']} active stocks missing from the "
+                f"listing file (limit {limit}); not marking any delisted"
+            )
+            delistings = []
+
+        self.db.execute_transaction(
+            [
+                (
+                    """UPDATE stocks SET
+                       nse_code = ?, isin = ?, bse_code = ?, stock_name = ?, industry_name = ?,
+                       listing_status = 'active', delisted_at = NULL
+                       WHERE id = ?""",
+                    [
+                        (
+                            new["nse_code"],
+                            new["isin"],
+                            new["bse_code"],
+                            new["stock_name"],
+                            new["industry_name"],
+                            stock_id,
+                        )
+                        for new, stock_id in diff["updates"]
+                    ],
+                ),
+                (
+                    f"""INSERT INTO stocks
+                       (stock_name, nse_code, bse_code, isin, industry_name,
+                        data_quality_score, listing_status)
+                       VALUES (?, ?, ?, ?, ?, {PLACEHOLDER_QUALITY}, 'active')
+                       ON CONFLICT (nse_code) DO NOTHING""",
+                    [
+                        (
+                            listing["name"] or listing["nse_code"],
+                            listing["nse_code"],
+                            listing["bse_code"],
+                            listing["isin"],
+                            listing["industry"],
+                        )
+                        for listing in diff["inserts"]
+                    ],
+                ),
+                (
+                    """UPDATE stocks SET listing_status = 'delisted', delisted_at = CURRENT_TIMESTAMP
+                       WHERE id = ?""",
+                    [(row["id"],) for row in delistings],
+                ),
+            ]
+        )
+
+        return {
+            "inserted": len(diff["inserts"]),
+            "updated": len(diff["updates"]),
+            "renamed": len(diff["renamed"]),
+            "relisted": len(diff["relisted"]),
+            "delisted": len(delistings),
+            "delisting_skipped": delisting_skipped,
+        }
+
+    def _register_symbols(self, universe: List[Dict], bse_only: List[Dict]) -> int:
+        """Feed every listing (including BSE-only names) to the symbol master"""
+        try:
+            from services.symbol_master import symbol_master
+
+            records = [
+                {
+                    "isin": listing["isin"],
+                    "nse_code": listing["nse_code"],
+                    "bse_code": listing["bse_code"],
+                    "yf_ticker": None if listing["nse_code"] else f"{listing['bse_code']}.BO",
+                    "company_name": listing["name"],
+                }
+                for listing in universe + bse_only
+            ]
+            result = symbol_master.upsert(records)
+            return result["inserted"] + result["updated"]
+        except Exception as e:
+            logger.warning(f"⚠️ Symbol master update failed: {e}")
+            return 0
+
+    def sync(
+        self,
+        nse_path: Optional[str] = None,
+        bse_path: Optional[str] = None,
+        dry_run: bool = False,
+        allow_mass_delisting: bool = False,
+    ) -> Dict:
+        """
+        Load the listing files, diff against stocks and apply the changes.
+
+        Args:
+            nse_path / bse_path: Local listing files (default: config paths, else download)
+            dry_run: Only report the diff
+            allow_mass_delisting: Apply delistings above UNIVERSE_MAX_DELIST_FRACTION
+
+        Returns:
+            Dict with listing counts and inserted/updated/renamed/relisted/delisted counts
+        """
+        start = time.time()
+        universe, bse_only = self.load_listings(nse_path, bse_path)
+        if not universe:
+            raise ValueError("NSE listing file contained no mainboard equities")
+
+        diff = self.diff(universe)
+        summary = {
+            "nse_listings": len(universe),
+            "dual_listed": sum(1 for listing in universe if listing["bse_code"]),
+            "bse_only": len(bse_only),
+        }
+
+        if dry_run:
+            summary.update(
+                {
+                    "dry_run": True,
+                    "inserts": [listing["nse_code"] for listing in diff["inserts"]],
+                    "updates": [new["nse_code"] for new, _ in diff["updates"]],
+                    "renamed": diff["renamed"],
+                    "relisted": diff["relisted"],
+                    "delistings": [row["nse_code"] for row in diff["delistings"]],
+                }
+            )
+            return summary
+
+        summary.update(self.apply(diff, allow_mass_delisting))
+        summary["symbols_registered"] = self._register_symbols(universe, bse_only)
+        summary["duration_seconds"] = round(time.time() - start, 2)
+
+        logger.info(
+            f"✅ Universe synced: {summary['inserted']} listed, {summary['updated']} updated "
+            f"({summary['renamed']} renamed), {summary['delisted']} delisted "
+            f"in {summary['duration_seconds']}s"
+        )
+        return summary
+
+
+# Singleton instance
+universe_ingestor = UniverseIngestor()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Sync the stock universe from listing files")
+    parser.add_argument("--nse", help="Local EQUITY_L.csv")
+    parser.add_argument("--bse", help="Local BSE scrip master (CSV or JSON)")
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--allow-mass-delisting", action="store_true")
+    args = parser.parse_args()
+
+    result = universe_ingestor.sync(
+        nse_path=args.nse,
+        bse_path=args.bse,
+        dry_run=args.dry_run,
+        allow_mass_delisting=args.allow_mass_delisting,
+    )
+    print(json.dumps(result, indent=2, default=str))
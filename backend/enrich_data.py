@@ -72,46 +72,33 @@ def main():
 
     print(f"Enriching {len(df)} stocks...")
     
-    # Mapping for List-Only uploads (Partial Nifty 50 list for demo)
-    ticker_map = {
-        'Adani Enterprises Ltd.': 'ADANIENT',
-        'Adani Ports & Special Economic Zone Ltd.': 'ADANIPORTS',
-        'Apollo Hospitals Enterprise Ltd.': 'APOLLOHOSP',
-        'Asian Paints Ltd.': 'ASIANPAINT',
-        'Axis Bank Ltd.': 'AXISBANK',
-        'Reliance Industries Ltd.': 'RELIANCE',
-        'Reliance': 'RELIANCE',
-        'Reliance Industries': 'RELIANCE',
-        'HDFC Bank Ltd.': 'HDFCBANK',
-        'Infosys Ltd.': 'INFY',
-        'ICICI Bank Ltd.': 'ICICIBANK',
-        'Tata Consultancy Services Ltd.': 'TCS',
-        'Bajaj Finance Ltd.': 'BAJFINANCE',
-        'Bharti Airtel Ltd.': 'BHARTIARTL',
-        'Cipla Ltd.': 'CIPLA',
-        'Divi\'s Laboratories Ltd.': 'DIVISLAB',
-        'Eicher Motors Ltd.': 'EICHERMOT',
-        'HCL Technologies Ltd.': 'HCLTECH',
-        'Hindustan Unilever Ltd.': 'HINDUNILVR',
-        'ITC Ltd.': 'ITC',
-        'Maruti Suzuki India Ltd.': 'MARUTI',
-        'Titan Company Ltd.': 'TITAN'
-    }
+    # Resolve names of List-Only uploads in one batch against the symbol master
+    names_without_code = [
+        str(row.get('Stock Name', '')).strip()
+        for _, row in df.iterrows()
+        if not str(row.get('NSE Code', '')) or str(row.get('NSE Code', '')) == 'nan'
+    ]
+    try:
+        from services.symbol_master import symbol_master
+        resolved = symbol_master.resolve_many(names_without_code, queue_misses=False)
+    except Exception as e:
+        print(f"  Symbol master unavailable ({e}), using dynamic search only")
+        symbol_master = None
+        resolved = {}
 
     for i, row in df.iterrows():
         # Identify Stock
         ticker_name = str(row.get('Stock Name', '')).strip()
         nse_code = str(row.get('NSE Code', ''))
         
-        # Fallback: Lookup Code from Name if missing
         # Fallback: Lookup Code from Name if missing
         if (not nse_code or nse_code == 'nan'):
-            # 1. Check Hardcoded Map
-            if ticker_name in ticker_map:
-                nse_code = ticker_map[ticker_name]
-                print(f"  Mapped '{ticker_name}' -> {nse_code} (Static)")
+            # 1. Check Symbol Master (local, batch-resolved above)
+            if resolved.get(ticker_name) and resolved[ticker_name].get('nse_code'):
+                nse_code = resolved[ticker_name]['nse_code']
+                print(f"  Mapped '{ticker_name}' -> {nse_code} (Symbol Master)")
             
-            # 2. Dynamic Search (New Feature)
+            # 2. Dynamic Search (true misses only)
             else:
                 try:
                     # Lazy import to avoid circular issues or setup issues
@@ -123,6 +110,12 @@ def main():
                             if 'nse_code' in cand and cand['nse_code']:
                                 nse_code = cand['nse_code']
                                 print(f"  Mapped '{ticker_name}' -> {nse_code} (Dynamic)")
+                                # Learn the mapping so the next run resolves it locally
+                                if symbol_master is not None:
+                                    symbol_master.upsert(
+                                        [{'nse_code': nse_code, 'isin': cand.get('isin'), 'bse_code': cand.get('bse_code')}],
+                                        aliases={cand.get('isin') or nse_code: [ticker_name]},
+                                    )
                                 break
                 except Exception as e:
                     print(f"  Dynamic lookup failed for {ticker_name}: {e}")
@@ -2,13 +2,56 @@
 Database models for the application
 """
 
+import json
 import uuid
 from datetime import datetime
 
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.dialects.postgresql import JSONB
+
+try:
+    import zstandard
+
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
 
 db = SQLAlchemy()
 
+ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
+
+
+class CompressedJSON(db.TypeDecorator):
+    """
+    JSON payload column: JSONB on Postgres, zstd-compressed JSON bytes elsewhere
+    (SQLite). Plain JSON text from older rows is still read.
+    """
+
+    impl = db.LargeBinary
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(JSONB())
+        return dialect.type_descriptor(db.LargeBinary())
+
+    def process_bind_param(self, value, dialect):
+        if value is None or dialect.name == "postgresql":
+            return value
+        raw = json.dumps(value, separators=(",", ":"), default=str).encode("utf-8")
+        if ZSTD_AVAILABLE:
+            return zstandard.ZstdCompressor(level=3).compress(raw)
+        return raw
+
+    def process_result_value(self, value, dialect):
+        if value is None or dialect.name == "postgresql":
+            return value
+        if isinstance(value, memoryview):
+            value = value.tobytes()
+        if isinstance(value, bytes) and value.startswith(ZSTD_MAGIC):
+            value = zstandard.ZstdDecompressor().decompress(value)
+        return json.loads(value)
+
 
 class User(db.Model):
     """User model for authentication"""
@@ -19,6 +62,8 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False, index=True)
     name = db.Column(db.String(100), nullable=False)
     password_hash = db.Column(db.String(255), nullable=False)
+    # Bumped whenever the user's UserAnalysis rows change; /api/results ETag
+    analysis_version = db.Column(db.BigInteger, default=0, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(
         db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow
@@ -52,6 +97,7 @@ class UserPortfolio(db.Model):
         db.String(36), db.ForeignKey("users.id"), nullable=False, index=True
     )
     stock_name = db.Column(db.String(255), nullable=False)
+    quantity = db.Column(db.Numeric(18, 4, asdecimal=False), nullable=True)  # Shares held
     added_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationship to user
@@ -70,6 +116,7 @@ class UserPortfolio(db.Model):
         return {
             "id": self.id,
             "stock_name": self.stock_name,
+            "quantity": self.quantity,
             "added_at": self.added_at.isoformat() if self.added_at else None,
         }
 
@@ -189,12 +236,22 @@ class UserAnalysis(db.Model):
     )
     stock_name = db.Column(db.String(255), nullable=False)
     nse_code = db.Column(db.String(50))
-    analysis_data = db.Column(db.JSON)  # Stores the full enriched data row
+    analysis_data = db.Column(CompressedJSON)  # Stores the full enriched data row
+    content_hash = db.Column(db.String(64))  # Unchanged payloads are not rewritten
+    # Per-user counter bumped on every processing run that changed the row,
+    # so readers can ask for what changed since the version they last saw
+    version = db.Column(db.BigInteger, default=0, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationships
     user = db.relationship("User", backref="analyses")
 
+    __table_args__ = (
+        db.UniqueConstraint("user_id", "stock_name", name="unique_user_analysis"),
+        db.Index("idx_user_analysis_version", "user_id", "version"),
+    )
+
     def to_dict(self):
         data = self.analysis_data or {}
         # Ensure ID and metadata are included
@@ -203,4 +260,6 @@ class UserAnalysis(db.Model):
         data["stock_name"] = self.stock_name
         data["nse_code"] = self.nse_code
         data["analyzed_at"] = self.created_at.isoformat() if self.created_at else None
+        data["updated_at"] = self.updated_at.isoformat() if self.updated_at else None
+        data["version"] = self.version
         return data
@@ -1,17 +1,22 @@
-import yfinance as yf
+import os
+import sys
+
 import pandas as pd
 import numpy as np
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.ohlcv_store import ohlcv_store
+
 class TechnicalAnalyst:
     def __init__(self, ticker):
         self.ticker = ticker
         self.data = pd.DataFrame()
         
     def fetch_data(self, period="1y"):
-        """Fetches historical data from Yahoo Finance"""
+        """Loads daily bars from the local OHLCV store (missing bars come from Yahoo Finance)"""
         try:
-            stock = yf.Ticker(self.ticker)
-            self.data = stock.history(period=period)
+            self.data = ohlcv_store.history(self.ticker, period=period)
             if self.data.empty:
                 print(f"Warning: No data for {self.ticker}")
             return not self.data.empty
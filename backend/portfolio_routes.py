@@ -19,13 +19,21 @@ def get_portfolio():
         # Get all portfolio items for this user
         portfolio_items = UserPortfolio.query.filter_by(user_id=user_id).all()
 
-        # Return list of stock names
+        # Return list of stock names (and quantities, where known)
         stock_names = [item.stock_name for item in portfolio_items]
+        holdings = [
+            {"stock_name": item.stock_name, "quantity": item.quantity}
+            for item in portfolio_items
+        ]
 
         return jsonify(
             {
                 "status": "success",
-                "data": {"stock_names": stock_names, "count": len(stock_names)},
+                "data": {
+                    "stock_names": stock_names,
+                    "holdings": holdings,
+                    "count": len(stock_names),
+                },
             }
         )
 
@@ -47,18 +55,37 @@ def add_to_portfolio():
                 {"status": "error", "message": "stock_name is required"}
             ), 400
 
+        quantity = data.get("quantity")
+        if quantity is not None:
+            try:
+                quantity = float(quantity)
+            except (TypeError, ValueError):
+                quantity = -1
+            if quantity < 0:
+                return jsonify(
+                    {"status": "error", "message": "quantity must be a non-negative number"}
+                ), 400
+
         # Check if already in portfolio
         existing = UserPortfolio.query.filter_by(
             user_id=user_id, stock_name=stock_name
         ).first()
 
         if existing:
+            if quantity is not None and quantity != existing.quantity:
+                existing.quantity = quantity
+                db.session.commit()
+                return jsonify(
+                    {"status": "success", "message": f"{stock_name} quantity updated"}
+                )
             return jsonify(
                 {"status": "success", "message": "Stock already in portfolio"}
             )
 
         # Add to portfolio
-        portfolio_item = UserPortfolio(user_id=user_id, stock_name=stock_name)
+        portfolio_item = UserPortfolio(
+            user_id=user_id, stock_name=stock_name, quantity=quantity
+        )
         db.session.add(portfolio_item)
         db.session.commit()
 
@@ -123,3 +150,140 @@ def clear_portfolio():
     except Exception as e:
         db.session.rollback()
         return jsonify({"status": "error", "message": str(e)}), 500
+
+
+def _user_holdings(user_id):
+    """({nse_code: quantity or None}, {nse_code: stock name}) for the user's portfolio"""
+    from services.symbol_master import symbol_master
+
+    portfolio_items = UserPortfolio.query.filter_by(user_id=user_id).all()
+
+    # Holdings are stored by name; prices by NSE code
+    resolved = symbol_master.resolve_many([item.stock_name for item in portfolio_items])
+    holdings, names = {}, {}
+    for item in portfolio_items:
+        record = resolved.get(item.stock_name) or {}
+        code = (record.get("nse_code") or item.stock_name.strip()).upper()
+        if code in holdings and item.quantity is not None:
+            holdings[code] = (holdings[code] or 0) + item.quantity
+        else:
+            holdings.setdefault(code, item.quantity)
+        names.setdefault(code, item.stock_name)
+    return holdings, names
+
+
+@portfolio_bp.route("/portfolio/risk", methods=["GET"])
+@jwt_required()
+def get_portfolio_risk():
+    """
+    Risk analytics for the user's holdings from stored daily prices.
+
+    Query params:
+        days: Trading days of history (default 252, 60-1000)
+        confidence: VaR / CVaR confidence level (default 0.95, 0.5-0.999)
+    """
+    from services.portfolio_risk import RiskDataError, portfolio_risk_engine
+
+    try:
+        user_id = get_jwt_identity()
+        days = min(max(request.args.get("days", 252, type=int), 60), 1000)
+        confidence = request.args.get("confidence", 0.95, type=float)
+        if not 0.5 <= confidence < 1:
+            return jsonify(
+                {"status": "error", "message": "confidence must be between 0.5 and 1"}
+            ), 400
+
+        holdings, names = _user_holdings(user_id)
+        if not holdings:
+            return jsonify(
+                {"status": "error", "message": "Portfolio is empty"}
+            ), 400
+
+        report = portfolio_risk_engine.analyze(holdings, days=days, confidence=confidence)
+        for entry in report["holdings"] + report["excluded"]:
+            entry["stock_name"] = names.get(entry["symbol"])
+
+        return jsonify({"status": "success", "data": report})
+
+    except RiskDataError as e:
+        return jsonify({"status": "error", "message": str(e)}), 422
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@portfolio_bp.route("/portfolio/optimize", methods=["POST"])
+@jwt_required()
+def optimize_portfolio():
+    """
+    Suggested weights for the user's holdings or any universe of stocks.
+
+    JSON body (all optional):
+        objective: min_variance (default) | max_sharpe | risk_parity | mean_variance
+        symbols: NSE codes to optimize over (default: the user's holdings)
+        preset: Screener preset whose top `limit` results (default 50) form the universe
+        days: Trading days of returns (default 252, 60-1000)
+        min_weight / max_weight: Per-position bounds (default 0 / 1)
+        sector_limits: Max weight per sector (number) or {sector: max weight}
+        risk_aversion / target_return: mean_variance settings
+    """
+    from services.portfolio_optimizer import OptimizationError, portfolio_optimizer
+    from services.price_history import price_history
+
+    try:
+        user_id = get_jwt_identity()
+        data = request.json or {}
+        days = min(max(int(data.get("days") or 252), 60), 1000)
+
+        names, current_weights = {}, None
+        if data.get("symbols"):
+            symbols = [str(s).strip().upper() for s in data["symbols"] if str(s).strip()]
+        elif data.get("preset"):
+            from services.screener_db_service import db_screener
+
+            result = db_screener.apply_preset(data["preset"])
+            if "error" in result["metadata"]:
+                return jsonify({"status": "error", "message": result["metadata"]["error"]}), 400
+            limit = min(max(int(data.get("limit") or 50), 2), 500)
+            symbols = [row.get("NSE Code") for row in result["results"] if row.get("NSE Code")][:limit]
+        else:
+            holdings, names = _user_holdings(user_id)
+            symbols = list(holdings)
+            # Current market-value weights (trades are reported against them)
+            if any(quantity for quantity in holdings.values()):
+                _, _, closes = price_history.load_closes(symbols, days + 1)
+                if len(closes):
+                    values = {
+                        symbol: (holdings[symbol] or 0) * price
+                        for symbol, price in zip(symbols, closes[-1])
+                        if price == price  # NaN: no price history
+                    }
+                    total = sum(values.values())
+                    if total > 0:
+                        current_weights = {s: v / total for s, v in values.items()}
+
+        if len(symbols) < 2:
+            return jsonify(
+                {"status": "error", "message": "At least two stocks are needed to optimize"}
+            ), 400
+
+        result = portfolio_optimizer.optimize(
+            symbols,
+            objective=data.get("objective") or "min_variance",
+            days=days,
+            min_weight=float(data.get("min_weight") or 0),
+            max_weight=float(data.get("max_weight") or 1),
+            sector_limits=data.get("sector_limits"),
+            current_weights=current_weights,
+            risk_aversion=float(data.get("risk_aversion") or 1),
+            target_return=data.get("target_return"),
+        )
+        if names:
+            for entry in result["weights"] + result["excluded"]:
+                entry["stock_name"] = names.get(entry["symbol"])
+
+        return jsonify({"status": "success", "data": result})
+
+    except (OptimizationError, TypeError, ValueError) as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
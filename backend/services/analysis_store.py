@@ -0,0 +1,115 @@
+"""
+Incremental persistence of per-user portfolio analysis (UserAnalysis).
+
+A processing run used to delete all of a user's analysis rows and insert
+them again. Now each holding's payload is hashed. Only holdings whose hash
+changed are rewritten, new holdings are inserted, and holdings no longer in
+the results are deleted. Every row written in a run gets the user's next
+`version` (also kept on users.analysis_version, the /api/results ETag), so
+`/api/results?since=<version>` returns only what changed since the reader's
+last poll.
+
+Usage:
+    from services.analysis_store import save_user_analysis
+    stats = save_user_analysis(user_id, results)  # results as from portfolio_data_service.load
+"""
+
+import hashlib
+import json
+import logging
+from datetime import datetime
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+def _stable_fields(payload: Dict) -> Dict:
+    """The payload without refresh timestamps, which move on every enrichment"""
+    stable = {
+        key: value
+        for key, value in payload.items()
+        if key != "last_updated" and not key.endswith("_updated_at")
+    }
+    if isinstance(stable.get("_quality"), dict):
+        stable["_quality"] = {k: v for k, v in stable["_quality"].items() if k != "last_updated"}
+    return stable
+
+
+def content_hash(payload: Dict) -> str:
+    """
+    SHA-256 of the canonical JSON form (key order does not matter).
+
+    last_updated / *_updated_at timestamps are left out, so a refresh that
+    changed no values keeps the hash and the row is not rewritten.
+    """
+    canonical = json.dumps(_stable_fields(payload), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def save_user_analysis(user_id: str, results: Dict) -> Dict:
+    """
+    Upsert one UserAnalysis row per symbol, skipping unchanged payloads.
+
+    Args:
+        user_id: Owner of the portfolio
+        results: {symbol: {"data": ..., "quality": ...}}
+
+    Returns:
+        {inserted, updated, unchanged, deleted, version}
+    """
+    from models import User, UserAnalysis, db
+
+    user = db.session.get(User, user_id)
+    existing = {row.stock_name: row for row in UserAnalysis.query.filter_by(user_id=user_id).all()}
+    current_version = max(
+        [row.version or 0 for row in existing.values()] + [(user.analysis_version or 0) if user else 0]
+    )
+    version = current_version + 1
+    now = datetime.utcnow()
+
+    stats = {"inserted": 0, "updated": 0, "unchanged": 0, "deleted": 0}
+    for symbol, result in results.items():
+        data = result.get("data", {})
+        payload = {**data, "_quality": result.get("quality", {})}
+        digest = content_hash(payload)
+        nse_code = data.get("nse_code") or symbol
+
+        row = existing.pop(symbol, None)
+        if row is None:
+            db.session.add(
+                UserAnalysis(
+                    user_id=user_id,
+                    stock_name=symbol,
+                    nse_code=nse_code,
+                    analysis_data=payload,
+                    content_hash=digest,
+                    version=version,
+                    created_at=now,
+                    updated_at=now,
+                )
+            )
+            stats["inserted"] += 1
+        elif row.content_hash == digest and row.nse_code == nse_code:
+            stats["unchanged"] += 1
+        else:
+            row.nse_code = nse_code
+            row.analysis_data = payload
+            row.content_hash = digest
+            row.version = version
+            row.updated_at = now
+            stats["updated"] += 1
+
+    # Holdings removed from the portfolio since the last run
+    for row in existing.values():
+        db.session.delete(row)
+        stats["deleted"] += 1
+
+    changed = stats["inserted"] + stats["updated"] + stats["deleted"]
+    if changed and user is not None:
+        # Deletions leave no row carrying the new version, so the user keeps it
+        user.analysis_version = version
+    db.session.commit()
+
+    stats["version"] = version if changed else current_version
+    logger.info(f"Saved analysis for user {user_id}: {stats}")
+    return stats
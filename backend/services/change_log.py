@@ -0,0 +1,244 @@
+"""
+Change-data-capture log for stock field updates.
+
+StockDataPopulator._update_stock_data diffs incoming values against the
+stored row, writes only the columns that changed and appends one
+(stock_id, field, old, new, ts) record per changed column to `stock_changes`
+in the same transaction. Downstream jobs (caches, sector aggregates, saved
+screens, Relative Strength) poll `changes_since(cursor)` and recompute only
+what moved.
+
+Cursors are change ids: keep the returned cursor and pass it back next time.
+Ids are assigned on insert but become visible on commit, so concurrent
+writers can commit them out of order. Reads stop before a recent change
+whose predecessor id is not visible yet (see ChangeLog.horizon) and pick it
+up once the gap is filled or has settled (a rolled-back insert).
+
+Usage:
+    from services.change_log import change_log
+    batch = change_log.changes_since(cursor)
+    for change in batch["changes"]:
+        ...
+    cursor = batch["cursor"]
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+import math
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import config
+from database.db_config import db_config
+
+logger = logging.getLogger(__name__)
+
+INSERT_SQL = """
+    INSERT INTO stock_changes (stock_id, field, old_value, new_value, changed_at)
+    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+"""
+
+# Differences below this are DECIMAL rounding, not changes
+NUMERIC_TOLERANCE = 0.005
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float, Decimal)):
+        return float(value)
+    return None
+
+
+def values_differ(old, new) -> bool:
+    if old is None or new is None:
+        return (old is None) != (new is None)
+
+    old_num, new_num = _number(old), _number(new)
+    if old_num is not None and new_num is not None:
+        if math.isnan(new_num):
+            return not math.isnan(old_num)
+        return not math.isclose(old_num, new_num, rel_tol=1e-9, abs_tol=NUMERIC_TOLERANCE)
+
+    if isinstance(old, (date, datetime)) or isinstance(new, (date, datetime)):
+        # Dates come back as date objects (Postgres) or text (SQLite)
+        return str(old)[:10] != str(new)[:10]
+
+    return str(old) != str(new)
+
+
+def serialize(value) -> Optional[str]:
+    if value is None:
+        return None
+    number = _number(value)
+    if number is not None:
+        return f"{number:.10g}"
+    return str(value)
+
+
+def diff_row(current: Dict, incoming: Dict) -> Dict[str, Tuple]:
+    """{column: (old, new)} for the incoming columns whose value changed"""
+    return {
+        column: (current.get(column), value)
+        for column, value in incoming.items()
+        if values_differ(current.get(column), value)
+    }
+
+
+class ChangeLog:
+    """Append-only stock field change log with cursor-based reads"""
+
+    def __init__(self, db=None):
+        self.db = db or db_config
+
+    def horizon(self, cursor: int = 0) -> Optional[int]:
+        """
+        First change id after `cursor` that is not safe to read yet (None = all are).
+
+        That is the oldest change younger than config.CHANGE_LOG_SETTLE_SECONDS
+        whose predecessor id is missing: the predecessor may still be committing.
+        """
+        seconds = int(config.CHANGE_LOG_SETTLE_SECONDS)
+        if self.db.is_production:
+            cutoff = f"CURRENT_TIMESTAMP - INTERVAL '{seconds} seconds'"
+        else:
+            cutoff = f"datetime('now', '-{seconds} seconds')"
+        row = self.db.execute_query(
+            f"""
+            SELECT MIN(c.id) AS blocked
+            FROM stock_changes c
+            WHERE c.id > ? AND c.changed_at >= {cutoff}
+              AND NOT EXISTS (SELECT 1 FROM stock_changes p WHERE p.id = c.id - 1)
+            """,
+            (int(cursor) + 1,),
+            fetch_one=True,
+        )
+        return int(row["blocked"]) if row and row["blocked"] is not None else None
+
+    def safe_head(self, cursor: int = 0) -> int:
+        """Last change id after `cursor` that is safe to read (`cursor` if none)"""
+        blocked = self.horizon(cursor)
+        if blocked is None:
+            row = self.db.execute_query("SELECT MAX(id) AS head FROM stock_changes", fetch_one=True)
+        else:
+            row = self.db.execute_query(
+                "SELECT MAX(id) AS head FROM stock_changes WHERE id < ?", (blocked,), fetch_one=True
+            )
+        head = int(row["head"] or 0) if row else 0
+        return max(int(cursor), head)
+
+    def cursor(self) -> int:
+        """Current safe head of the log (pass to changes_since to read what follows)"""
+        return self.safe_head(0)
+
+    def rows(self, stock_id: int, changes: Dict[str, Tuple]) -> List[tuple]:
+        """INSERT_SQL parameters for a diff_row() result"""
+        return [
+            (stock_id, field, serialize(old), serialize(new))
+            for field, (old, new) in changes.items()
+        ]
+
+    def changes_since(
+        self,
+        cursor: int = 0,
+        limit: int = 1000,
+        fields: Optional[Iterable[str]] = None,
+    ) -> Dict:
+        """
+        Committed changes after `cursor` up to the safe horizon, oldest first.
+
+        Args:
+            cursor: Last change id already processed (0 = from the start)
+            limit: Max changes per call
+            fields: Only these columns (the cursor still advances past others)
+
+        Returns:
+            {changes: [{id, stock_id, nse_code, field, old_value, new_value, changed_at}],
+             cursor, has_more}
+        """
+        fields = list(fields or [])
+        field_filter = ""
+        if fields:
+            field_filter = f"AND c.field IN ({', '.join('?' for _ in fields)})"
+
+        blocked = self.horizon(cursor)
+        horizon_filter = "AND c.id < ?" if blocked is not None else ""
+
+        changes = self.db.execute_query(
+            f"""
+            SELECT c.id, c.stock_id, s.nse_code, c.field, c.old_value, c.new_value, c.changed_at
+            FROM stock_changes c
+            LEFT JOIN stocks s ON s.id = c.stock_id
+            WHERE c.id > ? {horizon_filter} {field_filter}
+            ORDER BY c.id
+            LIMIT ?
+            """,
+            (int(cursor), *([blocked] if blocked is not None else []), *fields, limit + 1),
+        )
+
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+        if changes:
+            next_cursor = changes[-1]["id"]
+        elif fields:
+            # Nothing matched the filter: skip to the head so callers don't rescan
+            next_cursor = self.safe_head(cursor)
+        else:
+            next_cursor = int(cursor)
+
+        return {"changes": changes, "cursor": next_cursor, "has_more": has_more}
+
+    def changed_stocks_since(
+        self, cursor: int = 0, fields: Optional[Iterable[str]] = None
+    ) -> Dict:
+        """
+        Distinct stocks and columns changed after `cursor`, for consumers that
+        recompute per stock / aggregate rather than replaying every change.
+
+        Returns:
+            {stock_ids: [...], fields: [...], changes: n, cursor}
+        """
+        fields = list(fields or [])
+        field_filter = ""
+        if fields:
+            field_filter = f"AND field IN ({', '.join('?' for _ in fields)})"
+
+        rows = self.db.execute_query(
+            f"""
+            SELECT stock_id, field, COUNT(*) AS n, MAX(id) AS last_id
+            FROM stock_changes
+            WHERE id > ? {field_filter}
+            GROUP BY stock_id, field
+            """,
+            (int(cursor), *fields),
+        )
+
+        return {
+            "stock_ids": sorted({row["stock_id"] for row in rows}),
+            "fields": sorted({row["field"] for row in rows}),
+            "changes": sum(int(row["n"]) for row in rows),
+            # Everything visible is counted; the cursor stays below unsettled gaps
+            "cursor": self.safe_head(cursor) if rows else int(cursor),
+        }
+
+    def prune(self, retention_days: Optional[int] = None) -> int:
+        """Delete changes older than the retention window"""
+        days = retention_days or config.CHANGE_LOG_RETENTION_DAYS
+        if self.db.is_production:
+            cutoff = f"CURRENT_TIMESTAMP - INTERVAL '{int(days)} days'"
+        else:
+            cutoff = f"datetime('now', '-{int(days)} days')"
+        try:
+            return self.db.execute_query(f"DELETE FROM stock_changes WHERE changed_at < {cutoff}")
+        except Exception as e:
+            logger.warning(f"⚠️ Change log prune failed: {e}")
+            return 0
+
+
+# Singleton instance
+change_log = ChangeLog()
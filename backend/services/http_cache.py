@@ -0,0 +1,403 @@
+"""
+Persistent record/replay response cache for external market-data sources.
+
+Sits underneath the fetchers so the enrichment pipeline can run offline:
+- requests: `install()` hooks requests.Session.request, which covers
+  nsepython, the MoneyControl library, Google News RSS and Alpha Vantage.
+  Only GETs to config.HTTP_CACHE_HOSTS without auth headers are cached and
+  only 2xx responses are stored; every other request (LLM APIs, POSTs,
+  authenticated calls) passes straight through
+- library calls (yfinance uses its own curl_cffi session): wrap the call
+  with the `cached_call(endpoint)` decorator; None results are not stored
+
+Payloads are stored as JSON (response bodies base64-encoded), never pickled.
+
+Storage is a single SQLite file. Modes (config.HTTP_CACHE_MODE or KLYX_HTTP_CACHE):
+- off:    passthrough (default)
+- cache:  serve stored responses younger than the endpoint TTL, else fetch + store
+- record: always fetch live and store the response (overwrites)
+- replay: serve only stored responses, ignoring TTLs; a miss raises HTTPCacheMiss.
+          The whole store is loaded into memory on first use, so replays run at
+          memory speed and never touch the network.
+
+Usage:
+    KLYX_HTTP_CACHE=record python database/stock_populator.py   # capture
+    KLYX_HTTP_CACHE=replay python database/stock_populator.py   # offline rerun
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from functools import wraps
+from typing import Callable, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config import config
+from services.tiered_cache import _json_default
+
+logger = logging.getLogger(__name__)
+
+MODES = ("off", "cache", "record", "replay")
+
+
+class HTTPCacheMiss(Exception):
+    """Raised in replay mode when no recording exists for a request"""
+
+
+class ResponseStore:
+    """SQLite-backed store for recorded responses and library call results"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+        # key -> (kind, payload, stored_at); populated lazily / fully in replay
+        self._memory: Dict[str, Tuple[str, bytes, float]] = {}
+        self._fully_loaded = False
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                       key TEXT PRIMARY KEY,
+                       endpoint TEXT,
+                       kind TEXT,
+                       payload BLOB,
+                       stored_at REAL
+                   )"""
+            )
+            self._conn.commit()
+        return self._conn
+
+    def load_all(self):
+        """Load every recording into memory (used by replay mode)"""
+        with self._lock:
+            if self._fully_loaded:
+                return
+            rows = self._connect().execute(
+                "SELECT key, kind, payload, stored_at FROM responses"
+            ).fetchall()
+            for key, kind, payload, stored_at in rows:
+                self._memory[key] = (kind, payload, stored_at)
+            self._fully_loaded = True
+            logger.info(f"HTTP cache: loaded {len(rows)} recordings from {self.path}")
+
+    def get(self, key: str) -> Optional[Tuple[str, bytes, float]]:
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+            if self._fully_loaded:
+                return None
+            row = self._connect().execute(
+                "SELECT kind, payload, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._memory[key] = (row[0], row[1], row[2])
+            return self._memory[key]
+
+    def put(self, key: str, endpoint: str, kind: str, payload: bytes):
+        stored_at = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute(
+                """INSERT OR REPLACE INTO responses (key, endpoint, kind, payload, stored_at)
+                   VALUES (?, ?, ?, ?, ?)""",
+                (key, endpoint, kind, sqlite3.Binary(payload), stored_at),
+            )
+            conn.commit()
+            self._memory[key] = (kind, payload, stored_at)
+
+
+class HTTPCache:
+    """Mode + TTL policy on top of a ResponseStore"""
+
+    def __init__(
+        self,
+        mode: str = "off",
+        path: Optional[str] = None,
+        ttls: Optional[Dict[str, int]] = None,
+        default_ttl: int = 3600,
+        ignored_params: Tuple[str, ...] = (),
+        hosts: Tuple[str, ...] = (),
+        auth_headers: Tuple[str, ...] = (),
+    ):
+        if mode not in MODES:
+            logger.warning(f"Unknown HTTP cache mode '{mode}', using 'off'")
+            mode = "off"
+        self.mode = mode
+        self.ttls = ttls or {}
+        self.default_ttl = default_ttl
+        self.ignored_params = {p.lower() for p in ignored_params}
+        self.hosts = tuple(h.lower() for h in hosts)
+        self.auth_headers = {h.lower() for h in auth_headers}
+        self.store = ResponseStore(path) if mode != "off" and path else None
+        if self.store is None:
+            self.mode = "off"
+
+        self.stats = {"hits": 0, "misses": 0, "recorded": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    def ttl_for(self, endpoint: str) -> int:
+        """Longest matching TTL pattern wins (e.g. 'yfinance.history' over 'yfinance')"""
+        best = None
+        for pattern, ttl in self.ttls.items():
+            if pattern in endpoint and (best is None or len(pattern) > len(best[0])):
+                best = (pattern, ttl)
+        return best[1] if best else self.default_ttl
+
+    def should_cache(self, method: str, url: str, headers=None) -> bool:
+        """Unauthenticated GETs to a market-data host only"""
+        if method.upper() != "GET":
+            return False
+        host = (urlsplit(url).hostname or "").lower()
+        if not any(host == h or host.endswith("." + h) for h in self.hosts):
+            return False
+        return not any(name.lower() in self.auth_headers for name in (headers or {}))
+
+    # ------------------------------------------------------------------
+    # Keys
+    # ------------------------------------------------------------------
+
+    def request_key(self, method: str, url: str, params=None, data=None, json_body=None) -> str:
+        """Stable key: method + normalized URL (sorted query, secrets stripped) + body hash"""
+        parts = urlsplit(url)
+        query = parse_qsl(parts.query, keep_blank_values=True)
+        if isinstance(params, dict):
+            query.extend((k, str(v)) for k, v in params.items() if v is not None)
+        elif params:
+            query.extend((k, str(v)) for k, v in params)
+        query = sorted((k, v) for k, v in query if k.lower() not in self.ignored_params)
+        normalized = urlunsplit(
+            (parts.scheme, parts.netloc.lower(), parts.path, urlencode(query), "")
+        )
+
+        body = b""
+        if json_body is not None:
+            body = json.dumps(json_body, sort_keys=True, default=str).encode()
+        elif isinstance(data, dict):
+            body = urlencode(sorted(data.items())).encode()
+        elif isinstance(data, str):
+            body = data.encode()
+        elif isinstance(data, bytes):
+            body = data
+
+        digest = hashlib.sha1(body).hexdigest()[:12] if body else "-"
+        return f"http:{method.upper()}:{normalized}:{digest}"
+
+    @staticmethod
+    def call_key(endpoint: str, args: tuple, kwargs: dict) -> str:
+        raw = repr(args) + repr(sorted(kwargs.items()))
+        return f"call:{endpoint}:{hashlib.sha1(raw.encode()).hexdigest()}"
+
+    # ------------------------------------------------------------------
+    # Lookup / store
+    # ------------------------------------------------------------------
+
+    def lookup(self, key: str, endpoint: str) -> Optional[bytes]:
+        """Return stored payload if the current mode allows serving it"""
+        if self.mode in ("off", "record"):
+            return None
+
+        entry = self.store.get(key)
+        if entry is not None:
+            _, payload, stored_at = entry
+            if self.mode == "replay" or time.time() - stored_at < self.ttl_for(endpoint):
+                self.stats["hits"] += 1
+                return payload
+
+        self.stats["misses"] += 1
+        if self.mode == "replay":
+            raise HTTPCacheMiss(f"No recording for {endpoint} ({key})")
+        return None
+
+    def save(self, key: str, endpoint: str, kind: str, payload: bytes):
+        if self.mode in ("cache", "record"):
+            self.store.put(key, endpoint, kind, payload)
+            self.stats["recorded"] += 1
+
+
+# ----------------------------------------------------------------------
+# requests integration
+# ----------------------------------------------------------------------
+
+
+def _serialize_response(response) -> bytes:
+    return json.dumps(
+        {
+            "status_code": response.status_code,
+            "headers": dict(response.headers),
+            "content": base64.b64encode(response.content).decode("ascii"),
+            "url": response.url,
+            "encoding": response.encoding,
+            "reason": response.reason,
+        }
+    ).encode()
+
+
+def _deserialize_response(payload: bytes, request=None):
+    from requests.models import Response
+    from requests.structures import CaseInsensitiveDict
+
+    stored = json.loads(payload)
+    response = Response()
+    response.status_code = stored["status_code"]
+    response.headers = CaseInsensitiveDict(stored["headers"])
+    response._content = base64.b64decode(stored["content"])
+    response.url = stored["url"]
+    response.encoding = stored["encoding"]
+    response.reason = stored["reason"]
+    response.request = request
+    return response
+
+
+def _load(cache: "HTTPCache", key: str, endpoint: str, decode: Callable):
+    """
+    Decoded stored payload, or None to fetch live.
+
+    Recordings that no longer decode (e.g. pickled by an older version)
+    count as misses.
+    """
+    payload = cache.lookup(key, endpoint)
+    if payload is None:
+        return None
+    try:
+        return decode(payload)
+    except (ValueError, KeyError, TypeError) as e:
+        if cache.mode == "replay":
+            raise HTTPCacheMiss(f"Unreadable recording for {endpoint} ({key})") from e
+        logger.debug(f"HTTP cache: ignoring unreadable recording for {endpoint}: {e}")
+        return None
+
+
+_original_session_request = None
+_install_lock = threading.Lock()
+
+
+def install(cache: Optional["HTTPCache"] = None) -> bool:
+    """
+    Hook requests.Session so market-data GETs go through the cache. Idempotent.
+    Requests that fail `should_cache` are passed to the original method untouched.
+    Returns False (and does nothing) when the cache is off.
+    """
+    global _original_session_request
+
+    cache = cache or http_cache
+    if not cache.enabled:
+        return False
+
+    import requests
+
+    with _install_lock:
+        if _original_session_request is not None:
+            return True
+
+        original = requests.Session.request
+        _original_session_request = original
+
+        @wraps(original)
+        def cached_request(session, method, url, params=None, data=None, json=None, **kwargs):
+            headers = {**(session.headers or {}), **(kwargs.get("headers") or {})}
+            if not cache.should_cache(method, url, headers):
+                return original(session, method, url, params=params, data=data, json=json, **kwargs)
+
+            endpoint = urlsplit(url).netloc.lower()
+            key = cache.request_key(method, url, params=params, data=data, json_body=json)
+
+            cached = _load(cache, key, endpoint, _deserialize_response)
+            if cached is not None:
+                return cached
+
+            response = original(session, method, url, params=params, data=data, json=json, **kwargs)
+            if 200 <= response.status_code < 300:
+                cache.save(key, endpoint, "http", _serialize_response(response))
+            return response
+
+        requests.Session.request = cached_request
+
+    logger.info(f"HTTP cache installed (mode={cache.mode}, path={cache.store.path})")
+    return True
+
+
+def uninstall():
+    """Restore the original requests.Session.request"""
+    global _original_session_request
+
+    import requests
+
+    with _install_lock:
+        if _original_session_request is not None:
+            requests.Session.request = _original_session_request
+            _original_session_request = None
+
+
+# ----------------------------------------------------------------------
+# Library call integration
+# ----------------------------------------------------------------------
+
+
+def cached_call(endpoint: str, is_method: bool = False) -> Callable:
+    """
+    Decorator that records/replays the (JSON-serializable) return value of a
+    library call. None means the fetch failed and is never stored.
+    With is_method=True the first positional argument (self) is left out of the key.
+
+    Usage:
+        @cached_call("yfinance.fundamentals", is_method=True)
+        def fetch_fundamentals(self, symbol): ...
+    """
+
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = http_cache
+            if not cache.enabled:
+                return func(*args, **kwargs)
+
+            key_args = args[1:] if is_method else args
+            key = cache.call_key(endpoint, key_args, kwargs)
+
+            cached = _load(cache, key, endpoint, json.loads)
+            if cached is not None:
+                return cached
+
+            result = func(*args, **kwargs)
+            if result is None:
+                return result
+            try:
+                cache.save(key, endpoint, "call", json.dumps(result, default=_json_default).encode())
+            except Exception as e:
+                logger.debug(f"HTTP cache: could not store {endpoint} result: {e}")
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _build_default_cache() -> HTTPCache:
+    cache = HTTPCache(
+        mode=config.HTTP_CACHE_MODE,
+        path=config.HTTP_CACHE_PATH,
+        ttls=config.HTTP_CACHE_TTLS,
+        default_ttl=config.HTTP_CACHE_DEFAULT_TTL,
+        ignored_params=tuple(config.HTTP_CACHE_IGNORED_PARAMS),
+        hosts=tuple(config.HTTP_CACHE_HOSTS),
+        auth_headers=tuple(config.HTTP_CACHE_AUTH_HEADERS),
+    )
+    if cache.mode == "replay":
+        cache.store.load_all()
+    return cache
+
+
+# Singleton instance
+http_cache = _build_default_cache()
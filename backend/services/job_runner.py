@@ -0,0 +1,652 @@
+"""
+Checkpointed background jobs for long-running worker tasks.
+
+Jobs used to run inside the HTTP request: a 20+ minute enrichment blocked the
+request, and a restart midway started over from offset 0. Now:
+
+- POST returns a job ID immediately; the job runs on a background thread
+- Each job is planned once into items (usually one per symbol) stored in
+  `job_items` with state pending/done/failed and an attempt counter
+- Items are checkpointed as they complete, so a restarted job only processes
+  what is still pending
+- Running jobs hold a lease (heartbeat_at). If the process dies, the lease
+  expires after config.JOB_LEASE_SECONDS and the next runner picks the job up again
+- Cancellation is cooperative (checked between batches)
+- Each job type has a concurrency limit (config.JOB_CONCURRENCY_LIMITS),
+  enforced across processes when a job is claimed; jobs over the limit wait
+  in 'queued'
+- Submitting with max_queued bounds that queue: once it is full, submit
+  raises JobQueueFull (callers answer 429 with Retry-After)
+
+Usage:
+    class PriceJob(JobType):
+        name = "refresh"
+        def plan(self, params): return [(code, {...}), ...]
+        def process(self, items, params):
+            for item in items:
+                yield item["key"], None  # None = done, SKIPPED, str = error
+
+    job_runner.register(PriceJob())
+    job = job_runner.submit("refresh", {})
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import logging
+import socket
+import threading
+import time
+import uuid
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import config
+from database.db_config import db_config
+
+logger = logging.getLogger(__name__)
+
+# Job states
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+CANCELLED = "cancelled"
+
+# Item states
+PENDING = "pending"
+DONE = "done"
+SKIPPED = "skipped"  # Nothing to do for the item (e.g. already fresh)
+
+
+def _serialize(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+class JobCancelled(Exception):
+    """Raised inside a job thread when cancellation was requested"""
+
+
+class JobQueueFull(Exception):
+    """Raised by submit() when a job type already has max_queued jobs waiting"""
+
+    def __init__(self, job_type: str, retry_after: int):
+        super().__init__(f"Too many {job_type} jobs queued, retry in {retry_after}s")
+        self.job_type = job_type
+        self.retry_after = retry_after
+
+
+class JobType:
+    """
+    Base class for a kind of job.
+
+    Subclasses implement plan() and process(); finalize() is optional.
+    The params they receive also carry the job's own ID as params["job_id"].
+    """
+
+    name: str = ""
+    batch_size: int = 1  # items handed to process() at a time
+    batch_delay: float = 0  # seconds to sleep between batches (rate limiting)
+    max_attempts: int = 3  # failed items are retried on resume up to this many attempts
+
+    def chunk_size(self, params: Dict) -> int:
+        return self.batch_size
+
+    def plan(self, params: Dict) -> List[Tuple[str, Dict]]:
+        """Return the job's items as (key, payload) pairs, in processing order"""
+        raise NotImplementedError
+
+    def process(
+        self, items: List[Dict], params: Dict
+    ) -> Iterable[Tuple[str, Optional[str]]]:
+        """
+        Process one batch of items ({key, payload}).
+        Yield (key, None) when an item is done, (key, SKIPPED) when there was
+        nothing to do or (key, error) when it failed.
+        Items that are never yielded count as failed.
+        """
+        raise NotImplementedError
+
+    def finalize(self, params: Dict, summary: Dict) -> Optional[Dict]:
+        """Run once after all items are processed; returned dict is stored as the result"""
+        return None
+
+
+class JobStore:
+    """Persistence for jobs and their items (jobs / job_items tables)"""
+
+    def __init__(self, db=None):
+        self.db = db or db_config
+
+    def create(self, job_type: str, params: Dict) -> str:
+        job_id = str(uuid.uuid4())
+        self.db.execute_query(
+            """
+            INSERT INTO jobs (id, job_type, status, params, cancel_requested, created_at)
+            VALUES (?, ?, ?, ?, 0, CURRENT_TIMESTAMP)
+            """,
+            (job_id, job_type, QUEUED, json.dumps(params or {})),
+        )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        return self.db.execute_query(
+            "SELECT * FROM jobs WHERE id = ?", (job_id,), fetch_one=True
+        )
+
+    def list(
+        self, job_type: Optional[str] = None, status: Optional[str] = None, limit: int = 20
+    ) -> List[Dict]:
+        conditions = []
+        params = []
+        if job_type:
+            conditions.append("job_type = ?")
+            params.append(job_type)
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(limit)
+        return self.db.execute_query(
+            f"SELECT * FROM jobs {where} ORDER BY created_at DESC LIMIT ?",
+            tuple(params),
+        )
+
+    # ------------------------------------------------------------------
+    # Leases
+    # ------------------------------------------------------------------
+
+    def claimable(self, lease_cutoff: float) -> List[Dict]:
+        """Queued jobs plus running jobs whose owner stopped heartbeating, oldest first"""
+        return self.db.execute_query(
+            """
+            SELECT id, job_type FROM jobs
+            WHERE status = ?
+               OR (status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?))
+            ORDER BY created_at
+            """,
+            (QUEUED, RUNNING, lease_cutoff),
+        )
+
+    def count_queued(self, job_type: str) -> int:
+        row = self.db.execute_query(
+            "SELECT COUNT(*) AS n FROM jobs WHERE job_type = ? AND status = ?",
+            (job_type, QUEUED),
+            fetch_one=True,
+        )
+        return int(row["n"]) if row else 0
+
+    def find_active(self, job_type: str, params: Dict) -> Optional[Dict]:
+        """Queued or running job of this type with exactly these params"""
+        return self.db.execute_query(
+            """
+            SELECT * FROM jobs
+            WHERE job_type = ? AND params = ? AND status IN (?, ?)
+            ORDER BY created_at
+            LIMIT 1
+            """,
+            (job_type, json.dumps(params or {}), QUEUED, RUNNING),
+            fetch_one=True,
+        )
+
+    def claim(self, job_id: str, job_type: str, owner: str, lease_cutoff: float, limit: int) -> bool:
+        """
+        Atomically take ownership of a queued (or abandoned) job, provided
+        fewer than `limit` jobs of its type hold a live lease.
+
+        The running count is checked inside the UPDATE and claims of one job
+        type are serialized across processes (advisory lock on Postgres,
+        BEGIN IMMEDIATE on SQLite), so concurrent dispatchers cannot both
+        take the last slot.
+        """
+        with self.db.locked_transaction() as tx:
+            if tx.is_postgres:
+                tx.execute("SELECT pg_advisory_xact_lock(hashtext(?))", (f"jobs:{job_type}",))
+            claimed = tx.execute(
+                """
+                UPDATE jobs
+                SET status = ?, owner = ?, heartbeat_at = ?,
+                    started_at = COALESCE(started_at, CURRENT_TIMESTAMP)
+                WHERE id = ?
+                  AND (status = ? OR (status = ? AND (heartbeat_at IS NULL OR heartbeat_at < ?)))
+                  AND (
+                      SELECT COUNT(*) FROM jobs live
+                      WHERE live.job_type = ? AND live.status = ? AND live.heartbeat_at >= ?
+                  ) < ?
+                """,
+                (
+                    RUNNING, owner, time.time(), job_id, QUEUED, RUNNING, lease_cutoff,
+                    job_type, RUNNING, lease_cutoff, limit,
+                ),
+            )
+        return claimed == 1
+
+    def heartbeat(self, owner: str):
+        self.db.execute_query(
+            "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status = ?",
+            (time.time(), owner, RUNNING),
+        )
+
+    def cancel_requested(self, job_id: str) -> bool:
+        row = self.db.execute_query(
+            "SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,), fetch_one=True
+        )
+        return bool(row and row["cancel_requested"])
+
+    def finish(
+        self,
+        job_id: str,
+        status: str,
+        result: Optional[Dict] = None,
+        error: Optional[str] = None,
+    ):
+        self.db.execute_query(
+            """
+            UPDATE jobs
+            SET status = ?, result = ?, error_message = ?, finished_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+            """,
+            (status, json.dumps(result, default=str) if result else None, error, job_id),
+        )
+
+    def request_cancel(self, job_id: str) -> bool:
+        """Cancel a queued job outright, or flag a running one. False if already finished."""
+        cancelled = self.db.execute_query(
+            """
+            UPDATE jobs SET status = ?, cancel_requested = 1, finished_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND status = ?
+            """,
+            (CANCELLED, job_id, QUEUED),
+        )
+        if cancelled:
+            return True
+        flagged = self.db.execute_query(
+            "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = ?",
+            (job_id, RUNNING),
+        )
+        return flagged == 1
+
+    def requeue(self, job_id: str, max_attempts: int) -> bool:
+        """Put a finished job back in the queue, retrying failed items with attempts left"""
+        requeued = self.db.execute_query(
+            """
+            UPDATE jobs
+            SET status = ?, cancel_requested = 0, error_message = NULL, finished_at = NULL
+            WHERE id = ? AND status IN (?, ?, ?)
+            """,
+            (QUEUED, job_id, COMPLETED, FAILED, CANCELLED),
+        )
+        if not requeued:
+            return False
+        self.db.execute_query(
+            """
+            UPDATE job_items SET status = ?
+            WHERE job_id = ? AND status = ? AND attempts < ?
+            """,
+            (PENDING, job_id, FAILED, max_attempts),
+        )
+        return True
+
+    # ------------------------------------------------------------------
+    # Items (checkpoints)
+    # ------------------------------------------------------------------
+
+    def is_planned(self, job_id: str) -> bool:
+        row = self.db.execute_query(
+            "SELECT total_items FROM jobs WHERE id = ?", (job_id,), fetch_one=True
+        )
+        return bool(row) and row["total_items"] is not None
+
+    def add_items(self, job_id: str, items: List[Tuple[str, Dict]]):
+        # Clear a partial plan left by a crash between the insert and the total update
+        self.db.execute_query("DELETE FROM job_items WHERE job_id = ?", (job_id,))
+
+        seen = set()
+        rows = []
+        for key, payload in items:
+            if key in seen:
+                continue
+            seen.add(key)
+            rows.append((job_id, key, len(rows), json.dumps(payload, default=str), PENDING))
+
+        if rows:
+            self.db.execute_many(
+                """
+                INSERT INTO job_items (job_id, item_key, position, payload, status, attempts)
+                VALUES (?, ?, ?, ?, ?, 0)
+                """,
+                rows,
+            )
+        self.db.execute_query(
+            "UPDATE jobs SET total_items = ? WHERE id = ?", (len(rows), job_id)
+        )
+
+    def next_items(self, job_id: str, limit: int) -> List[Dict]:
+        rows = self.db.execute_query(
+            """
+            SELECT item_key, payload FROM job_items
+            WHERE job_id = ? AND status = ?
+            ORDER BY position
+            LIMIT ?
+            """,
+            (job_id, PENDING, limit),
+        )
+        return [
+            {"key": row["item_key"], "payload": json.loads(row["payload"] or "{}")}
+            for row in rows
+        ]
+
+    def record_results(self, job_id: str, results: List[Tuple[str, Optional[str]]]):
+        """Checkpoint processed items: (key, None) = done, (key, SKIPPED), (key, error) = failed"""
+        if not results:
+            return
+        self.db.execute_many(
+            """
+            UPDATE job_items
+            SET status = ?, attempts = attempts + 1, error_message = ?,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE job_id = ? AND item_key = ?
+            """,
+            [
+                (
+                    DONE if error is None else error if error == SKIPPED else FAILED,
+                    None if error == SKIPPED else error,
+                    job_id,
+                    key,
+                )
+                for key, error in results
+            ],
+        )
+
+    def record_batch_error(
+        self, job_id: str, keys: List[str], error: str, max_attempts: int
+    ):
+        """A whole batch raised: count an attempt, give up on items out of attempts"""
+        self.db.execute_many(
+            """
+            UPDATE job_items
+            SET attempts = attempts + 1, error_message = ?,
+                status = CASE WHEN attempts + 1 >= ? THEN ? ELSE status END,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE job_id = ? AND item_key = ?
+            """,
+            [(error, max_attempts, FAILED, job_id, key) for key in keys],
+        )
+
+    def item_counts(self, job_id: str) -> Dict[str, int]:
+        rows = self.db.execute_query(
+            "SELECT status, COUNT(*) AS n FROM job_items WHERE job_id = ? GROUP BY status",
+            (job_id,),
+        )
+        return {row["status"]: int(row["n"]) for row in rows}
+
+    def failed_items(self, job_id: str, limit: int = 20) -> List[Dict]:
+        return self.db.execute_query(
+            """
+            SELECT item_key, attempts, error_message FROM job_items
+            WHERE job_id = ? AND status = ?
+            ORDER BY position
+            LIMIT ?
+            """,
+            (job_id, FAILED, limit),
+        )
+
+
+class JobRunner:
+    """
+    Runs registered job types on background threads with leases and checkpoints.
+
+    A monitor thread heartbeats this runner's jobs and picks up queued or
+    abandoned jobs every MONITOR_INTERVAL seconds.
+    """
+
+    MONITOR_INTERVAL = 15
+    RESULT_FLUSH_SECONDS = 2  # checkpoint at least this often within a batch
+    BATCH_ERROR_BACKOFF = 5  # seconds before retrying items of a batch that raised
+
+    def __init__(self, store: Optional[JobStore] = None):
+        self.store = store or JobStore()
+        self.types: Dict[str, JobType] = {}
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self.lease_seconds = config.JOB_LEASE_SECONDS
+        self._lock = threading.Lock()
+        self._threads: Dict[str, threading.Thread] = {}
+        self._monitor = None
+
+    def register(self, job_type: JobType):
+        self.types[job_type.name] = job_type
+
+    def limit_for(self, job_type: str) -> int:
+        return config.JOB_CONCURRENCY_LIMITS.get(job_type, 1)
+
+    def _lease_cutoff(self) -> float:
+        return time.time() - self.lease_seconds
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the monitor thread (resumes interrupted jobs). Idempotent."""
+        with self._lock:
+            if self._monitor is not None:
+                return
+            self._monitor = threading.Thread(
+                target=self._monitor_loop, name="job-monitor", daemon=True
+            )
+            self._monitor.start()
+        logger.info(f"Job runner started ({self.owner})")
+
+    def submit(
+        self,
+        job_type: str,
+        params: Optional[Dict] = None,
+        max_queued: Optional[int] = None,
+    ) -> Dict:
+        """
+        Queue a job and start it if a slot is free. Returns the job status.
+
+        Args:
+            job_type: Registered job type name
+            params: Job parameters (JSON-serializable)
+            max_queued: Refuse the job when this many are already waiting
+
+        Raises:
+            JobQueueFull: if max_queued jobs of this type are already queued
+        """
+        if job_type not in self.types:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        if max_queued is not None and self.store.count_queued(job_type) >= max_queued:
+            raise JobQueueFull(job_type, config.JOB_RETRY_AFTER_SECONDS)
+
+        job_id = self.store.create(job_type, params or {})
+        logger.info(f"Queued {job_type} job {job_id}")
+        self.start()
+        self.dispatch()
+        return self.status(job_id)
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        """Job row plus item progress"""
+        job = self.store.get(job_id)
+        if job is None:
+            return None
+
+        counts = self.store.item_counts(job_id)
+        total = job["total_items"]
+        processed = counts.get(DONE, 0) + counts.get(SKIPPED, 0) + counts.get(FAILED, 0)
+
+        status = {
+            "job_id": job["id"],
+            "job_type": job["job_type"],
+            "status": job["status"],
+            "params": json.loads(job["params"] or "{}"),
+            "total": total,
+            "done": counts.get(DONE, 0),
+            "skipped": counts.get(SKIPPED, 0),
+            "failed": counts.get(FAILED, 0),
+            "pending": counts.get(PENDING, 0),
+            "progress_pct": round(100 * processed / total, 1) if total else 0,
+            "cancel_requested": bool(job["cancel_requested"]),
+            "result": json.loads(job["result"]) if job["result"] else None,
+            "error": job["error_message"],
+            "created_at": _serialize(job["created_at"]),
+            "started_at": _serialize(job["started_at"]),
+            "finished_at": _serialize(job["finished_at"]),
+        }
+        if counts.get(FAILED):
+            status["failed_items"] = self.store.failed_items(job_id)
+        return status
+
+    def list(self, job_type: Optional[str] = None, status: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        return [
+            {
+                "job_id": job["id"],
+                "job_type": job["job_type"],
+                "status": job["status"],
+                "total": job["total_items"],
+                "created_at": _serialize(job["created_at"]),
+                "finished_at": _serialize(job["finished_at"]),
+            }
+            for job in self.store.list(job_type, status, limit)
+        ]
+
+    def cancel(self, job_id: str) -> bool:
+        return self.store.request_cancel(job_id)
+
+    def resume(self, job_id: str) -> bool:
+        """Requeue a finished job; done items are skipped, failed items with attempts left are retried"""
+        job = self.store.get(job_id)
+        if job is None or job["job_type"] not in self.types:
+            return False
+        job_type = self.types[job["job_type"]]
+        if not self.store.requeue(job_id, job_type.max_attempts):
+            return False
+        self.start()
+        self.dispatch()
+        return True
+
+    # ------------------------------------------------------------------
+    # Scheduling
+    # ------------------------------------------------------------------
+
+    def dispatch(self):
+        """Start every claimable job that fits under its type's concurrency limit"""
+        with self._lock:
+            cutoff = self._lease_cutoff()
+            for job in self.store.claimable(cutoff):
+                job_id, job_type = job["id"], job["job_type"]
+                if job_type not in self.types or job_id in self._threads:
+                    continue
+                if not self.store.claim(job_id, job_type, self.owner, cutoff, self.limit_for(job_type)):
+                    continue
+
+                thread = threading.Thread(
+                    target=self._run, args=(job_id,), name=f"job-{job_type}", daemon=True
+                )
+                self._threads[job_id] = thread
+                thread.start()
+
+    def _monitor_loop(self):
+        while True:
+            try:
+                if self._threads:
+                    self.store.heartbeat(self.owner)
+                self.dispatch()
+            except Exception as e:
+                logger.warning(f"Job monitor error: {e}")
+            time.sleep(self.MONITOR_INTERVAL)
+
+    # ------------------------------------------------------------------
+    # Execution
+    # ------------------------------------------------------------------
+
+    def _run(self, job_id: str):
+        job = self.store.get(job_id)
+        job_type = self.types[job["job_type"]]
+        params = {**json.loads(job["params"] or "{}"), "job_id": job_id}
+        start = time.time()
+
+        try:
+            if not self.store.is_planned(job_id):
+                items = job_type.plan(params)
+                self.store.add_items(job_id, items)
+                logger.info(f"Job {job_id}: planned {len(items)} {job_type.name} items")
+            else:
+                logger.info(f"Job {job_id}: resuming {job_type.name} from checkpoint")
+
+            self._process_items(job_id, job_type, params)
+
+            counts = self.store.item_counts(job_id)
+            summary = {
+                "done": counts.get(DONE, 0),
+                "skipped": counts.get(SKIPPED, 0),
+                "failed": counts.get(FAILED, 0),
+                "duration_seconds": round(time.time() - start, 1),
+            }
+            result = job_type.finalize(params, summary) or {}
+            self.store.finish(job_id, COMPLETED, {**summary, **result})
+            logger.info(f"✅ Job {job_id} ({job_type.name}) complete: {summary}")
+
+        except JobCancelled:
+            self.store.finish(job_id, CANCELLED)
+            logger.info(f"Job {job_id} ({job_type.name}) cancelled")
+
+        except Exception as e:
+            logger.error(f"❌ Job {job_id} ({job_type.name}) failed: {e}", exc_info=True)
+            self.store.finish(job_id, FAILED, error=str(e))
+
+        finally:
+            with self._lock:
+                self._threads.pop(job_id, None)
+            # A slot is free: start the next queued job of any type
+            self.dispatch()
+
+    def _process_items(self, job_id: str, job_type: JobType, params: Dict):
+        chunk_size = max(1, int(job_type.chunk_size(params)))
+
+        while True:
+            if self.store.cancel_requested(job_id):
+                raise JobCancelled()
+
+            batch = self.store.next_items(job_id, chunk_size)
+            if not batch:
+                return
+
+            results: List[Tuple[str, Optional[str]]] = []
+            seen = set()
+            last_flush = time.time()
+            try:
+                for key, error in job_type.process(batch, params):
+                    results.append((key, error))
+                    seen.add(key)
+                    if time.time() - last_flush >= self.RESULT_FLUSH_SECONDS:
+                        self.store.record_results(job_id, results)
+                        results, last_flush = [], time.time()
+            except Exception as e:
+                # Whatever was not reported gets an attempt counted against it
+                self.store.record_results(job_id, results)
+                results = []
+                keys = [item["key"] for item in batch if item["key"] not in seen]
+                logger.warning(f"Job {job_id}: batch failed ({len(keys)} items): {e}")
+                self.store.record_batch_error(job_id, keys, str(e), job_type.max_attempts)
+                time.sleep(self.BATCH_ERROR_BACKOFF)
+            else:
+                results.extend(
+                    (item["key"], "no result") for item in batch if item["key"] not in seen
+                )
+
+            self.store.record_results(job_id, results)
+            self.store.heartbeat(self.owner)
+
+            if job_type.batch_delay:
+                time.sleep(job_type.batch_delay)
+
+
+# Singleton instance
+job_runner = JobRunner()
@@ -5,13 +5,35 @@ import json
 import pandas as pd
 import requests
 import re
+from lxml import html as lxml_html
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import config
+from services import http_cache
+from services.shareholding_store import (
+    HOLDING_FIELDS,
+    expected_quarter,
+    parse_quarter,
+    shareholding_store,
+)
+from services.symbol_master import symbol_master
 
 logger = logging.getLogger(__name__)
 
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36",
+}
+
+_TABLE = re.compile(r"<table\b.*?</table>", re.IGNORECASE | re.DOTALL)
+
+# Record/replay external responses when KLYX_HTTP_CACHE is set (no-op when off)
+http_cache.install()
+
 class MarketDataService:
     def __init__(self):
         self.mc = MoneyControl()
-        self.details_cache = {} # Symbol -> Details Dict
+        self.session = _build_session()  # Pooled keep-alive connections for page fetches
+        self.details_cache = {} # Symbol -> Details Dict (L1 over the symbol master)
 
     def get_moneycontrol_details(self, symbol):
         """
@@ -21,6 +43,15 @@ class MarketDataService:
         if symbol in self.details_cache:
             return self.details_cache[symbol]
 
+        # Shared symbol master (resolved earlier by any worker)
+        try:
+            details = symbol_master.get_moneycontrol(symbol)
+            if details:
+                self.details_cache[symbol] = details
+                return details
+        except Exception as e:
+            logger.debug(f"Symbol master lookup failed for {symbol}: {e}")
+
         try:
             # Strip common suffixes for search
             search_symbol = symbol.split('.')[0]
@@ -45,6 +76,10 @@ class MarketDataService:
                         'name': match.get('name')
                     }
                     self.details_cache[symbol] = details
+                    try:
+                        symbol_master.set_moneycontrol(symbol, details['id'], url, details['name'])
+                    except Exception as e:
+                        logger.debug(f"Could not store MoneyControl details for {symbol}: {e}")
                     return details
             
             logger.warning(f"No MoneyControl details found for {symbol}")
@@ -74,6 +109,12 @@ class MarketDataService:
                                 if p.isalpha() and p.isupper() and not p.startswith('IN') and len(p) < 12:
                                     c['nse_code'] = p
                                     break
+                            # Other identifiers for the symbol master
+                            for p in parts:
+                                if len(p) == 12 and p.startswith('IN') and p.isalnum():
+                                    c['isin'] = p
+                                elif len(p) == 6 and p.isdigit():
+                                    c['bse_code'] = p
                 return candidates
             return []
         except Exception as e:
@@ -149,115 +190,174 @@ class MarketDataService:
         except Exception as e:
             return {"error": str(e)}
 
-    def get_shareholding_pattern(self, symbol):
+    def get_shareholding_pattern(self, symbol, force_refresh=False):
         """
         Fetches latest shareholding pattern (Promoter, FII, DII, Public)
-        Returns dict with keys: promoter_pct, fii_pct, dii_pct, public_pct
+        Returns dict with keys: promoter_holding_pct, fii_holding_pct,
+        dii_holding_pct, public_holding_pct, quarter
+
+        Snapshots are stored per (symbol, quarter); within a quarter this is
+        a local lookup (see services/shareholding_store.py).
         """
+        key = symbol.upper().replace('.NS', '').replace('.BO', '')
         try:
+            if not force_refresh:
+                snapshot = shareholding_store.get_fresh(key)
+                if snapshot:
+                    return _snapshot_result(snapshot)
+
             details = self.get_moneycontrol_details(symbol)
             if not details or not details.get('url'):
                 return None
 
             mc_id = details['id']
             url = details['url']
-            
+
             # Extract slug from URL for fallback construction
             # URL format: .../stockpricequote/sector/slug/id
-            # or: .../india/stockpricequote/...
             slug = None
             try:
-                parts = url.split('/')
-                # ID is usually last, slug is second to last
-                slug = parts[-2]
-            except: pass
+                slug = url.rstrip('/').split('/')[-2]
+            except IndexError:
+                pass
 
             logger.info(f"Fetching shareholding for {symbol} (Slug: {slug})")
-            
-            headers = {
-                "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36",
-            }
-            
-            # Helper to parse table
-            def parse_holding_table(df):
-                data = {}
-                # Convert to string for easy searching
-                df_str = df.to_string().lower()
-                
-                # Look for Promoter
-                # Usually row 'Promoters' -> 'No. of Shares' -> '%'
-                # Generic approach: Iterate rows
-                try:
-                    for idx, row in df.iterrows():
-                        row_txt = str(row.to_list()).lower()
-                        
-                        # Check columns (usually one col has 'Promoter', another has %)
-                        # Column detection
-                        val_col_idx = -1
-                        # Find column with % (values < 100) or check headers
-                        
-                        # Simplified: Look for keywords in first column, take last column as %
-                        first_val = str(row.iloc[0]).lower()
-                        last_val = row.iloc[-1]
-                        
-                        # Parse percentage
-                        try:
-                            pct = float(str(last_val).replace('%',''))
-                        except: 
-                            continue
-
-                        if 'promoter' in first_val and 'pledge' not in first_val:
-                            data['promoter_holding_pct'] = pct
-                        elif 'fii' in first_val or 'foreign' in first_val:
-                            data['fii_holding_pct'] = pct
-                        elif ('dii' in first_val or 'domestic' in first_val) and 'institutions' in first_val:
-                            data['dii_holding_pct'] = pct
-                        elif 'public' in first_val:
-                            data['public_holding_pct'] = pct
-                            
-                    # Calculate MF if DII missing?
-                    # Usually DII includes MF.
-                    
-                    return data if data else None
-                except: return None
-
-            # Strategy 1: Check Quote Page (often has Shareholding summary)
-            try:
-                # Use pandas read_html directly on URL (simplest if it works)
-                # But headers needed usually
-                r = requests.get(url, headers=headers)
-                if r.status_code == 200:
-                    dfs = pd.read_html(r.text)
-                    for df in dfs:
-                        if 'Promoter' in str(df) and ('%' in str(df) or 'Hol' in str(df)):
-                            res = parse_holding_table(df)
-                            if res and res.get('promoter_holding_pct'):
-                                return res
-            except Exception as e:
-                logger.warning(f"Failed quote page shareholding parse: {e}")
-
-            # Strategy 2: Specific URL
+
+            # Strategy 1: Quote page (has the shareholding summary)
+            # Strategy 2: Dedicated shareholding page
+            urls = [url]
             if slug and mc_id:
-                # https://www.moneycontrol.com/financials/relianceindustries/shareholding-pattern/VI/RI
-                # Try VI (BSE?) or others? simpler: /company-facts/
-                
-                alt_url = f"https://www.moneycontrol.com/financials/{slug}/shareholding-pattern/VI/{mc_id}"
+                urls.append(f"https://www.moneycontrol.com/financials/{slug}/shareholding-pattern/VI/{mc_id}")
+
+            for page_url in urls:
                 try:
-                    r = requests.get(alt_url, headers=headers)
-                    if r.status_code == 200:
-                        dfs = pd.read_html(r.text)
-                        for df in dfs:
-                             if 'Promoter' in str(df) and '%' in str(df):
-                                 res = parse_holding_table(df)
-                                 if res and res.get('promoter_holding_pct'):
-                                     return res
-                except: pass
-                
+                    r = self.session.get(page_url, timeout=config.MONEYCONTROL_TIMEOUT)
+                    if r.status_code != 200:
+                        continue
+                    res = parse_shareholding_html(r.text)
+                except Exception as e:
+                    logger.warning(f"Failed shareholding parse for {symbol} ({page_url}): {e}")
+                    continue
+
+                if res:
+                    res['quarter'] = res.get('quarter') or expected_quarter()
+                    shareholding_store.save(key, res['quarter'], res)
+                    return res
+
             return None
 
         except Exception as e:
             logger.error(f"Error fetching shareholding for {symbol}: {e}")
             return None
 
+
+def _build_session():
+    """Keep-alive session with retries for MoneyControl pages"""
+    session = requests.Session()
+    retry = Retry(
+        total=config.MONEYCONTROL_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+    )
+    adapter = HTTPAdapter(
+        pool_connections=config.MONEYCONTROL_POOL_SIZE,
+        pool_maxsize=config.MONEYCONTROL_POOL_SIZE,
+        max_retries=retry,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(HEADERS)
+    return session
+
+
+def _pct(text):
+    try:
+        value = float(str(text).replace('%', '').replace(',', '').strip())
+    except ValueError:
+        return None
+    return value if 0 <= value <= 100 else None
+
+
+def _snapshot_result(snapshot):
+    result = {
+        field: float(snapshot[field])
+        for field in HOLDING_FIELDS
+        if snapshot.get(field) is not None
+    }
+    result['quarter'] = snapshot['quarter']
+    return result
+
+
+def _parse_holding_rows(rows):
+    """
+    Map shareholding table rows ([label, value, ...]) to holding percentages.
+
+    When the header carries several quarters the latest one is used, otherwise
+    the last column.
+    """
+    quarters = {}
+    for row in rows:
+        for idx, cell in enumerate(row[1:], 1):
+            quarter = parse_quarter(cell)
+            if quarter:
+                quarters[idx] = quarter
+    col = max(quarters, key=quarters.get) if quarters else -1
+
+    data = {}
+    for row in rows:
+        if len(row) < 2:
+            continue
+        label = row[0].lower()
+        pct = _pct(row[col] if col < len(row) else row[-1])
+        if pct is None:
+            continue
+
+        if 'promoter' in label and 'pledge' not in label:
+            field = 'promoter_holding_pct'
+        elif 'fii' in label or 'foreign' in label:
+            field = 'fii_holding_pct'
+        elif 'dii' in label or ('domestic' in label and 'institution' in label):
+            field = 'dii_holding_pct'
+        elif 'public' in label:
+            field = 'public_holding_pct'
+        else:
+            continue
+        # Category totals come before their sub-rows
+        data.setdefault(field, pct)
+
+    if not data:
+        return None
+    if quarters:
+        data['quarter'] = quarters[col]
+    return data
+
+
+def parse_shareholding_html(html):
+    """
+    Extract the shareholding pattern from a MoneyControl page.
+
+    Only <table> fragments that mention promoters are handed to lxml, instead
+    of building a DataFrame for every table on the page.
+    """
+    for match in _TABLE.finditer(html):
+        fragment = match.group(0)
+        if 'promoter' not in fragment.lower():
+            continue
+        try:
+            table = lxml_html.fragment_fromstring(fragment)
+        except Exception:
+            continue
+
+        rows = [
+            [" ".join(cell.text_content().split()) for cell in tr.xpath("./th|./td")]
+            for tr in table.xpath(".//tr")
+        ]
+        res = _parse_holding_rows(rows)
+        if res and res.get('promoter_holding_pct') is not None:
+            return res
+    return None
+
+
 # Singleton instance
 market_data_service = MarketDataService()
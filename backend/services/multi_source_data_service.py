@@ -11,7 +11,7 @@ Features:
 - Automatic fallback chain
 - Data quality scoring
 - Source tracking
-- Cache management
+- Two-tier cache (bounded LRU + shared Redis, stale-while-revalidate)
 - Retry logic
 - **Parallel fetching for 3x faster enrichment**
 """
@@ -24,9 +24,25 @@ from typing import Dict, List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
+from config import config
+from services import http_cache
+from services.refresh_scheduler import ANNUAL, PRICE, QUARTERLY, SHAREHOLDING
+from services.single_flight import SingleFlight
+from services.tiered_cache import TieredCache
 
 logger = logging.getLogger(__name__)
 
+# Record/replay external responses when KLYX_HTTP_CACHE is set (no-op when off)
+http_cache.install()
+
+
+def _epoch_to_date(ts) -> Optional[str]:
+    """Convert a Unix timestamp to an ISO date string"""
+    try:
+        return datetime.fromtimestamp(int(ts)).date().isoformat() if ts else None
+    except (TypeError, ValueError, OSError):
+        return None
+
 
 class DataQuality:
     """Track data quality and completeness"""
@@ -67,6 +83,8 @@ class DataQuality:
 class NSEDataFetcher:
     """Fetch data from NSE using nsepython or unofficial APIs"""
 
+    field_classes = (PRICE,)
+
     def __init__(self):
         self.name = "NSE"
         try:
@@ -82,6 +100,7 @@ class NSEDataFetcher:
                 "nsepython not available. Install with: pip install nsepython"
             )
 
+    @http_cache.cached_call("nse.quote", is_method=True)
     def fetch_quote(self, symbol: str) -> Optional[Dict]:
         """Fetch real-time quote data from NSE"""
         if not self.available:
@@ -113,6 +132,8 @@ class NSEDataFetcher:
 class YFinanceDataFetcher:
     """Enhanced yfinance fetcher with better error handling"""
 
+    field_classes = (PRICE, QUARTERLY, ANNUAL)
+
     def __init__(self):
         self.name = "YahooFinance"
         try:
@@ -124,6 +145,7 @@ class YFinanceDataFetcher:
             self.available = False
             logger.warning("yfinance not available")
 
+    @http_cache.cached_call("yfinance.fundamentals", is_method=True)
     def fetch_fundamentals(self, symbol: str) -> Optional[Dict]:
         """Fetch comprehensive fundamental data from Yahoo Finance"""
         if not self.available:
@@ -184,6 +206,10 @@ class YFinanceDataFetcher:
                 "target_mean_price": info.get("targetMeanPrice"),
                 "recommendation_key": info.get("recommendationKey"),
                 "number_of_analyst_opinions": info.get("numberOfAnalystOpinions"),
+                # Corporate calendar (drives refresh priority around results)
+                "next_earnings_date": _epoch_to_date(
+                    info.get("earningsTimestampStart") or info.get("earningsTimestamp")
+                ),
                 "_source": "YahooFinance",
                 "_timestamp": datetime.now().isoformat(),
                 "_ticker_used": ticker,
@@ -236,6 +262,8 @@ class YFinanceDataFetcher:
 class MoneyControlDataFetcher:
     """Fetch data from MoneyControl via pkscreener"""
 
+    field_classes = (ANNUAL,)  # fetch_shareholding covers SHAREHOLDING
+
     def __init__(self):
         self.name = "MoneyControl"
         try:
@@ -247,6 +275,7 @@ class MoneyControlDataFetcher:
             self.available = False
             logger.warning("MoneyControl service not available")
 
+    @http_cache.cached_call("moneycontrol.fundamentals", is_method=True)
     def fetch_fundamentals(
         self, symbol: str, statement_type: str = "standalone"
     ) -> Optional[Dict]:
@@ -306,6 +335,7 @@ class MoneyControlDataFetcher:
         except Exception as e:
             return None
 
+    @http_cache.cached_call("moneycontrol.shareholding", is_method=True)
     def fetch_shareholding(self, symbol: str) -> Optional[Dict]:
         """Fetch shareholding pattern from MoneyControl"""
         if not self.available:
@@ -351,6 +381,8 @@ class MoneyControlDataFetcher:
 class AlphaVantageDataFetcher:
     """Fetch data from Alpha Vantage (requires API key)"""
 
+    field_classes = (PRICE, QUARTERLY, ANNUAL)
+
     def __init__(self, api_key: Optional[str] = None):
         self.name = "AlphaVantage"
         self.api_key = api_key
@@ -422,8 +454,28 @@ class MultiSourceDataService:
     def __init__(
         self, alpha_vantage_key: Optional[str] = None, enable_cache: bool = True
     ):
-        self.cache = {} if enable_cache else None
-        self.cache_ttl = timedelta(minutes=15)  # Cache for 15 minutes
+        self.cache_ttl = timedelta(minutes=config.CACHE_TTL_MINUTES)
+        self.cache_stale_ttl = timedelta(minutes=config.CACHE_STALE_TTL_MINUTES)
+
+        # Bounded LRU backed by Redis so Flask, Celery and AI tools share fetches
+        self.cache = (
+            TieredCache(
+                namespace="msds",
+                ttl=self.cache_ttl.total_seconds(),
+                stale_ttl=self.cache_stale_ttl.total_seconds(),
+                max_entries=config.CACHE_MAX_ENTRIES,
+            )
+            if enable_cache and config.ENABLE_CACHE
+            else None
+        )
+
+        # Concurrent fetches of the same symbol (threads here or other
+        # workers via a Redis lease) share one multi-source fetch
+        self.single_flight = SingleFlight(
+            namespace="msds",
+            lease_seconds=config.SINGLE_FLIGHT_LEASE_SECONDS,
+            result_seconds=config.SINGLE_FLIGHT_RESULT_SECONDS,
+        )
 
         # Initialize fetchers in priority order
         self.fetchers = [
@@ -439,8 +491,43 @@ class MultiSourceDataService:
             f"MultiSourceDataService initialized with sources: {', '.join(available)}"
         )
 
+    def served_classes(self) -> List[str]:
+        """Field classes the available sources can refresh"""
+        classes = set()
+        for fetcher in self.fetchers:
+            if fetcher.available:
+                classes.update(fetcher.field_classes)
+                if hasattr(fetcher, "fetch_shareholding"):
+                    classes.add(SHAREHOLDING)
+        return sorted(classes)
+
+    def plan_sources(self, field_classes: Optional[List[str]] = None) -> List[Tuple]:
+        """
+        Calls needed to refresh `field_classes` (None = everything).
+
+        Returns:
+            [(fetcher, call_primary, call_shareholding)] - sources whose field
+            classes are all fresh are left out
+        """
+        wanted = None if field_classes is None else set(field_classes)
+        plan = []
+        for fetcher in self.fetchers:
+            if not fetcher.available:
+                continue
+            primary = wanted is None or bool(wanted & set(fetcher.field_classes))
+            shareholding = hasattr(fetcher, "fetch_shareholding") and (
+                wanted is None or SHAREHOLDING in wanted
+            )
+            if primary or shareholding:
+                plan.append((fetcher, primary, shareholding))
+        return plan
+
     def fetch_stock_data(
-        self, symbol: str, required_fields: Optional[List[str]] = None
+        self,
+        symbol: str,
+        required_fields: Optional[List[str]] = None,
+        field_classes: Optional[List[str]] = None,
+        allow_stale: bool = True,
     ) -> Tuple[Dict, Dict]:
         """
         Fetch stock data from multiple sources **in parallel** with intelligent fallbacks.
@@ -448,18 +535,43 @@ class MultiSourceDataService:
         Args:
             symbol: Stock symbol (e.g., 'RELIANCE' or 'RELIANCE.NS')
             required_fields: List of required fields for quality scoring
+            field_classes: Stale field classes to refresh (None = all); sources
+                that only provide fresh classes are skipped
+            allow_stale: Serve expired cache entries while refreshing in the
+                background. Writers that store the result (enrichment) pass
+                False and only get data younger than CACHE_TTL_MINUTES.
 
         Returns:
             Tuple of (merged_data, quality_info)
         """
-        # Check cache
-        if self.cache is not None:
-            cache_key = f"{symbol}_{datetime.now().strftime('%Y%m%d%H%M')}"
-            if cache_key in self.cache:
-                cached_data, cached_quality = self.cache[cache_key]
-                logger.debug(f"Cache hit for {symbol}")
-                return cached_data, cached_quality
+        cache_key = symbol.upper()
+        if field_classes is not None:
+            cache_key += ":" + ",".join(sorted(field_classes))
+
+        def load():
+            return self.single_flight.do(
+                cache_key,
+                lambda: list(
+                    self._fetch_stock_data_uncached(symbol, required_fields, field_classes)
+                ),
+            )
 
+        if self.cache is None:
+            merged_data, final_quality = load()
+            return merged_data, final_quality
+
+        # Expired entries are served immediately while one background refresh
+        # runs, unless the caller needs fresh data
+        merged_data, final_quality = self.cache.get_or_load(cache_key, load, allow_stale=allow_stale)
+        return merged_data, final_quality
+
+    def _fetch_stock_data_uncached(
+        self,
+        symbol: str,
+        required_fields: Optional[List[str]] = None,
+        field_classes: Optional[List[str]] = None,
+    ) -> Tuple[Dict, Dict]:
+        """Run the multi-source fetch for one symbol (no cache lookup)"""
         # Define default required fields if not provided
         if required_fields is None:
             required_fields = [
@@ -477,25 +589,22 @@ class MultiSourceDataService:
         sources_used = []
         fetch_attempts = []
 
-        def fetch_from_source(fetcher):
+        def fetch_from_source(fetcher, call_primary, call_shareholding):
             """Worker function to fetch from a single source"""
-            if not fetcher.available:
-                return None, fetcher.name
-            
             try:
-                if hasattr(fetcher, "fetch_fundamentals"):
-                    data = fetcher.fetch_fundamentals(symbol)
-                elif hasattr(fetcher, "fetch_quote"):
-                    data = fetcher.fetch_quote(symbol)
-                else:
-                    return None, fetcher.name
-                
-                # Secondary Fetch: Shareholding (if supported and available)
-                if hasattr(fetcher, "fetch_shareholding") and data:
+                data = None
+                if call_primary:
+                    if hasattr(fetcher, "fetch_fundamentals"):
+                        data = fetcher.fetch_fundamentals(symbol)
+                    elif hasattr(fetcher, "fetch_quote"):
+                        data = fetcher.fetch_quote(symbol)
+
+                # Secondary Fetch: Shareholding (skipped if the primary call found nothing)
+                if call_shareholding and (data or not call_primary):
                     try:
                         sh_data = fetcher.fetch_shareholding(symbol)
                         if sh_data:
-                            data.update(sh_data)
+                            data = {**(data or {}), **sh_data}
                     except Exception as e:
                         logger.debug(f"Shareholding fetch failed in worker: {e}")
 
@@ -504,9 +613,16 @@ class MultiSourceDataService:
                 logger.debug(f"Error fetching from {fetcher.name} for {symbol}: {e}")
                 return None, fetcher.name
 
-        # Fetch from all sources in PARALLEL
+        plan = self.plan_sources(field_classes)
+        if not plan:
+            logger.info(f"All requested field classes fresh for {symbol}, no sources called")
+
+        # Fetch from the planned sources in PARALLEL
         with ThreadPoolExecutor(max_workers=4) as executor:
-            futures = {executor.submit(fetch_from_source, f): f for f in self.fetchers}
+            futures = {
+                executor.submit(fetch_from_source, fetcher, primary, shareholding): fetcher
+                for fetcher, primary, shareholding in plan
+            }
             
             for future in as_completed(futures):
                 try:
@@ -555,14 +671,12 @@ class MultiSourceDataService:
 
         # Add metadata
         merged_data["_sources"] = sources_used
+        merged_data["_field_classes"] = (
+            sorted(field_classes) if field_classes is not None else None
+        )
         merged_data["_quality_score"] = final_quality["score"]
         merged_data["_last_updated"] = datetime.now().isoformat()
 
-        # Cache result
-        if self.cache is not None:
-            cache_key = f"{symbol}_{datetime.now().strftime('%Y%m%d%H%M')}"
-            self.cache[cache_key] = (merged_data, final_quality)
-
         logger.info(
             f"Final data for {symbol}: {final_quality['score']}% complete from {len(sources_used)} sources"
         )
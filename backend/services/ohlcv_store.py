@@ -0,0 +1,462 @@
+"""
+Local daily OHLCV bars per Yahoo ticker, memory-mapped.
+
+TechnicalAnalyst and the AI price / chart tools used to call
+yf.Ticker(...).history() on every use. Bars are now kept under
+config.OHLCV_STORE_PATH:
+
+    <root>/<ticker>.bin    fixed-size records (date, open, high, low, close,
+                           adj_close, volume), oldest first, read with np.memmap
+    <root>/catalog.json    per ticker: first / last date, rows, the first day
+                           the downloads covered and when Yahoo was last checked
+
+A read maps the file (reusing the mapping while the file is unchanged) and
+slices it with a binary search on the dates, so repeat reads are local and
+take microseconds. A refresh downloads only the bars from the day before
+the last stored date onwards and rewrites the bars it overlaps (the last one
+may have been stored mid-session). When an overlapping bar shows a new split
+(close and adj_close change) or dividend (adj_close changes), the older
+bars are rescaled to match rather than downloading the whole history again.
+
+The daily price refresh feeds the store from its batched download (see
+database/enrich_missing_fields._store_history); other tickers are fetched on
+first use.
+
+Usage:
+    from services.ohlcv_store import ohlcv_store
+    frame = ohlcv_store.history("RELIANCE.NS", period="6mo")  # like Ticker.history()
+    dates, tickers, closes = ohlcv_store.panel(["RELIANCE.NS", "TCS.NS"], days=252)
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import json
+import logging
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+from config import config
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within the process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+RECORD = np.dtype(
+    [
+        ("date", "<M8[D]"),
+        ("open", "<f8"),
+        ("high", "<f8"),
+        ("low", "<f8"),
+        ("close", "<f8"),
+        ("adj_close", "<f8"),
+        ("volume", "<f8"),
+    ]
+)
+FIELDS = RECORD.names[1:]
+# Bar field -> yfinance column
+COLUMNS = {
+    "open": "Open",
+    "high": "High",
+    "low": "Low",
+    "close": "Close",
+    "adj_close": "Adj Close",
+    "volume": "Volume",
+}
+PRICE_COLUMNS = ("Open", "High", "Low", "Close")
+
+CATALOG_FILE = "catalog.json"
+LOCK_FILE = ".lock"
+EARLIEST = np.datetime64("1900-01-01")  # Coverage of a period="max" download
+PERIOD_UNITS = {"wk": "weeks", "mo": "months", "y": "years"}
+
+
+def period_start(period: str, today: Optional[date] = None) -> np.datetime64:
+    """First calendar day a yfinance period string ("5d", "6mo", "1y", "ytd", "max") covers"""
+    today = pd.Timestamp(today or date.today())
+    if period == "max":
+        return EARLIEST
+    if period == "ytd":
+        return np.datetime64(f"{today.year}-01-01")
+    match = re.fullmatch(r"(\d+)(d|wk|mo|y)", period)
+    if not match:
+        raise ValueError(f"Unknown period: {period}")
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == "d":
+        # Trading days: leave room for weekends and holidays (trimmed by history())
+        offset = pd.DateOffset(days=count * 7 // 5 + 5)
+    else:
+        offset = pd.DateOffset(**{PERIOD_UNITS[unit]: count})
+    return np.datetime64((today - offset).date(), "D")
+
+
+def make_records(dates, **fields) -> np.ndarray:
+    """
+    RECORD array from dates and per-field arrays, sorted by date with one bar
+    per day. Missing fields are NaN; adj_close defaults to close.
+    """
+    records = np.empty(len(dates), dtype=RECORD)
+    records["date"] = np.asarray(dates, dtype="datetime64[D]")
+    for field in FIELDS:
+        records[field] = fields.get(field, np.nan)
+    adjusted = records["adj_close"]
+    missing = ~np.isfinite(adjusted)
+    adjusted[missing] = records["close"][missing]
+
+    records = records[np.isfinite(records["close"])]
+    records = records[np.argsort(records["date"], kind="stable")]
+    # Keep the last bar of a repeated date
+    last_of_day = np.append(records["date"][1:] != records["date"][:-1], True)
+    return records[last_of_day]
+
+
+def frame_records(frame: pd.DataFrame) -> np.ndarray:
+    """RECORD array from a single-ticker yfinance frame (Ticker.history(auto_adjust=False))"""
+    if frame is None or frame.empty:
+        return np.empty(0, dtype=RECORD)
+    index = frame.index
+    if index.tz is not None:
+        index = index.tz_localize(None)  # Exchange-local midnight -> trade date
+    return make_records(
+        index.values.astype("datetime64[D]"),
+        **{
+            field: frame[column].to_numpy(dtype=float)
+            for field, column in COLUMNS.items()
+            if column in frame.columns
+        },
+    )
+
+
+def to_frame(records: np.ndarray, adjusted: bool = True) -> pd.DataFrame:
+    """
+    Ticker.history()-shaped frame: Open, High, Low, Close, Volume on a
+    DatetimeIndex. adjusted=True scales OHLC for splits and dividends (like
+    yfinance's auto_adjust); adjusted=False keeps raw prices plus Adj Close.
+    """
+    frame = pd.DataFrame(
+        {column: np.array(records[field]) for field, column in COLUMNS.items()},
+        index=pd.DatetimeIndex(records["date"], name="Date"),
+    )
+    if adjusted:
+        factor = frame.pop("Adj Close") / frame["Close"]
+        for column in PRICE_COLUMNS:
+            frame[column] *= factor
+    return frame[[*PRICE_COLUMNS, "Volume"]] if adjusted else frame
+
+
+class OHLCVStore:
+    """Memory-mapped daily bars with incremental appends"""
+
+    def __init__(self, root: Optional[str] = None, refresh_minutes: Optional[float] = None):
+        self.root = root or config.OHLCV_STORE_PATH
+        minutes = config.OHLCV_REFRESH_MINUTES if refresh_minutes is None else refresh_minutes
+        self.refresh_seconds = minutes * 60
+        self._maps: Dict[str, Tuple[tuple, np.ndarray]] = {}
+        self._catalog: Tuple[Optional[int], Dict] = (None, {})
+        self._failed: Dict[str, float] = {}  # ticker -> time of the last failed download
+        self._lock = threading.RLock()
+
+    def _path(self, ticker: str) -> str:
+        return os.path.join(self.root, quote(ticker, safe="") + ".bin")
+
+    # ------------------------------------------------------------------
+    # Reads (local only)
+    # ------------------------------------------------------------------
+
+    def bars(self, ticker: str, start=None, end=None) -> np.ndarray:
+        """Stored bars with start <= date <= end (read-only RECORD array, oldest first)"""
+        path = self._path(ticker)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return np.empty(0, dtype=RECORD)
+
+        # A rewrite replaces the file (new inode); an append grows it
+        version = (stat.st_ino, stat.st_size)
+        with self._lock:
+            cached = self._maps.get(ticker)
+            if cached is None or cached[0] != version:
+                rows = stat.st_size // RECORD.itemsize
+                data = (
+                    np.memmap(path, dtype=RECORD, mode="r", shape=(rows,))
+                    if rows
+                    else np.empty(0, dtype=RECORD)
+                )
+                self._maps[ticker] = cached = (version, data)
+        data = cached[1]
+
+        dates = data["date"]
+        lo = 0 if start is None else np.searchsorted(dates, np.datetime64(start, "D"))
+        hi = len(data) if end is None else np.searchsorted(dates, np.datetime64(end, "D"), side="right")
+        return data[lo:hi]
+
+    def last_date(self, ticker: str) -> Optional[str]:
+        """Last stored trade date (ISO), None without history"""
+        data = self.bars(ticker)
+        return str(data["date"][-1]) if len(data) else None
+
+    def catalog(self) -> Dict[str, Dict]:
+        """{ticker: {first_date, last_date, rows, fetched_from, checked_at}} (do not modify)"""
+        path = os.path.join(self.root, CATALOG_FILE)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return {}
+        with self._lock:
+            if self._catalog[0] != mtime:
+                with open(path) as f:
+                    self._catalog = (mtime, json.load(f))
+            return self._catalog[1]
+
+    def panel(
+        self, tickers: List[str], days: int = 252, field: str = "close"
+    ) -> Tuple[np.ndarray, List[str], np.ndarray]:
+        """
+        One field for many tickers on common dates (local bars only).
+
+        Returns:
+            (dates, tickers, values): ISO dates (the last `days` of the union
+            of all tickers' trading days), the tickers in input order, and a
+            (dates x tickers) array holding each ticker's last bar on or
+            before every date (NaN before its first bar)
+        """
+        if field not in FIELDS:
+            raise ValueError(f"Unknown field: {field} (expected one of {', '.join(FIELDS)})")
+        tickers = list(dict.fromkeys(tickers))
+        series = [self.bars(ticker) for ticker in tickers]
+        tails = [data["date"][-days:] for data in series if len(data)]
+        if not tails:
+            return np.array([], dtype=str), tickers, np.empty((0, len(tickers)))
+
+        dates = np.unique(np.concatenate(tails))[-days:]
+        values = np.full((len(dates), len(tickers)), np.nan)
+        for j, data in enumerate(series):
+            if not len(data):
+                continue
+            at = np.searchsorted(data["date"], dates, side="right") - 1
+            listed = at >= 0
+            values[listed, j] = data[field][at[listed]]
+        return np.datetime_as_string(dates), tickers, values
+
+    # ------------------------------------------------------------------
+    # Reads that refresh from Yahoo first
+    # ------------------------------------------------------------------
+
+    def history(self, ticker: str, period: str = "1y", adjusted: bool = True, refresh: bool = True) -> pd.DataFrame:
+        """
+        Daily bars for a yfinance period, shaped like yf.Ticker(ticker).history(period).
+
+        With refresh, the bars missing since the last check are downloaded
+        first (at most every config.OHLCV_REFRESH_MINUTES); when Yahoo is
+        unreachable the stored bars are returned. Empty frame without any.
+        """
+        if refresh:
+            self.sync(ticker, period)
+        data = self.bars(ticker, start=period_start(period))
+        trading_days = re.fullmatch(r"(\d+)d", period)
+        if trading_days:
+            data = data[-int(trading_days.group(1)):]
+        return to_frame(data, adjusted)
+
+    def latest_close(self, ticker: str, refresh: bool = True) -> Optional[float]:
+        """Last (unadjusted) close, None without history"""
+        data = self.history(ticker, period="5d", adjusted=False, refresh=refresh)
+        return float(data["Close"].iloc[-1]) if not data.empty else None
+
+    def sync(self, ticker: str, period: str = "1y") -> int:
+        """
+        Download what the store is missing for `period`: the bars since the
+        last stored date, or the whole period when the stored bars start later.
+        Skipped while the ticker was checked within the refresh interval.
+        Never raises; returns the number of bars written.
+        """
+        start = period_start(period)
+        entry = self.catalog().get(ticker)
+        covered = entry is not None and np.datetime64(entry["fetched_from"]) <= start
+        now = time.time()
+        if covered and now - entry["checked_at"] < self.refresh_seconds:
+            return 0
+        if now - self._failed.get(ticker, 0) < self.refresh_seconds:
+            return 0
+
+        try:
+            import yfinance as yf
+
+            stored = self.bars(ticker)
+            if covered and len(stored):
+                # From the bar before the last, so a settled bar overlaps (see _adjustment)
+                since = str(stored["date"][max(len(stored) - 2, 0)])
+                frame = yf.Ticker(ticker).history(start=since, auto_adjust=False, actions=False)
+                return self.append(ticker, frame_records(frame))
+            frame = yf.Ticker(ticker).history(period=period, auto_adjust=False, actions=False)
+            return self.append(ticker, frame_records(frame), fetched_from=start, replace=True)
+        except Exception as e:
+            logger.warning(f"⚠️ OHLCV download failed for {ticker}: {e}")
+            self._failed[ticker] = now
+            return 0
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def append(self, ticker: str, records: np.ndarray, fetched_from=None, replace: bool = False) -> int:
+        """
+        Store bars for one ticker (see append_many). Returns bars written.
+
+        Args:
+            ticker: Yahoo ticker
+            records: RECORD array (see make_records / frame_records)
+            fetched_from: First day the download covered (extends coverage)
+            replace: Rewrite the stored bars with `records`
+        """
+        return self.append_many({ticker: records}, fetched_from=fetched_from, replace=replace)
+
+    def append_many(self, records: Dict[str, np.ndarray], fetched_from=None, replace: bool = False) -> int:
+        """
+        Store bars for many tickers with one catalog update.
+
+        Stored bars the download covers are overwritten, older ones are
+        rescaled after a split or dividend and older downloaded bars are skipped. Every ticker is marked as checked now, including tickers
+        the download returned nothing for.
+        """
+        if not records:
+            return 0
+        os.makedirs(self.root, exist_ok=True)
+        now = time.time()
+        written = 0
+        with self._write_lock():
+            updates = {}
+            for ticker, bars in records.items():
+                written += self._write(ticker, bars, replace)
+                stored = self.bars(ticker)
+                entry = self.catalog().get(ticker, {})
+                coverage = [np.datetime64(value, "D") for value in (entry.get("fetched_from"), fetched_from) if value]
+                if not coverage and len(stored):
+                    coverage = [stored["date"][0]]
+                updates[ticker] = {
+                    "first_date": str(stored["date"][0]) if len(stored) else None,
+                    "last_date": str(stored["date"][-1]) if len(stored) else None,
+                    "rows": len(stored),
+                    "fetched_from": str(min(coverage)) if coverage else str(np.datetime64(date.today(), "D")),
+                    "checked_at": now,
+                }
+            self._update_catalog(updates)
+        return written
+
+    def _write(self, ticker: str, records: np.ndarray, replace: bool) -> int:
+        """Write one ticker's bars (caller holds the write lock)"""
+        records = np.asarray(records, dtype=RECORD)
+        path = self._path(ticker)
+        stored = self.bars(ticker)
+
+        if replace or not len(stored):
+            if not len(records):
+                return 0
+            tmp = f"{path}.tmp"
+            records.tofile(tmp)
+            os.replace(tmp, path)
+            return len(records)
+
+        last = stored["date"][-1]
+        if not len(records) or records["date"][-1] < last:
+            return 0
+
+        # Rewrite every stored bar the download covers (Yahoo may have restated them)
+        since = max(records["date"][0], stored["date"][0])
+        new = records[records["date"] >= since]
+        offset = int(np.searchsorted(stored["date"], since))
+        price_factor, adj_factor = self._adjustment(stored[offset:], new)
+
+        if price_factor == 1 and adj_factor == 1 and offset + len(new) >= len(stored):
+            with open(path, "r+b") as f:
+                f.seek(offset * RECORD.itemsize)
+                f.write(new.tobytes())
+            return len(new)
+
+        # Corporate action: rescale the older bars to the new basis and
+        # replace the file (readers keep their mapping of the old one)
+        older = np.array(stored[:offset])
+        for field in ("open", "high", "low", "close"):
+            older[field] *= price_factor
+        older["volume"] /= price_factor
+        older["adj_close"] *= adj_factor
+        tmp = f"{path}.tmp"
+        np.concatenate([older, new]).tofile(tmp)
+        os.replace(tmp, path)
+        return len(new)
+
+    @staticmethod
+    def _adjustment(stored: np.ndarray, new: np.ndarray) -> Tuple[float, float]:
+        """
+        (price, adj_close) factors that restate stored bars on the basis of a
+        new download, from a day both cover.
+
+        Yahoo's Close is split-adjusted and its Adj Close also carries
+        dividends, so after a split both change on every older bar and after a
+        dividend only Adj Close does. The newest overlapping bar before the last
+        stored one is compared (the last may have been stored mid-session); if
+        that is the only overlap, just the adj_close / close ratio is compared.
+        """
+        common, old_at, new_at = np.intersect1d(stored["date"], new["date"], return_indices=True)
+        if not len(common):
+            return 1.0, 1.0
+        settled = np.flatnonzero(common < stored["date"][-1])
+        if len(settled):
+            i = settled[-1]
+            price_factor = new["close"][new_at[i]] / stored["close"][old_at[i]]
+            adj_factor = new["adj_close"][new_at[i]] / stored["adj_close"][old_at[i]]
+        else:
+            i = -1
+            price_factor = 1.0
+            adj_factor = (new["adj_close"][new_at[i]] / new["close"][new_at[i]]) / (
+                stored["adj_close"][old_at[i]] / stored["close"][old_at[i]]
+            )
+        return tuple(
+            float(factor) if np.isfinite(factor) and abs(factor - 1) > 1e-6 else 1.0
+            for factor in (price_factor, adj_factor)
+        )
+
+    def _update_catalog(self, updates: Dict[str, Dict]):
+        """Merge entries into catalog.json (caller holds the write lock)"""
+        path = os.path.join(self.root, CATALOG_FILE)
+        try:
+            with open(path) as f:
+                catalog = json.load(f)
+        except FileNotFoundError:
+            catalog = {}
+        catalog.update(updates)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(catalog, f)
+        os.replace(tmp, path)
+
+    @contextmanager
+    def _write_lock(self):
+        """Serialize writers across threads and (with fcntl) processes"""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.root, LOCK_FILE), "w") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+# Singleton instance
+ohlcv_store = OHLCVStore()
@@ -0,0 +1,217 @@
+"""
+Portfolio data served from the shared stocks table.
+
+A portfolio run used to fetch every holding from the external sources, so
+twenty users holding RELIANCE meant twenty fetches of the same data. Here the
+holdings are read from `stocks` in one query; only rows with a stale field
+class (see FreshnessPolicy) or no row at all are fetched, and those results
+are written back to `stocks` through StockDataPopulator.enrich_one, so the
+next user finds them fresh.
+
+Usage:
+    from services.portfolio_data import portfolio_data_service
+    results = portfolio_data_service.load(["RELIANCE", "Infosys Ltd"])
+    # {symbol: {"data": {...}, "quality": {...}}}, same shape as
+    # MultiSourceDataService.fetch_multiple_stocks
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Callable, Dict, List, Optional
+
+from database.db_config import db_config
+from services.multi_source_data_service import multi_source_service
+from services.refresh_scheduler import FreshnessPolicy
+from services.symbol_master import symbol_master
+
+logger = logging.getLogger(__name__)
+
+# Fetcher-style keys kept in analysis records for existing consumers:
+# key -> (stocks column, scale from the stored unit)
+LEGACY_KEYS = {
+    "currentPrice": ("current_price", 1),
+    "marketCap": ("market_cap", 1),
+    "pe_ratio": ("pe_ttm", 1),
+    "pb_ratio": ("pb_ratio", 1),
+    "roe": ("roe_annual_pct", 0.01),
+    "roa": ("roa_annual_pct", 0.01),
+    "operating_margin": ("operating_margin_pct", 0.01),
+    "revenue_growth": ("revenue_growth_yoy_pct", 0.01),
+    "dividend_yield": ("dividend_yield_pct", 0.01),
+    "year1Change": ("year_1_change_pct", 0.01),
+    "revenue": ("revenue_annual", 1),
+    "net_income": ("net_profit_annual", 1),
+    "promoter_holding": ("promoter_holding_pct", 0.01),
+    "fii_holding": ("fii_holding_pct", 0.01),
+    "dii_holding": ("dii_holding_pct", 0.01),
+    "target_mean_price": ("target_price", 1),
+    "recommendation_key": ("recommendation_key", None),
+    "number_of_analyst_opinions": ("analyst_count", None),
+}
+
+
+def _json_value(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return value
+
+
+def analysis_record(row: Dict) -> Dict:
+    """UserAnalysis.analysis_data for a stocks row (columns + legacy fetcher keys)"""
+    data = {column: _json_value(value) for column, value in row.items()}
+    for key, (column, scale) in LEGACY_KEYS.items():
+        value = data.get(column)
+        if value is not None and scale is not None:
+            value = value * scale
+        data[key] = value
+    data["_source"] = "stocks"
+    return data
+
+
+def row_quality(row: Dict) -> Dict:
+    return {
+        "score": _json_value(row.get("data_quality_score")) or 0,
+        "sources_used": [s for s in (row.get("data_sources") or "").split(", ") if s],
+        "last_updated": _json_value(row.get("last_updated")),
+    }
+
+
+class PortfolioDataService:
+    """Resolve holdings to stocks rows, refreshing only what is stale"""
+
+    def __init__(self, db=None, populator=None):
+        self.db = db or db_config
+        self._populator = populator
+        self.freshness = FreshnessPolicy()
+
+    @property
+    def populator(self):
+        if self._populator is None:
+            from database.stock_populator import StockDataPopulator
+
+            self._populator = StockDataPopulator()
+        return self._populator
+
+    def load(
+        self,
+        symbols: List[str],
+        max_workers: int = 10,
+        on_result: Optional[Callable[[str, Dict], None]] = None,
+    ) -> Dict:
+        """
+        Current data for each holding.
+
+        Args:
+            symbols: Holdings as stored in the portfolio (codes or names)
+            max_workers: Concurrent refreshes of stale / missing stocks
+            on_result: Called with (symbol, result) as each holding is ready:
+                fresh rows first, then each refreshed stock as it completes
+
+        Returns:
+            Dict of {symbol: {"data": ..., "quality": ...}}
+        """
+        resolved = symbol_master.resolve_many(symbols)
+        codes = {}
+        for symbol in symbols:
+            record = resolved.get(symbol) or {}
+            codes[symbol] = (record.get("nse_code") or str(symbol).strip()).upper()
+
+        rows = self._rows(codes.values())
+
+        # Holdings with no stocks row: add one when the symbol master knows
+        # the stock, so the fetch below is stored and shared
+        missing = {code for code in codes.values() if code not in rows}
+        placeholders = []
+        for symbol, code in codes.items():
+            record = resolved.get(symbol)
+            if code in missing and record and record.get("nse_code"):
+                placeholders.append((record.get("company_name") or code, code, record.get("isin")))
+                missing.discard(code)
+        if placeholders:
+            self._insert_placeholders(placeholders)
+            rows = self._rows(codes.values())
+
+        results = {}
+
+        def ready(code: str, result: Dict):
+            for symbol, symbol_code in codes.items():
+                if symbol_code == code:
+                    results[symbol] = result
+                    if on_result:
+                        on_result(symbol, result)
+
+        served = multi_source_service.served_classes()
+        stale = [row for row in rows.values() if self.freshness.stale_classes(row, served)]
+        stale_codes = {row["nse_code"].upper() for row in stale}
+
+        for code, row in rows.items():
+            if code not in stale_codes:
+                ready(code, self._result(row))
+
+        if stale:
+            logger.info(
+                f"Refreshing {len(stale)} of {len(rows)} portfolio stocks "
+                f"({len(rows) - len(stale)} served from the stocks table)"
+            )
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(self._refresh, row): row["nse_code"].upper() for row in stale}
+                for future in as_completed(futures):
+                    code = futures[future]
+                    row = self._rows([code]).get(code) or rows[code]
+                    ready(code, self._result(row))
+
+        # Unknown symbols (no row, not in the symbol master): fetch without storing
+        if missing:
+            logger.warning(f"⚠️ {len(missing)} holdings not in the stocks table: {sorted(missing)}")
+            direct = multi_source_service.fetch_multiple_stocks(sorted(missing), max_workers=max_workers)
+            for code in sorted(missing):
+                ready(code, direct.get(code) or {"data": {}, "quality": {"score": 0}})
+
+        return {symbol: results[symbol] for symbol in codes if symbol in results}
+
+    @staticmethod
+    def _result(row: Dict) -> Dict:
+        return {"data": analysis_record(row), "quality": row_quality(row)}
+
+    def _rows(self, codes) -> Dict[str, Dict]:
+        codes = sorted(set(codes))
+        if not codes:
+            return {}
+        rows = self.db.execute_query(
+            f"SELECT * FROM stocks WHERE nse_code IN ({', '.join('?' for _ in codes)})",
+            tuple(codes),
+        )
+        return {row["nse_code"].upper(): row for row in rows}
+
+    def _insert_placeholders(self, placeholders: List[tuple]):
+        try:
+            self.db.execute_many(
+                """
+                INSERT INTO stocks (stock_name, nse_code, isin, data_quality_score)
+                VALUES (?, ?, ?, 0)
+                ON CONFLICT (nse_code) DO NOTHING
+                """,
+                placeholders,
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to add portfolio stocks to the stocks table: {e}")
+
+    def _refresh(self, row: Dict) -> Optional[str]:
+        try:
+            return self.populator.enrich_one(row)
+        except Exception as e:
+            logger.error(f"❌ Failed to refresh {row.get('nse_code')}: {e}")
+            return None
+
+
+# Singleton instance
+portfolio_data_service = PortfolioDataService()
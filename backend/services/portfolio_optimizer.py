@@ -0,0 +1,448 @@
+"""
+Portfolio optimizer (rebalancing suggestions) from stored daily returns.
+
+Covariance is estimated with Ledoit-Wolf shrinkage towards a scaled identity:
+with 200 stocks and a year of returns the sample covariance is close to
+singular, and optimizers fed with it put everything into a few estimation
+errors. Expected returns are annualized historical means.
+
+Objectives (long-only, fully invested):
+- min_variance:  lowest volatility
+- max_sharpe:    highest (return - risk-free) / volatility
+- risk_parity:   every holding contributes the same share of risk
+- mean_variance: highest return - risk_aversion / 2 * variance, or lowest
+                 variance with expected return >= target_return
+
+All objectives take per-position caps (min_weight / max_weight) and sector
+limits. They are solved with SciPy's SLSQP using analytic gradients. The
+solution is kept per universe / objective / constraints and used as the
+starting point next time (warm start), so re-optimizing after a daily price
+update takes a few iterations instead of a cold solve.
+
+`solve()` works on (expected returns, covariance) only, so it runs offline
+and is what tests/benchmark_optimizer.py measures.
+
+Usage:
+    from services.portfolio_optimizer import portfolio_optimizer
+    result = portfolio_optimizer.optimize(["RELIANCE", "TCS", "HDFCBANK"], "max_sharpe", max_weight=0.4)
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+from scipy.optimize import linprog, minimize
+
+from config import config
+from database.db_config import db_config
+from services.price_history import price_history
+
+logger = logging.getLogger(__name__)
+
+OBJECTIVES = ("min_variance", "max_sharpe", "risk_parity", "mean_variance")
+TRADING_DAYS = 252
+MIN_OBSERVATIONS = 60  # Daily returns needed for a stock to be included
+WARM_START_SIZE = 64  # Solutions kept for warm starts
+
+
+class OptimizationError(ValueError):
+    """Infeasible constraints, unknown objective or not enough price history"""
+
+
+def ledoit_wolf(returns: np.ndarray) -> Tuple[np.ndarray, float]:
+    """
+    Ledoit-Wolf (2004) shrunk covariance of a (days x assets) returns matrix.
+
+    Returns:
+        (covariance, shrinkage): (1 - s) * sample + s * mean variance * I
+    """
+    n, p = returns.shape
+    X = returns - returns.mean(axis=0)
+    sample = X.T @ X / n
+    X2 = X**2
+    variances = X2.sum(axis=0) / n
+    mu = variances.sum() / p
+
+    # Squared Frobenius distance of the sample from the target, and the
+    # estimated variance of the sample entries (bounded by that distance)
+    delta_ = (sample**2).sum()
+    beta_ = (X2.T @ X2).sum() / n
+    beta = (beta_ - delta_) / (p * n)
+    delta = (delta_ - 2 * mu * variances.sum() + p * mu**2) / p
+    shrinkage = 0.0 if delta <= 0 else float(min(beta, delta) / delta)
+
+    covariance = (1 - shrinkage) * sample
+    covariance[np.diag_indices(p)] += shrinkage * mu
+    return covariance, shrinkage
+
+
+def equal_risk_contribution(cov: np.ndarray, max_iterations: int = 100) -> Tuple[np.ndarray, int]:
+    """
+    Unconstrained risk parity weights (Spinu 2013): minimize 1/2 y'Sy - sum(log y) / n
+    with damped Newton steps, then w = y / sum(y). Returns (weights, iterations).
+    """
+    n = len(cov)
+    budget = np.full(n, 1 / n)
+    y = 1 / np.sqrt(np.diag(cov))
+
+    def f(y):
+        return 0.5 * y @ cov @ y - budget @ np.log(y)
+
+    iterations = 0
+    for iterations in range(1, max_iterations + 1):
+        gradient = cov @ y - budget / y
+        if np.abs(gradient * y).max() < 1e-12:
+            break
+        step = np.linalg.solve(cov + np.diag(budget / y**2), gradient)
+        # Stay positive, then backtrack until the objective decreases enough
+        t = 1.0
+        while np.any(y - t * step <= 0):
+            t /= 2
+        while f(y - t * step) > f(y) - 1e-4 * t * (gradient @ step) and t > 1e-10:
+            t /= 2
+        y = y - t * step
+    return y / y.sum(), iterations
+
+
+def _objective(
+    objective: str,
+    mu: np.ndarray,
+    cov: np.ndarray,
+    risk_free: float,
+    risk_aversion: float,
+    target_return: Optional[float],
+):
+    """(f, grad) for the objective; all in annualized units"""
+    n = len(mu)
+
+    if objective == "min_variance" or (objective == "mean_variance" and target_return is not None):
+        def fun(w):
+            m = cov @ w
+            return w @ m, 2 * m
+
+    elif objective == "mean_variance":
+        def fun(w):
+            m = cov @ w
+            return risk_aversion / 2 * (w @ m) - mu @ w, risk_aversion * m - mu
+
+    elif objective == "max_sharpe":
+        def fun(w):
+            m = cov @ w
+            sigma = np.sqrt(max(w @ m, 1e-16))
+            excess = mu @ w - risk_free
+            return -excess / sigma, -(mu * sigma - excess * m / sigma) / sigma**2
+
+    elif objective == "risk_parity":
+        budget = np.full(n, 1 / n)
+
+        def fun(w):
+            # Squared distance of each risk share w_i (S w)_i / w'S w from 1/n
+            m = cov @ w
+            variance = max(w @ m, 1e-16)
+            error = w * m / variance - budget
+            grad = (
+                error * m
+                + cov @ (error * w)
+                - 2 * m * (error @ (w * m)) / variance
+            ) * 2 / variance
+            return error @ error, grad
+
+    else:
+        raise OptimizationError(f"Unknown objective: {objective} (expected one of {', '.join(OBJECTIVES)})")
+
+    return fun
+
+
+def solve(
+    objective: str,
+    mu: np.ndarray,
+    cov: np.ndarray,
+    min_weight: float = 0.0,
+    max_weight: float = 1.0,
+    groups: Optional[List[Tuple[np.ndarray, float]]] = None,
+    risk_free: Optional[float] = None,
+    risk_aversion: float = 1.0,
+    target_return: Optional[float] = None,
+    x0: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, Dict]:
+    """
+    Optimal long-only weights.
+
+    Args:
+        objective: One of OBJECTIVES
+        mu: Annualized expected returns (n)
+        cov: Annualized covariance (n x n)
+        min_weight / max_weight: Bounds for every position
+        groups: (member mask, max total weight) pairs, e.g. one per sector
+        risk_free: Annual risk-free rate for max_sharpe (config default)
+        risk_aversion: Mean-variance trade-off (higher = closer to min variance)
+        target_return: Mean-variance minimum expected return (instead of risk_aversion)
+        x0: Starting weights (warm start); equal weights when omitted
+
+    Returns:
+        (weights, solver info: success, message, iterations, warm_start)
+
+    Raises:
+        OptimizationError: if the constraints cannot be met
+    """
+    n = len(mu)
+    groups = groups or []
+    risk_free = config.OPTIMIZER_RISK_FREE_RATE if risk_free is None else risk_free
+
+    if not 0 <= min_weight <= max_weight:
+        raise OptimizationError("Expected 0 <= min_weight <= max_weight")
+    if max_weight * n < 1 - 1e-9:
+        raise OptimizationError(f"max_weight {max_weight} cannot hold a fully invested portfolio of {n} stocks")
+    if min_weight * n > 1 + 1e-9:
+        raise OptimizationError(f"min_weight {min_weight} exceeds 100% across {n} stocks")
+    # Most the portfolio can hold with every group at its limit
+    capacity = np.full(n, max_weight)
+    for mask, limit in groups:
+        if min_weight * mask.sum() > limit + 1e-9:
+            raise OptimizationError(f"min_weight across a group of {int(mask.sum())} exceeds its limit {limit}")
+        in_group = capacity[mask].sum()
+        if in_group > limit:
+            capacity[mask] *= limit / in_group
+    if capacity.sum() < 1 - 1e-9:
+        raise OptimizationError("Position caps and sector limits add up to less than 100%")
+
+    A = np.array([mask for mask, _ in groups], dtype=float).reshape(len(groups), n)
+    limits = np.array([limit for _, limit in groups])
+
+    if objective == "mean_variance" and target_return is not None:
+        # Highest expected return the caps and sector limits allow (a linear program)
+        best = linprog(
+            -mu,
+            A_ub=A if groups else None,
+            b_ub=limits if groups else None,
+            A_eq=np.ones((1, n)),
+            b_eq=[1],
+            bounds=(min_weight, max_weight),
+        )
+        if best.success and target_return > -best.fun + 1e-9:
+            raise OptimizationError(
+                f"target_return {target_return:.2%} exceeds the best expected return "
+                f"within the constraints ({-best.fun:.2%})"
+            )
+
+    fun = _objective(objective, mu, cov, risk_free, risk_aversion, target_return)
+
+    constraints = [{"type": "eq", "fun": lambda w: w.sum() - 1, "jac": lambda w: np.ones(n)}]
+    if groups:
+        constraints.append({"type": "ineq", "fun": lambda w: limits - A @ w, "jac": lambda w: -A})
+    if objective == "mean_variance" and target_return is not None:
+        constraints.append({"type": "ineq", "fun": lambda w: mu @ w - target_return, "jac": lambda w: mu})
+
+    warm = x0 is not None and len(x0) == n
+    if objective == "risk_parity":
+        # Newton is exact (and faster than any warm start) when no cap binds;
+        # otherwise its result starts the constrained solve
+        start, iterations = equal_risk_contribution(cov)
+        feasible = start.min() >= min_weight - 1e-9 and start.max() <= max_weight + 1e-9 and all(
+            start[mask].sum() <= limit + 1e-9 for mask, limit in groups
+        )
+        if feasible:
+            return start, {
+                "success": True,
+                "message": "Newton (unconstrained risk parity)",
+                "iterations": iterations,
+                "warm_start": False,
+            }
+        if not warm:
+            x0 = start
+
+    if x0 is not None and len(x0) == n:
+        start = np.clip(np.asarray(x0, dtype=float), min_weight, max_weight)
+    else:
+        start = np.ones(n)
+    start = np.clip(start / start.sum(), min_weight, max_weight)
+
+    result = minimize(
+        fun,
+        start,
+        jac=True,
+        method="SLSQP",
+        bounds=[(min_weight, max_weight)] * n,
+        constraints=constraints,
+        options={"maxiter": config.OPTIMIZER_MAX_ITERATIONS, "ftol": 1e-10},
+    )
+
+    weights = np.clip(result.x, min_weight, max_weight)
+    weights /= weights.sum()
+    info = {
+        "success": bool(result.success),
+        "message": str(result.message),
+        "iterations": int(result.nit),
+        "warm_start": warm,
+    }
+    if not result.success:
+        logger.warning(f"⚠️ {objective} optimization did not converge: {result.message}")
+    return weights, info
+
+
+class PortfolioOptimizer:
+    """Optimize weights for a universe of NSE codes from daily_prices"""
+
+    def __init__(self, history=None, db=None):
+        self.history = history or price_history
+        self.db = db or db_config
+        self._warm: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def sectors(self, symbols: List[str]) -> Dict[str, Optional[str]]:
+        if not symbols:
+            return {}
+        rows = self.db.execute_query(
+            f"SELECT nse_code, sector_name FROM stocks WHERE nse_code IN ({', '.join('?' for _ in symbols)})",
+            tuple(symbols),
+        )
+        return {row["nse_code"]: row["sector_name"] for row in rows}
+
+    def optimize(
+        self,
+        symbols: List[str],
+        objective: str = "min_variance",
+        days: int = TRADING_DAYS,
+        min_weight: float = 0.0,
+        max_weight: float = 1.0,
+        sector_limits: Union[float, Dict[str, float], None] = None,
+        current_weights: Optional[Dict[str, float]] = None,
+        risk_aversion: float = 1.0,
+        target_return: Optional[float] = None,
+        risk_free: Optional[float] = None,
+    ) -> Dict:
+        """
+        Optimal weights for `symbols`.
+
+        Args:
+            symbols: NSE codes (portfolio holdings or screener results)
+            objective: One of OBJECTIVES
+            days: Trading days of returns for the estimates
+            min_weight / max_weight: Bounds for every position
+            sector_limits: Max weight of any one sector (float), or {sector: max weight}
+            current_weights: {symbol: weight} of the current portfolio; reported
+                with the trades to reach the optimum and used as the warm start
+            risk_aversion / target_return / risk_free: see solve()
+
+        Returns:
+            Dict with weights per symbol, expected return / volatility / Sharpe,
+            sector weights, trades vs current weights and solver details
+
+        Raises:
+            OptimizationError: bad objective, infeasible constraints or too little history
+        """
+        if objective not in OBJECTIVES:
+            raise OptimizationError(f"Unknown objective: {objective} (expected one of {', '.join(OBJECTIVES)})")
+
+        symbols = list(dict.fromkeys(symbols))
+        dates, _, closes = self.history.load_closes(symbols, days + 1)
+        observed = np.isfinite(closes).sum(axis=0) if len(dates) else np.zeros(len(symbols))
+        keep = observed > MIN_OBSERVATIONS
+        excluded = [{"symbol": s, "reason": "insufficient price history"} for s, k in zip(symbols, keep) if not k]
+        symbols = [s for s, k in zip(symbols, keep) if k]
+        if len(symbols) < 2:
+            raise OptimizationError("Need at least two stocks with price history to optimize")
+
+        closes = closes[:, keep]
+        start = int(np.argmax(np.isfinite(closes).all(axis=1)))
+        closes = closes[start:]
+        if len(closes) <= MIN_OBSERVATIONS:
+            raise OptimizationError(f"Only {len(closes) - 1} days of aligned returns (need {MIN_OBSERVATIONS})")
+        returns = closes[1:] / closes[:-1] - 1
+
+        mu = returns.mean(axis=0) * TRADING_DAYS
+        cov, shrinkage = ledoit_wolf(returns)
+        cov *= TRADING_DAYS
+
+        sectors = self.sectors(symbols)
+        limits = {}
+        if sector_limits is not None:
+            for sector in sorted({sectors.get(s) for s in symbols if sectors.get(s)}):
+                limit = sector_limits if isinstance(sector_limits, (int, float)) else sector_limits.get(sector)
+                if limit is not None:
+                    limits[sector] = float(limit)
+        groups = [
+            (np.array([sectors.get(s) == sector for s in symbols]), limit)
+            for sector, limit in limits.items()
+        ]
+
+        # Warm start: last solution for this exact problem, else the current portfolio
+        key = (
+            objective, tuple(symbols), min_weight, max_weight,
+            tuple(limits.items()), risk_aversion, target_return,
+        )
+        with self._lock:
+            x0 = self._warm.get(key)
+        if x0 is None and current_weights:
+            x0 = np.array([current_weights.get(s, 0.0) for s in symbols])
+            x0 = x0 if x0.sum() > 0 else None
+
+        started = time.perf_counter()
+        weights, info = solve(
+            objective, mu, cov,
+            min_weight=min_weight, max_weight=max_weight, groups=groups,
+            risk_free=risk_free, risk_aversion=risk_aversion, target_return=target_return, x0=x0,
+        )
+        info["duration_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+        with self._lock:
+            self._warm[key] = weights
+            self._warm.move_to_end(key)
+            while len(self._warm) > WARM_START_SIZE:
+                self._warm.popitem(last=False)
+
+        risk_free = config.OPTIMIZER_RISK_FREE_RATE if risk_free is None else risk_free
+        m = cov @ weights
+        volatility = float(np.sqrt(weights @ m))
+        expected = float(mu @ weights)
+        contribution = weights * m / (volatility**2) if volatility > 0 else np.zeros_like(weights)
+
+        sector_weights: Dict[str, float] = {}
+        for symbol, weight in zip(symbols, weights):
+            sector = sectors.get(symbol) or "Unknown"
+            sector_weights[sector] = sector_weights.get(sector, 0.0) + float(weight)
+
+        current = np.array([(current_weights or {}).get(s, 0.0) for s in symbols])
+        result = {
+            "objective": objective,
+            "as_of": str(dates[-1]),
+            "observations": len(returns),
+            "shrinkage": round(shrinkage, 4),
+            "expected_return": round(expected, 6),
+            "volatility": round(volatility, 6),
+            "sharpe": round((expected - risk_free) / volatility, 4) if volatility > 0 else None,
+            "risk_free": risk_free,
+            "weights": [
+                {
+                    "symbol": symbol,
+                    "weight": round(float(weights[i]), 6),
+                    "sector": sectors.get(symbol),
+                    "expected_return": round(float(mu[i]), 6),
+                    "volatility": round(float(np.sqrt(cov[i, i])), 6),
+                    "risk_contribution_pct": round(float(contribution[i]), 6),
+                    **(
+                        {"current_weight": round(float(current[i]), 6), "trade": round(float(weights[i] - current[i]), 6)}
+                        if current_weights else {}
+                    ),
+                }
+                for i, symbol in enumerate(symbols)
+            ],
+            "sector_weights": {k: round(v, 6) for k, v in sorted(sector_weights.items())},
+            "excluded": excluded,
+            "solver": info,
+        }
+        if current_weights:
+            result["turnover"] = round(float(np.abs(weights - current).sum()) / 2, 6)
+        return result
+
+
+# Singleton instance
+portfolio_optimizer = PortfolioOptimizer()
@@ -0,0 +1,214 @@
+"""
+Portfolio risk analytics from stored daily prices.
+
+Holdings are turned into one aligned (days x holdings) returns matrix from
+daily_prices (see services/price_history.py), and every metric is computed on
+that matrix with NumPy - no per-holding loops:
+
+- annualized volatility (portfolio and per holding)
+- beta versus NIFTY (portfolio and per holding)
+- 1-day historical and parametric (normal) VaR / CVaR
+- correlation matrix
+- marginal and component risk contributions
+- maximum drawdown
+
+Weights are market values (quantity x last close). Without any quantities the
+portfolio is equal-weighted.
+
+Usage:
+    from services.portfolio_risk import portfolio_risk_engine
+    report = portfolio_risk_engine.analyze({"RELIANCE": 10, "TCS": 5})
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+from statistics import NormalDist
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from services.price_history import BENCHMARK_SYMBOL, price_history
+
+logger = logging.getLogger(__name__)
+
+TRADING_DAYS = 252
+MIN_OBSERVATIONS = 60  # Daily returns needed for a holding to be included
+MIN_COVERAGE = 0.8  # Share of the window a holding must have prices for
+
+
+class RiskDataError(ValueError):
+    """Not enough price history to compute portfolio risk"""
+
+
+def _round(value, digits: int = 6) -> Optional[float]:
+    value = float(value)
+    return round(value, digits) if np.isfinite(value) else None
+
+
+class PortfolioRiskEngine:
+    """Vectorized risk metrics for a set of holdings"""
+
+    def __init__(self, history=None):
+        self.history = history or price_history
+
+    def analyze(
+        self,
+        holdings: Dict[str, Optional[float]],
+        days: int = TRADING_DAYS,
+        confidence: float = 0.95,
+        benchmark: str = BENCHMARK_SYMBOL,
+    ) -> Dict:
+        """
+        Risk report for a portfolio.
+
+        Args:
+            holdings: {nse_code: quantity}; quantity None when unknown
+            days: Trading days of history to use
+            confidence: VaR / CVaR confidence level (e.g. 0.95)
+            benchmark: Index symbol in daily_prices for beta
+
+        Returns:
+            Dict with portfolio metrics, per-holding contributions, the
+            correlation matrix and the holdings left out (with the reason)
+
+        Raises:
+            RiskDataError: if fewer than MIN_OBSERVATIONS aligned returns remain
+        """
+        symbols = [s for s in holdings if s != benchmark]
+        excluded: List[Dict] = []
+
+        # With quantities for some holdings, value-weight those and leave out the rest
+        if any(holdings[s] is not None for s in symbols):
+            excluded += [{"symbol": s, "reason": "no quantity"} for s in symbols if holdings[s] is None]
+            symbols = [s for s in symbols if holdings[s] is not None and holdings[s] > 0]
+
+        dates, _, closes = self.history.load_closes(symbols + [benchmark], days + 1)
+        if len(dates) == 0:
+            raise RiskDataError("No price history for these holdings")
+        market, closes = closes[:, -1], closes[:, :-1]
+
+        # Holdings listed recently (or missing from daily_prices) would shorten the window
+        observed = np.isfinite(closes).sum(axis=0)
+        keep = (observed >= MIN_COVERAGE * len(dates)) & (observed > MIN_OBSERVATIONS)
+        excluded += [
+            {"symbol": s, "reason": "insufficient price history"}
+            for s, kept in zip(symbols, keep)
+            if not kept
+        ]
+        symbols = [s for s, kept in zip(symbols, keep) if kept]
+        closes = closes[:, keep]
+        if not symbols:
+            raise RiskDataError("No holdings have enough price history")
+
+        # Window where every kept holding has a price
+        complete = np.isfinite(closes).all(axis=1)
+        start = int(np.argmax(complete))
+        dates, closes, market = dates[start:], closes[start:], market[start:]
+        if len(dates) <= MIN_OBSERVATIONS:
+            raise RiskDataError(f"Only {len(dates) - 1} days of aligned returns (need {MIN_OBSERVATIONS})")
+
+        returns = closes[1:] / closes[:-1] - 1
+        last = closes[-1]
+
+        quantities = np.array([holdings[s] or 0 for s in symbols], dtype=float)
+        if quantities.any():
+            values = quantities * last
+            portfolio_value = float(values.sum())
+            weights = values / portfolio_value
+        else:
+            portfolio_value = None
+            weights = np.full(len(symbols), 1 / len(symbols))
+
+        portfolio = returns @ weights
+        n = len(portfolio)
+
+        # Covariance / correlation of holdings (daily)
+        centered = returns - returns.mean(axis=0)
+        covariance = centered.T @ centered / (n - 1)
+        stdev = np.sqrt(np.diag(covariance))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            correlation = covariance / np.outer(stdev, stdev)
+        correlation = np.nan_to_num(correlation)
+        np.fill_diagonal(correlation, 1.0)
+
+        # Risk contributions: sigma_p = sqrt(w' S w); MRC = S w / sigma_p
+        sigma = float(np.sqrt(weights @ covariance @ weights))
+        marginal = covariance @ weights / sigma if sigma > 0 else np.zeros_like(weights)
+        component = weights * marginal
+
+        # Beta vs the benchmark over the same days (if its history covers them)
+        market_returns = market[1:] / market[:-1] - 1
+        if np.isfinite(market_returns).all():
+            market_centered = market_returns - market_returns.mean()
+            market_var = market_centered @ market_centered / (n - 1)
+            betas = centered.T @ market_centered / (n - 1) / market_var
+            portfolio_beta = float(weights @ betas)
+        else:
+            betas = np.full(len(symbols), np.nan)
+            portfolio_beta = None
+
+        # 1-day VaR / CVaR as fractions of portfolio value (positive = loss)
+        alpha = 1 - confidence
+        mean = float(portfolio.mean())
+        threshold = float(np.quantile(portfolio, alpha))
+        historical_var = -threshold
+        historical_cvar = -float(portfolio[portfolio <= threshold].mean())
+        normal = NormalDist()
+        z = normal.inv_cdf(alpha)
+        parametric_var = -(mean + z * sigma)
+        parametric_cvar = -(mean - sigma * normal.pdf(z) / alpha)
+
+        # Maximum drawdown of the (daily rebalanced) portfolio
+        # wealth[i] is the value on dates[i]; starting at 1.0 lets a first-day
+        # loss count against the starting value
+        wealth = np.r_[1.0, np.cumprod(1 + portfolio)]
+        peaks = np.maximum.accumulate(wealth)
+        drawdown = wealth / peaks - 1
+        trough = int(np.argmin(drawdown))
+        peak = int(np.argmax(wealth[: trough + 1]))
+
+        annualize = np.sqrt(TRADING_DAYS)
+        report = {
+            "as_of": str(dates[-1]),
+            "start_date": str(dates[0]),
+            "observations": n,
+            "confidence": confidence,
+            "weighting": "market_value" if portfolio_value is not None else "equal",
+            "portfolio_value": _round(portfolio_value, 2) if portfolio_value is not None else None,
+            "volatility": _round(sigma * annualize),
+            "beta": _round(portfolio_beta) if portfolio_beta is not None else None,
+            "benchmark": benchmark,
+            "var": {"historical": _round(historical_var), "parametric": _round(parametric_var)},
+            "cvar": {"historical": _round(historical_cvar), "parametric": _round(parametric_cvar)},
+            "max_drawdown": {
+                "value": _round(drawdown[trough]),
+                "peak_date": str(dates[peak]),
+                "trough_date": str(dates[trough]),
+            },
+            "holdings": [
+                {
+                    "symbol": symbol,
+                    "weight": _round(weights[i]),
+                    "volatility": _round(stdev[i] * annualize),
+                    "beta": _round(betas[i]),
+                    "marginal_risk": _round(marginal[i] * annualize),
+                    "risk_contribution": _round(component[i] * annualize),
+                    "risk_contribution_pct": _round(component[i] / sigma) if sigma > 0 else None,
+                }
+                for i, symbol in enumerate(symbols)
+            ],
+            "correlation": {"symbols": symbols, "matrix": np.round(correlation, 4).tolist()},
+            "excluded": excluded,
+        }
+        if portfolio_value is not None:
+            report["var"]["historical_value"] = _round(historical_var * portfolio_value, 2)
+            report["var"]["parametric_value"] = _round(parametric_var * portfolio_value, 2)
+        return report
+
+
+# Singleton instance
+portfolio_risk_engine = PortfolioRiskEngine()
@@ -0,0 +1,272 @@
+"""
+Streaming portfolio upload.
+
+Broker exports can run to thousands of lots (one row per buy), so files are
+not loaded whole: CSVs are read line by line and .xlsx sheets with openpyxl
+in read-only mode. Stock names are normalized and deduplicated in memory, and
+each chunk of new names goes to `user_portfolio` in one
+INSERT ... ON CONFLICT DO NOTHING, so names already in the portfolio are
+skipped by the database instead of one lookup per row.
+
+An optional quantity column is summed per stock (one row per lot) and
+written to the holdings after the names are inserted, so re-uploading an
+export updates the quantities of stocks already in the portfolio.
+
+Rows that fail validation are reported with their spreadsheet row number;
+they never abort the rest of the file.
+
+Usage:
+    from services.portfolio_upload import portfolio_uploader
+    result = portfolio_uploader.import_file(user_id, file.stream, file.filename)
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import csv
+import io
+import logging
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import config
+
+logger = logging.getLogger(__name__)
+
+# Stock name columns, in order of preference (matched case-insensitively)
+NAME_COLUMNS = ["Stock Name", "Symbol", "Ticker", "Company"]
+# Optional quantity columns
+QUANTITY_COLUMNS = ["Quantity", "Qty", "Shares", "Units"]
+
+MAX_NAME_LENGTH = 255  # user_portfolio.stock_name
+
+
+class UploadError(ValueError):
+    """The file as a whole cannot be imported (unreadable, no stock column)"""
+
+
+def normalize_name(value) -> Optional[str]:
+    """Cell value -> stock name with collapsed whitespace (None if blank)"""
+    if value is None:
+        return None
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return None
+        if value.is_integer():
+            value = int(value)  # BSE codes read from Excel as 500325.0
+    name = " ".join(str(value).split())
+    return name or None
+
+
+def parse_quantity(value) -> Optional[float]:
+    """Cell value -> quantity (None if blank); ValueError if not a non-negative number"""
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    if isinstance(value, (int, float)):
+        quantity = float(value)
+    else:
+        text = str(value).strip().replace(",", "")
+        if not text:
+            return None
+        quantity = float(text)
+    if quantity < 0 or quantity != quantity or quantity == float("inf"):
+        raise ValueError(value)
+    return quantity
+
+
+def _find_column(header: List, columns: List[str]) -> Optional[int]:
+    labels = [str(label).strip().casefold() if label is not None else "" for label in header]
+    for column in columns:
+        if column.casefold() in labels:
+            return labels.index(column.casefold())
+    return None
+
+
+def _find_name_column(header: List) -> int:
+    column = _find_column(header, NAME_COLUMNS)
+    if column is None:
+        raise UploadError(f"No stock name column (expected one of: {', '.join(NAME_COLUMNS)})")
+    return column
+
+
+def _csv_rows(stream) -> Iterator[Tuple[int, List]]:
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        reader = csv.reader(text)
+        for row in reader:
+            yield reader.line_num, row
+    finally:
+        text.detach()  # leave the upload stream open for the caller
+
+
+def _xlsx_rows(stream) -> Iterator[Tuple[int, List]]:
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(stream, read_only=True, data_only=True)
+    try:
+        for number, row in enumerate(workbook.active.iter_rows(values_only=True), 1):
+            yield number, list(row)
+    finally:
+        workbook.close()
+
+
+def _legacy_excel_rows(stream) -> Iterator[Tuple[int, List]]:
+    # .xls has no streaming reader; these are small legacy exports
+    import pandas as pd
+
+    df = pd.read_excel(stream, header=None, dtype=object)
+    for number, row in enumerate(df.itertuples(index=False), 1):
+        yield number, list(row)
+
+
+def iter_rows(stream, filename: str) -> Iterator[Tuple[int, List]]:
+    """(row number, cell values) for every row of a CSV / Excel upload, header included"""
+    name = filename.lower()
+    if name.endswith(".csv"):
+        return _csv_rows(stream)
+    if name.endswith(".xls"):
+        return _legacy_excel_rows(stream)
+    return _xlsx_rows(stream)
+
+
+class PortfolioUploader:
+    """Import stock names from uploaded files into a user's portfolio"""
+
+    def __init__(self, chunk_size: Optional[int] = None):
+        self.chunk_size = chunk_size or config.UPLOAD_CHUNK_SIZE
+
+    def import_file(self, user_id: str, stream, filename: str) -> Dict:
+        """
+        Add every stock named in the file to the user's portfolio.
+
+        Returns:
+            {file, rows, added, duplicates, quantities, errors: [{row, value, error}], error_count}
+            (quantities: holdings whose quantity was set, when the file has a quantity column)
+
+        Raises:
+            UploadError: if the file has no recognizable stock name column
+        """
+        rows = iter_rows(stream, filename)
+        header = next((row for _, row in rows if any(normalize_name(cell) for cell in row)), None)
+        if header is None:
+            raise UploadError("File is empty")
+        name_column = _find_name_column(header)
+        quantity_column = _find_column(header, QUANTITY_COLUMNS)
+
+        result = {
+            "file": filename, "rows": 0, "added": 0, "duplicates": 0,
+            "quantities": 0, "errors": [], "error_count": 0,
+        }
+        seen = set()
+        chunk = []
+        quantities: Dict[str, List] = {}  # casefolded name -> [stored name, total]
+
+        for number, row in rows:
+            value = row[name_column] if name_column < len(row) else None
+            name = normalize_name(value)
+
+            if name is None and not any(normalize_name(cell) for cell in row):
+                continue  # blank line
+
+            result["rows"] += 1
+            if name is None:
+                self._row_error(result, number, value, "Missing stock name")
+                continue
+            if len(name) > MAX_NAME_LENGTH:
+                self._row_error(result, number, value, f"Stock name longer than {MAX_NAME_LENGTH} characters")
+                continue
+
+            key = name.casefold()
+            if quantity_column is not None:
+                cell = row[quantity_column] if quantity_column < len(row) else None
+                try:
+                    quantity = parse_quantity(cell)
+                except ValueError:
+                    self._row_error(result, number, cell, "Invalid quantity")
+                    continue
+                if quantity is not None:
+                    entry = quantities.setdefault(key, [name, 0.0])
+                    entry[1] += quantity
+
+            if key in seen:
+                result["duplicates"] += 1
+                continue
+            seen.add(key)
+
+            chunk.append(name)
+            if len(chunk) >= self.chunk_size:
+                result["added"] += self._insert(user_id, chunk)
+                chunk = []
+
+        if chunk:
+            result["added"] += self._insert(user_id, chunk)
+
+        # Names already in the portfolio were skipped by ON CONFLICT
+        result["duplicates"] += len(seen) - result["added"]
+
+        if quantities:
+            result["quantities"] = self._set_quantities(user_id, list(quantities.values()))
+
+        logger.info(
+            f"✅ Upload {filename}: {result['rows']} rows, {result['added']} added, "
+            f"{result['duplicates']} duplicates, {result['error_count']} errors"
+        )
+        return result
+
+    def _row_error(self, result: Dict, number: int, value, error: str):
+        result["error_count"] += 1
+        if len(result["errors"]) < config.UPLOAD_MAX_ERRORS:
+            result["errors"].append(
+                {"row": number, "value": None if value is None else str(value)[:100], "error": error}
+            )
+
+    def _insert(self, user_id: str, names: List[str]) -> int:
+        """Insert one chunk, skipping names already in the portfolio; returns rows added"""
+        from models import UserPortfolio, db
+
+        if db.engine.dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+
+        table = UserPortfolio.__table__
+        now = datetime.utcnow()
+        statement = (
+            insert(table)
+            .values([{"user_id": user_id, "stock_name": name, "added_at": now} for name in names])
+            .on_conflict_do_nothing(index_elements=["user_id", "stock_name"])
+            .returning(table.c.id)
+        )
+        try:
+            added = len(db.session.execute(statement).fetchall())
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return added
+
+    def _set_quantities(self, user_id: str, entries: List[List]) -> int:
+        """Set the holding quantity of each [name, quantity] in one executemany"""
+        from sqlalchemy import bindparam, update
+
+        from models import UserPortfolio, db
+
+        table = UserPortfolio.__table__
+        statement = (
+            update(table)
+            .where(table.c.user_id == user_id, table.c.stock_name == bindparam("stock"))
+            .values(quantity=bindparam("qty"))
+        )
+        try:
+            db.session.execute(statement, [{"stock": name, "qty": quantity} for name, quantity in entries])
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return len(entries)
+
+
+# Singleton instance
+portfolio_uploader = PortfolioUploader()
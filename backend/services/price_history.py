@@ -0,0 +1,301 @@
+"""
+Daily prices per symbol (daily_prices table).
+
+The price refresh already downloads a year of daily bars for every stock to
+compute change % and the 52-week range; close, adj_close, high and low are
+now kept here. This shared table is the one price source for portfolio risk,
+the optimizer and the technical indicators (services/portfolio_risk.py,
+portfolio_optimizer.py, technical_indicators.py). Each refresh appends only
+the bars from the last stored date onwards (that date is rewritten, since it
+may have been stored mid-session), unless Yahoo restated the history after a
+split or dividend (see PriceHistory.append).
+
+Aligned panels are cached in-process for config.PRICE_PANEL_CACHE_SECONDS,
+so repeated risk / optimizer requests over the same holdings skip the read.
+
+Usage:
+    from services.price_history import price_history
+    dates, symbols, closes = price_history.load_closes(["RELIANCE", "TCS"], days=252)
+    # closes: (len(dates) x len(symbols)) float array, forward-filled, NaN before listing
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config import config
+from database.db_config import db_config
+
+logger = logging.getLogger(__name__)
+
+# Index series stored next to the stocks: symbol -> Yahoo ticker
+INDEX_TICKERS = {
+    "NIFTY": "^NSEI",
+}
+BENCHMARK_SYMBOL = "NIFTY"
+
+PANEL_CACHE_SIZE = 32  # Aligned panels kept per process
+BAR_COLUMNS = ("close", "adj_close", "high", "low")
+
+
+def _iso(value) -> str:
+    # Postgres returns DATE as date, SQLite as text
+    return value.isoformat() if isinstance(value, date) else str(value)[:10]
+
+
+def _value(matrix: Optional[np.ndarray], i: int, j: int) -> Optional[float]:
+    if matrix is None or not np.isfinite(matrix[i, j]):
+        return None
+    return float(matrix[i, j])
+
+
+def forward_fill(matrix: np.ndarray) -> np.ndarray:
+    """Carry the last non-NaN value down each column (leading NaNs stay NaN)"""
+    rows = np.arange(matrix.shape[0])[:, None]
+    last_valid = np.where(np.isnan(matrix), 0, rows)
+    np.maximum.accumulate(last_valid, axis=0, out=last_valid)
+    return matrix[last_valid, np.arange(matrix.shape[1])]
+
+
+class PriceHistory:
+    """Read and append daily closes"""
+
+    def __init__(self, db=None):
+        self.db = db or db_config
+        self._panels: "OrderedDict[tuple, Tuple[float, tuple]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _fetch(self, query: str, params: tuple) -> List[tuple]:
+        """Rows as plain tuples (tens of thousands of prices; skips the dict per row)"""
+        if self.db.is_production:
+            import psycopg2.extensions
+
+            query = query.replace("?", "%s")
+        with self.db.get_connection() as conn:
+            if self.db.is_production:
+                cursor = conn.cursor(cursor_factory=psycopg2.extensions.cursor)
+            else:
+                conn.row_factory = None
+                cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchall()
+
+    def latest_dates(self, symbols: List[str]) -> Dict[str, str]:
+        """{symbol: last stored trade date (ISO)} for symbols with any history"""
+        if not symbols:
+            return {}
+        rows = self.db.execute_query(
+            f"""
+            SELECT symbol, MAX(trade_date) AS last_date FROM daily_prices
+            WHERE symbol IN ({', '.join('?' for _ in symbols)})
+            GROUP BY symbol
+            """,
+            tuple(symbols),
+        )
+        return {row["symbol"]: _iso(row["last_date"]) for row in rows}
+
+    def _reference_bars(self, symbols: List[str]) -> Dict[str, Tuple[str, float, float]]:
+        """
+        {symbol: (trade_date, close, adj_close)} of each symbol's second newest
+        stored bar: the newest one that was surely stored after the close
+        """
+        rows = self.db.execute_query(
+            f"""
+            SELECT p.symbol, p.trade_date, p.close, p.adj_close FROM daily_prices p
+            WHERE p.symbol IN ({', '.join('?' for _ in symbols)})
+              AND p.trade_date = (
+                  SELECT MAX(q.trade_date) FROM daily_prices q
+                  WHERE q.symbol = p.symbol
+                    AND q.trade_date < (SELECT MAX(r.trade_date) FROM daily_prices r WHERE r.symbol = p.symbol)
+              )
+            """,
+            tuple(symbols),
+        )
+        return {row["symbol"]: (_iso(row["trade_date"]), row["close"], row["adj_close"]) for row in rows}
+
+    def append(
+        self,
+        dates: List[str],
+        symbols: List[str],
+        close: np.ndarray,
+        adj_close: np.ndarray,
+        high: Optional[np.ndarray] = None,
+        low: Optional[np.ndarray] = None,
+    ) -> int:
+        """
+        Store (dates x symbols) bars, skipping bars older than each symbol's
+        last stored date. Returns the number of rows written.
+
+        Yahoo restates history after corporate actions: a split changes close
+        and adj_close of every earlier day, a dividend only adj_close. When the
+        downloaded bar of a symbol's settled reference day (see
+        _reference_bars) differs from the stored one, the symbol's whole
+        window is rewritten and its older rows are rescaled by the same factors.
+        """
+        if not symbols or not len(dates):
+            return 0
+        latest = self.latest_dates(symbols)
+        references = self._reference_bars(symbols)
+        day_index = {trade_date: i for i, trade_date in enumerate(dates)}
+
+        rows, rescales = [], []
+        for j, symbol in enumerate(symbols):
+            since = latest.get(symbol, "")
+            price_factor, adj_factor = self._restatement(
+                references.get(symbol), day_index, close[:, j], adj_close[:, j]
+            )
+            if (price_factor, adj_factor) != (1.0, 1.0):
+                logger.info(f"{symbol}: history restated (close x{price_factor:.4f}, adj_close x{adj_factor:.4f})")
+                rescales.append((price_factor, price_factor, price_factor, adj_factor, symbol, dates[0]))
+                since = ""
+
+            for i, trade_date in enumerate(dates):
+                if trade_date < since or not np.isfinite(close[i, j]):
+                    continue
+                adjusted = adj_close[i, j]
+                rows.append(
+                    (
+                        symbol,
+                        trade_date,
+                        float(close[i, j]),
+                        float(adjusted) if np.isfinite(adjusted) else float(close[i, j]),
+                        _value(high, i, j),
+                        _value(low, i, j),
+                    )
+                )
+
+        if rows:
+            self.db.execute_transaction(
+                [
+                    # Rows before the downloaded window move to the new basis
+                    (
+                        """
+                        UPDATE daily_prices
+                        SET close = close * ?, high = high * ?, low = low * ?, adj_close = adj_close * ?
+                        WHERE symbol = ? AND trade_date < ?
+                        """,
+                        rescales,
+                    ),
+                    (
+                        """
+                        INSERT INTO daily_prices (symbol, trade_date, close, adj_close, high, low)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (symbol, trade_date)
+                        DO UPDATE SET close = excluded.close, adj_close = excluded.adj_close,
+                                      high = excluded.high, low = excluded.low
+                        """,
+                        rows,
+                    ),
+                ]
+            )
+            with self._lock:
+                self._panels.clear()
+        return len(rows)
+
+    @staticmethod
+    def _restatement(
+        reference, day_index: Dict[str, int], close: np.ndarray, adj_close: np.ndarray
+    ) -> Tuple[float, float]:
+        """(close, adj_close) factors from stored to downloaded values on the reference day"""
+        if reference is None or reference[0] not in day_index:
+            return 1.0, 1.0
+        i = day_index[reference[0]]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            factors = (close[i] / float(reference[1] or np.nan), adj_close[i] / float(reference[2] or np.nan))
+        return tuple(
+            float(factor) if np.isfinite(factor) and abs(factor - 1) > 1e-6 else 1.0
+            for factor in factors
+        )
+
+    def load_closes(
+        self, symbols: List[str], days: int = 252, adjusted: bool = True
+    ) -> Tuple[np.ndarray, List[str], np.ndarray]:
+        """
+        Aligned closes for the last `days` trading days.
+
+        Returns:
+            (dates, symbols, closes): ISO date strings (the union of all
+            symbols' trading days), the symbols in input order, and a
+            (dates x symbols) array forward-filled over gaps
+        """
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return np.array([], dtype=str), [], np.empty((0, 0))
+
+        key = (tuple(symbols), days, adjusted)
+        with self._lock:
+            cached = self._panels.get(key)
+            if cached and time.time() - cached[0] < config.PRICE_PANEL_CACHE_SECONDS:
+                self._panels.move_to_end(key)
+                dates, closes = cached[1]
+                return dates, symbols, closes
+
+        column = "adj_close" if adjusted else "close"
+        dates, panels = self._read_panel(symbols, days, (column,))
+        closes = panels[column]
+        closes.flags.writeable = False  # shared between callers
+        with self._lock:
+            self._panels[key] = (time.time(), (dates, closes))
+            while len(self._panels) > PANEL_CACHE_SIZE:
+                self._panels.popitem(last=False)
+        return dates, symbols, closes
+
+    def load_bars(
+        self, symbols: List[str], days: int = 252, columns: Tuple[str, ...] = BAR_COLUMNS
+    ) -> Tuple[np.ndarray, List[str], Dict[str, np.ndarray]]:
+        """
+        Several stored columns on the same dates (not cached; for batch jobs).
+
+        Returns:
+            (dates, symbols, {column: (dates x symbols) array}), aligned and
+            forward-filled like load_closes
+        """
+        symbols = list(dict.fromkeys(symbols))
+        if not symbols:
+            return np.array([], dtype=str), [], {column: np.empty((0, 0)) for column in columns}
+        dates, panels = self._read_panel(symbols, days, columns)
+        return dates, symbols, panels
+
+    def _read_panel(
+        self, symbols: List[str], days: int, columns: Tuple[str, ...]
+    ) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+        unknown = set(columns) - set(BAR_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+        # Calendar cutoff with room for holidays; trimmed to `days` below
+        start = (date.today() - timedelta(days=int(days * 1.6) + 10)).isoformat()
+        rows = self._fetch(
+            f"""
+            SELECT symbol, trade_date, {', '.join(columns)} FROM daily_prices
+            WHERE symbol IN ({', '.join('?' for _ in symbols)}) AND trade_date >= ?
+            """,
+            tuple(symbols) + (start,),
+        )
+        if not rows:
+            return np.array([], dtype=str), {column: np.empty((0, len(symbols))) for column in columns}
+
+        row_symbols, row_dates, *row_values = zip(*rows)
+        column_of = {symbol: j for j, symbol in enumerate(symbols)}
+        row_columns = np.fromiter(map(column_of.__getitem__, row_symbols), dtype=np.intp, count=len(rows))
+        dates, row_index = np.unique(np.array(list(map(_iso, row_dates))), return_inverse=True)
+
+        panels = {}
+        for column, values in zip(columns, row_values):
+            panel = np.full((len(dates), len(symbols)), np.nan)
+            panel[row_index, row_columns] = np.array(values, dtype=float)
+            panels[column] = forward_fill(panel)[-days:]
+        return dates[-days:], panels
+
+
+# Singleton instance
+price_history = PriceHistory()
@@ -0,0 +1,281 @@
+"""
+Task progress events over Redis pub/sub, streamed to browsers as SSE.
+
+A task publishes events (progress, one result per finished symbol, done /
+error) to `klyx:progress:<task_id>`. `/api/process/stream/<task_id>`
+subscribes and forwards them as server-sent events, so the UI can render
+holdings as they complete instead of polling the Celery result backend.
+
+Each event is also appended to a short-lived replay list, so a client that
+connects after the task started (or reconnects with Last-Event-ID) still
+receives everything from the beginning.
+
+A stream closes after STREAM_TIMEOUT_SECONDS even if the task is still
+running, well inside gunicorn's 30s worker timeout. EventSource reconnects
+on its own (after the `retry` delay) sending Last-Event-ID, and the new
+stream resumes after the last event the client saw.
+
+Without Redis (no REDIS_URL, or unreachable) events go through an in-process
+broker instead. That covers tasks run in the web process (synchronous
+fallback), not tasks running in a separate worker.
+
+Usage:
+    publisher = ProgressPublisher(task_id)
+    publisher.publish("result", {"symbol": "RELIANCE", ...})
+    publisher.publish("done", {...})
+
+    return Response(sse_stream(task_id), mimetype="text/event-stream")
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from services.tiered_cache import _json_default, get_redis_url
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_EVENTS = ("done", "error")
+REPLAY_TTL_SECONDS = 3600
+HEARTBEAT_SECONDS = 10
+STREAM_TIMEOUT_SECONDS = 20  # Below gunicorn's default 30s worker timeout
+RECONNECT_MILLISECONDS = 1000
+
+
+def _channel(task_id: str) -> str:
+    return f"klyx:progress:{task_id}"
+
+
+def _log_key(task_id: str) -> str:
+    return f"klyx:progress:{task_id}:log"
+
+
+def _seq_key(task_id: str) -> str:
+    return f"klyx:progress:{task_id}:seq"
+
+
+def _message(seq: int, event: str, data: Dict) -> str:
+    return json.dumps({"id": int(seq), "event": event, "data": data}, default=_json_default)
+
+
+class _LocalBroker:
+    """In-process stand-in for Redis pub/sub + replay list"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._logs: Dict[str, List[Tuple[float, str]]] = defaultdict(list)
+        self._subscribers: Dict[str, List[queue.Queue]] = defaultdict(list)
+
+    def publish(self, task_id: str, event: str, data: Dict):
+        with self._lock:
+            now = time.time()
+            # Drop replay logs of long-finished tasks
+            for key in [k for k, log in self._logs.items() if now - log[-1][0] > REPLAY_TTL_SECONDS]:
+                del self._logs[key]
+            message = _message(len(self._logs[task_id]) + 1, event, data)
+            self._logs[task_id].append((now, message))
+            subscribers = list(self._subscribers.get(task_id, []))
+        for subscriber in subscribers:
+            subscriber.put(message)
+
+    def subscribe(self, task_id: str) -> queue.Queue:
+        subscriber = queue.Queue()
+        with self._lock:
+            self._subscribers[task_id].append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, task_id: str, subscriber: queue.Queue):
+        with self._lock:
+            if subscriber in self._subscribers[task_id]:
+                self._subscribers[task_id].remove(subscriber)
+            if not self._subscribers[task_id]:
+                del self._subscribers[task_id]
+
+    def replay(self, task_id: str) -> List[str]:
+        with self._lock:
+            return [message for _, message in self._logs.get(task_id, [])]
+
+
+_local_broker = _LocalBroker()
+
+_redis_client = None
+_redis_disabled_until = 0.0
+_redis_lock = threading.Lock()
+
+
+def _get_redis():
+    """Shared Redis client, or None (retried after 30s on errors)"""
+    global _redis_client
+    url = get_redis_url()
+    if not url or time.time() < _redis_disabled_until:
+        return None
+    with _redis_lock:
+        if _redis_client is None:
+            try:
+                import redis
+
+                _redis_client = redis.Redis.from_url(url, socket_connect_timeout=0.5)
+            except Exception as e:
+                logger.warning(f"Redis progress stream unavailable: {e}")
+                _disable_redis()
+                return None
+        return _redis_client
+
+
+def _disable_redis():
+    global _redis_client, _redis_disabled_until
+    _redis_client = None
+    _redis_disabled_until = time.time() + 30
+
+
+class ProgressPublisher:
+    """Publish progress events for one task"""
+
+    def __init__(self, task_id: Optional[str]):
+        self.task_id = task_id
+
+    def publish(self, event: str, data: Dict):
+        """Never raises: progress reporting must not fail the task"""
+        if not self.task_id:
+            return
+
+        client = _get_redis()
+        if client is not None:
+            try:
+                seq = client.incr(_seq_key(self.task_id))
+                message = _message(seq, event, data)
+                pipe = client.pipeline()
+                pipe.rpush(_log_key(self.task_id), message)
+                pipe.expire(_log_key(self.task_id), REPLAY_TTL_SECONDS)
+                pipe.expire(_seq_key(self.task_id), REPLAY_TTL_SECONDS)
+                pipe.publish(_channel(self.task_id), message)
+                pipe.execute()
+                return
+            except Exception as e:
+                logger.debug(f"Progress publish to Redis failed for {self.task_id}: {e}")
+                _disable_redis()
+
+        _local_broker.publish(self.task_id, event, data)
+
+
+def latest_event(task_id: str, event: str) -> Optional[Dict]:
+    """Data of the task's most recent `event` from the replay log (None if none yet)"""
+    client = _get_redis()
+    messages = None
+    if client is not None:
+        try:
+            messages = [
+                raw.decode() if isinstance(raw, bytes) else raw
+                for raw in client.lrange(_log_key(task_id), 0, -1)
+            ]
+        except Exception as e:
+            logger.debug(f"Progress replay read failed for {task_id}: {e}")
+            _disable_redis()
+    if messages is None:
+        messages = _local_broker.replay(task_id)
+
+    for message in reversed(messages):
+        payload = json.loads(message)
+        if payload["event"] == event:
+            return payload["data"]
+    return None
+
+
+def has_events(task_id: str) -> bool:
+    """Whether anything was published for the task (within REPLAY_TTL_SECONDS)"""
+    client = _get_redis()
+    if client is not None:
+        try:
+            return bool(client.exists(_log_key(task_id)))
+        except Exception as e:
+            logger.debug(f"Progress replay check failed for {task_id}: {e}")
+            _disable_redis()
+    return bool(_local_broker.replay(task_id))
+
+
+def _format_sse(message: str) -> str:
+    payload = json.loads(message)
+    return (
+        f"id: {payload['id']}\n"
+        f"event: {payload['event']}\n"
+        f"data: {json.dumps(payload['data'], default=_json_default)}\n\n"
+    )
+
+
+def _events(task_id: str, timeout: float) -> Iterator[Optional[str]]:
+    """Raw messages (replay first, then live), None on every idle heartbeat interval"""
+    client = _get_redis()
+    if client is not None:
+        try:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            # Subscribe before reading the replay list so nothing falls in between
+            pubsub.subscribe(_channel(task_id))
+        except Exception as e:
+            logger.debug(f"Progress subscribe failed for {task_id}: {e}")
+            _disable_redis()
+            client = None
+
+    if client is not None:
+        try:
+            for raw in client.lrange(_log_key(task_id), 0, -1):
+                yield raw.decode() if isinstance(raw, bytes) else raw
+            deadline = time.time() + timeout
+            while time.time() < deadline:
+                wait = min(HEARTBEAT_SECONDS, max(deadline - time.time(), 0))
+                message = pubsub.get_message(timeout=wait)
+                if message is None:
+                    yield None
+                    continue
+                data = message.get("data")
+                yield data.decode() if isinstance(data, bytes) else data
+        finally:
+            pubsub.close()
+        return
+
+    subscriber = _local_broker.subscribe(task_id)
+    try:
+        for message in _local_broker.replay(task_id):
+            yield message
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            try:
+                wait = min(HEARTBEAT_SECONDS, max(deadline - time.time(), 0))
+                yield subscriber.get(timeout=wait)
+            except queue.Empty:
+                yield None
+    finally:
+        _local_broker.unsubscribe(task_id, subscriber)
+
+
+def sse_stream(
+    task_id: str, last_event_id: Optional[int] = None, timeout: float = STREAM_TIMEOUT_SECONDS
+) -> Iterator[str]:
+    """
+    Server-sent events for a task, ending after its done / error event.
+
+    Args:
+        task_id: Task to follow
+        last_event_id: Skip events up to this id (EventSource reconnects)
+        timeout: Close after this many seconds if the task has not finished;
+            the client reconnects with Last-Event-ID and picks up from there
+    """
+    seen = last_event_id or 0
+    yield f"retry: {RECONNECT_MILLISECONDS}\n\n"
+    for message in _events(task_id, timeout):
+        if message is None:
+            yield ": keepalive\n\n"
+            continue
+        payload = json.loads(message)
+        # Replay and live delivery can overlap
+        if payload["id"] <= seen:
+            if payload["event"] in TERMINAL_EVENTS:
+                return  # client already has the end of the stream
+            continue
+        seen = payload["id"]
+        yield _format_sse(message)
+        if payload["event"] in TERMINAL_EVENTS:
+            return
@@ -0,0 +1,422 @@
+"""
+Priority-based refresh scheduler for the stocks universe.
+
+Instead of refreshing "anything older than 7 days" in arbitrary order, each
+stock gets a priority per field class:
+
+    priority = staleness x (1 + market cap + portfolio holders + recent views + earnings)
+
+- staleness: age of the field class / its TTL (only stocks with staleness >= 1 are due);
+  fundamentals use the stalest of quarterly / annual / shareholding (FreshnessPolicy)
+- market cap: log-scaled, so large caps rank above illiquid names
+- holders: number of users holding the stock in their portfolio
+- views: stock detail views over the last 7 days (see ViewTracker)
+- earnings: boost around results dates (fundamentals change right after)
+
+NSE market hours decide the field class:
+- 09:15-15:30 IST on weekdays: prices (cheap batched downloads)
+- shortly after the close: one closing price pass
+- otherwise: fundamentals (slow multi-source enrichment)
+
+Celery beat calls `tasks.scheduled_refresh` every REFRESH_INTERVAL_SECONDS;
+each tick takes the top `batch size` stocks from the queue.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import atexit
+import heapq
+import logging
+import math
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from config import config
+from database.db_config import db_config
+
+logger = logging.getLogger(__name__)
+
+IST = timezone(timedelta(hours=5, minutes=30))  # India has no DST
+
+MARKET_OPEN = (9, 15)
+MARKET_CLOSE = (15, 30)
+
+# Field classes, each with its own refresh timestamp and TTL
+PRICE = "price"
+TECHNICALS = "technicals"
+QUARTERLY = "quarterly"
+ANNUAL = "annual"
+SHAREHOLDING = "shareholding"
+STATIC = "static"
+
+FRESHNESS_COLUMNS = {
+    PRICE: "price_updated_at",
+    TECHNICALS: "technicals_updated_at",
+    QUARTERLY: "quarterly_updated_at",
+    ANNUAL: "annual_updated_at",
+    SHAREHOLDING: "shareholding_updated_at",
+    STATIC: "static_updated_at",
+}
+
+# The scheduler's off-hours pass refreshes these through the multi-source enrichment
+FUNDAMENTALS = "fundamentals"
+FUNDAMENTAL_CLASSES = (QUARTERLY, ANNUAL, SHAREHOLDING)
+
+
+def _parse_timestamp(value) -> Optional[datetime]:
+    """DB timestamps come back as datetime (Postgres) or text (SQLite), both UTC"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "")).replace(tzinfo=None)
+    except ValueError:
+        return None
+
+
+def _parse_date(value) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return date.fromisoformat(str(value)[:10])
+    except ValueError:
+        return None
+
+
+class MarketHours:
+    """NSE trading session helpers (holidays are not modelled)"""
+
+    @staticmethod
+    def now_ist(now: Optional[datetime] = None) -> datetime:
+        now = now or datetime.now(timezone.utc)
+        if now.tzinfo is None:
+            now = now.replace(tzinfo=timezone.utc)
+        return now.astimezone(IST)
+
+    @classmethod
+    def is_open(cls, now: Optional[datetime] = None) -> bool:
+        ist = cls.now_ist(now)
+        if ist.weekday() >= 5:
+            return False
+        minutes = ist.hour * 60 + ist.minute
+        return (
+            MARKET_OPEN[0] * 60 + MARKET_OPEN[1]
+            <= minutes
+            < MARKET_CLOSE[0] * 60 + MARKET_CLOSE[1]
+        )
+
+    @classmethod
+    def last_close_utc(cls, now: Optional[datetime] = None) -> datetime:
+        """Most recent session close (naive UTC), for the closing price pass"""
+        ist = cls.now_ist(now)
+        close = ist.replace(
+            hour=MARKET_CLOSE[0], minute=MARKET_CLOSE[1], second=0, microsecond=0
+        )
+        if close > ist:
+            close -= timedelta(days=1)
+        while close.weekday() >= 5:
+            close -= timedelta(days=1)
+        return close.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+class FreshnessPolicy:
+    """
+    Per-field-class TTLs (config.FIELD_CLASS_TTL_MINUTES) and staleness checks.
+
+    - price is fresh outside market hours once it covers the last close
+    - quarterly is stale as soon as results were published after its last refresh
+    - rows enriched before per-class timestamps existed fall back to last_updated
+    """
+
+    def __init__(self, ttl_minutes: Optional[Dict[str, int]] = None):
+        self.ttls = {
+            name: timedelta(minutes=minutes)
+            for name, minutes in (ttl_minutes or config.FIELD_CLASS_TTL_MINUTES).items()
+        }
+
+    def last_refreshed(self, row: Dict, field_class: str) -> Optional[datetime]:
+        """When this field class was last refreshed for the stock"""
+        value = row.get(FRESHNESS_COLUMNS[field_class])
+        if value is None and field_class != PRICE and row.get("data_quality_score"):
+            value = row.get("last_updated")
+        return _parse_timestamp(value)
+
+    def staleness(
+        self, row: Dict, field_class: str, now: Optional[datetime] = None
+    ) -> Optional[float]:
+        """Age / TTL (>= 1 means due); None if never refreshed"""
+        now_utc = MarketHours.now_ist(now).astimezone(timezone.utc).replace(tzinfo=None)
+        last = self.last_refreshed(row, field_class)
+        if last is None:
+            return None
+
+        if field_class == PRICE and not MarketHours.is_open(now):
+            if last >= MarketHours.last_close_utc(now):
+                return 0.0
+
+        staleness = (now_utc - last).total_seconds() / self.ttls[field_class].total_seconds()
+
+        if field_class == QUARTERLY:
+            earnings = _parse_date(row.get("next_earnings_date"))
+            if earnings and last.date() < earnings <= now_utc.date():
+                staleness = max(staleness, 1.0)
+
+        return staleness
+
+    def stale_classes(
+        self,
+        row: Dict,
+        classes=tuple(FRESHNESS_COLUMNS),
+        now: Optional[datetime] = None,
+    ) -> List[str]:
+        """Field classes (of `classes`) that are due for a refresh"""
+        due = []
+        for field_class in classes:
+            staleness = self.staleness(row, field_class, now)
+            if staleness is None or staleness >= 1:
+                due.append(field_class)
+        return due
+
+    def stale_condition(self, db, classes) -> str:
+        """SQL condition on stocks: any of `classes` older than its TTL (or never refreshed)"""
+        conditions = []
+        for field_class in classes:
+            column = FRESHNESS_COLUMNS[field_class]
+            if field_class != PRICE:
+                column = (
+                    f"COALESCE({column}, CASE WHEN data_quality_score > 0 "
+                    f"THEN last_updated END)"
+                )
+            minutes = int(self.ttls[field_class].total_seconds() // 60)
+            if db.is_production:
+                cutoff = f"CURRENT_TIMESTAMP - INTERVAL '{minutes} minutes'"
+            else:
+                cutoff = f"datetime('now', '-{minutes} minutes')"
+            conditions.append(f"{column} IS NULL OR {column} < {cutoff}")
+        return "(" + " OR ".join(f"({c})" for c in conditions) + ")"
+
+
+class RefreshScheduler:
+    """
+    Builds the refresh priority queue and picks right-sized batches.
+
+    Usage:
+        scheduler = RefreshScheduler()
+        plan = scheduler.next_batch()
+        # -> {"field_class": "price", "stocks": [{id, nse_code, ...}], ...}
+    """
+
+    # Priority weights
+    MARKET_CAP_WEIGHT = 0.25  # per decade of market cap in crores
+    HOLDER_WEIGHT = 1.0  # per log(1 + holders)
+    VIEW_WEIGHT = 0.5  # per log(1 + views)
+    EARNINGS_BOOST = 2.0  # results published in the last few days
+    EARNINGS_UPCOMING_BOOST = 0.5  # results due within a week
+
+    MAX_STALENESS = 10.0  # never-refreshed stocks
+
+    def __init__(self, db=None, policy: Optional[FreshnessPolicy] = None):
+        self.db = db or db_config
+        self.policy = policy or FreshnessPolicy()
+        self.batch_sizes = config.REFRESH_BATCH_SIZES
+
+    def select_field_class(self, now: Optional[datetime] = None) -> str:
+        """Prices intraday (and right after the close), fundamentals off-hours"""
+        if MarketHours.is_open(now):
+            return PRICE
+
+        now_utc = MarketHours.now_ist(now).astimezone(timezone.utc).replace(tzinfo=None)
+        closing_window = timedelta(minutes=config.CLOSING_PRICE_WINDOW_MINUTES)
+        if now_utc - MarketHours.last_close_utc(now) < closing_window:
+            return PRICE
+
+        return FUNDAMENTALS
+
+    def _load_candidates(self) -> List[Dict]:
+        """One query: refresh timestamps, size, holders and recent views per stock"""
+        if self.db.is_production:
+            views_since = "CURRENT_DATE - INTERVAL '7 days'"
+        else:
+            views_since = "date('now', '-7 days')"
+
+        query = f"""
+            SELECT s.id, s.nse_code, s.stock_name, s.market_cap, s.data_quality_score,
+                   s.last_updated, s.next_earnings_date,
+                   {", ".join(f"s.{column}" for column in FRESHNESS_COLUMNS.values())},
+                   COALESCE(p.holders, 0) AS holders,
+                   COALESCE(v.views, 0) AS views
+            FROM stocks s
+            LEFT JOIN (
+                -- Holdings are stored by code or by name: resolve each to a stock
+                -- id first (two equi-joins on the LOWER() indexes) so a stock held
+                -- both ways gets one row and every holder counts once
+                SELECT h.stock_id, COUNT(DISTINCT h.user_id) AS holders
+                FROM (
+                    SELECT st.id AS stock_id, up.user_id
+                    FROM user_portfolio up
+                    JOIN stocks st ON LOWER(st.nse_code) = LOWER(up.stock_name)
+                    UNION
+                    SELECT st.id AS stock_id, up.user_id
+                    FROM user_portfolio up
+                    JOIN stocks st ON LOWER(st.stock_name) = LOWER(up.stock_name)
+                ) h
+                GROUP BY h.stock_id
+            ) p ON p.stock_id = s.id
+            LEFT JOIN (
+                SELECT stock_id, SUM(views) AS views
+                FROM stock_views
+                WHERE view_date >= {views_since}
+                GROUP BY stock_id
+            ) v ON v.stock_id = s.id
+            WHERE s.nse_code IS NOT NULL
+              AND COALESCE(s.listing_status, 'active') <> 'delisted'
+        """
+        return self.db.execute_query(query)
+
+    def _staleness(self, row: Dict, field_class: str, now: datetime) -> float:
+        """Price: its own TTL. Fundamentals: the stalest of the enrichment classes"""
+        classes = (PRICE,) if field_class == PRICE else FUNDAMENTAL_CLASSES
+        values = [self.policy.staleness(row, c, now) for c in classes]
+        if any(value is None for value in values):
+            return self.MAX_STALENESS
+        return min(max(values), self.MAX_STALENESS)
+
+    def score(self, row: Dict, field_class: str, now_utc: datetime) -> float:
+        """Priority of refreshing `field_class` for this stock (0 = not due)"""
+        staleness = self._staleness(row, field_class, now_utc)
+
+        if staleness < 1:
+            return 0.0
+
+        weight = 1.0
+
+        market_cap_cr = float(row.get("market_cap") or 0) / 1e7
+        weight += self.MARKET_CAP_WEIGHT * math.log10(1 + market_cap_cr)
+        weight += self.HOLDER_WEIGHT * math.log1p(int(row.get("holders") or 0))
+        weight += self.VIEW_WEIGHT * math.log1p(int(row.get("views") or 0))
+
+        if field_class == FUNDAMENTALS:
+            earnings = _parse_date(row.get("next_earnings_date"))
+            if earnings:
+                days = (earnings - now_utc.date()).days
+                if -3 <= days <= 0:
+                    weight += self.EARNINGS_BOOST
+                elif 0 < days <= 7:
+                    weight += self.EARNINGS_UPCOMING_BOOST
+
+        return staleness * weight
+
+    def build_queue(
+        self, field_class: str, limit: int, now: Optional[datetime] = None
+    ) -> List[Tuple[float, Dict]]:
+        """Top `limit` due stocks for a field class, highest priority first"""
+        now_utc = MarketHours.now_ist(now).astimezone(timezone.utc).replace(tzinfo=None)
+
+        scored = (
+            (self.score(row, field_class, now_utc), row)
+            for row in self._load_candidates()
+        )
+        due = ((score, row) for score, row in scored if score > 0)
+        return heapq.nlargest(limit, due, key=lambda item: item[0])
+
+    def next_batch(
+        self, field_class: Optional[str] = None, now: Optional[datetime] = None
+    ) -> Dict:
+        """
+        Pick the field class for the current time and the batch to refresh.
+
+        Returns:
+            {field_class, market_open, stocks: [{id, nse_code, stock_name}], top_score}
+        """
+        field_class = field_class or self.select_field_class(now)
+        limit = self.batch_sizes[field_class]
+        queue = self.build_queue(field_class, limit, now)
+
+        return {
+            "field_class": field_class,
+            "market_open": MarketHours.is_open(now),
+            "stocks": [
+                {
+                    "id": row["id"],
+                    "nse_code": row["nse_code"],
+                    "stock_name": row["stock_name"],
+                }
+                for _, row in queue
+            ],
+            "top_score": round(queue[0][0], 2) if queue else 0,
+        }
+
+
+class ViewTracker:
+    """
+    Buffered per-day view counter for stock detail pages.
+
+    Views are counted in memory and flushed in one bulk upsert every
+    FLUSH_INTERVAL seconds (background thread, started on the first view) or
+    FLUSH_THRESHOLD views, so a page view never waits on a database write.
+    Whatever is still buffered is flushed when the process exits.
+    """
+
+    FLUSH_INTERVAL = 60
+    FLUSH_THRESHOLD = 100
+
+    def __init__(self, db=None):
+        self.db = db or db_config
+        self._counts: Dict[str, int] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._flusher = None
+
+    def record(self, nse_code: str):
+        with self._lock:
+            self._counts[nse_code] = self._counts.get(nse_code, 0) + 1
+            self._pending += 1
+            due = self._pending >= self.FLUSH_THRESHOLD
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, name="view-flush", daemon=True)
+                self._flusher.start()
+                atexit.register(self.flush)
+        if due:
+            self.flush()
+
+    def _flush_loop(self):
+        while True:
+            time.sleep(self.FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            counts, self._counts = self._counts, {}
+            self._pending = 0
+
+        if not counts:
+            return
+
+        today = date.today().isoformat()
+        try:
+            self.db.execute_many(
+                """
+                INSERT INTO stock_views (stock_id, view_date, views)
+                SELECT id, ?, ? FROM stocks WHERE nse_code = ?
+                ON CONFLICT (stock_id, view_date)
+                DO UPDATE SET views = stock_views.views + excluded.views
+                """,
+                [(today, views, code) for code, views in counts.items()],
+            )
+        except Exception as e:
+            logger.debug(f"Failed to flush stock views: {e}")
+
+
+# Singleton instances
+refresh_scheduler = RefreshScheduler()
+view_tracker = ViewTracker()
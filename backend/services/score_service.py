@@ -1,5 +1,13 @@
 
 import logging
+import os
+import sys
+import time
+from typing import Dict
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 logger = logging.getLogger(__name__)
 
@@ -99,6 +107,7 @@ class ScoreService:
             dy = data.get('dividend_yield_pct') or 0
             if dy > 1: score += 1
             
+            normalized_score = min(int((score / points) * 100), 100)
             return normalized_score
             
         except Exception as e:
@@ -158,3 +167,218 @@ class ScoreService:
         except Exception as e:
             logger.error(f"Error calculating momentum: {e}")
             return 0
+
+
+class BatchScorer:
+    """
+    Vectorized DVM scoring for the whole universe from stored columns.
+
+    Same rules as ScoreService, applied to NumPy column arrays loaded in one
+    query, so changing a weight only needs a rescore, not a re-enrichment.
+    Missing values behave like `or 0` in the per-stock methods.
+
+    Usage:
+        BatchScorer().rescore_universe()
+    """
+
+    COLUMNS = [
+        "roa_annual_pct",
+        "operating_margin_pct",
+        "debt_to_equity",
+        "current_ratio",
+        "net_profit_margin_pct",
+        "eps_growth_pct",
+        "promoter_holding_pct",
+        "roe_annual_pct",
+        "pe_ttm",
+        "peg_ratio",
+        "pb_ratio",
+        "dividend_yield_pct",
+        "rel_strength_score",
+        "year_1_change_pct",
+        "current_price",
+        "week_52_high",
+        "week_52_low",
+    ]
+
+    OUTPUTS = [
+        "durability_score",
+        "valuation_score",
+        "momentum_score",
+        "roce_annual_pct",
+        "earnings_yield_pct",
+    ]
+
+    def __init__(self, db=None):
+        from database.db_config import db_config
+
+        self.db = db or db_config
+
+    # ------------------------------------------------------------------
+    # Scores (arrays in, arrays out)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def durability(c: Dict[str, np.ndarray]) -> np.ndarray:
+        points = 10
+        de = c["debt_to_equity"]
+        score = (
+            (c["roa_annual_pct"] > 0).astype(int)
+            + (c["operating_margin_pct"] > 0)
+            + (c["roa_annual_pct"] > 10)
+            + (de < 1.0)
+            + (de < 0.1)
+            + (c["current_ratio"] > 1.5)
+            + (c["net_profit_margin_pct"] > 10)
+            + (c["eps_growth_pct"] > 0)
+            + (c["promoter_holding_pct"] > 30)
+            + (c["roe_annual_pct"] > 15)
+        )
+        return np.minimum(((score / points) * 100).astype(int), 100)
+
+    @staticmethod
+    def valuation(c: Dict[str, np.ndarray]) -> np.ndarray:
+        points = 5
+        pe, peg, pb = c["pe_ttm"], c["peg_ratio"], c["pb_ratio"]
+        score = (
+            (pe < 15).astype(int)
+            + (pe < 30)
+            + ((peg > 0) & (peg < 1.5))
+            + ((pb > 0) & (pb < 3))
+            + (c["dividend_yield_pct"] > 1)
+        )
+        normalized = np.minimum(((score / points) * 100).astype(int), 100)
+        # Loss making or invalid PE
+        return np.where(pe <= 0, 0, normalized)
+
+    @staticmethod
+    def momentum(c: Dict[str, np.ndarray]) -> np.ndarray:
+        rs = c["rel_strength_score"]
+        y1 = c["year_1_change_pct"] / 100  # stored in %, rules use decimals
+        price, high52, low52 = c["current_price"], c["week_52_high"], c["week_52_low"]
+
+        # 1. Relative Strength (40 pts), falling back to the raw 1Y return
+        fallback = np.select([y1 > 0.5, y1 > 0.2, y1 > 0], [40, 30, 15], default=0)
+        score = np.where(rs != 0, (rs / 100) * 40, fallback)
+
+        # 2. Trend: proximity to the 52-week high (30 pts)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            proximity = np.where((price != 0) & (high52 != 0), price / high52, 0)
+        score = score + np.select(
+            [proximity > 0.95, proximity > 0.85, proximity > 0.75], [30, 20, 10], default=0
+        )
+
+        # 4. Above the 52-week low (10 pts)
+        score = score + np.where((price != 0) & (low52 != 0) & (price > low52 * 1.1), 10, 0)
+
+        return np.clip(score.astype(int), 0, 100)
+
+    @staticmethod
+    def roce_proxy(c: Dict[str, np.ndarray]) -> np.ndarray:
+        # ROE stands in for ROCE until capital employed is stored (same as enrichment)
+        return np.where(c["roe_annual_pct"] != 0, c["roe_annual_pct"], np.nan)
+
+    @staticmethod
+    def earnings_yield(c: Dict[str, np.ndarray]) -> np.ndarray:
+        pe = c["pe_ttm"]
+        with np.errstate(divide="ignore"):
+            return np.where(pe > 0, 100 / pe, 0.0)
+
+    def score_columns(self, c: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        return {
+            "durability_score": self.durability(c),
+            "valuation_score": self.valuation(c),
+            "momentum_score": self.momentum(c),
+            "roce_annual_pct": self.roce_proxy(c),
+            "earnings_yield_pct": self.earnings_yield(c),
+        }
+
+    # ------------------------------------------------------------------
+    # Load / write
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        rows = self.db.execute_query(
+            f"""
+            SELECT s.id, {", ".join(f"s.{col}" for col in self.COLUMNS if not col.startswith("week_52"))},
+                   m.week_52_high, m.week_52_low,
+                   {", ".join(f"s.{col} AS current_{col}" for col in self.OUTPUTS)}
+            FROM stocks s
+            LEFT JOIN stock_metadata m ON m.stock_id = s.id
+            """
+        )
+        ids = np.array([row["id"] for row in rows], dtype=int)
+
+        def column(name):
+            return np.array(
+                [np.nan if row[name] is None else float(row[name]) for row in rows],
+                dtype=float,
+            )
+
+        inputs = {name: np.nan_to_num(column(name), nan=0.0) for name in self.COLUMNS}
+        current = {name: column(f"current_{name}") for name in self.OUTPUTS}
+        return ids, inputs, current
+
+    def rescore_universe(self) -> Dict:
+        """
+        Recompute all scores from stored columns and write back changed rows.
+
+        Returns:
+            Dict with scored, updated and duration_seconds
+        """
+        start = time.time()
+        ids, inputs, current = self._load()
+        if ids.size == 0:
+            return {"scored": 0, "updated": 0, "duration_seconds": 0}
+
+        scores = self.score_columns(inputs)
+
+        # Only rows where some output changed (NaN == NaN counts as unchanged)
+        changed = np.zeros(ids.size, dtype=bool)
+        for name in self.OUTPUTS:
+            new, old = scores[name].astype(float), current[name]
+            same = np.isclose(new, old, atol=0.005, equal_nan=True)
+            changed |= ~same
+
+        def value(array, i):
+            v = array[i]
+            return None if np.isnan(v) else round(float(v), 2)
+
+        rows = [
+            (
+                int(scores["durability_score"][i]),
+                int(scores["valuation_score"][i]),
+                int(scores["momentum_score"][i]),
+                value(scores["roce_annual_pct"], i),
+                value(scores["earnings_yield_pct"], i),
+                int(ids[i]),
+            )
+            for i in np.flatnonzero(changed)
+        ]
+
+        if rows:
+            self.db.execute_many(
+                """
+                UPDATE stocks
+                SET durability_score = ?,
+                    valuation_score = ?,
+                    momentum_score = ?,
+                    roce_annual_pct = ?,
+                    earnings_yield_pct = ?
+                WHERE id = ?
+                """,
+                rows,
+            )
+
+        elapsed = time.time() - start
+        logger.info(f"✅ Rescored {ids.size} stocks ({len(rows)} changed) in {elapsed:.3f}s")
+        return {
+            "scored": int(ids.size),
+            "updated": len(rows),
+            "duration_seconds": round(elapsed, 3),
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(BatchScorer().rescore_universe())
@@ -13,7 +13,9 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import logging
 from typing import Any, Dict, List, Optional
 
+from config import config
 from database.db_config import db_config
+from services.tiered_cache import TieredCache
 
 logger = logging.getLogger(__name__)
 
@@ -78,6 +80,8 @@ class DatabaseScreener:
         "ROCE Annual %": "roce_annual_pct",
         "Earnings Yield %": "earnings_yield_pct",
         "Relative Strength": "rel_strength_score",
+        "Sector Relative Strength": "sector_rel_strength_score",
+        "6M Change %": "half_year_change_pct",
     }
 
     # Operator mapping to SQL
@@ -96,6 +100,15 @@ class DatabaseScreener:
 
     def __init__(self):
         self.db = db_config
+        # Materialized preset results, shared across processes via Redis.
+        # Redis only: refreshes invalidate from the Celery worker, and a local
+        # copy in the web process would outlive that until its TTL.
+        self.preset_cache = TieredCache(
+            namespace="presets",
+            ttl=config.PRESET_CACHE_TTL_MINUTES * 60,
+            max_entries=64,
+            local_tier=False,
+        )
 
     def _map_field(self, field: str) -> Optional[str]:
         """Map user-friendly field name to database column"""
@@ -279,7 +292,55 @@ class DatabaseScreener:
             }
 
     def apply_preset(self, preset_name: str) -> Dict:
-        """Apply a preset screening strategy"""
+        """
+        Apply a preset screening strategy.
+
+        Served from the materialized copy if present; otherwise the screen runs
+        and its result is stored until the next data refresh invalidates it.
+        """
+        cached, state = self.preset_cache.get(preset_name)
+        if state is not None:
+            return cached
+
+        result = self._run_preset(preset_name)
+        if "error" not in result["metadata"]:
+            self.preset_cache.set(preset_name, result)
+        return result
+
+    def invalidate_presets(self):
+        """
+        Drop the materialized presets for every process.
+        Call after bulk writes to the screened columns (prices, technicals).
+        """
+        from services.screener_service import ScreenerPresets
+
+        for preset_name in ScreenerPresets.all_presets():
+            self.preset_cache.delete(preset_name)
+        logger.info("Preset cache invalidated")
+
+    def materialize_presets(self) -> Dict[str, int]:
+        """
+        Precompute every preset into the shared cache.
+        Run once after enrichment so preset requests don't re-run the screens.
+
+        Returns:
+            Dict of preset name -> number of matches
+        """
+        from services.screener_service import ScreenerPresets
+
+        counts = {}
+        for preset_name in ScreenerPresets.all_presets():
+            result = self._run_preset(preset_name)
+            if "error" in result["metadata"]:
+                logger.warning(f"Preset {preset_name} not materialized: {result['metadata']['error']}")
+                continue
+            self.preset_cache.set(preset_name, result)
+            counts[preset_name] = result["metadata"].get("total_matches", 0)
+
+        logger.info(f"✅ Materialized {len(counts)} presets")
+        return counts
+
+    def _run_preset(self, preset_name: str) -> Dict:
         from services.screener_service import ScreenerPresets
 
         presets = ScreenerPresets.all_presets()
@@ -392,6 +453,7 @@ class DatabaseScreener:
                     "day_change_pct",
                     "month_change_pct",
                     "qtr_change_pct",
+                    "half_year_change_pct",
                     "year_1_change_pct",
                 ],
                 "Dividend": ["dividend_yield_pct"],
@@ -0,0 +1,139 @@
+"""
+Persistent shareholding snapshots keyed by (symbol, quarter).
+
+Shareholding patterns are filed once a quarter (within 21 days of the quarter
+end), so once the latest filed quarter is stored every further request in
+that quarter is a local lookup instead of a MoneyControl page fetch.
+
+Quarters are labelled by their end month: "2024-09" is the Jul-Sep quarter.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+import re
+from datetime import date, datetime, timedelta
+from typing import Dict, Optional
+
+from config import config
+from database.db_config import db_config
+
+logger = logging.getLogger(__name__)
+
+HOLDING_FIELDS = (
+    "promoter_holding_pct",
+    "fii_holding_pct",
+    "dii_holding_pct",
+    "public_holding_pct",
+)
+
+FILING_DEADLINE_DAYS = 21  # SEBI LODR Reg. 31: within 21 days of quarter end
+
+_MONTHS = {"mar": 3, "jun": 6, "sep": 9, "dec": 12}
+_QUARTER_LABEL = re.compile(r"\b(mar|jun|sep|dec)[a-z]*[\s'\-]*(\d{4}|\d{2})\b", re.IGNORECASE)
+
+
+def quarter_end(year: int, month: int) -> date:
+    """Last day of a quarter ending in `month` (3, 6, 9 or 12)"""
+    if month == 12:
+        return date(year, 12, 31)
+    return date(year, month + 1, 1) - timedelta(days=1)
+
+
+def expected_quarter(today: Optional[date] = None) -> str:
+    """Most recent quarter whose shareholding filing deadline has passed"""
+    today = today or date.today()
+    year, month = today.year, (today.month - 1) // 3 * 3  # end month of the previous quarter
+    if month == 0:
+        year, month = year - 1, 12
+    while quarter_end(year, month) + timedelta(days=FILING_DEADLINE_DAYS) > today:
+        month -= 3
+        if month == 0:
+            year, month = year - 1, 12
+    return f"{year:04d}-{month:02d}"
+
+
+def parse_quarter(text: str) -> Optional[str]:
+    """'Sep 2024' / "Sep '24" / 'September-24' -> '2024-09' (None if no quarter found)"""
+    match = _QUARTER_LABEL.search(text or "")
+    if not match:
+        return None
+    year = int(match.group(2))
+    if year < 100:
+        year += 2000
+    return f"{year:04d}-{_MONTHS[match.group(1)[:3].lower()]:02d}"
+
+
+class ShareholdingStore:
+    """Read/write shareholding snapshots"""
+
+    def __init__(self, db=None):
+        self.db = db or db_config
+
+    def get_latest(self, symbol: str) -> Optional[Dict]:
+        """Latest stored quarter for a symbol, with its fetch time"""
+        try:
+            return self.db.execute_query(
+                f"""
+                SELECT symbol, quarter, {", ".join(HOLDING_FIELDS)}, fetched_at
+                FROM shareholding_snapshots
+                WHERE symbol = ?
+                ORDER BY quarter DESC
+                LIMIT 1
+                """,
+                (symbol.upper(),),
+                fetch_one=True,
+            )
+        except Exception as e:
+            logger.debug(f"Shareholding snapshot lookup failed for {symbol}: {e}")
+            return None
+
+    def get_fresh(self, symbol: str, today: Optional[date] = None) -> Optional[Dict]:
+        """
+        Stored snapshot if no newer filing can exist yet.
+
+        A snapshot is fresh when it covers the expected quarter, or when it was
+        fetched within SHAREHOLDING_RECHECK_HOURS (a late filer is re-checked
+        at most that often instead of on every call).
+        """
+        snapshot = self.get_latest(symbol)
+        if not snapshot:
+            return None
+
+        if snapshot["quarter"] >= expected_quarter(today):
+            return snapshot
+
+        fetched_at = snapshot.get("fetched_at")
+        if isinstance(fetched_at, str):
+            try:
+                fetched_at = datetime.fromisoformat(fetched_at)
+            except ValueError:
+                fetched_at = None
+        recheck = timedelta(hours=config.SHAREHOLDING_RECHECK_HOURS)
+        if fetched_at and datetime.utcnow() - fetched_at.replace(tzinfo=None) < recheck:
+            return snapshot
+        return None
+
+    def save(self, symbol: str, quarter: str, data: Dict, source: str = "MoneyControl"):
+        try:
+            self.db.execute_query(
+                f"""
+                INSERT INTO shareholding_snapshots
+                    (symbol, quarter, {", ".join(HOLDING_FIELDS)}, source, fetched_at)
+                VALUES (?, ?, {", ".join("?" for _ in HOLDING_FIELDS)}, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT (symbol, quarter) DO UPDATE SET
+                    {", ".join(f"{field} = excluded.{field}" for field in HOLDING_FIELDS)},
+                    source = excluded.source,
+                    fetched_at = excluded.fetched_at
+                """,
+                (symbol.upper(), quarter, *(data.get(field) for field in HOLDING_FIELDS), source),
+            )
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to store shareholding for {symbol} ({quarter}): {e}")
+
+
+# Singleton instance
+shareholding_store = ShareholdingStore()
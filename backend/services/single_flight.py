@@ -0,0 +1,206 @@
+"""
+Single-flight execution: concurrent calls for the same key share one run.
+
+Layers:
+1. In-process - the first caller runs the function, concurrent callers for
+   the same key wait on its future and get the same result (or exception)
+2. Redis (shared) - the running process holds a short lease on the key;
+   another process asking for the same key waits for the result published
+   by the lease holder instead of running the function itself
+
+Redis is optional. Without REDIS_URL, or while Redis is unreachable, only the
+in-process layer applies. A waiter whose leader dies (lease expired, no
+result) runs the function itself.
+
+Usage:
+    flight = SingleFlight(namespace="msds")
+    data = flight.do("RELIANCE", lambda: expensive_fetch("RELIANCE"))
+"""
+
+import json
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from services.tiered_cache import _json_default, get_redis_url
+
+logger = logging.getLogger(__name__)
+
+# Delete the lease only if we still hold it
+_RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent calls per key, in-process and across processes.
+    """
+
+    # After a Redis error, skip the shared layer for this many seconds
+    REDIS_RETRY_SECONDS = 30
+    POLL_MIN_SECONDS = 0.05
+    POLL_MAX_SECONDS = 0.5
+
+    def __init__(
+        self,
+        namespace: str,
+        lease_seconds: float = 60,
+        result_seconds: float = 30,
+        redis_url: Optional[str] = None,
+        use_redis: bool = True,
+    ):
+        self.namespace = namespace
+        self.lease_seconds = lease_seconds
+        self.result_seconds = result_seconds
+
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        self._redis_url = (redis_url or get_redis_url()) if use_redis else None
+        self._redis = None
+        self._redis_disabled_until = 0.0
+
+        self.stats = {"runs": 0, "shared": 0, "remote_shared": 0}
+
+    # ------------------------------------------------------------------
+    # Redis layer
+    # ------------------------------------------------------------------
+
+    def _get_redis(self):
+        if not self._redis_url or time.time() < self._redis_disabled_until:
+            return None
+
+        if self._redis is None:
+            try:
+                import redis
+
+                self._redis = redis.Redis.from_url(
+                    self._redis_url,
+                    socket_timeout=0.5,
+                    socket_connect_timeout=0.5,
+                )
+            except Exception as e:
+                logger.warning(f"Redis single-flight layer unavailable: {e}")
+                self._disable_redis()
+                return None
+
+        return self._redis
+
+    def _disable_redis(self):
+        self._redis = None
+        self._redis_disabled_until = time.time() + self.REDIS_RETRY_SECONDS
+
+    def _lease_key(self, key: str) -> str:
+        return f"klyx:sf:{self.namespace}:{key}"
+
+    def _result_key(self, key: str) -> str:
+        return f"klyx:sf:{self.namespace}:{key}:result"
+
+    def _acquire(self, client, key: str) -> Optional[str]:
+        """Lease token if we got the lease, None if another process holds it"""
+        token = uuid.uuid4().hex
+        acquired = client.set(
+            self._lease_key(key), token, nx=True, px=int(self.lease_seconds * 1000)
+        )
+        return token if acquired else None
+
+    def _wait_for_result(self, client, key: str) -> tuple:
+        """
+        Wait while another process holds the lease.
+
+        Returns:
+            (True, value) once it publishes a result, (False, None) if the
+            lease is gone without one (leader died or failed)
+        """
+        deadline = time.time() + self.lease_seconds
+        delay = self.POLL_MIN_SECONDS
+        while time.time() < deadline:
+            raw = client.get(self._result_key(key))
+            if raw is not None:
+                return True, json.loads(raw)
+            if not client.exists(self._lease_key(key)):
+                # Released between the two reads: the result may have landed
+                raw = client.get(self._result_key(key))
+                return (True, json.loads(raw)) if raw is not None else (False, None)
+            time.sleep(delay)
+            delay = min(delay * 2, self.POLL_MAX_SECONDS)
+        return False, None
+
+    def _run_shared(self, key: str, fn: Callable[[], Any]) -> Any:
+        """Run fn under the Redis lease, or reuse the lease holder's result"""
+        client = self._get_redis()
+        if client is None:
+            return fn()
+
+        try:
+            token = self._acquire(client, key)
+            if token is None:
+                found, value = self._wait_for_result(client, key)
+                if found:
+                    self.stats["remote_shared"] += 1
+                    return value
+                token = self._acquire(client, key)
+        except Exception as e:
+            logger.debug(f"Redis single-flight failed for {key}: {e}")
+            self._disable_redis()
+            return fn()
+
+        try:
+            value = fn()
+            if value is not None:
+                try:
+                    client.set(
+                        self._result_key(key),
+                        json.dumps(value, default=_json_default),
+                        ex=max(1, int(self.result_seconds)),
+                    )
+                except Exception as e:
+                    logger.debug(f"Redis single-flight publish failed for {key}: {e}")
+            return value
+        finally:
+            if token is not None:
+                try:
+                    client.eval(_RELEASE_SCRIPT, 1, self._lease_key(key), token)
+                except Exception as e:
+                    logger.debug(f"Redis single-flight release failed for {key}: {e}")
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def do(self, key: str, fn: Callable[[], Any]) -> Any:
+        """
+        Run fn() once for all concurrent callers of `key`.
+
+        The value must be JSON-serializable to be shared across processes;
+        results shared that way come back as JSON types (tuples become lists).
+        """
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+
+        if not leader:
+            self.stats["shared"] += 1
+            return future.result()
+
+        try:
+            self.stats["runs"] += 1
+            value = self._run_shared(key, fn)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
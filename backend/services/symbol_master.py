@@ -0,0 +1,463 @@
+"""
+Persistent symbol master: one row per listed company with all its identifiers.
+
+Maps NSE code, BSE code, ISIN, yfinance ticker and MoneyControl ID/URL, plus
+name aliases ("Reliance Industries Ltd." -> RELIANCE). Replaces per-process
+lookups (MarketDataService.details_cache, hardcoded ticker maps) with a shared
+table, so a new worker does not re-resolve everything over the network.
+
+Resolution is local-first:
+1. `resolve_many(names)` batch-resolves against in-memory indexes built from
+   the table (one query, reloaded every RELOAD_SECONDS)
+2. True misses are queued in `symbol_lookup_queue`
+3. `process_lookup_queue()` (Celery beat) resolves queued names with the
+   MoneyControl search and learns the result as a new alias
+
+Usage:
+    from services.symbol_master import symbol_master
+    resolved = symbol_master.resolve_many(["RELIANCE", "Infosys Ltd.", "INE009A01021"])
+    # -> {"RELIANCE": {...}, "Infosys Ltd.": {...}, "INE009A01021": {...}}
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+import re
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+from database.db_config import db_config
+
+logger = logging.getLogger(__name__)
+
+ISIN_PATTERN = re.compile(r"^IN[A-Z0-9]{9}[0-9]$")
+BSE_CODE_PATTERN = re.compile(r"^[0-9]{6}$")
+
+# Corporate suffixes dropped when normalizing names into aliases
+_NAME_NOISE = re.compile(r"\b(LTD|LIMITED|THE|CO|INC|CORP|CORPORATION|PVT|PRIVATE)\b")
+
+IDENTIFIER_FIELDS = ("isin", "nse_code", "bse_code", "yf_ticker", "mc_id", "mc_url", "company_name")
+
+
+def normalize_alias(name: str) -> str:
+    """'Reliance Industries Ltd.' -> 'RELIANCE INDUSTRIES'"""
+    text = str(name).upper().replace("&", " AND ")
+    text = re.sub(r"\.(NS|BO)$", "", text.strip())
+    text = re.sub(r"[^A-Z0-9 ]", " ", text)
+    text = _NAME_NOISE.sub(" ", text)
+    return " ".join(text.split())
+
+
+class SymbolMaster:
+    """
+    Symbol master table + in-memory indexes + miss queue.
+    """
+
+    RELOAD_SECONDS = 600
+    MAX_LOOKUP_ATTEMPTS = 3
+
+    def __init__(self, db=None):
+        self.db = db or db_config
+        self._lock = threading.Lock()
+        self._loaded_at = 0.0
+        self._records: Dict[int, Dict] = {}
+        self._by_isin: Dict[str, int] = {}
+        self._by_nse: Dict[str, int] = {}
+        self._by_bse: Dict[str, int] = {}
+        self._by_yf: Dict[str, int] = {}
+        self._by_alias: Dict[str, int] = {}
+
+    # ------------------------------------------------------------------
+    # Indexes
+    # ------------------------------------------------------------------
+
+    def _ensure_loaded(self):
+        if time.time() - self._loaded_at < self.RELOAD_SECONDS:
+            return
+        self.reload()
+
+    def reload(self):
+        """Rebuild the in-memory indexes from the table (seeding it from stocks if empty)"""
+        # Mark as loaded first: seeding goes through upsert(), which checks freshness
+        self._loaded_at = time.time()
+        rows = self.db.execute_query(
+            f"SELECT id, {', '.join(IDENTIFIER_FIELDS)} FROM symbol_master"
+        )
+        if not rows:
+            seeded = self.sync_from_stocks(reload=False)
+            if seeded:
+                rows = self.db.execute_query(
+                    f"SELECT id, {', '.join(IDENTIFIER_FIELDS)} FROM symbol_master"
+                )
+        aliases = self.db.execute_query("SELECT alias, symbol_id FROM symbol_aliases")
+
+        records = {row["id"]: dict(row) for row in rows}
+        by_isin, by_nse, by_bse, by_yf = {}, {}, {}, {}
+        for symbol_id, record in records.items():
+            for index, field in (
+                (by_isin, "isin"),
+                (by_nse, "nse_code"),
+                (by_bse, "bse_code"),
+                (by_yf, "yf_ticker"),
+            ):
+                if record.get(field):
+                    index[str(record[field]).upper()] = symbol_id
+
+        by_alias = {row["alias"]: row["symbol_id"] for row in aliases}
+
+        with self._lock:
+            self._records = records
+            self._by_isin, self._by_nse, self._by_bse, self._by_yf = by_isin, by_nse, by_bse, by_yf
+            self._by_alias = by_alias
+
+        logger.info(f"Symbol master loaded: {len(records)} symbols, {len(by_alias)} aliases")
+
+    def _lookup_id(self, query: str) -> Optional[int]:
+        raw = str(query).strip()
+        code = raw.upper()
+        if not code:
+            return None
+
+        if ISIN_PATTERN.match(code):
+            return self._by_isin.get(code)
+        if code.endswith(".BO"):
+            return self._by_bse.get(code[:-3]) or self._by_nse.get(code[:-3])
+        if code.endswith(".NS"):
+            return self._by_nse.get(code[:-3])
+        if BSE_CODE_PATTERN.match(code):
+            return self._by_bse.get(code)
+
+        symbol_id = self._by_nse.get(code) or self._by_yf.get(code)
+        if symbol_id is None:
+            symbol_id = self._by_alias.get(normalize_alias(raw))
+        return symbol_id
+
+    # ------------------------------------------------------------------
+    # Resolution
+    # ------------------------------------------------------------------
+
+    def resolve(self, query: str, queue_miss: bool = True) -> Optional[Dict]:
+        return self.resolve_many([query], queue_misses=queue_miss).get(query)
+
+    def resolve_many(self, queries: Iterable[str], queue_misses: bool = True) -> Dict[str, Optional[Dict]]:
+        """
+        Resolve many names/codes against the local indexes.
+
+        Args:
+            queries: NSE/BSE codes, ISINs, yfinance tickers or company names
+            queue_misses: Queue unresolved queries for a network lookup
+
+        Returns:
+            Dict of query -> symbol record (or None when unresolved)
+        """
+        self._ensure_loaded()
+
+        results = {}
+        misses = []
+        with self._lock:
+            for query in queries:
+                if query in results:
+                    continue
+                symbol_id = self._lookup_id(query)
+                if symbol_id is None:
+                    results[query] = None
+                    misses.append(query)
+                else:
+                    results[query] = dict(self._records[symbol_id])
+
+        if misses and queue_misses:
+            self.queue_lookups(misses)
+
+        return results
+
+    def get_moneycontrol(self, symbol: str) -> Optional[Dict]:
+        """Stored MoneyControl details for a symbol ({id, url, name}) or None"""
+        record = self.resolve(symbol, queue_miss=False)
+        if record and record.get("mc_url"):
+            return {
+                "id": record["mc_id"],
+                "url": record["mc_url"],
+                "name": record["company_name"],
+            }
+        return None
+
+    # ------------------------------------------------------------------
+    # Writes
+    # ------------------------------------------------------------------
+
+    def upsert(self, records: List[Dict], aliases: Optional[Dict[str, List[str]]] = None, reload: bool = True) -> Dict:
+        """
+        Bulk insert/update symbol records.
+
+        Records are matched to existing rows by ISIN, then NSE code, then BSE
+        code. Provided identifiers overwrite stored ones; missing ones are kept.
+        Every record's company name and codes are also registered as aliases.
+
+        Args:
+            records: Dicts with any of IDENTIFIER_FIELDS
+            aliases: Extra aliases per record key (isin or nse_code or bse_code)
+            reload: Rebuild the indexes afterwards
+
+        Returns:
+            Dict with inserted and updated counts, and failed (records
+            skipped because they conflict with another row)
+        """
+        self._ensure_loaded()
+        aliases = aliases or {}
+
+        inserts, updates = [], []
+        new_keys: Dict[str, Dict] = {}  # identifiers of records inserted by this call
+        with self._lock:
+            for record in records:
+                clean = {
+                    field: (str(record[field]).strip() if record.get(field) not in (None, "") else None)
+                    for field in IDENTIFIER_FIELDS
+                }
+                for field in ("isin", "nse_code", "bse_code", "yf_ticker"):
+                    if clean[field]:
+                        clean[field] = clean[field].upper()
+                if clean["nse_code"] and not clean["yf_ticker"]:
+                    clean["yf_ticker"] = f"{clean['nse_code']}.NS"
+
+                symbol_id = (
+                    (clean["isin"] and self._by_isin.get(clean["isin"]))
+                    or (clean["nse_code"] and self._by_nse.get(clean["nse_code"]))
+                    or (clean["bse_code"] and self._by_bse.get(clean["bse_code"]))
+                    or None
+                )
+                if symbol_id is None:
+                    keys = [f"{f}:{clean[f]}" for f in ("isin", "nse_code", "bse_code") if clean[f]]
+                    duplicate = next((new_keys[k] for k in keys if k in new_keys), None)
+                    if duplicate is not None:
+                        # Same company twice in one batch: merge into the pending insert
+                        for field in IDENTIFIER_FIELDS:
+                            duplicate[field] = duplicate[field] or clean[field]
+                        clean = duplicate
+                    else:
+                        inserts.append(clean)
+                    for field in ("isin", "nse_code", "bse_code"):
+                        if clean[field]:
+                            new_keys[f"{field}:{clean[field]}"] = clean
+                else:
+                    updates.append((clean, symbol_id))
+
+        failed = 0
+        if updates:
+            failed += self._write_rows(
+                f"""
+                UPDATE symbol_master
+                SET {", ".join(f"{field} = COALESCE(?, {field})" for field in IDENTIFIER_FIELDS)},
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+                """,
+                [tuple(clean[field] for field in IDENTIFIER_FIELDS) + (symbol_id,) for clean, symbol_id in updates],
+                "update",
+            )
+        if inserts:
+            # Another process may have added the code since the indexes were loaded
+            failed += self._write_rows(
+                f"""
+                INSERT INTO symbol_master ({", ".join(IDENTIFIER_FIELDS)}, updated_at)
+                VALUES ({", ".join("?" for _ in IDENTIFIER_FIELDS)}, CURRENT_TIMESTAMP)
+                ON CONFLICT (nse_code) DO UPDATE SET
+                    {", ".join(
+                        f"{field} = COALESCE(excluded.{field}, symbol_master.{field})"
+                        for field in IDENTIFIER_FIELDS if field != "nse_code"
+                    )},
+                    updated_at = CURRENT_TIMESTAMP
+                """,
+                [tuple(clean[field] for field in IDENTIFIER_FIELDS) for clean in inserts],
+                "insert",
+            )
+
+        self._write_aliases([clean for clean in inserts] + [clean for clean, _ in updates], aliases)
+
+        if reload:
+            self.reload()
+        return {"inserted": len(inserts), "updated": len(updates), "failed": failed}
+
+    def _write_rows(self, query: str, rows: List[tuple], action: str) -> int:
+        """
+        Run a batch write; if it fails (e.g. a record that would take another
+        row's unique ISIN / NSE code), redo it row by row and skip the rows
+        that still fail, so one bad record does not drop the whole batch.
+
+        Returns:
+            Number of rows skipped
+        """
+        try:
+            self.db.execute_many(query, rows)
+            return 0
+        except Exception as e:
+            logger.warning(f"⚠️ Symbol master {action} batch failed, retrying row by row: {e}")
+
+        failed = 0
+        for row in rows:
+            try:
+                self.db.execute_query(query, row)
+            except Exception as e:
+                failed += 1
+                logger.error(f"❌ Symbol master {action} skipped for {[v for v in row[:3] if v]}: {e}")
+        if failed:
+            logger.warning(f"⚠️ Symbol master {action}: {failed} of {len(rows)} records skipped")
+        return failed
+
+    def _write_aliases(self, records: List[Dict], extra: Dict[str, List[str]]):
+        """Register names and codes as aliases (first writer wins)"""
+        rows = []
+        for record in records:
+            key = record["isin"] or record["nse_code"] or record["bse_code"]
+            names = [record["company_name"], record["nse_code"]] + list(extra.get(key, []))
+            for name in names:
+                if name:
+                    alias = normalize_alias(name)
+                    if alias:
+                        rows.append((alias, record["isin"], record["nse_code"], record["bse_code"]))
+
+        if not rows:
+            return
+
+        # Resolve the owning row in SQL so freshly inserted records get their aliases too
+        self.db.execute_many(
+            """
+            INSERT INTO symbol_aliases (alias, symbol_id)
+            SELECT ?, id FROM symbol_master
+            WHERE id = (
+                SELECT MIN(id) FROM symbol_master
+                WHERE isin = ? OR nse_code = ? OR bse_code = ?
+            )
+            ON CONFLICT (alias) DO NOTHING
+            """,
+            rows,
+        )
+
+    def sync_from_stocks(self, reload: bool = True) -> int:
+        """Seed / refresh the master from the stocks table"""
+        stocks = self.db.execute_query(
+            "SELECT stock_name, nse_code, bse_code, isin FROM stocks WHERE nse_code IS NOT NULL"
+        )
+        if not stocks:
+            return 0
+        self.upsert(
+            [
+                {
+                    "company_name": s["stock_name"],
+                    "nse_code": s["nse_code"],
+                    "bse_code": s["bse_code"],
+                    "isin": s["isin"],
+                }
+                for s in stocks
+            ],
+            reload=reload,
+        )
+        return len(stocks)
+
+    def set_moneycontrol(self, symbol: str, mc_id, mc_url: str, name: Optional[str] = None):
+        """Persist MoneyControl details resolved over the network"""
+        record = self.resolve(symbol, queue_miss=False)
+        if record:
+            key = {"isin": record["isin"], "nse_code": record["nse_code"], "bse_code": record["bse_code"]}
+        else:
+            key = {"nse_code": str(symbol).split(".")[0]}
+        self.upsert(
+            [{**key, "mc_id": mc_id, "mc_url": mc_url, "company_name": name}],
+            aliases={key.get("isin") or key.get("nse_code") or key.get("bse_code"): [symbol]},
+        )
+
+    # ------------------------------------------------------------------
+    # Miss queue
+    # ------------------------------------------------------------------
+
+    def queue_lookups(self, queries: List[str]):
+        rows = [(normalize_alias(q), str(q).strip()) for q in queries if normalize_alias(q)]
+        if not rows:
+            return
+        try:
+            self.db.execute_many(
+                """
+                INSERT INTO symbol_lookup_queue (query, raw_query, status, attempts, requested_at)
+                VALUES (?, ?, 'pending', 0, CURRENT_TIMESTAMP)
+                ON CONFLICT (query) DO NOTHING
+                """,
+                rows,
+            )
+        except Exception as e:
+            logger.debug(f"Could not queue symbol lookups: {e}")
+
+    def process_lookup_queue(self, limit: int = 50) -> Dict:
+        """
+        Resolve queued misses with the MoneyControl search and learn the results.
+
+        Returns:
+            Dict with resolved, not_found and remaining counts
+        """
+        from services.market_data_service import market_data_service
+
+        pending = self.db.execute_query(
+            """
+            SELECT query, raw_query, attempts FROM symbol_lookup_queue
+            WHERE status = 'pending'
+            ORDER BY requested_at
+            LIMIT ?
+            """,
+            (limit,),
+        )
+
+        resolved, not_found = 0, 0
+        for item in pending:
+            record = None
+            # May have been learned since it was queued
+            if self.resolve(item["raw_query"], queue_miss=False):
+                status = "resolved"
+            else:
+                candidates = market_data_service.search_candidates(item["raw_query"])
+                for candidate in candidates:
+                    if candidate.get("nse_code") or candidate.get("isin"):
+                        record = {
+                            "isin": candidate.get("isin"),
+                            "nse_code": candidate.get("nse_code"),
+                            "bse_code": candidate.get("bse_code"),
+                            "company_name": candidate.get("name"),
+                        }
+                        break
+
+                if record:
+                    key = record["isin"] or record["nse_code"] or record["bse_code"]
+                    self.upsert([record], aliases={key: [item["raw_query"]]})
+                    status = "resolved"
+                elif item["attempts"] + 1 >= self.MAX_LOOKUP_ATTEMPTS:
+                    status = "not_found"
+                else:
+                    status = "pending"
+
+            self.db.execute_query(
+                """
+                UPDATE symbol_lookup_queue
+                SET status = ?, attempts = attempts + 1, last_attempt_at = CURRENT_TIMESTAMP
+                WHERE query = ?
+                """,
+                (status, item["query"]),
+            )
+            if status == "resolved":
+                resolved += 1
+            elif status == "not_found":
+                not_found += 1
+
+        remaining = self.db.execute_query(
+            "SELECT COUNT(*) AS n FROM symbol_lookup_queue WHERE status = 'pending'",
+            fetch_one=True,
+        )
+        logger.info(f"Symbol lookups: {resolved} resolved, {not_found} not found")
+        return {
+            "resolved": resolved,
+            "not_found": not_found,
+            "remaining": int(remaining["n"]) if remaining else 0,
+        }
+
+
+# Singleton instance
+symbol_master = SymbolMaster()
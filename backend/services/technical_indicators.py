@@ -0,0 +1,281 @@
+"""
+Universe-wide technical indicators from stored daily bars.
+
+The stocks table has rsi, macd, adx, beta_1yr, sma_50, sma_200 and ema_20
+columns that no data source fills, so the trend / RSI presets filtered on
+empty data. This batch loads one (days x stocks) panel per bar field from
+daily_prices (see services/price_history.py), computes every indicator for
+all stocks at once with NumPy - recursive smoothers step through the days,
+each step covering every stock - and bulk-writes the latest values.
+
+Prices are adjusted for splits and dividends (adj_close / close), so
+averages stay comparable with the current price across corporate actions.
+
+Indicators (latest value per stock):
+- sma_50, sma_200: simple moving averages of the close
+- ema_20: exponential moving average of the close
+- rsi: 14-day RSI with Wilder smoothing
+- macd: EMA(12) - EMA(26) of the close
+- adx: 14-day average directional index (Wilder)
+- beta_1yr: beta of daily returns versus NIFTY
+
+Runs after the daily price refresh (RefreshJob), from /worker/technicals
+and as the tasks.compute_technicals Celery task.
+
+Usage:
+    from services.technical_indicators import TechnicalIndicatorBatch
+    TechnicalIndicatorBatch().run()
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from config import config
+from database.db_config import db_config
+
+logger = logging.getLogger(__name__)
+
+RSI_PERIOD = 14
+ADX_PERIOD = 14
+MACD_FAST, MACD_SLOW = 12, 26
+MIN_BETA_OBSERVATIONS = 60  # Daily returns shared with the index
+
+
+def ewm(values: np.ndarray, alpha: float, min_periods: int = 1) -> np.ndarray:
+    """
+    Exponentially weighted mean down each column (pandas ewm(adjust=False)).
+
+    Starts at a column's first value; NaN days carry the previous mean.
+    Rows before `min_periods` values were seen are NaN.
+    """
+    out = np.empty_like(values)
+    current = np.full(values.shape[1], np.nan)
+    for t, row in enumerate(values):
+        blended = alpha * row + (1 - alpha) * current
+        current = np.where(np.isnan(current), row, np.where(np.isnan(row), current, blended))
+        out[t] = current
+    seen = np.cumsum(np.isfinite(values), axis=0)
+    out[seen < min_periods] = np.nan
+    return out
+
+
+def last_sma(values: np.ndarray, window: int) -> np.ndarray:
+    """Latest `window`-day mean per column (NaN unless all of the window is present)"""
+    if len(values) < window:
+        return np.full(values.shape[1], np.nan)
+    recent = values[-window:]
+    return np.where(np.isfinite(recent).all(axis=0), recent.mean(axis=0), np.nan)
+
+
+def rsi(close: np.ndarray, period: int = RSI_PERIOD) -> np.ndarray:
+    """Latest RSI per column (Wilder smoothing of gains and losses)"""
+    change = np.diff(close, axis=0)
+    gain = ewm(np.where(change > 0, change, np.where(np.isnan(change), np.nan, 0.0)), 1 / period, period)[-1]
+    loss = ewm(np.where(change < 0, -change, np.where(np.isnan(change), np.nan, 0.0)), 1 / period, period)[-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(loss == 0, np.where(gain > 0, 100.0, 50.0), 100 - 100 / (1 + gain / loss))
+
+
+def macd(close: np.ndarray) -> np.ndarray:
+    """Latest MACD line per column: EMA(12) - EMA(26)"""
+    fast = ewm(close, 2 / (MACD_FAST + 1), MACD_FAST)[-1]
+    slow = ewm(close, 2 / (MACD_SLOW + 1), MACD_SLOW)[-1]
+    return fast - slow
+
+
+def adx(high: np.ndarray, low: np.ndarray, close: np.ndarray, period: int = ADX_PERIOD) -> np.ndarray:
+    """Latest ADX per column (Wilder's directional movement system)"""
+    up = np.diff(high, axis=0)
+    down = -np.diff(low, axis=0)
+    missing = np.isnan(up) | np.isnan(down)
+    plus_dm = np.where(missing, np.nan, np.where((up > down) & (up > 0), up, 0.0))
+    minus_dm = np.where(missing, np.nan, np.where((down > up) & (down > 0), down, 0.0))
+
+    previous = close[:-1]
+    true_range = np.fmax(
+        high[1:] - low[1:], np.fmax(np.abs(high[1:] - previous), np.abs(low[1:] - previous))
+    )
+    true_range[np.isnan(high[1:]) | np.isnan(low[1:])] = np.nan
+
+    alpha = 1 / period
+    atr = ewm(true_range, alpha, period)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plus_di = 100 * ewm(plus_dm, alpha, period) / atr
+        minus_di = 100 * ewm(minus_dm, alpha, period) / atr
+        total = plus_di + minus_di
+        dx = np.where(total > 0, 100 * np.abs(plus_di - minus_di) / total, 0.0)
+    dx[np.isnan(total)] = np.nan
+    return ewm(dx, alpha, period)[-1]
+
+
+def beta(close: np.ndarray, market: np.ndarray, min_observations: int = MIN_BETA_OBSERVATIONS) -> np.ndarray:
+    """Beta of each column's daily returns versus the market's, over the days both have"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        returns = close[1:] / close[:-1] - 1
+        market_returns = market[1:] / market[:-1] - 1
+    valid = np.isfinite(returns) & np.isfinite(market_returns)[:, None]
+    count = valid.sum(axis=0)
+
+    r = np.where(valid, returns, 0.0)
+    m = np.where(valid, market_returns[:, None], 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mean_r = r.sum(axis=0) / count
+        mean_m = m.sum(axis=0) / count
+        covariance = (r * m).sum(axis=0) / count - mean_r * mean_m
+        variance = (m * m).sum(axis=0) / count - mean_m**2
+        result = covariance / variance
+    return np.where((count >= min_observations) & (variance > 0), result, np.nan)
+
+
+def compute_indicators(
+    close: np.ndarray,
+    high: np.ndarray,
+    low: np.ndarray,
+    market: Optional[np.ndarray] = None,
+) -> Dict[str, np.ndarray]:
+    """
+    Latest indicator values for every column of (days x stocks) panels.
+
+    Args:
+        close, high, low: Adjusted prices, oldest day first
+        market: Index closes on the same days (for beta), or None
+
+    Returns:
+        {column: array of one value per stock (NaN when history is too short)}
+    """
+    return {
+        "rsi": rsi(close),
+        "macd": macd(close),
+        "adx": adx(high, low, close),
+        "beta_1yr": beta(close, market) if market is not None else np.full(close.shape[1], np.nan),
+        "sma_50": last_sma(close, 50),
+        "sma_200": last_sma(close, 200),
+        "ema_20": ewm(close, 2 / 21, 20)[-1],
+    }
+
+
+class TechnicalIndicatorBatch:
+    """Compute and store technical indicators for the whole universe"""
+
+    # stocks column -> decimals kept (matches the schema's DECIMAL scale)
+    OUTPUTS = {
+        "rsi": 4,
+        "macd": 4,
+        "adx": 4,
+        "beta_1yr": 4,
+        "sma_50": 2,
+        "sma_200": 2,
+        "ema_20": 2,
+    }
+
+    def __init__(self, db=None, history=None):
+        from services.price_history import price_history
+
+        self.db = db or db_config
+        self.history = history or price_history
+
+    def _load_universe(self) -> List[Dict]:
+        return self.db.execute_query(
+            """
+            SELECT id, nse_code FROM stocks
+            WHERE nse_code IS NOT NULL
+              AND COALESCE(listing_status, 'active') <> 'delisted'
+            """
+        )
+
+    def load_panels(self, symbols: List[str], days: int) -> Dict[str, np.ndarray]:
+        """Adjusted close / high / low panels plus NIFTY closes on the same dates"""
+        from services.price_history import BENCHMARK_SYMBOL
+
+        dates, _, bars = self.history.load_bars(symbols + [BENCHMARK_SYMBOL], days)
+        close, adj_close, high, low = (bars[column] for column in ("close", "adj_close", "high", "low"))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            factor = adj_close / close
+        return {
+            "dates": dates,
+            "close": adj_close[:, :-1],
+            "high": (high * factor)[:, :-1],
+            "low": (low * factor)[:, :-1],
+            "market": adj_close[:, -1],
+        }
+
+    def run(self, days: Optional[int] = None) -> Dict:
+        """
+        Recompute indicators for all listed stocks and write them back.
+
+        Stocks whose last stored bar is more than config.TECHNICALS_MAX_STALE_DAYS
+        older than the newest one (suspended, or missing from daily_prices) are skipped.
+
+        Returns:
+            Dict with computed, updated, skipped, as_of and duration_seconds
+        """
+        start = time.time()
+        days = days or config.TECHNICALS_HISTORY_DAYS
+        stocks = self._load_universe()
+        symbols = [s["nse_code"] for s in stocks]
+        panels = self.load_panels(symbols, days)
+        if len(panels["dates"]) == 0:
+            logger.warning("⚠️ No stored bars - run the price refresh first")
+            return {"computed": 0, "updated": 0, "skipped": len(stocks), "as_of": None, "duration_seconds": 0}
+
+        market = panels["market"]
+        values = compute_indicators(
+            panels["close"],
+            panels["high"],
+            panels["low"],
+            market if np.isfinite(market).sum() > MIN_BETA_OBSERVATIONS else None,
+        )
+
+        latest = self.history.latest_dates(symbols)
+        as_of = np.datetime64(panels["dates"][-1])
+        cutoff = str(as_of - np.timedelta64(config.TECHNICALS_MAX_STALE_DAYS, "D"))
+        current = np.array([latest.get(symbol, "") for symbol in symbols]) >= cutoff
+
+        def value(column, j):
+            v = values[column][j]
+            return round(float(v), self.OUTPUTS[column]) if np.isfinite(v) else None
+
+        rows = [
+            tuple(value(column, j) for column in self.OUTPUTS) + (stocks[j]["id"],)
+            for j in np.flatnonzero(current)
+        ]
+        if rows:
+            self.db.execute_many(
+                f"""
+                UPDATE stocks
+                SET {', '.join(f'{column} = ?' for column in self.OUTPUTS)},
+                    technicals_updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+                """,
+                rows,
+            )
+
+            from services.screener_db_service import db_screener
+
+            # Trend / RSI presets were materialized from the old values
+            try:
+                db_screener.invalidate_presets()
+            except Exception as e:
+                logger.warning(f"⚠️ Preset cache invalidation failed: {e}")
+
+        elapsed = time.time() - start
+        logger.info(
+            f"✅ Technical indicators for {len(rows)} stocks "
+            f"({len(stocks) - len(rows)} skipped) as of {as_of} in {elapsed:.2f}s"
+        )
+        return {
+            "computed": len(symbols),
+            "updated": len(rows),
+            "skipped": len(stocks) - len(rows),
+            "as_of": str(as_of),
+            "duration_seconds": round(elapsed, 3),
+        }
@@ -0,0 +1,283 @@
+"""
+Two-tier TTL cache: bounded in-process LRU backed by a shared Redis tier.
+
+Tiers:
+1. Local LRU (per process) - microsecond reads, bounded by max_entries
+2. Redis (shared) - lets Flask, Celery workers and AI tools reuse each other's fetches
+
+Semantics:
+- Entries are fresh for `ttl` seconds
+- After that they are stale for another `stale_ttl` seconds: a stale read is
+  served immediately while ONE background refresh runs (stale-while-revalidate)
+- After ttl + stale_ttl the entry is gone and the caller loads synchronously
+
+Redis is optional. If REDIS_URL is not set or Redis is unreachable, the cache
+silently degrades to the local tier.
+
+Caches invalidated from another process (e.g. a Celery worker) pass
+local_tier=False: with Redis configured they skip the local tier, so a delete
+or set is seen by every process on its next read.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+FRESH = "fresh"
+STALE = "stale"
+
+
+def get_redis_url() -> Optional[str]:
+    """Resolve Redis URL from environment (same rules as celery_app)"""
+    url = os.environ.get("REDIS_URL") or os.environ.get("KV_URL")
+    if url and "upstash.io" in url and url.startswith("redis://"):
+        # Upstash requires TLS
+        url = url.replace("redis://", "rediss://", 1)
+    return url
+
+
+def _json_default(obj):
+    """Serialize numpy scalars and other leftovers for the Redis tier"""
+    if hasattr(obj, "item"):
+        return obj.item()
+    return str(obj)
+
+
+class TieredCache:
+    """
+    Bounded LRU + Redis cache with TTLs and stale-while-revalidate.
+
+    Usage:
+        cache = TieredCache(namespace="msds", ttl=900, stale_ttl=3600)
+        value = cache.get_or_load("RELIANCE", lambda: expensive_fetch("RELIANCE"))
+    """
+
+    # After a Redis error, skip the shared tier for this many seconds
+    REDIS_RETRY_SECONDS = 30
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float,
+        stale_ttl: float = 0,
+        max_entries: int = 2048,
+        redis_url: Optional[str] = None,
+        use_redis: bool = True,
+        local_tier: bool = True,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+
+        # key -> (value, stored_at)
+        self._local: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Keys with a background refresh in flight
+        self._refreshing = set()
+
+        self._redis_url = (redis_url or get_redis_url()) if use_redis else None
+        self._redis = None
+        self._redis_disabled_until = 0.0
+
+        # Without Redis the local tier is the only one, so keep it
+        self._use_local = local_tier or not self._redis_url
+
+        self.stats = {"hits": 0, "stale_hits": 0, "misses": 0, "redis_hits": 0}
+
+    # ------------------------------------------------------------------
+    # Redis tier
+    # ------------------------------------------------------------------
+
+    def _get_redis(self):
+        """Lazily connect to Redis. Returns None if unavailable."""
+        if not self._redis_url or time.time() < self._redis_disabled_until:
+            return None
+
+        if self._redis is None:
+            try:
+                import redis
+
+                self._redis = redis.Redis.from_url(
+                    self._redis_url,
+                    socket_timeout=0.5,
+                    socket_connect_timeout=0.5,
+                )
+            except Exception as e:
+                logger.warning(f"Redis cache tier unavailable: {e}")
+                self._disable_redis()
+                return None
+
+        return self._redis
+
+    def _disable_redis(self):
+        self._redis = None
+        self._redis_disabled_until = time.time() + self.REDIS_RETRY_SECONDS
+
+    def _redis_key(self, key: str) -> str:
+        return f"klyx:{self.namespace}:{key}"
+
+    def _redis_get(self, key: str) -> Optional[Tuple[Any, float]]:
+        client = self._get_redis()
+        if client is None:
+            return None
+
+        try:
+            raw = client.get(self._redis_key(key))
+            if raw is None:
+                return None
+            payload = json.loads(raw)
+            return payload["value"], float(payload["stored_at"])
+        except Exception as e:
+            logger.debug(f"Redis get failed for {key}: {e}")
+            self._disable_redis()
+            return None
+
+    def _redis_set(self, key: str, value: Any, stored_at: float):
+        client = self._get_redis()
+        if client is None:
+            return
+
+        try:
+            payload = json.dumps(
+                {"value": value, "stored_at": stored_at}, default=_json_default
+            )
+            expiry = max(1, int(self.ttl + self.stale_ttl))
+            client.set(self._redis_key(key), payload, ex=expiry)
+        except Exception as e:
+            logger.debug(f"Redis set failed for {key}: {e}")
+            self._disable_redis()
+
+    # ------------------------------------------------------------------
+    # Public API
+    # ------------------------------------------------------------------
+
+    def _state(self, stored_at: float, now: float) -> Optional[str]:
+        age = now - stored_at
+        if age < self.ttl:
+            return FRESH
+        if age < self.ttl + self.stale_ttl:
+            return STALE
+        return None
+
+    def get(self, key: str) -> Tuple[Any, Optional[str]]:
+        """
+        Look up a key in the local tier, then Redis.
+
+        Returns:
+            Tuple of (value, state) where state is 'fresh', 'stale' or None (miss)
+        """
+        now = time.time()
+
+        with self._lock:
+            entry = self._local.get(key) if self._use_local else None
+            if entry is not None:
+                state = self._state(entry[1], now)
+                if state is not None:
+                    self._local.move_to_end(key)
+                    return entry[0], state
+                # Fully expired
+                del self._local[key]
+
+        entry = self._redis_get(key)
+        if entry is not None:
+            state = self._state(entry[1], now)
+            if state is not None:
+                self.stats["redis_hits"] += 1
+                self._set_local(key, entry[0], entry[1])
+                return entry[0], state
+
+        return None, None
+
+    def _set_local(self, key: str, value: Any, stored_at: float):
+        if not self._use_local:
+            return
+        with self._lock:
+            self._local[key] = (value, stored_at)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+
+    def set(self, key: str, value: Any):
+        """Store a value in both tiers"""
+        stored_at = time.time()
+        self._set_local(key, value, stored_at)
+        self._redis_set(key, value, stored_at)
+
+    def delete(self, key: str):
+        """Remove a key from both tiers"""
+        with self._lock:
+            self._local.pop(key, None)
+
+        client = self._get_redis()
+        if client is not None:
+            try:
+                client.delete(self._redis_key(key))
+            except Exception as e:
+                logger.debug(f"Redis delete failed for {key}: {e}")
+                self._disable_redis()
+
+    def clear_local(self):
+        """Drop the in-process tier (Redis is left untouched)"""
+        with self._lock:
+            self._local.clear()
+
+    def __len__(self):
+        return len(self._local)
+
+    def get_or_load(self, key: str, loader: Callable[[], Any], allow_stale: bool = True) -> Any:
+        """
+        Return cached value, loading it on a miss.
+
+        Fresh hit: returned as-is.
+        Stale hit: returned immediately, one background refresh is started.
+        Miss: loader() runs synchronously and the result is cached.
+
+        With allow_stale=False (callers that persist the value) a stale hit
+        is treated as a miss.
+        """
+        value, state = self.get(key)
+
+        if state == FRESH:
+            self.stats["hits"] += 1
+            return value
+
+        if state == STALE and allow_stale:
+            self.stats["stale_hits"] += 1
+            self._refresh_in_background(key, loader)
+            return value
+
+        self.stats["misses"] += 1
+        value = loader()
+        if value is not None:
+            self.set(key, value)
+        return value
+
+    def _refresh_in_background(self, key: str, loader: Callable[[], Any]):
+        """Start a refresh thread unless one is already running for this key"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def refresh():
+            try:
+                value = loader()
+                if value is not None:
+                    self.set(key, value)
+            except Exception as e:
+                logger.debug(f"Background refresh failed for {key}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        threading.Thread(
+            target=refresh, name=f"cache-refresh-{key}", daemon=True
+        ).start()
@@ -2,6 +2,7 @@ import pandas as pd
 import os
 import logging
 from services.market_data_service import market_data_service
+from services.symbol_master import symbol_master
 
 logger = logging.getLogger(__name__)
 
@@ -21,8 +22,8 @@ def verify_files():
         return {"status": "no_files", "valid": [], "invalid": []}
 
     invalid_items = []
-    processed_symbols = set()
-    valid_symbols = set()
+    processed_symbols = []
+    seen = set()
     
     # We only care about unique identifiers across all files
     
@@ -40,28 +41,30 @@ def verify_files():
             if symbol_col:
                 symbols = df[symbol_col].dropna().astype(str).unique()
                 for sym in symbols:
-                    if sym in processed_symbols:
-                        continue
-                    processed_symbols.add(sym)
-                        
-                    # Validate
-                    mc_id = market_data_service.get_moneycontrol_id(sym)
-                    if mc_id:
-                        valid_symbols.add(sym)
-                    else:
-                        # Fetch suggestions
-                        candidates = market_data_service.search_candidates(sym)
-                        invalid_items.append({
-                            "symbol": sym,
-                            "candidates": candidates
-                        })
+                    if sym not in seen:
+                        seen.add(sym)
+                        processed_symbols.append(sym)
                         
         except Exception as e:
             logger.error(f"Error reading {file_path}: {e}")
 
+    # Validate all symbols in one batch against the symbol master
+    # (misses are searched right below, so they are not queued)
+    resolved = symbol_master.resolve_many(processed_symbols, queue_misses=False)
+    valid_symbols = [sym for sym in processed_symbols if resolved.get(sym)]
+
+    # Only true misses need suggestions from the network search
+    for sym in processed_symbols:
+        if not resolved.get(sym):
+            candidates = market_data_service.search_candidates(sym)
+            invalid_items.append({
+                "symbol": sym,
+                "candidates": candidates
+            })
+
     return {
         "status": "success",
-        "valid": list(valid_symbols),
+        "valid": valid_symbols,
         "invalid": invalid_items
     }
 
@@ -0,0 +1,226 @@
+"""
+Job types run by the Render worker (worker_app.py) through the job runner.
+
+Each job is planned into one item per stock, so progress is checkpointed per
+symbol and an interrupted job resumes where it stopped.
+
+PortfolioJob is the exception: the web app runs it in-process when no Celery
+broker is reachable (see submit_portfolio_job).
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import logging
+from typing import Dict, List, Tuple
+
+from config import config
+from database.db_config import db_config
+from services.job_runner import SKIPPED, JobType, job_runner
+
+logger = logging.getLogger(__name__)
+
+
+class EnrichJob(JobType):
+    """Full multi-source enrichment of stale / low-quality stocks"""
+
+    name = "enrich"
+    batch_size = 50
+    batch_delay = 2
+
+    def chunk_size(self, params: Dict) -> int:
+        # 'batch_size' keeps its old meaning: pause after this many stocks
+        return params.get("batch_size") or self.batch_size
+
+    def plan(self, params: Dict) -> List[Tuple[str, Dict]]:
+        from database.stock_populator import StockDataPopulator
+
+        stocks = StockDataPopulator()._select_stale_stocks(params.get("max_stocks"))
+        return [
+            (s["nse_code"], {"id": s["id"], "nse_code": s["nse_code"], "stock_name": s["stock_name"]})
+            for s in stocks
+        ]
+
+    def process(self, items: List[Dict], params: Dict):
+        from database.stock_populator import ENRICHED, NO_DATA, StockDataPopulator
+
+        populator = StockDataPopulator()
+        for item in items:
+            try:
+                outcome = populator.enrich_one(item["payload"])
+                if outcome == ENRICHED:
+                    yield item["key"], None
+                elif outcome == NO_DATA:
+                    yield item["key"], "no data fetched"
+                else:
+                    yield item["key"], SKIPPED  # every field class was fresh
+            except Exception as e:
+                logger.error(f"Failed to enrich {item['key']}: {e}")
+                yield item["key"], str(e)
+
+    def finalize(self, params: Dict, summary: Dict) -> Dict:
+        from database.stock_populator import StockDataPopulator
+
+        # Relative Strength and presets once for the whole universe
+        result = StockDataPopulator().finalize_enrichment()
+        return {"enriched": summary["done"], "skipped": summary["skipped"], **result}
+
+
+class PopulateJob(JobType):
+    """Sync the stock list with the NSE/BSE listing files"""
+
+    name = "populate"
+
+    def plan(self, params: Dict) -> List[Tuple[str, Dict]]:
+        # The listing diff is applied in one transaction, so there is nothing
+        # to checkpoint per stock: the whole sync runs in finalize
+        return []
+
+    def process(self, items: List[Dict], params: Dict):
+        return iter(())
+
+    def finalize(self, params: Dict, summary: Dict) -> Dict:
+        from database.stock_populator import StockDataPopulator
+
+        return StockDataPopulator().sync_universe()
+
+
+class RefreshJob(JobType):
+    """Daily price refresh via batched multi-ticker downloads"""
+
+    name = "refresh"
+    max_attempts = 2
+
+    def chunk_size(self, params: Dict) -> int:
+        from database.enrich_missing_fields import PRICE_BATCH_SIZE
+
+        return params.get("batch_size") or PRICE_BATCH_SIZE
+
+    def plan(self, params: Dict) -> List[Tuple[str, Dict]]:
+        # Ordered by market cap so the most important stocks are refreshed first
+        stocks = db_config.execute_query(
+            """
+            SELECT id, nse_code
+            FROM stocks
+            WHERE nse_code IS NOT NULL
+              AND COALESCE(listing_status, 'active') <> 'delisted'
+            ORDER BY market_cap DESC NULLS LAST
+            """
+        )
+        return [(s["nse_code"], {"id": s["id"], "nse_code": s["nse_code"]}) for s in stocks]
+
+    def process(self, items: List[Dict], params: Dict):
+        from database.enrich_missing_fields import refresh_price_batch
+
+        refreshed = set(refresh_price_batch([item["payload"] for item in items]))
+        for item in items:
+            yield item["key"], None if item["key"] in refreshed else "no price data"
+
+    def finalize(self, params: Dict, summary: Dict) -> Dict:
+        from database.enrich_missing_fields import refresh_index_prices
+
+        from services.technical_indicators import TechnicalIndicatorBatch
+
+        # Benchmark history for portfolio risk and beta (vs NIFTY)
+        try:
+            result = {"index_rows": refresh_index_prices()}
+        except Exception as e:
+            logger.warning(f"⚠️ Index price refresh failed: {e}")
+            result = {"index_rows": 0}
+
+        # Indicators from the bars just stored
+        try:
+            result["technicals"] = TechnicalIndicatorBatch().run()
+        except Exception as e:
+            logger.warning(f"⚠️ Technical indicator batch failed: {e}")
+        return result
+
+
+class SyncFundamentalsJob(JobType):
+    """MoneyControl fundamentals (P&L, balance sheet, cash flow, ratios)"""
+
+    name = "sync-fundamentals"
+    batch_delay = 2  # don't hammer MoneyControl
+
+    def plan(self, params: Dict) -> List[Tuple[str, Dict]]:
+        stocks = db_config.execute_query(
+            """
+            SELECT nse_code, stock_name
+            FROM stocks
+            WHERE nse_code IS NOT NULL
+            ORDER BY market_cap DESC NULLS LAST
+            LIMIT ? OFFSET ?
+            """,
+            (params.get("batch_size", 50), params.get("offset", 0)),
+        )
+        return [(s["nse_code"], s) for s in stocks]
+
+    def process(self, items: List[Dict], params: Dict):
+        from services.market_data_service import market_data_service
+
+        for item in items:
+            logger.info(f"Fetching fundamentals for {item['key']}...")
+            fundamentals = market_data_service.get_fundamentals(item["key"])
+            if "error" in fundamentals:
+                logger.warning(f"⚠️ Failed to sync {item['key']}: {fundamentals.get('error')}")
+                yield item["key"], str(fundamentals.get("error"))
+            else:
+                logger.info(f"✅ Synced {item['key']}")
+                yield item["key"], None
+
+
+class PortfolioJob(JobType):
+    """Portfolio processing (process_portfolio_task) without a Celery worker"""
+
+    name = "portfolio"
+    max_attempts = 1
+
+    def plan(self, params: Dict) -> List[Tuple[str, Dict]]:
+        # One analysis run per user; progress goes to the SSE stream instead
+        return []
+
+    def process(self, items: List[Dict], params: Dict):
+        return iter(())
+
+    def finalize(self, params: Dict, summary: Dict) -> Dict:
+        from tasks.portfolio_tasks import process_portfolio_task
+
+        # Same task body as the worker, run on the job thread; the job ID is
+        # the task ID, so /api/process/status and /stream work unchanged
+        result = process_portfolio_task.apply(
+            args=[params["user_id"], True], task_id=params["job_id"], throw=True
+        )
+        return result.get()
+
+
+def submit_portfolio_job(user_id: str, runner=None) -> Dict:
+    """
+    Queue portfolio processing on the in-process job runner.
+
+    A user with a portfolio job already queued or running gets that job back.
+
+    Raises:
+        JobQueueFull: if config.JOB_QUEUE_LIMITS["portfolio"] jobs are waiting
+    """
+    runner = runner or job_runner
+    if PortfolioJob.name not in runner.types:
+        runner.register(PortfolioJob())
+
+    active = runner.store.find_active(PortfolioJob.name, {"user_id": user_id})
+    if active:
+        return runner.status(active["id"])
+
+    return runner.submit(
+        PortfolioJob.name,
+        {"user_id": user_id},
+        max_queued=config.JOB_QUEUE_LIMITS.get(PortfolioJob.name),
+    )
+
+
+def register_worker_jobs(runner=None):
+    runner = runner or job_runner
+    for job_type in (EnrichJob(), PopulateJob(), RefreshJob(), SyncFundamentalsJob()):
+        runner.register(job_type)
+    return runner
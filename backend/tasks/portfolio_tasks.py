@@ -5,31 +5,67 @@ Background tasks for portfolio processing
 import os
 import sys
 import time
+import uuid
+from contextlib import contextmanager
 from celery import Task
 from celery.utils.log import get_task_logger
 
 # Add backend to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from celery_app import celery_app
+from celery_app import REDIS_URL, celery_app
 
 logger = get_task_logger(__name__)
 
+SCHEDULED_REFRESH_LOCK = 'klyx:lock:scheduled-refresh'
+
+
+@contextmanager
+def task_lock(key, ttl_seconds, client=None):
+    """
+    Redis lock (SET NX with a TTL) held while the block runs.
+
+    Yields True if this run holds the lock, False if another run does. The
+    TTL frees the lock if the holder dies; a run that outlives it loses it.
+    """
+    from services.single_flight import _RELEASE_SCRIPT
+
+    if client is None:
+        import redis
+
+        client = redis.Redis.from_url(REDIS_URL, socket_connect_timeout=2)
+    token = uuid.uuid4().hex
+    acquired = client.set(key, token, nx=True, ex=int(ttl_seconds))
+    try:
+        yield bool(acquired)
+    finally:
+        if acquired:
+            client.eval(_RELEASE_SCRIPT, 1, key, token)
+
 
 class CallbackTask(Task):
     """Base task with progress callback support"""
     
     def update_progress(self, current, total, message=""):
-        """Update task progress"""
-        self.update_state(
-            state='PROGRESS',
-            meta={
-                'current': current,
-                'total': total,
-                'percent': int((current / total) * 100) if total > 0 else 0,
-                'message': message
-            }
-        )
+        """Update task progress (Celery state + SSE progress stream)"""
+        meta = {
+            'current': current,
+            'total': total,
+            'percent': int((current / total) * 100) if total > 0 else 0,
+            'message': message
+        }
+        try:
+            self.update_state(state='PROGRESS', meta=meta)
+        except Exception as e:
+            # No result backend (e.g. run synchronously without Redis): SSE only
+            logger.debug(f"Could not store task progress: {e}")
+        self.publish_event('progress', meta)
+
+    def publish_event(self, event, data):
+        """Push an event to /api/process/stream/<task_id> subscribers"""
+        from services.progress_stream import ProgressPublisher
+
+        ProgressPublisher(self.request.id).publish(event, data)
 
 
 @celery_app.task(bind=True, base=CallbackTask, name='tasks.process_portfolio')
@@ -47,9 +83,10 @@ def process_portfolio_task(self, user_id, use_multi_source=True):
     logger.info(f"Starting portfolio processing for user {user_id}")
     
     try:
-        from app import app, db
-        from models import UserPortfolio, UserAnalysis
-        from services.multi_source_data_service import multi_source_service
+        from app import app
+        from models import UserPortfolio
+        from services.analysis_store import save_user_analysis
+        from services.portfolio_data import portfolio_data_service
         
         with app.app_context():
             # Step 1: Fetch User Portfolio (10% progress)
@@ -57,61 +94,69 @@ def process_portfolio_task(self, user_id, use_multi_source=True):
             portfolio_items = UserPortfolio.query.filter_by(user_id=user_id).all()
             
             if not portfolio_items:
-                return {
+                result = {
                     'status': 'error',
                     'user_id': user_id,
                     'message': 'No stocks found in portfolio. Please add stocks first.'
                 }
+                self.publish_event('error', result)
+                return result
             
             symbols = [item.stock_name for item in portfolio_items]
             logger.info(f"Found {len(symbols)} stocks for user {user_id}: {symbols}")
             
-            # Step 2: Enrich Data (Parallel) (50% progress)
-            self.update_progress(20, 100, f"Enriching {len(symbols)} stocks (Parallel)...")
+            # Step 2: Load from the shared stocks table (50% progress)
+            # Only stale or missing stocks are fetched (in parallel) and written back
+            self.update_progress(20, 100, f"Loading {len(symbols)} stocks...")
             
-            # Use parallel fetching (max 10 workers)
-            enrichment_results = multi_source_service.fetch_multiple_stocks(
-                symbols, max_workers=10
+            completed = []
+            progress = {'percent': 20}
+
+            def on_result(symbol, result):
+                # Stream each holding as soon as it is ready (20% -> 80%)
+                completed.append(symbol)
+                self.publish_event('result', {
+                    'symbol': symbol,
+                    'data': result.get('data', {}),
+                    'quality': result.get('quality', {}),
+                    'completed': len(completed),
+                    'total': len(symbols),
+                })
+                # Celery state only when the percentage moves (<= 60 backend writes)
+                percent = 20 + int(60 * len(completed) / len(symbols))
+                if percent != progress['percent']:
+                    progress['percent'] = percent
+                    self.update_progress(
+                        percent, 100, f"Loaded {len(completed)}/{len(symbols)} stocks"
+                    )
+
+            enrichment_results = portfolio_data_service.load(
+                symbols, max_workers=10, on_result=on_result
             )
             
             # Step 3: Save to UserAnalysis (90% progress)
+            # Per-symbol upsert: unchanged payloads (same content hash) are not rewritten
             self.update_progress(80, 100, "Saving analysis results...")
             
-            # Clear old analysis for this user (full refresh)
-            # Or should we upsert? Full refresh is cleaner for now to avoid duplicates/stale
-            UserAnalysis.query.filter_by(user_id=user_id).delete()
-            
-            saved_count = 0
-            for symbol, result in enrichment_results.items():
-                data = result.get('data', {})
-                quality = result.get('quality', {})
-                
-                # Create analysis record
-                analysis = UserAnalysis(
-                    user_id=user_id,
-                    stock_name=symbol,
-                    nse_code=symbol, # Assume symbol is code for now
-                    analysis_data={
-                        **data, 
-                        "_quality": quality
-                    }
-                )
-                db.session.add(analysis)
-                saved_count += 1
-            
-            db.session.commit()
+            saved = save_user_analysis(user_id, enrichment_results)
+            saved_count = len(enrichment_results)
             
             self.update_progress(100, 100, "Portfolio analysis complete!")
             logger.info(f"Saved {saved_count} analysis records for user {user_id}")
             
-            return {
+            result = {
                 'status': 'completed',
                 'user_id': user_id,
                 'message': f'Successfully analyzed {saved_count} stocks',
+                'version': saved['version'],
+                'changed': saved['inserted'] + saved['updated'] + saved['deleted'],
                 'timestamp': time.time()
             }
+            self.publish_event('done', result)
+            return result
         
     except Exception as e:
+        self.publish_event('error', {'message': str(e)})
         logger.error(f"Portfolio processing failed for user {user_id}: {str(e)}")
         # Log full traceback
         import traceback
@@ -120,36 +165,152 @@ def process_portfolio_task(self, user_id, use_multi_source=True):
 
 
 @celery_app.task(name='tasks.enrich_stock_database')
-def enrich_stock_database_task(batch_size=10, max_stocks=None):
+def enrich_stock_database_task(batch_size=10, max_stocks=None, chunk_size=None):
     """
     Background task to enrich stock database with external data.
-    
+
+    Fans out: the stale universe is split into chunks that run as a Celery
+    chord, so every worker takes chunks in parallel. The chord callback
+    aggregates the per-chunk stats and runs Relative Strength and preset
+    materialization once.
+
     Args:
-        batch_size: Number of stocks to process in each batch
+        batch_size: Number of stocks to process before pausing (per chunk)
         max_stocks: Maximum number of stocks to enrich (None = all)
-        
+        chunk_size: Stocks per subtask (default: config.ENRICH_CHUNK_SIZE)
+
     Returns:
-        dict: Enrichment results
+        dict: Dispatch info (chunks, total, callback task ID)
     """
     logger.info(f"Starting database enrichment (batch_size={batch_size}, max_stocks={max_stocks})")
     
     try:
+        from celery import chord
+
+        from config import config
         from database.stock_populator import StockDataPopulator
-        
-        populator = StockDataPopulator()
-        result = populator.enrich_stock_data(
-            batch_size=batch_size,
-            max_stocks=max_stocks
+        from services.change_log import change_log
+
+        stocks = StockDataPopulator()._select_stale_stocks(max_stocks)
+        if not stocks:
+            logger.info("No stocks need enrichment")
+            return {'enriched': 0, 'failed': 0, 'total': 0}
+
+        chunk_size = chunk_size or config.ENRICH_CHUNK_SIZE
+        chunks = [
+            [{'id': s['id'], 'stock_name': s['stock_name'], 'nse_code': s['nse_code']} for s in stocks[i:i + chunk_size]]
+            for i in range(0, len(stocks), chunk_size)
+        ]
+
+        callback = finalize_enrichment_task.s(
+            started_at=time.time(), since_cursor=change_log.cursor()
         )
-        
-        logger.info(f"Database enrichment completed: {result}")
-        return result
+        result = chord(
+            enrich_stock_chunk_task.s(chunk, batch_size) for chunk in chunks
+        )(callback)
+
+        logger.info(f"Dispatched {len(chunks)} enrichment chunks for {len(stocks)} stocks")
+        return {
+            'status': 'dispatched',
+            'total': len(stocks),
+            'chunks': len(chunks),
+            'callback_id': result.id,
+        }
         
     except Exception as e:
         logger.error(f"Database enrichment failed: {str(e)}")
         raise
 
 
+@celery_app.task(name='tasks.enrich_stock_chunk')
+def enrich_stock_chunk_task(stocks, batch_size=10):
+    """
+    Enrich one chunk of stocks (chord header task).
+
+    Never raises: a failed chunk reports its stocks as failed so the chord
+    callback still runs.
+    """
+    try:
+        from database.stock_populator import StockDataPopulator
+
+        return StockDataPopulator().enrich_stock_data(
+            batch_size=batch_size,
+            stocks=stocks,
+            update_relative_strength=False,
+        )
+    except Exception as e:
+        logger.error(f"Enrichment chunk failed ({len(stocks)} stocks): {str(e)}")
+        return {'enriched': 0, 'skipped': 0, 'failed': len(stocks), 'total': len(stocks), 'error': str(e)}
+
+
+@celery_app.task(name='tasks.finalize_enrichment')
+def finalize_enrichment_task(chunk_results, started_at=None, since_cursor=None):
+    """
+    Chord callback: aggregate chunk stats, then run the universe-wide steps once
+    (skipping rescoring / presets if the change log shows nothing changed).
+
+    Returns:
+        dict: Enrichment results
+    """
+    totals = {'enriched': 0, 'skipped': 0, 'failed': 0, 'total': 0}
+    for chunk in chunk_results:
+        for key in totals:
+            totals[key] += chunk.get(key, 0)
+
+    from database.stock_populator import StockDataPopulator
+
+    totals.update(StockDataPopulator().finalize_enrichment(since_cursor=since_cursor))
+    totals['chunks'] = len(chunk_results)
+    totals['chunk_errors'] = sum(1 for chunk in chunk_results if chunk.get('error'))
+    if started_at:
+        totals['duration_seconds'] = round(time.time() - started_at, 1)
+
+    logger.info(f"Database enrichment completed: {totals}")
+    return totals
+
+
+@celery_app.task(name='tasks.rescore_universe')
+def rescore_universe_task():
+    """
+    Recompute durability/valuation/momentum scores, ROCE proxy and earnings
+    yield for every stock from stored columns (no external fetches).
+
+    Returns:
+        dict: Scored / updated counts
+    """
+    from services.score_service import BatchScorer
+
+    return BatchScorer().rescore_universe()
+
+
+@celery_app.task(name='tasks.compute_technicals')
+def compute_technicals_task():
+    """
+    Recompute RSI, MACD, ADX, beta and moving averages for every stock from
+    the stored daily bars (no external fetches).
+
+    Returns:
+        dict: Updated / skipped counts and the as-of date
+    """
+    from services.technical_indicators import TechnicalIndicatorBatch
+
+    return TechnicalIndicatorBatch().run()
+
+
+@celery_app.task(name='tasks.resolve_symbol_queue')
+def resolve_symbol_queue_task(limit=50):
+    """
+    Resolve names that missed the symbol master's local indexes
+    (network search, rate-limited by `limit` per run).
+
+    Returns:
+        dict: Resolved / not found / remaining counts
+    """
+    from services.symbol_master import symbol_master
+
+    return symbol_master.process_lookup_queue(limit=limit)
+
+
 @celery_app.task(name='tasks.refresh_stock_database')
 def refresh_stock_database_task(full_refresh=False):
     """
@@ -164,16 +325,14 @@ def refresh_stock_database_task(full_refresh=False):
     logger.info(f"Starting database refresh (full={full_refresh})")
     
     try:
-        from database.stock_populator import StockDataPopulator, StockListFetcher
+        from database.stock_populator import StockDataPopulator
         
         populator = StockDataPopulator()
         results = {}
         
         # Step 1: Update stock list
         logger.info("Fetching stock list...")
-        stock_list = StockListFetcher.get_nse_stock_list()
-        pop_result = populator.populate_initial_stocks(stock_list)
-        results['populate'] = pop_result
+        results['populate'] = populator.sync_universe()
         
         # Step 2: Enrich stocks
         logger.info("Enriching stocks...")
@@ -191,3 +350,62 @@ def refresh_stock_database_task(full_refresh=False):
     except Exception as e:
         logger.error(f"Database refresh failed: {str(e)}")
         raise
+
+
+@celery_app.task(name='tasks.scheduled_refresh')
+def scheduled_refresh_task():
+    """
+    Periodic (Celery beat) refresh of the highest-priority stale stocks.
+
+    The scheduler picks prices during NSE market hours and fundamentals
+    off-hours, and sizes the batch to fit one beat interval. A run that
+    overlaps a previous one (e.g. a slow fundamentals batch) is skipped, so
+    two runs never pick the same top-priority stocks.
+
+    Returns:
+        dict: Field class, batch size and refresh results
+    """
+    try:
+        from config import config
+
+        with task_lock(SCHEDULED_REFRESH_LOCK, config.REFRESH_LOCK_SECONDS) as acquired:
+            if not acquired:
+                logger.info("Scheduled refresh skipped: previous run still in progress")
+                return {'skipped': True, 'reason': 'previous run still in progress'}
+            return _run_scheduled_refresh()
+
+    except Exception as e:
+        logger.error(f"Scheduled refresh failed: {str(e)}")
+        raise
+
+
+def _run_scheduled_refresh():
+    """One scheduled refresh batch (caller holds SCHEDULED_REFRESH_LOCK)"""
+    from services.refresh_scheduler import PRICE, refresh_scheduler
+
+    plan = refresh_scheduler.next_batch()
+    stocks = plan['stocks']
+
+    logger.info(
+        f"Scheduled refresh: {len(stocks)} stocks, field_class={plan['field_class']}, "
+        f"top_score={plan['top_score']}"
+    )
+
+    if not stocks:
+        return {'field_class': plan['field_class'], 'refreshed': 0}
+
+    if plan['field_class'] == PRICE:
+        from database.enrich_missing_fields import refresh_daily_prices
+
+        result = refresh_daily_prices(stocks=stocks)
+    else:
+        from database.stock_populator import StockDataPopulator
+
+        result = StockDataPopulator().enrich_stock_data(stocks=stocks)
+
+    return {
+        'field_class': plan['field_class'],
+        'refreshed': len(stocks),
+        'result': result,
+    }
+
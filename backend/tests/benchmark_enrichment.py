@@ -0,0 +1,452 @@
+"""
+Throughput benchmark for the enrichment pipeline.
+
+Seeds a synthetic stocks universe in a throwaway SQLite database and replaces
+every fetcher (NSE, yfinance, MoneyControl, Alpha Vantage) with a fake that
+returns a realistic payload after a latency drawn from a log-normal
+distribution (median / p95 per source below, roughly what the live sources
+show from India). Nothing touches the network, and with a fixed seed two runs
+see the same latencies, so numbers are comparable across commits.
+
+Runs `StockDataPopulator.enrich_stock_data` and
+`MultiSourceDataService.fetch_multiple_stocks` end to end and reports
+symbols/s, p50/p95 per-symbol latency, external calls per source, peak RSS
+and peak thread count.
+
+Usage (from backend/):
+    python tests/benchmark_enrichment.py                      # 200 symbols
+    python tests/benchmark_enrichment.py --symbols 1000 --latency-scale 0.1
+    python tests/benchmark_enrichment.py --json > before.json
+
+Not collected by pytest (no test_ prefix): it measures, it does not assert.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import hashlib
+import json
+import logging
+import math
+import random
+import resource
+import shutil
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Per-source latency in seconds: (median, p95). yfinance makes three requests
+# (info, balance sheet, quarterly income); MoneyControl fundamentals walk
+# several statement pages.
+LATENCY_PROFILES = {
+    "NSE": (0.25, 0.9),
+    "YahooFinance": (0.6, 2.0),
+    "MoneyControl": (1.2, 3.5),
+    "MoneyControl.shareholding": (0.7, 2.0),
+    "AlphaVantage": (0.4, 1.2),
+}
+FAILURE_RATES = {
+    "NSE": 0.05,
+    "YahooFinance": 0.03,
+    "MoneyControl": 0.10,
+    "MoneyControl.shareholding": 0.10,
+    "AlphaVantage": 0.20,
+}
+
+
+class LatencyModel:
+    """Seeded log-normal latencies fitted to a (median, p95) pair per source"""
+
+    Z95 = 1.6449
+
+    def __init__(self, seed: int, scale: float = 1.0):
+        self.seed = seed
+        self.scale = scale
+        self.calls = Counter()
+        self._lock = threading.Lock()
+
+    def _rng(self, source: str, symbol: str) -> random.Random:
+        # Per (source, symbol) so thread scheduling does not change the draws
+        digest = hashlib.sha1(f"{self.seed}:{source}:{symbol}".encode()).hexdigest()
+        return random.Random(int(digest[:16], 16))
+
+    def call(self, source: str, symbol: str) -> bool:
+        """Sleep for one simulated request; returns False if it 'failed'"""
+        with self._lock:
+            self.calls[source] += 1
+        rng = self._rng(source, symbol)
+        median, p95 = LATENCY_PROFILES[source]
+        sigma = math.log(p95 / median) / self.Z95
+        time.sleep(rng.lognormvariate(math.log(median), sigma) * self.scale)
+        return rng.random() >= FAILURE_RATES[source]
+
+
+def _payload_rng(symbol: str) -> random.Random:
+    return random.Random(int(hashlib.sha1(symbol.encode()).hexdigest()[:16], 16))
+
+
+class FakeNSE:
+    name = "NSE"
+    available = True
+
+    def __init__(self, model: LatencyModel):
+        from services.refresh_scheduler import PRICE
+
+        self.field_classes = (PRICE,)
+        self.model = model
+
+    def fetch_quote(self, symbol: str) -> Optional[Dict]:
+        if not self.model.call(self.name, symbol):
+            return None
+        rng = _payload_rng(symbol)
+        price = rng.uniform(10, 5000)
+        return {
+            "currentPrice": round(price, 2),
+            "marketCap": price * rng.uniform(1e6, 1e9),
+            "pe_ratio": rng.uniform(5, 80),
+            "week52High": price * rng.uniform(1.0, 1.6),
+            "week52Low": price * rng.uniform(0.5, 1.0),
+            "volume": rng.randint(10_000, 10_000_000),
+            "_source": self.name,
+        }
+
+
+class FakeYFinance:
+    name = "YahooFinance"
+    available = True
+
+    def __init__(self, model: LatencyModel):
+        from services.refresh_scheduler import ANNUAL, PRICE, QUARTERLY
+
+        self.field_classes = (PRICE, QUARTERLY, ANNUAL)
+        self.model = model
+
+    def fetch_fundamentals(self, symbol: str) -> Optional[Dict]:
+        if not self.model.call(self.name, symbol):
+            return None
+        rng = _payload_rng(symbol)
+        price = rng.uniform(10, 5000)
+        revenue = rng.uniform(1e8, 1e12)
+        equity = revenue * rng.uniform(0.2, 2.0)
+        return {
+            "currentPrice": round(price, 2),
+            "marketCap": price * rng.uniform(1e6, 1e9),
+            "pe_ratio": rng.uniform(5, 80),
+            "pb_ratio": rng.uniform(0.5, 15),
+            "ps_ratio": rng.uniform(0.2, 20),
+            "roe": rng.uniform(-0.1, 0.4),
+            "roa": rng.uniform(-0.05, 0.2),
+            "profit_margin": rng.uniform(-0.1, 0.3),
+            "operating_margin": rng.uniform(-0.05, 0.4),
+            "revenue": revenue,
+            "net_income": revenue * rng.uniform(-0.05, 0.25),
+            "promoter_holding": rng.uniform(0.2, 0.75),
+            "institutional_holding": rng.uniform(0.05, 0.5),
+            "dividend_yield": rng.uniform(0, 0.05),
+            "year1Change": rng.uniform(-0.5, 1.5),
+            "beta": rng.uniform(0.4, 1.8),
+            "target_mean_price": price * rng.uniform(0.8, 1.4),
+            "recommendation_key": rng.choice(["buy", "hold", "sell", "strong_buy"]),
+            "number_of_analyst_opinions": rng.randint(0, 40),
+            "total_assets": equity * rng.uniform(1.2, 4.0),
+            "current_assets": equity * rng.uniform(0.3, 1.5),
+            "total_debt": equity * rng.uniform(0, 1.5),
+            "current_liabilities": equity * rng.uniform(0.2, 1.2),
+            "stockholders_equity": equity,
+            "_source": self.name,
+        }
+
+
+class FakeMoneyControl:
+    name = "MoneyControl"
+    available = True
+
+    def __init__(self, model: LatencyModel):
+        from services.refresh_scheduler import ANNUAL
+
+        self.field_classes = (ANNUAL,)
+        self.model = model
+
+    def fetch_fundamentals(self, symbol: str) -> Optional[Dict]:
+        if not self.model.call(self.name, symbol):
+            return None
+        rng = _payload_rng(symbol)
+        revenue = rng.uniform(1e8, 1e12)
+        return {
+            "revenue": revenue,
+            "net_income": revenue * rng.uniform(-0.05, 0.25),
+            "_source": self.name,
+        }
+
+    def fetch_shareholding(self, symbol: str) -> Optional[Dict]:
+        if not self.model.call("MoneyControl.shareholding", symbol):
+            return None
+        rng = _payload_rng(symbol)
+        promoter = rng.uniform(0.2, 0.75)
+        fii = rng.uniform(0.02, 0.3)
+        dii = rng.uniform(0.02, 0.25)
+        return {
+            "promoter_holding": promoter,
+            "fii_holding": fii,
+            "dii_holding": dii,
+            "public_holding": max(0.0, 1 - promoter - fii - dii),
+            "institutional_holding": fii + dii,
+            "_source": self.name,
+        }
+
+
+class FakeAlphaVantage:
+    name = "AlphaVantage"
+    available = True
+
+    def __init__(self, model: LatencyModel):
+        from services.refresh_scheduler import ANNUAL, PRICE, QUARTERLY
+
+        self.field_classes = (PRICE, QUARTERLY, ANNUAL)
+        self.model = model
+
+    def fetch_fundamentals(self, symbol: str) -> Optional[Dict]:
+        if not self.model.call(self.name, symbol):
+            return None
+        rng = _payload_rng(symbol)
+        return {
+            "currentPrice": rng.uniform(10, 5000),
+            "pe_ratio": rng.uniform(5, 80),
+            "roe": rng.uniform(-0.1, 0.4),
+            "_source": self.name,
+        }
+
+
+class ResourceMonitor:
+    """Samples thread count while a phase runs; peak RSS comes from getrusage"""
+
+    INTERVAL = 0.01
+
+    def __init__(self):
+        self.peak_threads = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def os_threads() -> int:
+        # Counts native threads too (Redis, psycopg2 pools); falls back to Python threads
+        try:
+            with open("/proc/self/status") as f:
+                for line in f:
+                    if line.startswith("Threads:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return threading.active_count()
+
+    @staticmethod
+    def peak_rss_mb() -> float:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reports KiB, macOS bytes
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_threads = max(self.peak_threads, self.os_threads())
+            time.sleep(self.INTERVAL)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak_threads = max(self.peak_threads, self.os_threads())
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def seed_universe(db, n: int) -> List[Dict]:
+    """Placeholder rows as the universe ingestion creates them"""
+    db.execute_many(
+        """INSERT INTO stocks (stock_name, nse_code, isin, data_quality_score, market_cap)
+           VALUES (?, ?, ?, 0, ?)""",
+        [(f"Synthetic {i} Ltd", f"SYN{i:05d}", f"INE{i:06d}01", (n - i) * 1e9) for i in range(n)],
+    )
+    return db.execute_query("SELECT id, stock_name, nse_code FROM stocks ORDER BY id")
+
+
+def run_phase(name: str, model: LatencyModel, fn, symbols: int) -> Dict:
+    latencies: List[float] = []
+    model.calls.clear()
+    with ResourceMonitor() as monitor:
+        start = time.perf_counter()
+        fn(latencies)
+        wall = time.perf_counter() - start
+
+    return {
+        "phase": name,
+        "symbols": symbols,
+        "wall_seconds": round(wall, 3),
+        "symbols_per_second": round(symbols / wall, 2) if wall else 0.0,
+        "latency_p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "latency_p95_ms": round(percentile(latencies, 95) * 1000, 1),
+        "external_calls": dict(model.calls),
+        "calls_per_symbol": round(sum(model.calls.values()) / symbols, 2) if symbols else 0.0,
+        "peak_rss_mb": round(ResourceMonitor.peak_rss_mb(), 1),
+        "peak_threads": monitor.peak_threads,
+    }
+
+
+def run_benchmark(
+    symbols: int = 200,
+    latency_scale: float = 1.0,
+    seed: int = 42,
+    workers: int = 10,
+    phases: tuple = ("enrich", "fetch_multiple"),
+) -> Dict:
+    from database.db_config import db_config
+    from database.migrations import run_migrations
+    from database.stock_populator import StockDataPopulator
+    from services.multi_source_data_service import multi_source_service
+
+    model = LatencyModel(seed, latency_scale)
+    workdir = tempfile.mkdtemp(prefix="klyx-bench-")
+    saved = (
+        db_config.sqlite_path,
+        db_config.is_production,
+        multi_source_service.fetchers,
+        multi_source_service.cache,
+    )
+
+    try:
+        db_config.is_production = False
+        db_config.sqlite_path = os.path.join(workdir, "bench.db")
+        db_config.init_database()
+        run_migrations()
+        universe = seed_universe(db_config, symbols)
+
+        multi_source_service.fetchers = [
+            FakeNSE(model),
+            FakeYFinance(model),
+            FakeMoneyControl(model),
+            FakeAlphaVantage(model),
+        ]
+        multi_source_service.cache = None  # measure fetches, not cache hits
+
+        results = []
+
+        if "enrich" in phases:
+            populator = StockDataPopulator()
+            enrich_one = populator.enrich_one
+
+            def timed_enrich_one(stock, *args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return enrich_one(stock, *args, **kwargs)
+                finally:
+                    latencies.append(time.perf_counter() - start)
+
+            def enrich(collect):
+                nonlocal latencies
+                latencies = collect
+                populator.enrich_one = timed_enrich_one
+                # batch_size > universe: no rate-limit pauses inside the measurement
+                populator.enrich_stock_data(batch_size=symbols + 1, stocks=universe)
+
+            latencies: List[float] = []
+            results.append(run_phase("enrich_stock_data", model, enrich, symbols))
+
+            # Second pass over the now-fresh universe: what the freshness policy saves
+            results.append(run_phase("enrich_stock_data (fresh)", model, enrich, symbols))
+
+        if "fetch_multiple" in phases:
+            fetch = multi_source_service.fetch_stock_data
+
+            def timed_fetch(symbol, *args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fetch(symbol, *args, **kwargs)
+                finally:
+                    latencies.append(time.perf_counter() - start)
+
+            def fetch_multiple(collect):
+                nonlocal latencies
+                latencies = collect
+                multi_source_service.fetch_stock_data = timed_fetch
+                try:
+                    multi_source_service.fetch_multiple_stocks(
+                        [s["nse_code"] for s in universe], max_workers=workers
+                    )
+                finally:
+                    del multi_source_service.fetch_stock_data
+
+            results.append(
+                run_phase(f"fetch_multiple_stocks (workers={workers})", model, fetch_multiple, symbols)
+            )
+
+        return {
+            "symbols": symbols,
+            "latency_scale": latency_scale,
+            "seed": seed,
+            "results": results,
+        }
+
+    finally:
+        (
+            db_config.sqlite_path,
+            db_config.is_production,
+            multi_source_service.fetchers,
+            multi_source_service.cache,
+        ) = saved
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_report(report: Dict):
+    print(
+        f"\nEnrichment benchmark: {report['symbols']} symbols, "
+        f"latency x{report['latency_scale']}, seed {report['seed']}\n"
+    )
+    header = f"{'phase':<38} {'sym/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'calls/sym':>10} {'RSS MB':>8} {'threads':>8}"
+    print(header)
+    print("-" * len(header))
+    for r in report["results"]:
+        print(
+            f"{r['phase']:<38} {r['symbols_per_second']:>8} {r['latency_p50_ms']:>9} "
+            f"{r['latency_p95_ms']:>9} {r['calls_per_symbol']:>10} {r['peak_rss_mb']:>8} "
+            f"{r['peak_threads']:>8}"
+        )
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Enrichment pipeline throughput benchmark")
+    parser.add_argument("--symbols", type=int, default=200)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiply all simulated latencies")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--workers", type=int, default=10, help="fetch_multiple_stocks max_workers")
+    parser.add_argument("--phases", default="enrich,fetch_multiple")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    logging.getLogger().setLevel(logging.ERROR)  # the pipeline logs per symbol
+
+    report = run_benchmark(
+        symbols=args.symbols,
+        latency_scale=args.latency_scale,
+        seed=args.seed,
+        workers=args.workers,
+        phases=tuple(args.phases.split(",")),
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
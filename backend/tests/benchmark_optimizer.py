@@ -0,0 +1,146 @@
+"""
+Solve-time benchmark for the portfolio optimizer.
+
+Generates a year of daily returns for a synthetic universe from a seeded
+three-factor model (market, size, sector-like factor plus idiosyncratic noise
+with a spread of volatilities), so no database or network is involved and two
+runs with the same seed solve the same problems.
+
+For every objective it reports the cold solve (no starting point) and the
+warm solve after one more trading day is appended to the returns - what the
+service sees when a user re-optimizes after the daily price refresh.
+
+Usage (from backend/):
+    python tests/benchmark_optimizer.py                       # 200 assets
+    python tests/benchmark_optimizer.py --assets 500 --max-weight 0.02 --sector-limit 0.2
+    python tests/benchmark_optimizer.py --json > before.json
+
+Not collected by pytest (no test_ prefix): it measures, it does not assert.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import logging
+import time
+from typing import Dict
+
+import numpy as np
+
+from services.portfolio_optimizer import OBJECTIVES, TRADING_DAYS, ledoit_wolf, solve
+
+SECTORS = 10
+
+
+def synthetic_returns(assets: int, days: int, seed: int) -> np.ndarray:
+    """(days x assets) daily returns from a three-factor model"""
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(0, 0.01, (days, 3))
+    loadings = rng.normal(1, 0.3, (assets, 3)) * [1.0, 0.5, 0.3]
+    noise = rng.normal(0.0004, 0.015, (days, assets)) * rng.uniform(0.5, 2.0, assets)
+    return factors @ loadings.T + noise
+
+
+def estimate(returns: np.ndarray):
+    cov, shrinkage = ledoit_wolf(returns)
+    return returns.mean(axis=0) * TRADING_DAYS, cov * TRADING_DAYS, shrinkage
+
+
+def run_benchmark(
+    assets: int = 200,
+    days: int = TRADING_DAYS,
+    seed: int = 42,
+    max_weight: float = 1.0,
+    sector_limit: float = None,
+) -> Dict:
+    returns = synthetic_returns(assets, days + 1, seed)
+    groups = []
+    if sector_limit is not None:
+        sector = np.arange(assets) % SECTORS
+        groups = [(sector == k, sector_limit) for k in range(SECTORS)]
+
+    started = time.perf_counter()
+    mu, cov, shrinkage = estimate(returns[:-1])
+    estimate_ms = (time.perf_counter() - started) * 1000
+    # The next day's estimates (one more return, oldest dropped)
+    next_mu, next_cov, _ = estimate(returns[1:])
+
+    results = []
+    for objective in OBJECTIVES:
+        started = time.perf_counter()
+        weights, cold = solve(objective, mu, cov, max_weight=max_weight, groups=groups)
+        cold_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        _, warm = solve(objective, next_mu, next_cov, max_weight=max_weight, groups=groups, x0=weights)
+        warm_ms = (time.perf_counter() - started) * 1000
+
+        results.append(
+            {
+                "objective": objective,
+                "cold_ms": round(cold_ms, 1),
+                "cold_iterations": cold["iterations"],
+                "warm_ms": round(warm_ms, 1),
+                "warm_iterations": warm["iterations"],
+                "converged": cold["success"] and warm["success"],
+                "volatility": round(float(np.sqrt(weights @ cov @ weights)), 4),
+                "positions": int((weights > 1e-4).sum()),
+            }
+        )
+
+    return {
+        "assets": assets,
+        "days": days,
+        "seed": seed,
+        "max_weight": max_weight,
+        "sector_limit": sector_limit,
+        "shrinkage": round(shrinkage, 4),
+        "estimate_ms": round(estimate_ms, 1),
+        "results": results,
+    }
+
+
+def print_report(report: Dict):
+    print(
+        f"\nOptimizer benchmark: {report['assets']} assets x {report['days']} days, "
+        f"max weight {report['max_weight']}, sector limit {report['sector_limit']}, seed {report['seed']}\n"
+        f"Ledoit-Wolf: {report['estimate_ms']} ms (shrinkage {report['shrinkage']})\n"
+    )
+    header = f"{'objective':<15} {'cold ms':>9} {'iters':>6} {'warm ms':>9} {'iters':>6} {'vol':>8} {'positions':>10} {'ok':>4}"
+    print(header)
+    print("-" * len(header))
+    for r in report["results"]:
+        print(
+            f"{r['objective']:<15} {r['cold_ms']:>9} {r['cold_iterations']:>6} {r['warm_ms']:>9} "
+            f"{r['warm_iterations']:>6} {r['volatility']:>8} {r['positions']:>10} {'yes' if r['converged'] else 'NO':>4}"
+        )
+    print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Portfolio optimizer solve-time benchmark")
+    parser.add_argument("--assets", type=int, default=200)
+    parser.add_argument("--days", type=int, default=TRADING_DAYS)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--max-weight", type=float, default=1.0)
+    parser.add_argument("--sector-limit", type=float, default=None, help=f"Max weight per sector ({SECTORS} sectors)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+
+    report = run_benchmark(
+        assets=args.assets,
+        days=args.days,
+        seed=args.seed,
+        max_weight=args.max_weight,
+        sector_limit=args.sector_limit,
+    )
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
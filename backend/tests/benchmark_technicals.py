@@ -0,0 +1,150 @@
+"""
+Run-time benchmark for the universe-wide technical indicator batch.
+
+Seeds a synthetic universe in a throwaway SQLite database and writes a year
+of daily bars per stock (random walks from a seeded generator, a few stocks
+listed part-way through the year) plus NIFTY into its daily_prices table.
+Nothing touches the network.
+
+Times each stage of `TechnicalIndicatorBatch.run`: loading the panels from
+daily_prices, computing the indicators and writing them to stocks, plus the
+end-to-end run.
+
+Usage (from backend/):
+    python tests/benchmark_technicals.py                     # 2000 stocks x 252 days
+    python tests/benchmark_technicals.py --stocks 500 --days 504
+    python tests/benchmark_technicals.py --json > before.json
+
+Not collected by pytest (no test_ prefix): it measures, it does not assert.
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import json
+import logging
+import shutil
+import tempfile
+import time
+from typing import Dict
+
+import numpy as np
+
+
+def synthetic_bars(stocks: int, days: int, seed: int) -> Dict[str, np.ndarray]:
+    """(days x stocks + 1) OHLCV arrays; the last column is the index"""
+    rng = np.random.default_rng(seed)
+    market = rng.normal(0.0004, 0.01, days)
+    returns = rng.normal(1, 0.4, stocks + 1) * market[:, None] + rng.normal(0, 0.015, (days, stocks + 1))
+    returns[:, -1] = market
+    close = 100 * np.cumprod(1 + returns, axis=0)
+    spread = rng.uniform(0, 0.02, (days, stocks + 1))
+    bars = {
+        "open": close * (1 + rng.normal(0, 0.005, (days, stocks + 1))),
+        "high": close * (1 + spread),
+        "low": close * (1 - spread),
+        "close": close,
+        "adj_close": close * 0.98,
+        "volume": rng.uniform(1e4, 1e7, (days, stocks + 1)),
+    }
+    # One stock in fifty listed part-way through the window
+    for j in range(0, stocks, 50):
+        for values in bars.values():
+            values[: days // 2, j] = np.nan
+    return bars
+
+
+def run_benchmark(stocks: int = 2000, days: int = 252, seed: int = 42) -> Dict:
+    from database.db_config import db_config
+    from database.migrations import run_migrations
+    from services.price_history import BENCHMARK_SYMBOL, PriceHistory
+    from services.technical_indicators import TechnicalIndicatorBatch, compute_indicators
+
+    workdir = tempfile.mkdtemp(prefix="klyx-bench-")
+    saved = (db_config.sqlite_path, db_config.is_production)
+
+    try:
+        db_config.is_production = False
+        db_config.sqlite_path = os.path.join(workdir, "bench.db")
+        db_config.init_database()
+        run_migrations()
+        codes = [f"SYN{i:05d}" for i in range(stocks)]
+        db_config.execute_many(
+            "INSERT INTO stocks (stock_name, nse_code) VALUES (?, ?)",
+            [(f"Synthetic {code} Ltd", code) for code in codes],
+        )
+
+        history = PriceHistory(db_config)
+        bars = synthetic_bars(stocks, days, seed)
+        dates = np.busday_offset(np.datetime64("today", "D"), np.arange(-days + 1, 1), roll="backward")
+        history.append(
+            list(np.datetime_as_string(dates)),
+            codes + [BENCHMARK_SYMBOL],
+            bars["close"],
+            bars["adj_close"],
+            high=bars["high"],
+            low=bars["low"],
+        )
+
+        batch = TechnicalIndicatorBatch(history=history)
+
+        started = time.perf_counter()
+        panels = batch.load_panels(codes, days)
+        load_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        values = compute_indicators(panels["close"], panels["high"], panels["low"], panels["market"])
+        compute_ms = (time.perf_counter() - started) * 1000
+
+        started = time.perf_counter()
+        result = batch.run(days)
+        run_ms = (time.perf_counter() - started) * 1000
+
+        return {
+            "stocks": stocks,
+            "days": days,
+            "seed": seed,
+            "load_ms": round(load_ms, 1),
+            "compute_ms": round(compute_ms, 1),
+            "write_ms": round(run_ms - load_ms - compute_ms, 1),
+            "run_ms": round(run_ms, 1),
+            "updated": result["updated"],
+            "missing": {column: int(np.isnan(v).sum()) for column, v in values.items()},
+        }
+
+    finally:
+        db_config.sqlite_path, db_config.is_production = saved
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def print_report(report: Dict):
+    print(
+        f"\nTechnical indicator benchmark: {report['stocks']} stocks x {report['days']} days, "
+        f"seed {report['seed']}\n"
+    )
+    print(f"{'load panels':<16} {report['load_ms']:>10} ms")
+    print(f"{'compute':<16} {report['compute_ms']:>10} ms")
+    print(f"{'write (approx)':<16} {report['write_ms']:>10} ms")
+    print(f"{'end to end':<16} {report['run_ms']:>10} ms  ({report['updated']} stocks updated)")
+    print(f"\nNULL values per column: {report['missing']}\n")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Technical indicator batch benchmark")
+    parser.add_argument("--stocks", type=int, default=2000)
+    parser.add_argument("--days", type=int, default=252)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR)
+    logging.getLogger().setLevel(logging.ERROR)
+
+    report = run_benchmark(stocks=args.stocks, days=args.days, seed=args.seed)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
@@ -0,0 +1,40 @@
+"""
+Tests for analysis payload hashing (incremental UserAnalysis writes).
+
+Run: python3 -m pytest tests/test_analysis_store.py -v
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.analysis_store import content_hash
+
+
+def _payload(**overrides):
+    payload = {
+        "nse_code": "TCS",
+        "pe_ttm": 29.4,
+        "last_updated": "2024-06-03T10:00:00",
+        "price_updated_at": "2024-06-03T10:00:00",
+        "_quality": {"score": 85, "sources_used": ["yfinance"], "last_updated": "2024-06-03T10:00:00"},
+    }
+    payload.update(overrides)
+    return payload
+
+
+class TestContentHash:
+    """Only value changes move the hash"""
+
+    def test_refresh_timestamps_are_ignored(self):
+        refreshed = _payload(
+            last_updated="2024-06-04T10:00:00",
+            price_updated_at="2024-06-04T10:00:00",
+            _quality={"score": 85, "sources_used": ["yfinance"], "last_updated": "2024-06-04T10:00:00"},
+        )
+        assert content_hash(refreshed) == content_hash(_payload())
+
+    def test_value_changes_move_the_hash(self):
+        assert content_hash(_payload(pe_ttm=30.1)) != content_hash(_payload())
+        assert content_hash(_payload(_quality={"score": 60})) != content_hash(_payload())
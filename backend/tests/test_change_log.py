@@ -0,0 +1,88 @@
+"""
+Tests for the stock change log (change-data-capture feed).
+
+Run: python3 -m pytest tests/test_change_log.py -v
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from database.db_config import db_config
+from database.migrations import run_migrations
+from services.change_log import ChangeLog
+
+
+@pytest.fixture
+def scratch_db(tmp_path):
+    """Point db_config at a throwaway SQLite database"""
+    saved = (db_config.sqlite_path, db_config.is_production)
+    db_config.is_production = False
+    db_config.sqlite_path = str(tmp_path / "change_log.db")
+    db_config.init_database()
+    run_migrations()
+    db_config.execute_query("INSERT INTO stocks (stock_name, nse_code) VALUES ('Infosys', 'INFY')")
+    yield db_config
+    db_config.sqlite_path, db_config.is_production = saved
+
+
+def _record(db, change_id, age_seconds=0):
+    db.execute_query(
+        f"""
+        INSERT INTO stock_changes (id, stock_id, field, old_value, new_value, changed_at)
+        VALUES (?, 1, 'current_price', '1', '2', datetime('now', '-{age_seconds} seconds'))
+        """,
+        (change_id,),
+    )
+
+
+class TestSafeHorizon:
+    """Reads stop before ids that may still be committing"""
+
+    def test_recent_gap_holds_back_later_changes(self, scratch_db):
+        log = ChangeLog(scratch_db)
+        for change_id in (1, 2, 4, 5):  # 3 is still in flight
+            _record(scratch_db, change_id)
+
+        batch = log.changes_since(0)
+        assert [c["id"] for c in batch["changes"]] == [1, 2]
+        assert batch["cursor"] == 2
+        assert log.cursor() == 2
+
+        _record(scratch_db, 3)  # commits late
+        batch = log.changes_since(batch["cursor"])
+        assert [c["id"] for c in batch["changes"]] == [3, 4, 5]
+
+    def test_settled_gap_is_skipped(self, scratch_db):
+        log = ChangeLog(scratch_db)
+        _record(scratch_db, 1, age_seconds=600)
+        _record(scratch_db, 3, age_seconds=600)  # 2 was rolled back long ago
+
+        assert [c["id"] for c in log.changes_since(0)["changes"]] == [1, 3]
+
+
+class TestLockedUpdate:
+    """Diff and write happen in one locked transaction"""
+
+    def test_old_value_read_inside_transaction(self, scratch_db):
+        with scratch_db.locked_transaction() as tx:
+            row = tx.execute(
+                f"SELECT current_price FROM stocks WHERE id = ?{tx.for_update}", (1,), fetch_one=True
+            )
+            assert row["current_price"] is None
+            tx.execute("UPDATE stocks SET current_price = ? WHERE id = ?", (101.5, 1))
+
+        row = scratch_db.execute_query("SELECT current_price FROM stocks WHERE id = 1", fetch_one=True)
+        assert float(row["current_price"]) == 101.5
+
+    def test_failed_transaction_rolls_back(self, scratch_db):
+        with pytest.raises(RuntimeError):
+            with scratch_db.locked_transaction() as tx:
+                tx.execute("UPDATE stocks SET current_price = ? WHERE id = ?", (99, 1))
+                raise RuntimeError("writer failed")
+
+        row = scratch_db.execute_query("SELECT current_price FROM stocks WHERE id = 1", fetch_one=True)
+        assert row["current_price"] is None
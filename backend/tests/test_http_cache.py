@@ -0,0 +1,101 @@
+"""
+Tests for the record/replay HTTP cache (no network: the transport is faked).
+
+Run: python3 -m pytest tests/test_http_cache.py -v
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import requests
+from requests.models import Response
+
+from services import http_cache
+from services.http_cache import HTTPCache
+
+
+def _response(status_code, content=b"{}"):
+    response = Response()
+    response.status_code = status_code
+    response._content = content
+    response.url = "https://example"
+    return response
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return HTTPCache(
+        mode="cache",
+        path=str(tmp_path / "http_cache.db"),
+        hosts=("nseindia.com", "moneycontrol.com"),
+        auth_headers=("authorization",),
+    )
+
+
+@pytest.fixture
+def transport(monkeypatch, cache):
+    """Fake requests transport: counts live calls, answers with queued statuses"""
+    calls = []
+    statuses = []
+
+    def fake_request(session, method, url, **kwargs):
+        calls.append((method, url))
+        return _response(statuses.pop(0) if statuses else 200, b'{"ok": true}')
+
+    monkeypatch.setattr(requests.Session, "request", fake_request)
+    assert http_cache.install(cache)
+    yield calls, statuses
+    http_cache.uninstall()
+
+
+class TestRequestsCache:
+    """Only unauthenticated 2xx GETs to market-data hosts are stored"""
+
+    def test_market_data_get_is_cached(self, transport):
+        calls, _ = transport
+        first = requests.get("https://www.nseindia.com/api/quote-equity?symbol=TCS")
+        second = requests.get("https://www.nseindia.com/api/quote-equity?symbol=TCS")
+
+        assert len(calls) == 1
+        assert second.json() == first.json() == {"ok": True}
+
+    def test_error_statuses_are_not_cached(self, transport):
+        calls, statuses = transport
+        statuses.extend([429, 404, 200])
+        for _ in range(3):
+            requests.get("https://www.nseindia.com/api/quote-equity?symbol=TCS")
+
+        assert len(calls) == 3
+
+    def test_other_hosts_posts_and_auth_pass_through(self, transport):
+        calls, _ = transport
+        for _ in range(2):
+            requests.post("https://api.openai.com/v1/chat/completions", json={"q": 1})
+            requests.get("https://api.openai.com/v1/models")
+            requests.post("https://www.nseindia.com/api/search", data={"q": "TCS"})
+            requests.get(
+                "https://www.moneycontrol.com/private",
+                headers={"Authorization": "Bearer secret"},
+            )
+
+        assert len(calls) == 8
+
+
+class TestCachedCall:
+    """Library call results are stored as JSON, None is never stored"""
+
+    def test_none_is_not_stored(self, monkeypatch, cache):
+        monkeypatch.setattr(http_cache, "http_cache", cache)
+        results = [None, {"price": 1.5}]
+
+        @http_cache.cached_call("nse.quote")
+        def fetch(symbol):
+            return results.pop(0)
+
+        assert fetch("TCS") is None
+        assert fetch("TCS") == {"price": 1.5}
+        assert fetch("TCS") == {"price": 1.5}
+        assert results == []
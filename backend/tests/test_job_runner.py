@@ -0,0 +1,51 @@
+"""
+Tests for job leases and the per-type concurrency limit.
+
+Run: python3 -m pytest tests/test_job_runner.py -v
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+
+import pytest
+
+from database.db_config import db_config
+from database.migrations import run_migrations
+from services.job_runner import JobStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    """JobStore on a throwaway SQLite database"""
+    saved = (db_config.sqlite_path, db_config.is_production)
+    db_config.is_production = False
+    db_config.sqlite_path = str(tmp_path / "jobs.db")
+    db_config.init_database()
+    run_migrations()
+    yield JobStore(db_config)
+    db_config.sqlite_path, db_config.is_production = saved
+
+
+class TestClaim:
+    """Claims never exceed the type's concurrency limit"""
+
+    def test_claim_respects_limit(self, store):
+        first, second = store.create("enrich", {"n": 1}), store.create("enrich", {"n": 2})
+        cutoff = time.time() - 120
+
+        assert store.claim(first, "enrich", "host-a:1", cutoff, limit=1)
+        assert not store.claim(second, "enrich", "host-b:2", cutoff, limit=1)
+        assert store.get(second)["status"] == "queued"
+        assert store.claim(second, "enrich", "host-b:2", cutoff, limit=2)
+
+    def test_abandoned_lease_frees_its_slot(self, store):
+        first, second = store.create("enrich", {"n": 1}), store.create("enrich", {"n": 2})
+        store.claim(first, "enrich", "host-a:1", time.time() - 120, limit=1)
+
+        # host-a stopped heartbeating: its lease is past the cutoff
+        later_cutoff = time.time() + 1
+        assert store.claim(second, "enrich", "host-b:2", later_cutoff, limit=1)
@@ -0,0 +1,66 @@
+"""
+Tests for the memory-mapped OHLCV store's incremental writes.
+
+Run: python3 -m pytest tests/test_ohlcv_store.py -v
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+from services.ohlcv_store import OHLCVStore, make_records
+
+DATES = np.datetime64("2024-06-03") + np.arange(6)
+
+
+def _bars(days, close, adj_close=None, volume=1000.0):
+    close = np.asarray(close, dtype=float)
+    return make_records(
+        DATES[days],
+        open=close,
+        high=close,
+        low=close,
+        close=close,
+        adj_close=close if adj_close is None else np.asarray(adj_close, dtype=float),
+        volume=np.full(len(close), volume),
+    )
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = OHLCVStore(str(tmp_path / "ohlcv"))
+    store.append("TEST.NS", _bars(slice(0, 4), [100, 100, 100, 100]))
+    return store
+
+
+class TestCorporateActions:
+    """Older bars are restated on the basis of each new download"""
+
+    def test_split_rescales_history(self, store):
+        # 2:1 split: Yahoo restates Close and Adj Close of every older bar
+        store.append("TEST.NS", _bars(slice(2, 6), [50, 50, 50, 51], volume=2000.0))
+
+        bars = store.bars("TEST.NS")
+        assert list(bars["close"]) == [50, 50, 50, 50, 50, 51]
+        assert list(bars["adj_close"]) == [50, 50, 50, 50, 50, 51]
+        assert list(bars["open"][:2]) == [50, 50]
+        assert list(bars["volume"][:2]) == [2000, 2000]
+
+    def test_dividend_rescales_adj_close_only(self, store):
+        store.append("TEST.NS", _bars(slice(2, 6), [100, 100, 98, 99], adj_close=[98, 98, 98, 99]))
+
+        bars = store.bars("TEST.NS")
+        assert list(bars["close"]) == [100, 100, 100, 100, 98, 99]
+        assert list(bars["adj_close"]) == pytest.approx([98, 98, 98, 98, 98, 99])
+
+    def test_mid_session_bar_is_not_a_split(self, store):
+        # Only the last stored bar overlaps and it was stored mid-session
+        store.append("TEST.NS", _bars(slice(3, 5), [104, 105]))
+
+        bars = store.bars("TEST.NS")
+        assert list(bars["close"]) == [100, 100, 100, 104, 105]
+        assert list(bars["adj_close"]) == [100, 100, 100, 104, 105]
@@ -0,0 +1,84 @@
+"""
+Tests for the portfolio optimizer's estimators and solver (no database).
+
+Run: python3 -m pytest tests/test_portfolio_optimizer.py -v
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+from services.portfolio_optimizer import OptimizationError, equal_risk_contribution, ledoit_wolf, solve
+
+# Demeaned returns with variances 4 and 1 and no correlation. By hand:
+# mu = 2.5, delta = ((4 - 2.5)^2 + (1 - 2.5)^2) / 2 = 2.25,
+# beta = sum over days of |x x' - S|^2 / n^2 / p = 32 / 16 / 2 = 1,
+# shrinkage = beta / delta = 4/9 -> 5/9 * diag(4, 1) + 4/9 * 2.5 * I
+RETURNS = np.array([[2.0, 1.0], [2.0, -1.0], [-2.0, 1.0], [-2.0, -1.0]])
+
+
+class TestLedoitWolf:
+    """Shrinkage intensity and covariance on a fixed matrix"""
+
+    def test_hand_checked_shrinkage(self):
+        covariance, shrinkage = ledoit_wolf(RETURNS)
+
+        assert shrinkage == pytest.approx(4 / 9)
+        np.testing.assert_allclose(covariance, [[30 / 9, 0], [0, 15 / 9]])
+
+    def test_mean_is_removed(self):
+        covariance, shrinkage = ledoit_wolf(RETURNS + 0.5)
+
+        assert shrinkage == pytest.approx(4 / 9)
+        np.testing.assert_allclose(covariance, [[30 / 9, 0], [0, 15 / 9]])
+
+    def test_no_shrinkage_when_sample_is_the_target(self):
+        _, shrinkage = ledoit_wolf(np.array([[1.0, 1.0], [1.0, -1.0], [-1.0, 1.0], [-1.0, -1.0]]))
+        assert shrinkage == 0
+
+
+class TestRiskParity:
+    """Every holding contributes the same share of risk"""
+
+    def test_uncorrelated_weights_are_inverse_volatility(self):
+        weights, _ = equal_risk_contribution(np.diag([4.0, 1.0]))
+        np.testing.assert_allclose(weights, [1 / 3, 2 / 3], atol=1e-9)
+
+    def test_equal_contributions_with_correlation(self):
+        cov = np.array([[0.04, 0.006, 0.01], [0.006, 0.09, 0.012], [0.01, 0.012, 0.0225]])
+        weights, _ = equal_risk_contribution(cov)
+
+        contributions = weights * (cov @ weights)
+        np.testing.assert_allclose(contributions / contributions.sum(), [1 / 3] * 3, atol=1e-8)
+
+
+class TestSolve:
+    """Closed-form optima on diagonal covariances"""
+
+    cov = np.diag([0.04, 0.09])
+    mu = np.array([0.10, 0.20])
+
+    def test_min_variance_is_inverse_variance(self):
+        weights, info = solve("min_variance", self.mu, self.cov)
+        assert info["success"]
+        np.testing.assert_allclose(weights, [9 / 13, 4 / 13], atol=1e-6)
+
+    def test_max_sharpe_is_tangency(self):
+        # w ~ inverse(cov) @ (mu - rf) = [2.5, 2.22]
+        weights, _ = solve("max_sharpe", self.mu, self.cov, risk_free=0.0)
+        np.testing.assert_allclose(weights, np.array([2.5, 20 / 9]) / (2.5 + 20 / 9), atol=1e-5)
+
+    def test_caps_and_group_limits_bind(self):
+        weights, _ = solve("min_variance", self.mu, self.cov, max_weight=0.6)
+        np.testing.assert_allclose(weights, [0.6, 0.4], atol=1e-6)
+
+        weights, _ = solve("min_variance", self.mu, self.cov, groups=[(np.array([True, False]), 0.25)])
+        np.testing.assert_allclose(weights, [0.25, 0.75], atol=1e-6)
+
+    def test_infeasible_caps_raise(self):
+        with pytest.raises(OptimizationError):
+            solve("min_variance", self.mu, self.cov, max_weight=0.4)
@@ -0,0 +1,43 @@
+"""
+Tests for the portfolio risk engine (price history is faked, no database).
+
+Run: python3 -m pytest tests/test_portfolio_risk.py -v
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+from services.portfolio_risk import PortfolioRiskEngine
+
+
+class FakeHistory:
+    """load_closes() over fixed (days x symbols) closes; the last column is the benchmark"""
+
+    def __init__(self, closes):
+        self.closes = np.asarray(closes, dtype=float)
+        self.dates = np.datetime64("2024-01-01") + np.arange(len(self.closes))
+
+    def load_closes(self, symbols, days):
+        return self.dates[-days:], symbols, self.closes[-days:]
+
+
+class TestMaxDrawdown:
+    """Drawdowns are measured from the starting value"""
+
+    def test_first_day_loss_counts(self):
+        # 100 closes falling 1% a day: 99 losing days from the first close
+        prices = 100 * 0.99 ** np.arange(100)
+        market = 100 * 1.001 ** np.arange(100)
+        history = FakeHistory(np.column_stack([prices, market]))
+
+        report = PortfolioRiskEngine(history).analyze({"FALL": None}, days=99)
+        drawdown = report["max_drawdown"]
+
+        assert drawdown["value"] == pytest.approx(0.99**99 - 1, abs=1e-6)  # -0.6303
+        assert drawdown["peak_date"] == str(history.dates[0])
+        assert drawdown["trough_date"] == str(history.dates[-1])
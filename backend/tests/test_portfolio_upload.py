@@ -0,0 +1,66 @@
+"""
+Tests for streaming portfolio uploads (row parsing and quantity totals).
+
+Run: python3 -m pytest tests/test_portfolio_upload.py -v
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import io
+
+import pytest
+
+from services.portfolio_upload import PortfolioUploader, parse_quantity
+
+
+class RecordingUploader(PortfolioUploader):
+    """Keeps the inserted names and quantities instead of writing them"""
+
+    def __init__(self):
+        super().__init__(chunk_size=2)
+        self.names, self.quantities = [], []
+
+    def _insert(self, user_id, names):
+        self.names.extend(names)
+        return len(names)
+
+    def _set_quantities(self, user_id, entries):
+        self.quantities.extend(entries)
+        return len(entries)
+
+
+class TestParseQuantity:
+    """Broker export cells -> non-negative quantities"""
+
+    @pytest.mark.parametrize(
+        "value, expected",
+        [(5, 5.0), (2.5, 2.5), ("1,200", 1200.0), (" 15 ", 15.0), ("", None), (None, None), (float("nan"), None)],
+    )
+    def test_valid(self, value, expected):
+        assert parse_quantity(value) == expected
+
+    @pytest.mark.parametrize("value", ["-3", -1, "abc", "inf"])
+    def test_invalid(self, value):
+        with pytest.raises(ValueError):
+            parse_quantity(value)
+
+
+class TestImportFile:
+    """Lots are summed per stock; bad rows are reported, not fatal"""
+
+    def test_csv_with_lots(self):
+        csv = "Symbol,Qty\nTCS,10\ntcs,5\n\nINFY,\nRELIANCE,abc\n,3\nHDFCBANK,\"1,000\"\n"
+        uploader = RecordingUploader()
+
+        result = uploader.import_file(1, io.BytesIO(csv.encode()), "holdings.csv")
+
+        assert uploader.names == ["TCS", "INFY", "HDFCBANK"]
+        assert sorted(uploader.quantities) == [["HDFCBANK", 1000.0], ["TCS", 15.0]]
+        assert (result["rows"], result["added"], result["duplicates"], result["quantities"]) == (6, 3, 1, 2)
+        assert [(error["row"], error["error"]) for error in result["errors"]] == [
+            (6, "Invalid quantity"),
+            (7, "Missing stock name"),
+        ]
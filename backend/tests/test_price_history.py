@@ -0,0 +1,68 @@
+"""
+Tests for the daily_prices history (appends and corporate-action restatements).
+
+Run: python3 -m pytest tests/test_price_history.py -v
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from database.db_config import db_config
+from database.migrations import run_migrations
+from services.price_history import PriceHistory
+
+DATES = [(date.today() - timedelta(days=10 - i)).isoformat() for i in range(6)]
+
+
+@pytest.fixture
+def history(tmp_path):
+    """PriceHistory on a throwaway SQLite database holding four bars of 100"""
+    saved = (db_config.sqlite_path, db_config.is_production)
+    db_config.is_production = False
+    db_config.sqlite_path = str(tmp_path / "prices.db")
+    db_config.init_database()
+    run_migrations()
+    history = PriceHistory(db_config)
+    _append(history, slice(0, 4), [100, 100, 100, 100])
+    yield history
+    db_config.sqlite_path, db_config.is_production = saved
+
+
+def _append(history, days, close, adj_close=None):
+    close = np.asarray(close, dtype=float)[:, None]
+    adjusted = close if adj_close is None else np.asarray(adj_close, dtype=float)[:, None]
+    return history.append(DATES[days], ["TEST"], close, adjusted, high=close * 1.01, low=close * 0.99)
+
+
+def _stored(history, column):
+    _, _, bars = history.load_bars(["TEST"], days=10)
+    return list(bars[column][:, 0])
+
+
+class TestRestatement:
+    """Yahoo's restated history replaces the stored one"""
+
+    def test_plain_append_writes_from_last_date(self, history):
+        assert _append(history, slice(2, 6), [100, 100, 101, 102]) == 3
+        assert _stored(history, "close") == [100, 100, 100, 100, 101, 102]
+
+    def test_split_rescales_whole_history(self, history):
+        # 2:1 split: every earlier close and adj_close halves
+        _append(history, slice(2, 6), [50, 50, 50, 51])
+
+        assert _stored(history, "close") == [50, 50, 50, 50, 50, 51]
+        assert _stored(history, "adj_close") == [50, 50, 50, 50, 50, 51]
+        assert _stored(history, "high") == pytest.approx([50.5, 50.5, 50.5, 50.5, 50.5, 51.51])
+
+    def test_dividend_rescales_adj_close_only(self, history):
+        _append(history, slice(2, 6), [100, 100, 98, 99], adj_close=[98, 98, 98, 99])
+
+        assert _stored(history, "close") == [100, 100, 100, 100, 98, 99]
+        assert _stored(history, "adj_close") == pytest.approx([98, 98, 98, 98, 98, 99])
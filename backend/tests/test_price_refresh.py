@@ -0,0 +1,53 @@
+"""
+Tests for the batched price-only refresh (snapshots from multi-ticker bars).
+
+Run: python3 -m pytest tests/test_price_refresh.py -v
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from database.enrich_missing_fields import price_snapshots
+
+
+def _download(closes):
+    """yf.download-shaped frame: (field, ticker) columns, High/Low 1 around Close"""
+    index = pd.bdate_range("2024-01-01", periods=len(next(iter(closes.values()))))
+    fields = {"Close": 0, "High": 1, "Low": -1}
+    columns = {
+        (field, f"{code}.NS"): np.asarray(values, dtype=float) + offset
+        for field, offset in fields.items()
+        for code, values in closes.items()
+    }
+    return pd.DataFrame(columns, index=index)
+
+
+class TestPriceSnapshots:
+    """Change % and 52-week range from one aligned download"""
+
+    def test_hand_checked_fields(self):
+        rising = np.arange(100, 130)  # 30 bars: 100 ... 129
+        held = np.r_[np.full(29, 50.0), np.nan]  # no bar on the last day
+        bars = _download({"RISE": rising, "HOLD": held, "GONE": np.full(30, np.nan)})
+
+        snapshots = price_snapshots(bars, ["RISE", "HOLD", "GONE"])
+
+        rise = snapshots["RISE"]
+        assert rise["current_price"] == 129
+        assert rise["day_change_pct"] == pytest.approx((129 / 128 - 1) * 100)
+        assert rise["week_change_pct"] == pytest.approx((129 / 124 - 1) * 100)
+        assert rise["month_change_pct"] == pytest.approx((129 / 108 - 1) * 100)
+        assert rise["qtr_change_pct"] == pytest.approx(29.0)  # shorter history: from the first bar
+        assert (rise["week_52_high"], rise["week_52_low"]) == (130, 99)
+
+        # Last close carried over the missing bar
+        assert snapshots["HOLD"]["current_price"] == 50
+        assert snapshots["HOLD"]["day_change_pct"] == 0
+
+        assert "GONE" not in snapshots
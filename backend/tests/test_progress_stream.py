@@ -0,0 +1,54 @@
+"""
+Tests for the SSE progress stream (in-process broker, no Redis).
+
+Run: python3 -m pytest tests/test_progress_stream.py -v
+"""
+
+import os
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from services import progress_stream
+from services.progress_stream import ProgressPublisher, has_events, sse_stream
+
+
+@pytest.fixture(autouse=True)
+def local_broker(monkeypatch):
+    """Keep events in-process even if REDIS_URL is set"""
+    monkeypatch.setattr(progress_stream, "_get_redis", lambda: None)
+
+
+class TestShortStreams:
+    """Streams close well inside the worker timeout and resume on reconnect"""
+
+    def test_stream_closes_after_timeout(self):
+        task_id = str(uuid.uuid4())
+        ProgressPublisher(task_id).publish("progress", {"percent": 10})
+
+        started = time.time()
+        chunks = list(sse_stream(task_id, timeout=0.2))
+
+        assert time.time() - started < progress_stream.HEARTBEAT_SECONDS
+        assert any("event: progress" in chunk for chunk in chunks)
+
+    def test_reconnect_skips_seen_events(self):
+        task_id = str(uuid.uuid4())
+        publisher = ProgressPublisher(task_id)
+        publisher.publish("progress", {"percent": 10})
+        publisher.publish("done", {"ok": True})
+
+        chunks = list(sse_stream(task_id, last_event_id=1, timeout=0.2))
+
+        assert not any("event: progress" in chunk for chunk in chunks)
+        assert any("id: 2\nevent: done" in chunk for chunk in chunks)
+
+    def test_unknown_task_has_no_events(self):
+        task_id = str(uuid.uuid4())
+        assert not has_events(task_id)
+        ProgressPublisher(task_id).publish("progress", {"percent": 0})
+        assert has_events(task_id)
@@ -0,0 +1,110 @@
+"""
+Tests for the refresh scheduler: candidate query, overlap lock and view counts.
+
+Run: python3 -m pytest tests/test_refresh_scheduler.py -v
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+
+import pytest
+
+from database.db_config import db_config
+from database.migrations import run_migrations
+from services.refresh_scheduler import RefreshScheduler, ViewTracker
+
+
+@pytest.fixture
+def scratch_db(tmp_path):
+    """Point db_config at a throwaway SQLite database"""
+    saved = (db_config.sqlite_path, db_config.is_production)
+    db_config.is_production = False
+    db_config.sqlite_path = str(tmp_path / "scheduler.db")
+    db_config.init_database()
+    run_migrations()
+    yield db_config
+    db_config.sqlite_path, db_config.is_production = saved
+
+
+class TestCandidateHolders:
+    """Portfolio holders are counted once per stock"""
+
+    def test_stock_held_by_code_and_by_name(self, scratch_db):
+        scratch_db.execute_many(
+            "INSERT INTO stocks (stock_name, nse_code) VALUES (?, ?)",
+            [("Tata Consultancy Services", "TCS"), ("Infosys", "INFY")],
+        )
+        scratch_db.execute_many(
+            "INSERT INTO users (id, email, name, password_hash) VALUES (?, ?, ?, ?)",
+            [("u1", "a@example.com", "A", "x"), ("u2", "b@example.com", "B", "x")],
+        )
+        scratch_db.execute_many(
+            "INSERT INTO user_portfolio (user_id, stock_name) VALUES (?, ?)",
+            [
+                ("u1", "TCS"),
+                ("u1", "Tata Consultancy Services"),
+                ("u2", "tata consultancy services"),
+            ],
+        )
+
+        rows = RefreshScheduler(db=scratch_db)._load_candidates()
+        tcs = [row for row in rows if row["nse_code"] == "TCS"]
+        infy = [row for row in rows if row["nse_code"] == "INFY"]
+
+        assert len(tcs) == 1
+        assert tcs[0]["holders"] == 2
+        assert len(infy) == 1
+        assert infy[0]["holders"] == 0
+
+
+class FakeRedis:
+    """SET NX and the compare-and-delete release script"""
+
+    def __init__(self):
+        self.data = {}
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def eval(self, script, numkeys, key, token):
+        if self.data.get(key) == token:
+            del self.data[key]
+
+
+class TestScheduledRefreshLock:
+    """Overlapping beat ticks skip instead of refreshing the same stocks"""
+
+    def test_second_run_is_skipped_while_first_holds_lock(self):
+        from tasks.portfolio_tasks import task_lock
+
+        redis = FakeRedis()
+        with task_lock("refresh", 60, client=redis) as first:
+            with task_lock("refresh", 60, client=redis) as second:
+                assert (first, second) == (True, False)
+            assert "refresh" in redis.data  # the skipped run leaves the lock alone
+
+        with task_lock("refresh", 60, client=redis) as third:
+            assert third is True
+
+
+class TestViewTracker:
+    """Buffered views reach the table without further traffic"""
+
+    def test_idle_buffer_is_flushed_on_timer(self, scratch_db):
+        scratch_db.execute_query("INSERT INTO stocks (stock_name, nse_code) VALUES ('Infosys', 'INFY')")
+        tracker = ViewTracker(scratch_db)
+        tracker.FLUSH_INTERVAL = 0.05
+
+        tracker.record("INFY")
+        tracker.record("INFY")
+        time.sleep(0.3)
+
+        row = scratch_db.execute_query("SELECT views FROM stock_views", fetch_one=True)
+        assert row["views"] == 2
@@ -0,0 +1,82 @@
+"""
+Tests for universe-wide rescoring: BatchScorer must match ScoreService.
+
+Run: python3 -m pytest tests/test_score_service.py -v
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from services.score_service import BatchScorer, ScoreService
+
+# Column -> values drawn for it: rule thresholds, both sides of them, zero and missing
+SAMPLES = {
+    "roa_annual_pct": [None, -2, 0, 5, 10, 12],
+    "operating_margin_pct": [None, -1, 0, 8],
+    "debt_to_equity": [None, 0, 0.05, 0.1, 0.8, 1.0, 2.5],
+    "current_ratio": [None, 1.2, 1.5, 2.0],
+    "net_profit_margin_pct": [None, 4, 10, 18],
+    "eps_growth_pct": [None, -5, 0, 12],
+    "promoter_holding_pct": [None, 20, 30, 55],
+    "roe_annual_pct": [None, 0, 15, 22],
+    "pe_ttm": [None, -8, 0, 12, 15, 22, 30, 45],
+    "peg_ratio": [None, -1, 0, 0.8, 1.5, 2],
+    "pb_ratio": [None, 0, 1.2, 3, 6],
+    "dividend_yield_pct": [None, 0.5, 1, 2.5],
+    "rel_strength_score": [None, 0, 35, 99],
+    "year_1_change_pct": [None, -10, 0, 10, 20, 35, 50, 80],
+    "current_price": [None, 0, 90, 100, 140],
+    "week_52_high": [None, 0, 100, 110, 130, 150],
+    "week_52_low": [None, 0, 60, 85, 95],
+}
+
+
+def _rows(count=500, seed=7):
+    rng = np.random.default_rng(seed)
+    return [
+        {column: values[rng.integers(len(values))] for column, values in SAMPLES.items()}
+        for _ in range(count)
+    ]
+
+
+def _expected(row):
+    """ScoreService on one stock (momentum reads the API's camelCase keys)"""
+    momentum_input = {
+        "rel_strength_score": row["rel_strength_score"],
+        "year1Change": None if row["year_1_change_pct"] is None else row["year_1_change_pct"] / 100,
+        "currentPrice": row["current_price"],
+        "week52High": row["week_52_high"],
+        "week52Low": row["week_52_low"],
+    }
+    return (
+        ScoreService.calculate_durability(row),
+        ScoreService.calculate_valuation(row),
+        ScoreService.calculate_momentum(momentum_input),
+    )
+
+
+class TestBatchScorer:
+    """Vectorized scores equal the per-stock scores on the same rows"""
+
+    def test_matches_score_service(self):
+        rows = _rows()
+        columns = {
+            name: np.array([0.0 if row[name] is None else float(row[name]) for row in rows])
+            for name in BatchScorer.COLUMNS
+        }
+
+        scores = BatchScorer(db=object()).score_columns(columns)
+        batch = list(zip(scores["durability_score"], scores["valuation_score"], scores["momentum_score"]))
+
+        assert [tuple(map(int, scored)) for scored in batch] == [_expected(row) for row in rows]
+
+    def test_earnings_yield_and_roce_proxy(self):
+        columns = {"pe_ttm": np.array([20.0, 0.0, -5.0]), "roe_annual_pct": np.array([18.0, 0.0, -3.0])}
+
+        assert list(BatchScorer.earnings_yield(columns)) == [5.0, 0.0, 0.0]
+        roce = BatchScorer.roce_proxy(columns)
+        assert roce[0] == 18 and np.isnan(roce[1]) and roce[2] == -3
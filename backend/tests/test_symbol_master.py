@@ -0,0 +1,73 @@
+"""
+Tests for symbol master bulk writes.
+
+Run: python3 -m pytest tests/test_symbol_master.py -v
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from database.db_config import db_config
+from database.migrations import run_migrations
+from services.symbol_master import SymbolMaster
+
+
+@pytest.fixture
+def master(tmp_path):
+    """SymbolMaster on a throwaway SQLite database"""
+    saved = (db_config.sqlite_path, db_config.is_production)
+    db_config.is_production = False
+    db_config.sqlite_path = str(tmp_path / "symbol_master.db")
+    db_config.init_database()
+    run_migrations()
+    yield SymbolMaster(db_config)
+    db_config.sqlite_path, db_config.is_production = saved
+
+
+def _codes(db):
+    rows = db.execute_query("SELECT isin, nse_code FROM symbol_master ORDER BY nse_code")
+    return [(row["isin"], row["nse_code"]) for row in rows]
+
+
+class TestUpsertConflicts:
+    """One conflicting record does not drop the rest of the batch"""
+
+    def test_nse_code_added_after_load_is_merged(self, master):
+        master.upsert([{"nse_code": "TCS", "company_name": "Tata Consultancy"}])
+        # Row written by another process after this instance built its indexes
+        db_config.execute_query("INSERT INTO symbol_master (nse_code) VALUES ('INFY')")
+
+        result = master.upsert(
+            [
+                {"isin": "INE009A01021", "nse_code": "INFY", "company_name": "Infosys"},
+                {"isin": "INE040A01034", "nse_code": "HDFCBANK", "company_name": "HDFC Bank"},
+            ],
+            reload=False,
+        )
+
+        assert result["failed"] == 0
+        assert _codes(db_config) == [("INE040A01034", "HDFCBANK"), ("INE009A01021", "INFY"), (None, "TCS")]
+
+    def test_isin_conflict_skips_only_that_record(self, master):
+        master.upsert([{"isin": "INE467B01029", "nse_code": "TCS"}])
+        # Row written by another process after this instance built its indexes
+        db_config.execute_query("INSERT INTO symbol_master (isin, nse_code) VALUES ('INE009A01021', 'INFY')")
+
+        result = master.upsert(
+            [
+                {"isin": "INE009A01021", "nse_code": "INFY1"},  # ISIN already taken
+                {"isin": "INE040A01034", "nse_code": "HDFCBANK"},
+            ],
+            reload=False,
+        )
+
+        assert result["failed"] == 1
+        assert _codes(db_config) == [
+            ("INE040A01034", "HDFCBANK"),
+            ("INE009A01021", "INFY"),
+            ("INE467B01029", "TCS"),
+        ]
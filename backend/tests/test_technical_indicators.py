@@ -0,0 +1,119 @@
+"""
+Tests for the vectorized technical indicators against pandas references.
+
+Run: python3 -m pytest tests/test_technical_indicators.py -v
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from services.technical_indicators import adx, beta, compute_indicators, ewm, last_sma, macd, rsi
+
+DAYS = 300
+LISTED_FROM = 120  # The last stock has no bars before this day
+
+
+@pytest.fixture(scope="module")
+def panels():
+    rng = np.random.default_rng(11)
+    market = 100 * np.cumprod(1 + rng.normal(0.0005, 0.01, DAYS))
+    returns = 0.8 * (market[1:] / market[:-1] - 1)[:, None] + rng.normal(0, 0.015, (DAYS - 1, 3))
+    close = 100 * np.vstack([np.ones(3), np.cumprod(1 + returns, axis=0)])
+    spread = rng.uniform(0.002, 0.03, (DAYS, 3))
+    high, low = close * (1 + spread), close * (1 - spread)
+    for values in (close, high, low):
+        values[:LISTED_FROM, -1] = np.nan
+    return close, high, low, market
+
+
+def _columns(*arrays):
+    """Per stock: its bars as pandas Series, from its first bar on"""
+    for j in range(arrays[0].shape[1]):
+        yield [pd.Series(values[:, j]).dropna().reset_index(drop=True) for values in arrays]
+
+
+def _wilder(series, period=14):
+    return series.ewm(alpha=1 / period, adjust=False, min_periods=period).mean()
+
+
+def reference_rsi(close):
+    change = close.diff().iloc[1:]
+    gain, loss = _wilder(change.clip(lower=0)), _wilder(-change.clip(upper=0))
+    return 100 - 100 / (1 + gain.iloc[-1] / loss.iloc[-1])
+
+
+def reference_adx(high, low, close):
+    up, down = high.diff(), -low.diff()
+    plus_dm = up.where((up > down) & (up > 0), 0.0).iloc[1:]
+    minus_dm = down.where((down > up) & (down > 0), 0.0).iloc[1:]
+    previous = close.shift()
+    true_range = pd.concat(
+        [high - low, (high - previous).abs(), (low - previous).abs()], axis=1
+    ).max(axis=1).iloc[1:]
+    atr = _wilder(true_range)
+    plus_di, minus_di = 100 * _wilder(plus_dm) / atr, 100 * _wilder(minus_dm) / atr
+    dx = 100 * (plus_di - minus_di).abs() / (plus_di + minus_di)
+    return _wilder(dx).iloc[-1]
+
+
+class TestAgainstPandas:
+    """Each column matches pandas on that stock alone"""
+
+    def test_ewm(self, panels):
+        close = panels[0]
+        values = ewm(close, 2 / 21, 20)
+        for j, (series,) in enumerate(_columns(close)):
+            expected = series.ewm(span=20, adjust=False, min_periods=20).mean()
+            np.testing.assert_allclose(values[-len(series):, j], expected, equal_nan=True)
+
+    def test_rsi_and_macd(self, panels):
+        close = panels[0]
+        values_rsi, values_macd = rsi(close), macd(close)
+        for j, (series,) in enumerate(_columns(close)):
+            assert values_rsi[j] == pytest.approx(reference_rsi(series))
+            fast, slow = (series.ewm(span=span, adjust=False).mean().iloc[-1] for span in (12, 26))
+            assert values_macd[j] == pytest.approx(fast - slow)
+
+    def test_adx(self, panels):
+        close, high, low, _ = panels
+        values = adx(high, low, close)
+        for j, (h, l, c) in enumerate(_columns(high, low, close)):
+            assert values[j] == pytest.approx(reference_adx(h, l, c))
+
+    def test_beta_and_sma(self, panels):
+        close, _, _, market = panels
+        values = beta(close, market)
+        for j, (series,) in enumerate(_columns(close)):
+            returns = series.pct_change()
+            index = pd.Series(market[-len(series):]).pct_change()
+            assert values[j] == pytest.approx(returns.cov(index) / index.var())
+            assert last_sma(close, 50)[j] == pytest.approx(series.iloc[-50:].mean())
+
+    def test_short_history_is_nan(self, panels):
+        close, high, low, market = panels
+        values = compute_indicators(close[-30:], high[-30:], low[-30:], market[-30:])
+
+        assert np.isnan(values["sma_50"]).all() and np.isnan(values["beta_1yr"]).all()
+        assert np.isfinite(values["rsi"]).all()
+
+
+class TestHandChecked:
+    """Values that need no reference"""
+
+    def test_rsi_extremes(self):
+        rising = np.arange(1.0, 31.0)[:, None]
+        flat = np.full((30, 1), 5.0)
+        assert rsi(rising)[0] == 100
+        assert rsi(flat)[0] == 50
+
+    def test_beta_of_scaled_returns(self):
+        market = 100 * np.cumprod(1 + np.tile([0.01, -0.005, 0.002], 40))
+        stock = 50 * np.cumprod(1 + 2 * (market[1:] / market[:-1] - 1))
+        close = np.r_[50, stock][:, None]
+        assert beta(close, market)[0] == pytest.approx(2.0)
@@ -0,0 +1,78 @@
+"""
+Tests for the tiered cache's stale-while-revalidate behaviour (local tier only).
+
+Run: python3 -m pytest tests/test_tiered_cache.py -v
+"""
+
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import time
+
+from services.tiered_cache import TieredCache
+
+
+def _expired_cache():
+    """Cache holding 'old' for RELIANCE, past its TTL but within the stale window"""
+    cache = TieredCache(namespace="test", ttl=60, stale_ttl=3600, use_redis=False)
+    cache._set_local("RELIANCE", "old", time.time() - 120)
+    return cache
+
+
+class TestStaleServing:
+    """Readers may get stale entries, writers only fresh ones"""
+
+    def test_readers_get_stale_value(self):
+        cache = _expired_cache()
+        assert cache.get_or_load("RELIANCE", lambda: "new") == "old"
+        assert cache.stats["stale_hits"] == 1
+
+    def test_writers_reload_stale_value(self):
+        cache = _expired_cache()
+        assert cache.get_or_load("RELIANCE", lambda: "new", allow_stale=False) == "new"
+        assert cache.get("RELIANCE") == ("new", "fresh")
+        assert cache.stats["stale_hits"] == 0
+
+
+class FakeRedis:
+    """Just the get/set/delete subset TieredCache uses"""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def _shared_cache(redis):
+    cache = TieredCache(namespace="test", ttl=60, redis_url="redis://fake", local_tier=False)
+    cache._redis = redis
+    return cache
+
+
+class TestSharedOnly:
+    """Without a local tier every process sees invalidations at once"""
+
+    def test_delete_reaches_other_process(self):
+        redis = FakeRedis()
+        worker, web = _shared_cache(redis), _shared_cache(redis)
+
+        worker.set("value", {"results": [1]})
+        assert web.get("value") == ({"results": [1]}, "fresh")
+
+        worker.delete("value")
+        assert web.get("value") == (None, None)
+        assert len(web) == 0
+
+    def test_local_tier_kept_without_redis(self):
+        cache = TieredCache(namespace="test", ttl=60, use_redis=False, local_tier=False)
+        cache.set("value", 1)
+        assert cache.get("value") == (1, "fresh")
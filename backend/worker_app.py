@@ -10,6 +10,8 @@ import os
 from flask import Flask, jsonify, request
 from flask_cors import CORS
 
+from services.worker_jobs import register_worker_jobs
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
@@ -26,6 +28,9 @@ allowed_origins = [
 ]
 CORS(app, origins=allowed_origins)
 
+# Long-running tasks run as checkpointed background jobs
+job_runner = register_worker_jobs()
+
 
 @app.route("/health")
 def health():
@@ -47,6 +52,12 @@ def root():
                 "populate": "/worker/populate (POST)",
                 "refresh": "/worker/refresh (POST)",
                 "sync-fundamentals": "/worker/sync-fundamentals (POST)",
+                "rescore": "/worker/rescore (POST)",
+                "technicals": "/worker/technicals (POST)",
+                "jobs": "/worker/jobs (GET)",
+                "job-status": "/worker/jobs/<job_id> (GET)",
+                "cancel": "/worker/jobs/<job_id>/cancel (POST)",
+                "resume": "/worker/jobs/<job_id>/resume (POST)",
             },
         }
     )
@@ -59,34 +70,10 @@ def run_migrations():
     Safe to run multiple times (uses IF NOT EXISTS)
     """
     try:
-        from database.db_config import db_config
-        
-        migrations = [
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS durability_score INTEGER",
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS valuation_score INTEGER",
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS momentum_score INTEGER",
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS roce_annual_pct DECIMAL(10,2)",
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS earnings_yield_pct DECIMAL(10,2)",
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS rel_strength_score INTEGER",
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS target_price DECIMAL(10,2)",
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS recommendation_key VARCHAR(50)",
-            "ALTER TABLE stocks ADD COLUMN IF NOT EXISTS analyst_count INTEGER",
-        ]
-        
-        logger.info("Running database migrations...")
-        results = []
-        
-        for i, migration in enumerate(migrations, 1):
-            try:
-                db_config.execute_query(migration)
-                logger.info(f"✅ Migration {i}/{len(migrations)}: {migration[:60]}...")
-                results.append({"migration": i, "status": "success", "sql": migration[:60]})
-            except Exception as e:
-                logger.warning(f"⚠️  Migration {i} failed (may already exist): {e}")
-                results.append({"migration": i, "status": "skipped", "reason": str(e)[:100]})
-        
-        logger.info("✅ All migrations complete!")
-        
+        from database.migrations import run_migrations
+
+        results = run_migrations()
+
         return jsonify({
             "status": "success",
             "message": "Database migrations completed",
@@ -98,189 +85,170 @@ def run_migrations():
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
-@app.route("/worker/enrich", methods=["POST"])
-def enrich_stocks():
-    """
-    Enrich stocks with sector, industry, day_change_pct
-    Can take 20-30 minutes for all stocks
-    """
+def _submit_job(job_type: str, message: str):
+    """Queue a background job and return its ID immediately (202)"""
     try:
-        # Import here to avoid issues if module not found
-        from database.stock_populator import StockDataPopulator
-
-        # Get parameters from request
-        data = request.json or {}
-        batch_size = data.get("batch_size", 50)
-        max_stocks = data.get("max_stocks", None) # Optional limit
-
-        logger.info(f"Starting enrichment: batch_size={batch_size}")
-
-        # Run enrichment
-        populator = StockDataPopulator()
-        result = populator.enrich_stock_data(batch_size=batch_size, max_stocks=max_stocks)
+        params = request.get_json(silent=True) or {}
+        job = job_runner.submit(job_type, params)
 
-        logger.info(f"Enrichment complete: {result}")
+        logger.info(f"Queued {job_type} job {job['job_id']}: {params}")
 
         return jsonify(
             {
                 "status": "success",
-                "message": "Stock enrichment completed",
-                "data": result,
+                "message": message,
+                "job_id": job["job_id"],
+                "status_url": f"/worker/jobs/{job['job_id']}",
+                "data": job,
             }
-        )
+        ), 202
 
     except Exception as e:
-        logger.error(f"Enrichment failed: {str(e)}", exc_info=True)
+        logger.error(f"Failed to queue {job_type} job: {str(e)}", exc_info=True)
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@app.route("/worker/enrich", methods=["POST"])
+def enrich_stocks():
+    """
+    Enrich stocks with sector, industry, day_change_pct
+    Can take 20-30 minutes for all stocks (runs as a background job)
+
+    Body: {"batch_size": 50, "max_stocks": null}
+    """
+    return _submit_job("enrich", "Stock enrichment job queued")
+
+
 @app.route("/worker/populate", methods=["POST"])
 def populate_database():
     """
     Populate database with stock metadata
-    Can take 15-30 minutes
+    Can take 15-30 minutes (runs as a background job)
     """
-    try:
-        from database.stock_populator import StockDataPopulator, StockListFetcher
-
-        logger.info("Starting database population")
-        
-        # 1. Fetch latest list
-        stock_list = StockListFetcher.get_nse_stock_list()
-        
-        # 2. Populate/Update initial records
-        populator = StockDataPopulator()
-        result = populator.populate_initial_stocks(stock_list)
-
-        logger.info(f"Population complete: {result}")
-
-        return jsonify(
-            {
-                "status": "success",
-                "message": "Database population completed",
-                "data": result,
-            }
-        )
-
-    except Exception as e:
-        logger.error(f"Population failed: {str(e)}", exc_info=True)
-        return jsonify({"status": "error", "message": str(e)}), 500
+    return _submit_job("populate", "Database population job queued")
 
 
 @app.route("/worker/refresh", methods=["POST"])
 def refresh_stock_data():
     """
     Refresh stock data (daily prices, etc.)
-    Faster than full enrichment
+    Faster than full enrichment (runs as a background job)
     """
-    try:
-        from database.enrich_missing_fields import refresh_daily_prices
+    return _submit_job("refresh", "Daily refresh job queued")
+
+
+@app.route("/worker/sync-fundamentals", methods=["POST"])
+def sync_fundamentals():
+    """
+    Sync fundamental data from MoneyControl.
+    Updates: P&L, Balance Sheet, Cash Flow, Ratios
+    Can take 30-60 minutes for all stocks (runs as a background job)
 
-        logger.info("Starting daily refresh")
+    Body: {"batch_size": 50, "offset": 0}
+    """
+    return _submit_job("sync-fundamentals", "Fundamentals sync job queued")
 
-        result = refresh_daily_prices()
 
-        logger.info(f"Refresh complete: {result}")
+@app.route("/worker/rescore", methods=["POST"])
+def rescore_stocks():
+    """
+    Recompute scores for all stocks from stored data (no external fetches).
+    Runs inline - takes well under a second.
+    """
+    try:
+        from services.score_service import BatchScorer
+
+        result = BatchScorer().rescore_universe()
 
         return jsonify(
-            {"status": "success", "message": "Daily refresh completed", "data": result}
+            {"status": "success", "message": "Scores recomputed", "data": result}
         )
 
     except Exception as e:
-        logger.error(f"Refresh failed: {str(e)}", exc_info=True)
+        logger.error(f"Rescore failed: {str(e)}", exc_info=True)
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
-@app.route("/worker/sync-fundamentals", methods=["POST"])
-def sync_fundamentals():
+@app.route("/worker/technicals", methods=["POST"])
+def compute_technicals():
     """
-    Sync fundamental data from MoneyControl for all stocks.
-    Updates: P&L, Balance Sheet, Cash Flow, Ratios
-    Can take 30-60 minutes for all stocks.
+    Recompute technical indicators (RSI, MACD, ADX, beta, SMA/EMA) for all
+    stocks from the stored daily bars. Runs inline - a few seconds.
+
+    Body: {"days": 252}
     """
     try:
-        import time
-        from database.db_config import DatabaseConfig
-        from services.market_data_service import market_data_service
+        from services.technical_indicators import TechnicalIndicatorBatch
 
-        db_config = DatabaseConfig()
-        
-        # Get parameters
-        data = request.json or {}
-        batch_size = data.get("batch_size", 50)
-        offset = data.get("offset", 0)
-
-        logger.info(f"Starting MoneyControl fundamentals sync: batch_size={batch_size}, offset={offset}")
-
-        # Get stocks to sync
-        query = f"""
-            SELECT nse_code, stock_name 
-            FROM stocks 
-            ORDER BY market_cap DESC NULLS LAST
-            LIMIT %s OFFSET %s
-        """
-        stocks = db_config.execute_query(query, (batch_size, offset))
-
-        if not stocks:
-            return jsonify({
-                "status": "success",
-                "message": "No stocks to sync",
-                "data": {"synced": 0, "failed": 0}
-            })
-
-        synced = 0
-        failed = 0
-        results = []
-
-        for stock in stocks:
-            nse_code = stock["nse_code"]
-            try:
-                logger.info(f"Fetching fundamentals for {nse_code}...")
-                
-                # Fetch fundamentals from MoneyControl
-                fundamentals = market_data_service.get_fundamentals(nse_code)
-                
-                if "error" not in fundamentals:
-                    synced += 1
-                    results.append({"stock": nse_code, "status": "success"})
-                    logger.info(f"✅ Synced {nse_code}")
-                else:
-                    failed += 1
-                    results.append({"stock": nse_code, "status": "failed", "error": fundamentals.get("error")})
-                    logger.warning(f"⚠️ Failed to sync {nse_code}: {fundamentals.get('error')}")
-
-                # Rate limiting - don't hammer MoneyControl
-                time.sleep(2)
-
-            except Exception as e:
-                failed += 1
-                results.append({"stock": nse_code, "status": "error", "error": str(e)})
-                logger.error(f"❌ Error syncing {nse_code}: {e}")
-
-        logger.info(f"Fundamentals sync complete: {synced} synced, {failed} failed")
+        params = request.get_json(silent=True) or {}
+        result = TechnicalIndicatorBatch().run(days=params.get("days"))
 
-        return jsonify({
-            "status": "success",
-            "message": f"Fundamentals sync completed: {synced} synced, {failed} failed",
-            "data": {
-                "synced": synced,
-                "failed": failed,
-                "batch_size": batch_size,
-                "offset": offset,
-                "details": results[:10]  # Only return first 10 for brevity
-            }
-        })
+        return jsonify(
+            {"status": "success", "message": "Technical indicators recomputed", "data": result}
+        )
 
     except Exception as e:
-        logger.error(f"Fundamentals sync failed: {str(e)}", exc_info=True)
+        logger.error(f"Technical indicator batch failed: {str(e)}", exc_info=True)
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@app.route("/worker/jobs", methods=["GET"])
+def list_jobs():
+    """Recent jobs, newest first. Query: ?type=enrich&status=running&limit=20"""
+    try:
+        jobs = job_runner.list(
+            job_type=request.args.get("type"),
+            status=request.args.get("status"),
+            limit=request.args.get("limit", 20, type=int),
+        )
+        return jsonify({"status": "success", "data": jobs})
+
+    except Exception as e:
+        logger.error(f"Failed to list jobs: {str(e)}", exc_info=True)
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@app.route("/worker/jobs/<job_id>", methods=["GET"])
+def job_status(job_id):
+    """Job status and per-item progress (done / failed / pending)"""
+    job = job_runner.status(job_id)
+    if job is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    return jsonify({"status": "success", "data": job})
+
+
+@app.route("/worker/jobs/<job_id>/cancel", methods=["POST"])
+def cancel_job(job_id):
+    """Cancel a queued job, or stop a running one after its current batch"""
+    if not job_runner.cancel(job_id):
+        return jsonify(
+            {"status": "error", "message": "Job not found or already finished"}
+        ), 409
+    return jsonify(
+        {"status": "success", "message": "Cancellation requested", "data": job_runner.status(job_id)}
+    )
+
+
+@app.route("/worker/jobs/<job_id>/resume", methods=["POST"])
+def resume_job(job_id):
+    """
+    Resume a cancelled, failed or completed job from its checkpoint.
+    Done items are skipped; failed items are retried while they have attempts left.
+    """
+    if not job_runner.resume(job_id):
+        return jsonify(
+            {"status": "error", "message": "Job not found or still active"}
+        ), 409
+    return jsonify(
+        {"status": "success", "message": "Job resumed", "data": job_runner.status(job_id)}
+    ), 202
+
+
 @app.route("/worker/trigger/<task>", methods=["POST"])
 def trigger_task(task):
     """
     Manual task trigger (requires API key)
-    Tasks: enrich, populate, refresh
+    Tasks: enrich, populate, refresh, sync-fundamentals, technicals
     """
     # Check API key
     api_key = request.headers.get("X-API-Key")
@@ -299,6 +267,10 @@ def trigger_task(task):
         return populate_database()
     elif task == "refresh":
         return refresh_stock_data()
+    elif task == "sync-fundamentals":
+        return sync_fundamentals()
+    elif task == "technicals":
+        return compute_technicals()
     else:
         return jsonify({"status": "error", "message": f"Unknown task: {task}"}), 400
 
@@ -320,4 +292,9 @@ if __name__ == "__main__":
     debug = os.environ.get("FLASK_ENV") != "production"
 
     logger.info(f"Starting worker app on port {port}")
+
+    # Resume jobs interrupted by a restart (skip the debug reloader's parent process)
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        job_runner.start()
+
     app.run(host="0.0.0.0", port=port, debug=debug)
@@ -9,6 +9,8 @@ from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 import logging
 
+from .price_store import PriceStore, frame_to_records, records_to_frame
+
 logger = logging.getLogger(__name__)
 
 
@@ -23,9 +25,10 @@ class MarketDataProvider:
         Initialize market data provider.
 
         Args:
-            cache_dir: Directory to cache downloaded data
+            cache_dir: Directory to cache downloaded data (daily bars, see PriceStore)
         """
         self.cache_dir = cache_dir
+        self.price_store = PriceStore(cache_dir)
         logger.info(f"MarketDataProvider initialized with cache_dir: {cache_dir}")
 
     def get_stock_price(
@@ -37,6 +40,9 @@ class MarketDataProvider:
         """
         Get historical stock price data (OHLCV).
 
+        Bars are read from the local price store; only the days it has not
+        downloaded yet are fetched from yfinance.
+
         Args:
             symbol: Stock ticker symbol (e.g., "AAPL", "NVDA")
             start_date: Start date in "YYYY-MM-DD" format
@@ -55,20 +61,16 @@ class MarketDataProvider:
             datetime.strptime(start_date, "%Y-%m-%d")
             datetime.strptime(end_date, "%Y-%m-%d")
 
-            # Create ticker object
-            ticker = yf.Ticker(symbol.upper())
+            symbol = symbol.upper()
+            if not self.price_store.is_fresh(symbol, start_date, end_date):
+                self._download(symbol, start_date, end_date)
 
-            # Fetch historical data
-            data = ticker.history(start=start_date, end=end_date)
+            data = records_to_frame(self.price_store.bars(symbol, start_date, end_date))
 
             if data.empty:
                 logger.warning(f"No data found for {symbol} between {start_date} and {end_date}")
                 return pd.DataFrame()
 
-            # Remove timezone info for consistency
-            if data.index.tz is not None:
-                data.index = data.index.tz_localize(None)
-
             # Round to 2 decimal places
             numeric_columns = ["Open", "High", "Low", "Close"]
             for col in numeric_columns:
@@ -82,6 +84,35 @@ class MarketDataProvider:
             logger.error(f"Error fetching stock data for {symbol}: {e}")
             raise
 
+    def _download(self, symbol: str, start_date: str, end_date: str) -> int:
+        """
+        Download the bars the price store is missing and store them.
+
+        Args:
+            symbol: Stock ticker symbol (upper case)
+            start_date: Start date in "YYYY-MM-DD" format
+            end_date: End date in "YYYY-MM-DD" format
+
+        Returns:
+            Number of bars written
+        """
+        entry = self.price_store.catalog().get(symbol)
+        ticker = yf.Ticker(symbol)
+
+        if entry and entry["last_date"] and start_date >= entry["fetched_from"]:
+            # Only the days since the last stored bar (re-fetched: it may be intraday)
+            data = ticker.history(start=entry["last_date"], end=end_date)
+            written = self.price_store.write(symbol, frame_to_records(data), entry["last_date"], end_date)
+        else:
+            # Reach the stored bars so the covered range has no gap
+            if entry and entry["first_date"]:
+                end_date = max(end_date, entry["first_date"])
+            data = ticker.history(start=start_date, end=end_date)
+            written = self.price_store.write(symbol, frame_to_records(data), start_date, end_date)
+
+        logger.info(f"Stored {written} new bars for {symbol}")
+        return written
+
     def get_latest_price(self, symbol: str) -> Optional[float]:
         """
         Get the latest available price for a symbol.
@@ -93,8 +124,12 @@ class MarketDataProvider:
             Latest closing price or None if unavailable
         """
         try:
-            ticker = yf.Ticker(symbol.upper())
-            data = ticker.history(period="1d")
+            today = datetime.now()
+            data = self.get_stock_price(
+                symbol,
+                (today - timedelta(days=7)).strftime("%Y-%m-%d"),
+                (today + timedelta(days=1)).strftime("%Y-%m-%d"),
+            )
 
             if data.empty:
                 logger.warning(f"No latest price data for {symbol}")
@@ -0,0 +1,254 @@
+"""
+Price Store Module - local memory-mapped daily OHLCV bars
+Keeps downloaded bars on disk so repeat history reads skip yfinance
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import quote
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+RECORD = np.dtype([
+    ("date", "<M8[D]"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+])
+FIELDS = RECORD.names[1:]
+COLUMNS = {"open": "Open", "high": "High", "low": "Low", "close": "Close", "volume": "Volume"}
+CATALOG_FILE = "catalog.json"
+
+
+def frame_to_records(frame: pd.DataFrame) -> np.ndarray:
+    """
+    Convert a yfinance history DataFrame to a sorted record array.
+
+    Args:
+        frame: DataFrame with Open, High, Low, Close, Volume columns
+
+    Returns:
+        Structured array (one bar per date, oldest first)
+    """
+    if frame is None or frame.empty:
+        return np.empty(0, dtype=RECORD)
+    index = frame.index
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    records = np.empty(len(frame), dtype=RECORD)
+    records["date"] = index.values.astype("datetime64[D]")
+    for field, column in COLUMNS.items():
+        records[field] = frame[column].to_numpy(dtype=float) if column in frame.columns else np.nan
+    records = records[np.isfinite(records["close"])]
+    records = records[np.argsort(records["date"], kind="stable")]
+    last_of_day = np.append(records["date"][1:] != records["date"][:-1], True)
+    return records[last_of_day]
+
+
+def records_to_frame(records: np.ndarray) -> pd.DataFrame:
+    """
+    Convert stored records back to a yfinance-style DataFrame.
+
+    Args:
+        records: Structured array from PriceStore.bars()
+
+    Returns:
+        DataFrame with Open, High, Low, Close, Volume on a DatetimeIndex
+    """
+    return pd.DataFrame(
+        {column: np.array(records[field]) for field, column in COLUMNS.items()},
+        index=pd.DatetimeIndex(records["date"], name="Date"),
+    )
+
+
+class PriceStore:
+    """
+    Daily bars per symbol in <cache_dir>/<symbol>.bin (fixed-size records,
+    read with np.memmap) plus a catalog.json of covered date ranges.
+
+    Reads slice the mapped file with a binary search on the dates. Writes
+    append only the bars after the last stored date.
+    """
+
+    def __init__(self, cache_dir: str = "./data/cache", refresh_minutes: float = 15):
+        """
+        Initialize the price store.
+
+        Args:
+            cache_dir: Directory for the bar files and catalog
+            refresh_minutes: How long a symbol counts as up to date after a download
+        """
+        self.cache_dir = cache_dir
+        self.refresh_seconds = refresh_minutes * 60
+        self._maps: Dict[str, Tuple[tuple, np.ndarray]] = {}
+        self._lock = threading.RLock()
+
+    def _path(self, symbol: str) -> str:
+        return os.path.join(self.cache_dir, quote(symbol, safe="") + ".bin")
+
+    def bars(self, symbol: str, start: Optional[str] = None, end: Optional[str] = None) -> np.ndarray:
+        """
+        Stored bars with start <= date < end (read-only, oldest first).
+
+        Args:
+            symbol: Ticker symbol
+            start: First date "YYYY-MM-DD" (inclusive)
+            end: Last date "YYYY-MM-DD" (exclusive, like yfinance)
+
+        Returns:
+            Structured array of bars (empty if nothing is stored)
+        """
+        path = self._path(symbol)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return np.empty(0, dtype=RECORD)
+
+        version = (stat.st_ino, stat.st_size)
+        with self._lock:
+            cached = self._maps.get(symbol)
+            if cached is None or cached[0] != version:
+                rows = stat.st_size // RECORD.itemsize
+                data = np.memmap(path, dtype=RECORD, mode="r", shape=(rows,)) if rows else np.empty(0, dtype=RECORD)
+                self._maps[symbol] = cached = (version, data)
+        data = cached[1]
+
+        dates = data["date"]
+        lo = 0 if start is None else np.searchsorted(dates, np.datetime64(start, "D"))
+        hi = len(data) if end is None else np.searchsorted(dates, np.datetime64(end, "D"))
+        return data[lo:hi]
+
+    def catalog(self) -> Dict[str, Dict]:
+        """
+        Get the catalog of stored symbols.
+
+        Returns:
+            Dictionary mapping symbol to {first_date, last_date, rows,
+            fetched_from, fetched_to, checked_at}; downloads covered
+            [fetched_from, fetched_to)
+        """
+        try:
+            with open(os.path.join(self.cache_dir, CATALOG_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def is_fresh(self, symbol: str, start: str, end: str) -> bool:
+        """
+        Check whether stored bars cover [start, end) without a download.
+
+        Args:
+            symbol: Ticker symbol
+            start: Start date in "YYYY-MM-DD" format
+            end: End date in "YYYY-MM-DD" format
+
+        Returns:
+            True if the range was downloaded before; a range reaching today
+            also needs a download within the refresh interval
+        """
+        entry = self.catalog().get(symbol)
+        if not entry or start < entry["fetched_from"]:
+            return False
+        today = datetime.now().strftime("%Y-%m-%d")
+        if end <= today:
+            return end <= entry["fetched_to"]
+        return entry["fetched_to"] >= today and time.time() - entry["checked_at"] < self.refresh_seconds
+
+    def write(self, symbol: str, records: np.ndarray, fetched_from: str, fetched_to: str) -> int:
+        """
+        Store downloaded bars.
+
+        Bars older than the last stored date are skipped and that date is
+        overwritten. With fetched_from earlier than the stored coverage, the
+        bars are merged with the stored ones and the file is rewritten.
+
+        Args:
+            symbol: Ticker symbol
+            records: Structured array from frame_to_records()
+            fetched_from: First date the download covered
+            fetched_to: End date of the download (exclusive)
+
+        Returns:
+            Number of bars written
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(symbol)
+        with self._lock:
+            stored = self.bars(symbol)
+            entry = self.catalog().get(symbol, {})
+            backfill = fetched_from < entry.get("fetched_from", "9999")
+
+            if backfill or not len(stored):
+                merged = np.concatenate([records, stored[stored["date"] > records["date"][-1]]]) if len(records) else stored
+                written = len(records)
+                if written:
+                    tmp = f"{path}.tmp"
+                    merged.tofile(tmp)
+                    os.replace(tmp, path)
+            else:
+                last = stored["date"][-1]
+                new = records[records["date"] >= last]
+                offset = len(stored) - 1 if len(new) and new["date"][0] == last else len(stored)
+                written = len(new)
+                if written:
+                    with open(path, "r+b") as f:
+                        f.seek(offset * RECORD.itemsize)
+                        f.write(new.tobytes())
+
+            stored = self.bars(symbol)
+            # Today's bar may still change: coverage ends before today
+            fetched_to = min(fetched_to, datetime.now().strftime("%Y-%m-%d"))
+            self._update_catalog(symbol, {
+                "first_date": str(stored["date"][0]) if len(stored) else None,
+                "last_date": str(stored["date"][-1]) if len(stored) else None,
+                "rows": len(stored),
+                "fetched_from": min(fetched_from, entry.get("fetched_from", fetched_from)),
+                "fetched_to": max(fetched_to, entry.get("fetched_to", fetched_to)),
+                "checked_at": time.time(),
+            })
+        return written
+
+    def _update_catalog(self, symbol: str, entry: Dict):
+        catalog = self.catalog()
+        catalog[symbol] = entry
+        path = os.path.join(self.cache_dir, CATALOG_FILE)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(catalog, f)
+        os.replace(tmp, path)
+
+    def panel(self, symbols: List[str], field: str = "close", days: int = 252) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Get one field for many symbols aligned on common dates.
+
+        Args:
+            symbols: Ticker symbols
+            field: open, high, low, close or volume
+            days: Number of most recent trading days
+
+        Returns:
+            (dates, values) where values is a (dates x symbols) array holding
+            each symbol's last bar on or before every date (NaN before its first bar)
+        """
+        series = [self.bars(symbol) for symbol in symbols]
+        tails = [data["date"][-days:] for data in series if len(data)]
+        if not tails:
+            return np.array([], dtype="datetime64[D]"), np.empty((0, len(symbols)))
+
+        dates = np.unique(np.concatenate(tails))[-days:]
+        values = np.full((len(dates), len(symbols)), np.nan)
+        for j, data in enumerate(series):
+            if len(data):
+                at = np.searchsorted(data["date"], dates, side="right") - 1
+                values[at >= 0, j] = data[field][at[at >= 0]]
+        return dates, values